@@ -1,9 +1,11 @@
+from http import HTTPStatus
 from datetime import date
 from urllib.parse import urljoin
 
 from env_utils import EnvUtils
 from current_limit_config_dto import CurrentLimitConfigDto
 from current_limit_settings_dto import CurrentLimitSettingsDto
+from http_etag_cache import HttpEtagCache
 from http_session_singleton_async import HttpSessionSingletonAsync
 
 class CurrentLimitHelper:
@@ -14,17 +16,13 @@ class CurrentLimitHelper:
   async def load_config() -> CurrentLimitConfigDto:
     server_url = EnvUtils.get_remote_cache_server_url()
     url = urljoin(server_url, CurrentLimitHelper.CURRENT_LIMIT_CONFIG_URL)
-    session = await HttpSessionSingletonAsync.get_session()
-
-    async with session.get(url) as response:
-      response.raise_for_status()
-      payload = await response.text()
-      config = CurrentLimitConfigDto.from_json(payload)
+    payload = await CurrentLimitHelper._get_payload(url)
+    config = CurrentLimitConfigDto.from_json(payload)
 
-      today = date.today()
-      config.dont_regulate_dates = [d for d in config.dont_regulate_dates if d >= today]
+    today = date.today()
+    config.dont_regulate_dates = [d for d in config.dont_regulate_dates if d >= today]
 
-      return config
+    return config
 
   @staticmethod
   async def save_config(config: CurrentLimitConfigDto) -> None:
@@ -42,12 +40,8 @@ class CurrentLimitHelper:
   async def load_settings() -> CurrentLimitSettingsDto:
     server_url = EnvUtils.get_remote_cache_server_url()
     url = urljoin(server_url, CurrentLimitHelper.CURRENT_LIMIT_SETTINGS_URL)
-    session = await HttpSessionSingletonAsync.get_session()
-
-    async with session.get(url) as response:
-      response.raise_for_status()
-      payload = await response.text()
-      return CurrentLimitSettingsDto.from_json(payload)
+    payload = await CurrentLimitHelper._get_payload(url)
+    return CurrentLimitSettingsDto.from_json(payload)
 
   @staticmethod
   async def save_settings(settings: CurrentLimitSettingsDto) -> None:
@@ -65,3 +59,21 @@ class CurrentLimitHelper:
     session = await HttpSessionSingletonAsync.get_session()
     async with session.get(url) as response:
       response.raise_for_status()
+
+  @staticmethod
+  async def _get_payload(url: str) -> str:
+    """
+    Returns the payload at url. The last payload is reused if it wasn't changed on the server
+    """
+    session = await HttpSessionSingletonAsync.get_session()
+
+    async with session.get(url, headers = HttpEtagCache.get_headers(url)) as response:
+      if response.status == HTTPStatus.NOT_MODIFIED:
+        payload = HttpEtagCache.get_body(url)
+        if payload is not None:
+          return payload
+
+      response.raise_for_status()
+      payload = await response.text()
+      HttpEtagCache.put(url, response.headers.get("ETag"), payload)
+      return payload
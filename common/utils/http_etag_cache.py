@@ -0,0 +1,65 @@
+import threading
+
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+class HttpEtagCache:
+  """
+  Keeps the last response body with its ETag for conditional GET requests.
+
+  Usage:
+    headers = HttpEtagCache.get_headers(url)
+    ... send the request with headers ...
+    if status is 304: body = HttpEtagCache.get_body(url)
+    else: HttpEtagCache.put(url, response ETag, body)
+
+  Cache key should contain everything which changes the body (url and query).
+  Least recently used bodies are dropped above max_entries.
+  """
+  max_entries = 256
+
+  _lock = threading.Lock()
+  _entries: 'OrderedDict[str, Tuple[str, str]]' = OrderedDict()
+
+  @classmethod
+  def get_headers(cls, cache_key: str) -> Dict[str, str]:
+    """
+    Returns If-None-Match header with the saved ETag, or empty dict
+    """
+    with cls._lock:
+      entry = cls._entries.get(cache_key)
+    return {"If-None-Match": entry[0]} if entry is not None else {}
+
+  @classmethod
+  def get_body(cls, cache_key: str) -> Optional[str]:
+    """
+    Returns the saved body, should be called when the server responds with 304
+    """
+    with cls._lock:
+      entry = cls._entries.get(cache_key)
+      if entry is None:
+        return None
+
+      cls._entries.move_to_end(cache_key)
+      return entry[1]
+
+  @classmethod
+  def put(cls, cache_key: str, etag: Optional[str], body: str) -> None:
+    """
+    Saves the body with its ETag. Responses without ETag are not saved
+    """
+    with cls._lock:
+      if not etag:
+        cls._entries.pop(cache_key, None)
+        return
+
+      cls._entries[cache_key] = (etag, body)
+      cls._entries.move_to_end(cache_key)
+
+      while len(cls._entries) > cls.max_entries:
+        cls._entries.popitem(last = False)
+
+  @classmethod
+  def remove(cls, cache_key: str) -> None:
+    with cls._lock:
+      cls._entries.pop(cache_key, None)
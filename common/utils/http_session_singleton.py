@@ -1,9 +1,90 @@
+import socket
 import requests
 import atexit
 import logging
 import threading
 
-from typing import Optional
+from typing import Any, Dict, Optional
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+
+from unix_socket_url import UnixSocketUrl
+
+class UnixSocketConnection(HTTPConnection):
+  """
+  HTTP connection over a Unix domain socket
+  """
+  def __init__(self, *args: Any, socket_path: str, **kwargs: Any):
+    super().__init__(*args, **kwargs)
+    self._socket_path = socket_path
+
+  def _new_conn(self) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    if isinstance(self.timeout, (int, float)):
+      sock.settimeout(self.timeout)
+    try:
+      sock.connect(self._socket_path)
+    except OSError:
+      sock.close()
+      raise
+    return sock
+
+class UnixSocketConnectionPool(HTTPConnectionPool):
+  ConnectionCls = UnixSocketConnection
+
+class UnixSocketAdapter(HTTPAdapter):
+  """
+  Transport adapter which sends requests to unix:// URLs over Unix domain sockets
+  """
+  def __init__(self):
+    super().__init__()
+    self._pools_lock = threading.Lock()
+    self._socket_pools: Dict[str, UnixSocketConnectionPool] = {}
+
+  def get_connection_with_tls_context(self, request, verify, proxies = None, cert = None):
+    return self._get_pool(request.url)
+
+  def get_connection(self, url, proxies = None):
+    return self._get_pool(url)
+
+  def request_url(self, request, proxies) -> str:
+    # The socket is the host, proxies aren't used
+    return request.path_url
+
+  def close(self):
+    super().close()
+    with self._pools_lock:
+      for pool in self._socket_pools.values():
+        pool.close()
+      self._socket_pools.clear()
+
+  def _get_pool(self, url: str) -> UnixSocketConnectionPool:
+    socket_path = UnixSocketUrl.get_socket_path(url)
+    with self._pools_lock:
+      pool = self._socket_pools.get(socket_path)
+      if pool is None:
+        # Host header is 'localhost', the socket path is passed to the connections
+        pool = UnixSocketConnectionPool("localhost", maxsize = DEFAULT_POOLSIZE, socket_path = socket_path)
+        self._socket_pools[socket_path] = pool
+      return pool
+
+class HttpSession(requests.Session):
+  """
+  requests.Session which also accepts unix:// URLs (see UnixSocketUrl)
+  """
+  # requests leaves URLs of non-http schemes as is and ignores their params,
+  # so unix:// is sent as http+unix:// to be parsed like http://
+  unix_scheme = "http+unix"
+
+  def __init__(self):
+    super().__init__()
+    self.mount(f"{self.unix_scheme}://", UnixSocketAdapter())
+
+  def request(self, method, url, *args, **kwargs):
+    if isinstance(url, str) and UnixSocketUrl.is_unix(url):
+      url = f"{self.unix_scheme}{url[len(UnixSocketUrl.scheme):]}"
+    return super().request(method, url, *args, **kwargs)
 
 class HttpSessionSingleton:
   """
@@ -23,7 +104,7 @@ class HttpSessionSingleton:
     return cls._instance
 
   def _init_session(self):
-    self._session = requests.Session()
+    self._session = HttpSession()
     logging.getLogger().info("Created shared HTTP session.")
     atexit.register(self._close_session)
 
@@ -3,10 +3,37 @@ import asyncio
 import logging
 
 from typing import Optional
+from aiohttp.client_exceptions import UnixClientConnectorError
+
+from unix_socket_url import UnixSocketUrl
+
+class UnixSocketConnector(aiohttp.TCPConnector):
+  """
+  TCP connector which also connects to unix:// URLs over Unix domain sockets
+  """
+  allowed_protocol_schema_set = aiohttp.TCPConnector.allowed_protocol_schema_set | frozenset({UnixSocketUrl.scheme})
+
+  async def _create_connection(self, req, traces, timeout):
+    if req.url.scheme != UnixSocketUrl.scheme:
+      return await super()._create_connection(req, traces, timeout)
+
+    socket_path = UnixSocketUrl.get_socket_path(str(req.url))
+    try:
+      _, proto = await asyncio.wait_for(
+        self._loop.create_unix_connection(self._factory, socket_path),
+        timeout.sock_connect,
+      )
+    except asyncio.TimeoutError:
+      raise
+    except OSError as e:
+      raise UnixClientConnectorError(socket_path, req.connection_key, e) from e
+
+    return proto
 
 class HttpSessionSingletonAsync:
   """
   Async singleton for a shared aiohttp.ClientSession.
+  The session also accepts unix:// URLs (see UnixSocketUrl).
   """
   _lock = asyncio.Lock()
   _instance: Optional["HttpSessionSingletonAsync"] = None
@@ -22,7 +49,7 @@ class HttpSessionSingletonAsync:
     async with cls._lock:
       if cls._session is None or cls._session.closed:
         timeout = aiohttp.ClientTimeout(total = 10)
-        cls._session = aiohttp.ClientSession(timeout = timeout)
+        cls._session = aiohttp.ClientSession(timeout = timeout, connector = UnixSocketConnector())
         logging.getLogger().info("Created shared aiohttp session.")
     return cls._session
 
@@ -0,0 +1,32 @@
+from urllib.parse import quote, unquote, urlsplit, uses_netloc, uses_relative
+
+class UnixSocketUrl:
+  """
+  URLs of HTTP servers listening on a Unix domain socket.
+
+  The socket path is the percent-encoded host of the URL, so the URL of an endpoint
+  can be made with urljoin() the same way as for TCP servers:
+    unix://%2Fsockets%2Fdeye-storage.sock/cache/key
+  is GET /cache/key sent to the server listening on /sockets/deye-storage.sock
+
+  Hosts are case-insensitive, so URL parsers may lowercase socket paths,
+  which should be lowercase for this reason.
+  """
+  scheme = "unix"
+
+  @staticmethod
+  def is_unix(url: str) -> bool:
+    return url.lower().startswith(f"{UnixSocketUrl.scheme}://")
+
+  @staticmethod
+  def from_path(socket_path: str) -> str:
+    return f"{UnixSocketUrl.scheme}://{quote(socket_path, safe = '')}"
+
+  @staticmethod
+  def get_socket_path(url: str) -> str:
+    return unquote(urlsplit(url).netloc)
+
+# Let urljoin() replace the path of unix:// URLs and keep the host (socket path)
+for schemes in (uses_relative, uses_netloc):
+  if UnixSocketUrl.scheme not in schemes:
+    schemes.append(UnixSocketUrl.scheme)
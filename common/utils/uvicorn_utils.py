@@ -0,0 +1,42 @@
+import os
+import socket
+import uvicorn
+
+from typing import Any
+from uvicorn.supervisors import Multiprocess
+
+class UvicornUtils:
+  @staticmethod
+  def run(app: Any, host: str, port: int, socket_path: str = "", **kwargs: Any) -> None:
+    """
+    Runs the app like uvicorn.run() on the TCP port and, if socket_path is set,
+    also on a Unix domain socket, so co-located services can bypass the TCP stack
+    """
+    if not socket_path:
+      uvicorn.run(app, host = host, port = port, **kwargs)
+      return
+
+    config = uvicorn.Config(app, host = host, port = port, **kwargs)
+    sockets = [config.bind_socket(), UvicornUtils._bind_unix_socket(socket_path)]
+
+    if config.workers > 1:
+      Multiprocess(config, sockets = sockets).run()
+    else:
+      uvicorn.Server(config).run(sockets = sockets)
+
+  @staticmethod
+  def _bind_unix_socket(socket_path: str) -> socket.socket:
+    directory = os.path.dirname(socket_path)
+    if directory:
+      os.makedirs(directory, exist_ok = True)
+
+    # Socket file is left after the previous run, as uvicorn re-raises
+    # the stop signal when it exits
+    if os.path.exists(socket_path):
+      os.remove(socket_path)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(socket_path)
+    # Clients in other containers run as other users
+    os.chmod(socket_path, 0o666)
+    return sock
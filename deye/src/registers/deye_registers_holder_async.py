@@ -9,7 +9,9 @@ from deye_registers import DeyeRegisters
 from deye_exceptions import DeyeValueException
 from deye_modbus_interactor import DeyeModbusInteractor
 from deye_registers_holder import DeyeRegistersHolder
+from deye_register_cache_data import DeyeRegisterCacheData
 from deye_register_cache_hit_rate import DeyeRegisterCacheHitRate
+from deye_register_cache_tier_stat import DeyeRegisterCacheTierStat
 from deye_modbus_interactor_async import DeyeModbusInteractorAsync
 
 class DeyeRegistersHolderAsync(DeyeRegistersHolder):
@@ -63,6 +65,20 @@ class DeyeRegistersHolderAsync(DeyeRegistersHolder):
   def cache_hit_rates(self) -> Dict[str, DeyeRegisterCacheHitRate]:
     return {interactor.name: interactor.cache_hit_rate for interactor in self._interactors}
 
+  @property
+  def data_ages(self) -> Dict[str, float]:
+    """
+    Age in seconds of the oldest register value got on the last read, per inverter
+    """
+    return {interactor.name: interactor.data_age for interactor in self._interactors}
+
+  @property
+  def cache_tier_stats(self) -> Dict[str, Dict[str, DeyeRegisterCacheTierStat]]:
+    """
+    Process-wide number of registers got from memory and storage cache, per inverter
+    """
+    return {interactor.name: interactor.cache_tier_stats for interactor in self._interactors}
+
   async def get_cache_hit_rates(self) -> Dict[str, DeyeRegisterCacheHitRate]:
     # Create a list of coroutines
     tasks = [interactor.get_cache_hit_rate() for interactor in self._interactors]
@@ -86,22 +102,27 @@ class DeyeRegistersHolderAsync(DeyeRegistersHolder):
     tasks: List[asyncio.Task[None]] = []
 
     try:
-      # Enqueue and create tasks for all interactors
+      # Enqueue registers for all interactors
       for interactor in self._interactors:
         try:
           for register in registers:
             register.enqueue(interactor)
-
-          # Create an asyncio task for the interactor's processing logic
-          # Using create_task starts execution immediately in the event loop
-          coro = interactor.process_enqueued_registers()
-          task = asyncio.create_task(coro, name = interactor.name)
-
-          tasks.append(task)
         except Exception as e:
           raise DeyeUtils.get_reraised_exception(
             e, f'{type(self).__name__}: error while enqueueing {interactor.name}') from e
 
+      # Read cached registers for all interactors with one request if possible
+      cached_registers = await self._get_cached_registers_batch()
+
+      # Create tasks for all interactors
+      for interactor in self._interactors:
+        # Create an asyncio task for the interactor's processing logic
+        # Using create_task starts execution immediately in the event loop
+        coro = interactor.process_enqueued_registers(cached_registers = cached_registers.get(interactor.name))
+        task = asyncio.create_task(coro, name = interactor.name)
+
+        tasks.append(task)
+
       if not tasks:
         return
 
@@ -171,6 +192,14 @@ class DeyeRegistersHolderAsync(DeyeRegistersHolder):
         raise DeyeUtils.get_reraised_exception(
           e, f'{type(self).__name__}: error while reading register {register.name}') from e
 
+  async def _get_cached_registers_batch(self) -> Dict[str, Dict[int, DeyeRegisterCacheData]]:
+    try:
+      return await DeyeModbusInteractorAsync.get_cached_registers_batch(self._interactors)
+    except Exception as e:
+      # Not critical, each interactor will read the cache by itself
+      self._log.warning(f'{type(self).__name__}: batch cache read failed: {e}')
+      return {}
+
   async def write_register(self, register: DeyeRegister, value) -> None:
     if self._master_interactor == None:
       raise DeyeValueException(f'{type(self).__name__}: need to set master inverter before write')
@@ -62,6 +62,13 @@ class DeyeRegistersHolderSync(DeyeRegistersHolder):
   def cache_hit_rates(self) -> Dict[str, DeyeRegisterCacheHitRate]:
     return {interactor.name: interactor.cache_hit_rate for interactor in self._interactors}
 
+  @property
+  def data_ages(self) -> Dict[str, float]:
+    """
+    Age in seconds of the oldest register value got on the last read, per inverter
+    """
+    return {interactor.name: interactor.data_age for interactor in self._interactors}
+
   def get_cache_hit_rates(self) -> Dict[str, DeyeRegisterCacheHitRate]:
     return {interactor.name: interactor.get_cache_hit_rate() for interactor in self._interactors}
 
@@ -0,0 +1,103 @@
+from array import array
+from bisect import bisect_right
+from typing import Iterable, List, Optional
+
+from deye_register_cache_data import DeyeRegisterCacheData
+
+class DeyeRegisterBank:
+  """
+  Compact image of register values read from one inverter.
+
+  Registers are merged into disjoint address intervals which are stored
+  back-to-back in a single array('H'). A sorted index of interval starts
+  allows to find any register in O(log n) and to return its values as
+  a zero-copy memoryview slice, even if the register was read in pieces.
+  """
+  def __init__(self):
+    self._starts: List[int] = []
+    self._ends: List[int] = []
+    self._offsets: List[int] = []
+    self._values = array('H')
+
+  def __len__(self) -> int:
+    return len(self._values)
+
+  def load(self, registers: Iterable[DeyeRegisterCacheData]) -> None:
+    """
+    Rebuilds the bank from registers. For overlapping registers the later one wins.
+    """
+    regs = list(registers)
+
+    self._starts = []
+    self._ends = []
+    self._offsets = []
+
+    # Merge overlapping and adjacent registers into disjoint intervals
+    for reg in sorted(regs, key = lambda r: r.address):
+      if not reg.quantity:
+        continue
+
+      end = reg.address + reg.quantity
+      if self._ends and reg.address <= self._ends[-1]:
+        self._ends[-1] = max(self._ends[-1], end)
+      else:
+        self._offsets.append(self._offsets[-1] + self._ends[-1] - self._starts[-1] if self._starts else 0)
+        self._starts.append(reg.address)
+        self._ends.append(end)
+
+    size = self._offsets[-1] + self._ends[-1] - self._starts[-1] if self._starts else 0
+    self._values = array('H', bytes(2 * size))
+
+    for reg in regs:
+      if not reg.quantity:
+        continue
+
+      offset = self._get_offset(reg.address)
+      # Inverter registers are unsigned 16-bit
+      self._values[offset:offset + reg.quantity] = array('H', (value & 0xFFFF for value in reg.values))
+
+  def clear(self) -> None:
+    self.load([])
+
+  def get_view(self, address: int, quantity: int) -> Optional[memoryview]:
+    """
+    Returns zero-copy view of register values or None if the range is not fully loaded
+    """
+    index = bisect_right(self._starts, address) - 1
+    if index < 0 or address + quantity > self._ends[index]:
+      return None
+
+    offset = self._offsets[index] + address - self._starts[index]
+    return memoryview(self._values)[offset:offset + quantity]
+
+  def get_values(self, address: int, quantity: int) -> List[int]:
+    """
+    Returns register values. Values which are not loaded are returned as zeros.
+    """
+    view = self.get_view(address, quantity)
+    if view is not None:
+      return view.tolist()
+
+    result = [0] * quantity
+    end = address + quantity
+
+    index = max(0, bisect_right(self._starts, address) - 1)
+
+    # Copy every loaded interval which overlaps requested range
+    while index < len(self._starts) and self._starts[index] < end:
+      intersect_start = max(address, self._starts[index])
+      intersect_end = min(end, self._ends[index])
+
+      if intersect_start < intersect_end:
+        src_offset = self._offsets[index] + intersect_start - self._starts[index]
+        dest_offset = intersect_start - address
+        length = intersect_end - intersect_start
+        result[dest_offset:dest_offset + length] = self._values[src_offset:src_offset + length].tolist()
+
+      index += 1
+
+    return result
+
+  def _get_offset(self, address: int) -> int:
+    index = bisect_right(self._starts, address) - 1
+    return self._offsets[index] + address - self._starts[index]
@@ -5,6 +5,8 @@ from deye_exceptions import DeyeCacheException
 
 class DeyeRegisterCacheData:
   """Container for register data and its caching metadata."""
+  __slots__ = ('_address', '_quantity', '_caching_time', '_read_ts', '_values')
+
   def __init__(
     self,
     address: int,
@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+from typing import Dict
+from dataclasses import dataclass, field
 
 @dataclass
 class DeyeRegisterCacheHitRate:
@@ -6,6 +7,8 @@ class DeyeRegisterCacheHitRate:
   got_from_inverter_count: int
   total_count: int
   cache_hit_rate: float
+  # Hit rates of the recent reads by window name ('1m', '15m', '24h')
+  windowed_cache_hit_rates: Dict[str, float] = field(default_factory = dict)
 
   @property
   def cache_hit_rate_percent(self) -> int:
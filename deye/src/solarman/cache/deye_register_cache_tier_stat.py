@@ -0,0 +1,14 @@
+from dataclasses import dataclass
+
+@dataclass
+class DeyeRegisterCacheTierStat:
+  hits: int = 0
+  misses: int = 0
+
+  @property
+  def hit_rate_percent(self) -> int:
+    total = self.hits + self.misses
+    return round(self.hits / total * 100) if total else 0
+
+  def __str__(self) -> str:
+    return f"{self.hit_rate_percent}% {self.hits}/{self.hits + self.misses}"
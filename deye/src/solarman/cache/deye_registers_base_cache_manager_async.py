@@ -3,7 +3,7 @@ import json
 import time
 import logging
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from abc import ABC, abstractmethod
 from contextlib import asynccontextmanager
@@ -32,7 +32,17 @@ class DeyeRegistersBaseCacheManagerAsync(ABC):
     self,
     registers_to_check: Dict[int, DeyeRegisterCacheData],
     current_ts: float,
+    stale_time: int = 0,
   ) -> Dict[int, DeyeRegisterCacheData]:
+    """
+    Returns registers which are still valid in the cache.
+
+    Args:
+      registers_to_check: registers to look up, keyed by address.
+      current_ts: current timestamp in seconds.
+      stale_time: how many seconds after caching_time expiry a register is still returned.
+        Callers should check read_ts of the returned registers to find the stale ones.
+    """
     start_time = time.perf_counter()
     results: Dict[int, DeyeRegisterCacheData] = {}
 
@@ -40,45 +50,22 @@ class DeyeRegistersBaseCacheManagerAsync(ABC):
       content: Optional[str] = None
 
       async with self._shared_lock_context():
-        content = await self._get_json()
-        if not content or not content.strip():
-          return results
+        content = await self._get_json(addresses = list(registers_to_check.keys()))
+
+      if not content or not content.strip():
+        return results
 
       try:
         cache_content = json.loads(content)
       except (json.JSONDecodeError, ValueError) as e:
         raise DeyeCacheException(f"{self._name}: cache json parse error after get: {e}") from e
 
-      current_time = int(current_ts * self._ts_multiplier)
-      cached_registry = cache_content.get("registers", {})
-
-      # Iterate through the registers we are interested in
-      for addr, reg in registers_to_check.items():
-        self._check_address_match(addr, reg.address)
-        addr_str = str(addr)
-        if addr_str in cached_registry:
-          entry = cached_registry[addr_str]
-          cached_time = entry.get("ts_label", 0)
-
-          # Check if the cached data is still valid by time duration
-          if (current_time - cached_time) > (reg.caching_time * self._ts_multiplier):
-            continue
-
-          # Check if midnight was crossed since the last cache update
-          # Cache becomes invalid if a new day has started
-          if not DeyeUtils.is_same_day(cached_time, current_time):
-            continue
-
-          try:
-            raw_data = entry.get("data", [])
-            results[addr] = DeyeRegisterCacheData(
-              address = reg.address,
-              quantity = reg.quantity,
-              caching_time = reg.caching_time,
-              values = raw_data[:reg.quantity],
-            )
-          except Exception as eee:
-            self._logger.warning("%s: wrong cached register skipped: %s", self._name, eee)
+      results = self._get_valid_registers(
+        cache_content = cache_content,
+        registers_to_check = registers_to_check,
+        current_ts = current_ts,
+        stale_time = stale_time,
+      )
     except DeyeKnownException as e:
       self._logger.error("%s: cache read error: %s", self._name, e, exc_info = True)
       raise
@@ -94,6 +81,55 @@ class DeyeRegistersBaseCacheManagerAsync(ABC):
 
     return results
 
+  def _get_valid_registers(
+    self,
+    cache_content: Dict[str, Any],
+    registers_to_check: Dict[int, DeyeRegisterCacheData],
+    current_ts: float,
+    stale_time: int = 0,
+  ) -> Dict[int, DeyeRegisterCacheData]:
+    """
+    Returns registers from the parsed cache content which are still valid
+    """
+    results: Dict[int, DeyeRegisterCacheData] = {}
+
+    current_time = int(current_ts * self._ts_multiplier)
+    cached_registry = cache_content.get("registers", {})
+
+    # Iterate through the registers we are interested in
+    for addr, reg in registers_to_check.items():
+      self._check_address_match(addr, reg.address)
+      addr_str = str(addr)
+      if addr_str in cached_registry:
+        entry = cached_registry[addr_str]
+        cached_time = entry.get("ts_label", 0)
+
+        # Registers without caching time are never served stale
+        max_age = reg.caching_time + (stale_time if reg.caching_time > 0 else 0)
+
+        # Check if the cached data is still valid by time duration
+        if (current_time - cached_time) > (max_age * self._ts_multiplier):
+          continue
+
+        # Check if midnight was crossed since the last cache update
+        # Cache becomes invalid if a new day has started
+        if not DeyeUtils.is_same_day(cached_time, current_time):
+          continue
+
+        try:
+          raw_data = entry.get("data", [])
+          results[addr] = DeyeRegisterCacheData(
+            address = reg.address,
+            quantity = reg.quantity,
+            caching_time = reg.caching_time,
+            read_ts = cached_time / self._ts_multiplier,
+            values = raw_data[:reg.quantity],
+          )
+        except Exception as eee:
+          self._logger.warning("%s: wrong cached register skipped: %s", self._name, eee)
+
+    return results
+
   async def save_to_cache(
     self,
     registers_to_save: Dict[int, DeyeRegisterCacheData],
@@ -129,6 +165,7 @@ class DeyeRegistersBaseCacheManagerAsync(ABC):
           # Store using the address as a string key for JSON compatibility
           cache_content["registers"][str(addr)] = {
             "ts_label": int(reg.read_ts * self._ts_multiplier),
+            "ttl": reg.caching_time,
             "data": reg.values,
           }
 
@@ -201,6 +238,7 @@ class DeyeRegistersBaseCacheManagerAsync(ABC):
           self._check_address_match(addr, registers_to_remove[addr].address)
           cache_content["registers"][str(addr)] = {
             "ts_label": int(reg.read_ts * self._ts_multiplier),
+            "ttl": reg.caching_time,
             "data": [], # Just pass empty data. Register will be skipped on the next read cycle
           }
 
@@ -272,10 +310,11 @@ class DeyeRegistersBaseCacheManagerAsync(ABC):
     yield
 
   @abstractmethod
-  async def _get_json(self) -> str:
+  async def _get_json(self, addresses: Optional[List[int]] = None) -> str:
     """
     Used for general data retrieval.
     Fetches the current state of the cache to be used for reading and displaying data.
+    Storage backend can return only registers at the specified addresses (if any).
     """
     pass
 
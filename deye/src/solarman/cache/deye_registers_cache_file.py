@@ -0,0 +1,174 @@
+import mmap
+import struct
+import logging
+
+from contextlib import contextmanager
+from typing import IO, Any, Dict, Iterable, Iterator, Optional
+
+class DeyeRegistersCacheFile:
+  """
+  Fixed layout binary file with cached registers, accessed through mmap.
+
+  The file has a header followed by one slot per modbus address, so any register
+  is read or written without touching the rest of the file. Every slot contains:
+    - sequence counter: odd while the slot is being written (seqlock)
+    - generation: slot is empty if it differs from the header generation
+    - read timestamp (ts_label) in milliseconds
+    - quantity and values
+
+  Readers don't lock the file: they retry if the slot sequence is odd or has changed
+  while reading. Writers should hold an exclusive lock on the file to exclude each other.
+  Reset just increments the header generation, so all slots become empty at once.
+
+  Unused slots are never written, so the file is sparse on most file systems.
+  """
+  magic = b'DEYEREGS'
+  version = 1
+  max_values = 16
+  slot_count = 0x10000
+
+  _header_format = '<8sIIIIQ'
+  _header_size = 64
+  _generation_offset = struct.calcsize('<8sIIII')
+  _seq_format = '<I'
+  _seq_size = struct.calcsize(_seq_format)
+  _body_format = f'<IqHH{max_values}H'
+  _slot_size = _seq_size + struct.calcsize(_body_format)
+  _read_retries = 100
+
+  file_size = _header_size + slot_count * _slot_size
+
+  def __init__(self, mm: mmap.mmap):
+    self._mm = mm
+    self._log = logging.getLogger()
+
+  @classmethod
+  @contextmanager
+  def map(cls, f: IO[Any], writable: bool) -> Iterator[Optional['DeyeRegistersCacheFile']]:
+    """
+    Maps opened file into memory. Yields None if the file is not initialized and not writable.
+    Writable file is (re)initialized if needed, so the caller should hold an exclusive lock.
+    """
+    f.seek(0, 2)
+    is_valid = f.tell() >= cls.file_size and cls._is_header_valid(f)
+
+    if not is_valid:
+      if not writable:
+        yield None
+        return
+
+      cls._initialize(f)
+
+    mm = mmap.mmap(f.fileno(), cls.file_size, access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+    try:
+      yield cls(mm)
+    finally:
+      mm.close()
+
+  def read(self, addresses: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    Returns registers by address in the cache JSON format: {"ts_label": ..., "data": [...]}.
+    All registers are returned if addresses are not specified.
+    """
+    generation = self._get_generation()
+    results: Dict[int, Dict[str, Any]] = {}
+
+    for address in (range(self.slot_count) if addresses is None else addresses):
+      if not 0 <= address < self.slot_count:
+        continue
+
+      entry = self._read_slot(address, generation)
+      if entry is not None:
+        results[address] = entry
+
+    return results
+
+  def write(self, entries: Dict[int, Dict[str, Any]]) -> None:
+    """
+    Writes registers in the cache JSON format. Only touched slots are updated.
+    """
+    generation = self._get_generation()
+
+    for address, entry in entries.items():
+      values = entry.get("data") or []
+
+      if not 0 <= address < self.slot_count or len(values) > self.max_values:
+        self._log.warning(f"{type(self).__name__}: register at address {address} "
+                          f"with {len(values)} values can't be cached")
+        continue
+
+      self._write_slot(address, generation, int(entry.get("ts_label", 0)), values)
+
+    self._mm.flush()
+
+  def reset(self) -> None:
+    """
+    Makes all slots empty
+    """
+    struct.pack_into('<Q', self._mm, self._generation_offset, self._get_generation() + 1)
+    self._mm.flush()
+
+  def _read_slot(self, address: int, generation: int) -> Optional[Dict[str, Any]]:
+    offset = self._header_size + address * self._slot_size
+
+    for _ in range(self._read_retries):
+      seq = struct.unpack_from(self._seq_format, self._mm, offset)[0]
+      if seq & 1:
+        # Slot is being written right now
+        continue
+
+      body = struct.unpack_from(self._body_format, self._mm, offset + self._seq_size)
+
+      if struct.unpack_from(self._seq_format, self._mm, offset)[0] != seq:
+        # Slot was changed while reading
+        continue
+
+      slot_generation, ts_label, quantity = body[0], body[1], body[2]
+      if slot_generation != generation:
+        return None
+
+      return {"ts_label": ts_label, "data": list(body[4:4 + quantity])}
+
+    self._log.warning(f"{type(self).__name__}: register at address {address} is skipped, "
+                      "because it is being written for too long")
+    return None
+
+  def _write_slot(self, address: int, generation: int, ts_label: int, values: list) -> None:
+    offset = self._header_size + address * self._slot_size
+    seq = struct.unpack_from(self._seq_format, self._mm, offset)[0]
+
+    # Odd sequence tells readers the slot is being written.
+    # Sequence could be left odd by a crashed writer, so keep it odd anyway
+    seq = (seq + 1) | 1
+    struct.pack_into(self._seq_format, self._mm, offset, seq & 0xFFFFFFFF)
+
+    padded = [value & 0xFFFF for value in values] + [0] * (self.max_values - len(values))
+    struct.pack_into(self._body_format, self._mm, offset + self._seq_size, generation, ts_label, len(values), 0,
+                     *padded)
+
+    struct.pack_into(self._seq_format, self._mm, offset, (seq + 1) & 0xFFFFFFFF)
+
+  def _get_generation(self) -> int:
+    return struct.unpack_from('<Q', self._mm, self._generation_offset)[0]
+
+  @classmethod
+  def _is_header_valid(cls, f: IO[Any]) -> bool:
+    f.seek(0)
+    header = f.read(struct.calcsize(cls._header_format))
+
+    if len(header) != struct.calcsize(cls._header_format):
+      return False
+
+    magic, version, slot_size, slot_count, max_values, _ = struct.unpack(cls._header_format, header)
+    return ((magic, version, slot_size, slot_count, max_values) == (cls.magic, cls.version, cls._slot_size,
+                                                                    cls.slot_count, cls.max_values))
+
+  @classmethod
+  def _initialize(cls, f: IO[Any]) -> None:
+    f.seek(0)
+    f.truncate(0)
+    # Generation starts from 1, so never written (zero) slots are empty
+    f.write(struct.pack(cls._header_format, cls.magic, cls.version, cls._slot_size, cls.slot_count, cls.max_values,
+                        1))
+    f.truncate(cls.file_size)
+    f.flush()
@@ -1,17 +1,19 @@
 import os
+import json
 
-from typing import IO, Any, Optional
+from typing import List, Optional
 from contextlib import asynccontextmanager
 
 from deye_utils import DeyeUtils
 from deye_file_lock import DeyeFileLock
 from lock_exceptions import DeyeLockNotHeldException
+from deye_registers_cache_file import DeyeRegistersCacheFile
 from deye_registers_base_cache_manager_async import DeyeRegistersBaseCacheManagerAsync
 from deye_register_cache_hit_rate import DeyeRegisterCacheHitRate
 
-# -----------------------------------------------------
-# Class for caching register data locally in JSON files
-# -----------------------------------------------------
+# ------------------------------------------------------------
+# Class for caching register data locally in binary mmap files
+# ------------------------------------------------------------
 class DeyeRegistersLocalCacheManagerAsync(DeyeRegistersBaseCacheManagerAsync):
   def __init__(
     self,
@@ -24,8 +26,9 @@ class DeyeRegistersLocalCacheManagerAsync(DeyeRegistersBaseCacheManagerAsync):
     )
 
     cache_path = DeyeFileLock.lock_path
-    self._cache_filename = os.path.join(cache_path, f"registers-cache-{self._name}-{self._serial}.json")
-    self._active_file: Optional[IO[Any]] = None
+    self._cache_filename = os.path.join(cache_path, f"registers-cache-{self._name}-{self._serial}.bin")
+    self._active_file: Optional[DeyeRegistersCacheFile] = None
+    self._lock_held = False
 
     # Ensure cache directory exists
     DeyeUtils.ensure_dir_exists(cache_path, mode = 0o777)
@@ -38,77 +41,82 @@ class DeyeRegistersLocalCacheManagerAsync(DeyeRegistersBaseCacheManagerAsync):
 
   @asynccontextmanager
   async def _shared_lock_context(self):
-    async with self._lock_internal("r", DeyeFileLock.LOCK_SH):
-      yield
+    # Readers don't lock the file, torn reads are detected by slot sequence counters
+    with open(self._cache_filename, "rb") as f:
+      with DeyeRegistersCacheFile.map(f, writable = False) as cache_file:
+        self._active_file = cache_file
+        self._lock_held = True
+        try:
+          yield
+        finally:
+          self._active_file = None
+          self._lock_held = False
 
   @asynccontextmanager
   async def _exclusive_lock_context(self):
-    async with self._lock_internal("a+", DeyeFileLock.LOCK_EX):
-      yield
-
-  @asynccontextmanager
-  async def _lock_internal(self, mode: str, lock_type: int):
-    f = open(self._cache_filename, mode, encoding = "utf-8")
-    try:
-      await DeyeFileLock.flock_async(f, lock_type)
-      self._active_file = f
-      yield
-    finally:
-      self._active_file = None
+    # Writers still exclude each other
+    with open(self._cache_filename, "r+b") as f:
+      await DeyeFileLock.flock_async(f, DeyeFileLock.LOCK_EX)
       try:
-        DeyeFileLock.flock(f, DeyeFileLock.LOCK_UN)
+        with DeyeRegistersCacheFile.map(f, writable = True) as cache_file:
+          self._active_file = cache_file
+          self._lock_held = True
+          try:
+            yield
+          finally:
+            self._active_file = None
+            self._lock_held = False
       finally:
-        f.close()
+        DeyeFileLock.flock(f, DeyeFileLock.LOCK_UN)
 
-  async def _get_json(self) -> str:
+  async def _get_json(self, addresses: Optional[List[int]] = None) -> str:
     """
     Used for general data retrieval.
     Fetches the current state of the cache to be used for reading and displaying data.
+    Only slots of the specified addresses are read from the cache file.
     """
-    f = self._active_file
-    if not f:
-      raise DeyeLockNotHeldException(f"{type(self).__name__}: "
-                                     "read_json() must be called within a lock context")
+    f = self._get_active_file("get_json")
+    if f is None:
+      # Cache file is not initialized yet
+      return ''
 
-    f.seek(0)
-    return f.read()
+    registers = f.read(addresses)
+
+    return json.dumps({
+      "inverter": self._name,
+      "serial": self._serial,
+      "registers": {str(addr): entry for addr, entry in registers.items()},
+    })
 
   async def _read_json(self) -> str:
     """
-    Used specifically for the read-before-write cycle.
-    Fetches existing data to merge with new updates. Can be overridden to return 
-    an empty string if the storage backend (e.g., a smart server) handles merging automatically.
-    In this case _get_json() and _read_json() have the same implementation because local file storage requires read-modify-write cycle.
+    Returns an empty string because only touched slots are
+    updated in the cache file, so read-modify-write cycle is not required.
     """
-    return await self._get_json()
+    return ''
 
   async def _save_json(self, json_string: str) -> None:
-    f = self._active_file
-    if not f:
+    f = self._get_active_file("save_json")
+    if f is None:
       raise DeyeLockNotHeldException(f"{type(self).__name__}: "
-                                     "save_json() must be called within a lock context")
-
-    # Clear file and save updated structure
-    f.seek(0)
-    f.truncate(0)
+                                     "save_json() must be called within an exclusive lock context")
 
-    # Write the new JSON string to the file
-    f.write(json_string)
-
-    # Flush to physical storage
-    f.flush()
+    registers = json.loads(json_string).get("registers", {})
+    f.write({int(addr): entry for addr, entry in registers.items()})
 
   async def _reset(self) -> None:
-    f = self._active_file
-    if not f:
+    f = self._get_active_file("reset")
+    if f is None:
       raise DeyeLockNotHeldException(f"{type(self).__name__}: "
-                                     "save_json() must be called within a lock context")
-    # Clear file
-    f.seek(0)
-    f.truncate(0)
+                                     "reset() must be called within an exclusive lock context")
+    f.reset()
 
-    # Flush to physical storage
-    f.flush()
+  def _get_active_file(self, operation: str) -> Optional[DeyeRegistersCacheFile]:
+    # Active file could be None in the shared lock context if the cache file is not initialized yet
+    if not self._lock_held:
+      raise DeyeLockNotHeldException(f"{type(self).__name__}: "
+                                     f"{operation}() must be called within a lock context")
+    return self._active_file
 
   async def is_cache_available(self) -> bool:
     """
@@ -0,0 +1,67 @@
+import threading
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Tuple
+
+class DeyeRegistersMemoryCache:
+  """
+  Process-wide in-memory storage for cached registers with LRU eviction.
+
+  Entries have the same format as in the cache JSON ({"ts_label": ..., "data": [...]})
+  and are keyed by (cache key, register address). Validity of the entries
+  is checked by the caller, the storage only bounds number of entries.
+  """
+  _lock = threading.Lock()
+  _entries: 'OrderedDict[Tuple[str, int], Dict[str, Any]]' = OrderedDict()
+  _max_size = 0
+
+  @classmethod
+  def reserve(cls, size: int) -> None:
+    """
+    Makes sure the storage can hold at least size entries
+    """
+    with cls._lock:
+      cls._max_size = max(cls._max_size, size)
+
+  @classmethod
+  def get(cls, key: str, addresses: Iterable[int]) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns entries at the specified addresses by address string, like in the cache JSON
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+
+    with cls._lock:
+      for address in addresses:
+        entry = cls._entries.get((key, address))
+        if entry is not None:
+          cls._entries.move_to_end((key, address))
+          results[str(address)] = entry
+
+    return results
+
+  @classmethod
+  def put(cls, key: str, entries: Dict[int, Dict[str, Any]]) -> None:
+    with cls._lock:
+      for address, entry in entries.items():
+        cls._entries[(key, address)] = entry
+        cls._entries.move_to_end((key, address))
+
+      # Evict least recently used entries
+      while len(cls._entries) > cls._max_size:
+        cls._entries.popitem(last = False)
+
+  @classmethod
+  def remove(cls, key: str, addresses: Iterable[int]) -> None:
+    with cls._lock:
+      for address in addresses:
+        cls._entries.pop((key, address), None)
+
+  @classmethod
+  def clear(cls, key: str) -> None:
+    with cls._lock:
+      for entry_key in [entry_key for entry_key in cls._entries if entry_key[0] == key]:
+        del cls._entries[entry_key]
+
+  @classmethod
+  def size(cls) -> int:
+    return len(cls._entries)
@@ -1,4 +1,5 @@
 from http import HTTPStatus
+from typing import Dict, List, Optional
 from urllib.parse import urljoin
 
 from deye_utils import DeyeUtils
@@ -24,7 +25,8 @@ class DeyeRegistersRemoteCacheManager(DeyeRegistersBaseCacheManager):
 
     self._remote_cache_server = remote_cache_server
     # Added inverter name to the endpoint path to match FastAPI routes
-    self._inverter_cache_endpoint = urljoin(remote_cache_server, f"/cache/{self._name}-{self._serial}")
+    self._cache_key = f"{self._name}-{self._serial}"
+    self._inverter_cache_endpoint = urljoin(remote_cache_server, f"/cache/{self._cache_key}")
     self._average_hit_rate_endpoint = urljoin(remote_cache_server, f"/average/{self._name}-{self._serial}")
 
     self._session = HttpSessionSingleton().session
@@ -32,13 +34,18 @@ class DeyeRegistersRemoteCacheManager(DeyeRegistersBaseCacheManager):
     self._logger.info(f"{self._name} {self.__class__.__name__} initialized")
     self._logger.info(f"{self._name} remote cache endpoint: {self._inverter_cache_endpoint}")
 
-  def _get_json(self) -> str:
+  def _get_json(self, addresses: Optional[List[int]] = None) -> str:
     """
     Used for general data retrieval.
     Fetches the current state of the cache to be used for reading and displaying data.
+    Only registers at the specified addresses are requested from the server.
     """
     try:
-      with self._session.get(self._inverter_cache_endpoint, timeout = 5) as response:
+      with self._session.get(
+          self._inverter_cache_endpoint,
+          params = self._get_query_params(addresses),
+          timeout = 5,
+      ) as response:
         # Treat 404 as an empty result (key is missing in the cache)
         if response.status_code == HTTPStatus.NOT_FOUND:
           return "{}"
@@ -52,6 +59,11 @@ class DeyeRegistersRemoteCacheManager(DeyeRegistersBaseCacheManager):
         e, f"{self._name}: error reading "
         f"remote cache from {self._inverter_cache_endpoint}") from e
 
+  def _get_query_params(self, addresses: Optional[List[int]]) -> Dict[str, str]:
+    if not addresses:
+      return {}
+    return {"registers": ",".join(str(addr) for addr in addresses)}
+
   def _read_json(self) -> str:
     """
     Returns an empty string because remote server performs data merging 
@@ -122,6 +134,7 @@ class DeyeRegistersRemoteCacheManager(DeyeRegistersBaseCacheManager):
         got_from_inverter_count = js.get("count2", 0),
         total_count = js.get("total", 0),
         cache_hit_rate = js.get("average", 0.0),
+        windowed_cache_hit_rates = {name: window.get("average", 0.0) for name, window in js.get("windows", {}).items()},
       )
 
       self._logger.info(
@@ -155,6 +168,7 @@ class DeyeRegistersRemoteCacheManager(DeyeRegistersBaseCacheManager):
         got_from_inverter_count = js.get("count2", 0),
         total_count = js.get("total", 0),
         cache_hit_rate = js.get("average", 0.0),
+        windowed_cache_hit_rates = {name: window.get("average", 0.0) for name, window in js.get("windows", {}).items()},
       )
 
       self._logger.info(
@@ -172,7 +186,9 @@ class DeyeRegistersRemoteCacheManager(DeyeRegistersBaseCacheManager):
 
   def reset_cache_hit_rate(self) -> None:
     try:
-      with self._session.delete(self._average_hit_rate_endpoint, timeout = 3) as response:
+      # Only the totals are reset, the recent windows are kept
+      url = urljoin(f"{self._average_hit_rate_endpoint}/", "totals")
+      with self._session.delete(url, timeout = 3) as response:
         if response.status_code == HTTPStatus.NOT_FOUND:
           self._logger.warning(f'{self._name} global cache hit rate not found')
         else:
@@ -1,10 +1,15 @@
+import time
+
 from http import HTTPStatus
-from urllib.parse import urljoin
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urljoin
 
 from deye_utils import DeyeUtils
 from deye_exceptions import DeyeCacheException
 from deye_registers_base_cache_manager_async import DeyeRegistersBaseCacheManagerAsync
+from http_etag_cache import HttpEtagCache
 from http_session_singleton_async import HttpSessionSingletonAsync
+from deye_register_cache_data import DeyeRegisterCacheData
 from deye_register_cache_hit_rate import DeyeRegisterCacheHitRate
 
 # ---------------------------------------------------------------
@@ -24,33 +29,112 @@ class DeyeRegistersRemoteCacheManagerAsync(DeyeRegistersBaseCacheManagerAsync):
 
     self._remote_cache_server = remote_cache_server
     # Added inverter name to the endpoint path to match FastAPI routes
-    self._inverter_cache_endpoint = urljoin(remote_cache_server, f"/cache/{self._name}-{self._serial}")
+    self._cache_key = f"{self._name}-{self._serial}"
+    self._inverter_cache_endpoint = urljoin(remote_cache_server, f"/cache/{self._cache_key}")
     self._average_hit_rate_endpoint = urljoin(remote_cache_server, f"/average/{self._name}-{self._serial}")
+    self._batch_cache_endpoint = urljoin(remote_cache_server, "/batch/cache")
 
     self._logger.info(f"{self._name} {self.__class__.__name__} initialized")
     self._logger.info(f"{self._name} remote cache endpoint: {self._inverter_cache_endpoint}")
 
-  async def _get_json(self) -> str:
+  @staticmethod
+  async def get_cached_registers_batch(
+    requests: List[Tuple['DeyeRegistersRemoteCacheManagerAsync', Dict[int, DeyeRegisterCacheData]]],
+    current_ts: float,
+    stale_time: int = 0,
+  ) -> List[Dict[int, DeyeRegisterCacheData]]:
+    """
+    Same as get_cached_registers(), but reads registers for several inverters with one request.
+    All cache managers should use the same remote cache server.
+
+    Returns:
+      List[Dict[int, DeyeRegisterCacheData]]: valid registers in the same order as requests
+    """
+    if not requests:
+      return []
+
+    endpoint = requests[0][0]._batch_cache_endpoint
+    if any(manager._batch_cache_endpoint != endpoint for manager, _ in requests):
+      raise DeyeCacheException("all remote cache managers should use the same remote cache server")
+
+    start_time = time.perf_counter()
+    keys = {manager._cache_key: [str(addr) for addr in registers] for manager, registers in requests}
+
+    try:
+      session = await HttpSessionSingletonAsync.get_session()
+      async with session.post(endpoint, json = keys) as response:
+        response.raise_for_status()
+        content = await response.json()
+    except Exception as e:
+      raise DeyeUtils.get_reraised_exception(e, f"error reading remote cache from {endpoint}") from e
+
+    results: List[Dict[int, DeyeRegisterCacheData]] = []
+
+    for manager, registers in requests:
+      try:
+        results.append(
+          manager._get_valid_registers(
+            cache_content = content.get(manager._cache_key, {}),
+            registers_to_check = registers,
+            current_ts = current_ts,
+            stale_time = stale_time,
+          ))
+      except Exception as e:
+        raise DeyeUtils.get_reraised_exception(e, f"{manager._name}: cache read error") from e
+
+    duration_ms = round((time.perf_counter() - start_time) * 1000)
+    logger = requests[0][0]._logger
+    logger.info(f"batch cache read for {len(requests)} inverters took {duration_ms} ms")
+
+    for manager, result in zip((manager for manager, _ in requests), results):
+      logger.info(f'{manager._name} got {DeyeUtils.get_quantity(result)} registers from cache')
+
+    return results
+
+  async def _get_json(self, addresses: Optional[List[int]] = None) -> str:
     """
     Used for general data retrieval.
     Fetches the current state of the cache to be used for reading and displaying data.
+    Only registers at the specified addresses are requested from the server.
+    The last response is reused if the server data wasn't changed since then (304).
     """
+    params = self._get_query_params(addresses)
+    etag_key = f"{self._inverter_cache_endpoint}?{urlencode(params)}"
+
     try:
       session = await HttpSessionSingletonAsync.get_session()
-      async with session.get(self._inverter_cache_endpoint) as response:
+      async with session.get(
+          self._inverter_cache_endpoint,
+          params = params,
+          headers = HttpEtagCache.get_headers(etag_key),
+      ) as response:
         # Treat 404 as an empty result (key is missing in the cache)
         if response.status == HTTPStatus.NOT_FOUND:
+          HttpEtagCache.remove(etag_key)
           return "{}"
 
+        if response.status == HTTPStatus.NOT_MODIFIED:
+          content = HttpEtagCache.get_body(etag_key)
+          if content is not None:
+            # Registers expired since the last read are filtered by _get_valid_registers()
+            return content
+
         response.raise_for_status()
 
         # FastAPI returns a dict, we convert it back to string to satisfy base class
-        return await response.text()
+        content = await response.text()
+        HttpEtagCache.put(etag_key, response.headers.get("ETag"), content)
+        return content
     except Exception as e:
       raise DeyeUtils.get_reraised_exception(
         e, f"{self._name}: error reading "
         f"remote cache from {self._inverter_cache_endpoint}") from e
 
+  def _get_query_params(self, addresses: Optional[List[int]]) -> Dict[str, str]:
+    if not addresses:
+      return {}
+    return {"registers": ",".join(str(addr) for addr in addresses)}
+
   async def _read_json(self) -> str:
     """
     Returns an empty string because remote server performs data merging 
@@ -125,6 +209,7 @@ class DeyeRegistersRemoteCacheManagerAsync(DeyeRegistersBaseCacheManagerAsync):
         got_from_inverter_count = js.get("count2", 0),
         total_count = js.get("total", 0),
         cache_hit_rate = js.get("average", 0.0),
+        windowed_cache_hit_rates = {name: window.get("average", 0.0) for name, window in js.get("windows", {}).items()},
       )
 
       self._logger.info(
@@ -159,6 +244,7 @@ class DeyeRegistersRemoteCacheManagerAsync(DeyeRegistersBaseCacheManagerAsync):
         got_from_inverter_count = js.get("count2", 0),
         total_count = js.get("total", 0),
         cache_hit_rate = js.get("average", 0.0),
+        windowed_cache_hit_rates = {name: window.get("average", 0.0) for name, window in js.get("windows", {}).items()},
       )
 
       self._logger.info(
@@ -177,7 +263,9 @@ class DeyeRegistersRemoteCacheManagerAsync(DeyeRegistersBaseCacheManagerAsync):
   async def reset_cache_hit_rate(self) -> None:
     try:
       session = await HttpSessionSingletonAsync.get_session()
-      async with session.delete(self._average_hit_rate_endpoint) as response:
+      # Only the totals are reset, the recent windows are kept
+      url = urljoin(f"{self._average_hit_rate_endpoint}/", "totals")
+      async with session.delete(url) as response:
         if response.status == HTTPStatus.NOT_FOUND:
           self._logger.warning(f'{self._name} global cache hit rate not found')
         else:
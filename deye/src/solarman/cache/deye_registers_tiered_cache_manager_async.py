@@ -0,0 +1,234 @@
+import threading
+
+from typing import Dict, List, Optional, Tuple, cast
+
+from deye_utils import DeyeUtils
+from deye_register_cache_data import DeyeRegisterCacheData
+from deye_register_cache_hit_rate import DeyeRegisterCacheHitRate
+from deye_register_cache_tier_stat import DeyeRegisterCacheTierStat
+from deye_registers_memory_cache import DeyeRegistersMemoryCache
+from deye_registers_base_cache_manager_async import DeyeRegistersBaseCacheManagerAsync
+from deye_registers_remote_cache_manager_async import DeyeRegistersRemoteCacheManagerAsync
+
+# ------------------------------------------------------------------
+# Class for caching register data in process memory (L1) in front of
+# another cache manager (L2), usually the remote one
+# ------------------------------------------------------------------
+class DeyeRegistersTieredCacheManagerAsync(DeyeRegistersBaseCacheManagerAsync):
+  """
+  Two-tier register cache.
+
+  Fresh registers are served from the process-wide memory cache, the rest are
+  requested from the underlying cache manager. Saved registers are written
+  to both tiers, removed registers and reset are always applied to both tiers,
+  even if memory cache is disabled for this manager (memory_cache_size = 0).
+
+  Registers changed by another process are seen in memory cache only after
+  their caching_time expiry. Stale registers are never served from memory.
+  """
+  _stats_lock = threading.Lock()
+  # Process-wide statistics by cache key
+  _stats: Dict[str, Dict[str, DeyeRegisterCacheTierStat]] = {}
+
+  def __init__(
+    self,
+    cache_manager: DeyeRegistersBaseCacheManagerAsync,
+    memory_cache_size: int,
+    verbose: bool = False,
+  ):
+    super().__init__(
+      name = cache_manager._name,
+      serial = cache_manager._serial,
+    )
+
+    self._cache_manager = cache_manager
+    self._memory_cache_size = max(0, memory_cache_size)
+    # Statistics are logged on every read only in verbose mode
+    self._verbose = verbose
+    self._cache_key = f"{self._name}-{self._serial}"
+
+    DeyeRegistersMemoryCache.reserve(self._memory_cache_size)
+
+  @property
+  def cache_manager(self) -> DeyeRegistersBaseCacheManagerAsync:
+    """
+    Underlying (L2) cache manager
+    """
+    return self._cache_manager
+
+  def get_tier_stats(self) -> Dict[str, DeyeRegisterCacheTierStat]:
+    """
+    Returns process-wide number of registers got from (or missed in) each tier
+    """
+    with self._stats_lock:
+      stats = self._stats.get(self._cache_key, {})
+      return {tier: DeyeRegisterCacheTierStat(stat.hits, stat.misses) for tier, stat in stats.items()}
+
+  async def get_cached_registers(
+    self,
+    registers_to_check: Dict[int, DeyeRegisterCacheData],
+    current_ts: float,
+    stale_time: int = 0,
+  ) -> Dict[int, DeyeRegisterCacheData]:
+    results = self._get_from_memory(registers_to_check, current_ts)
+    missing = {addr: reg for addr, reg in registers_to_check.items() if addr not in results}
+
+    storage_results: Dict[int, DeyeRegisterCacheData] = {}
+    if missing:
+      storage_results = await self._cache_manager.get_cached_registers(
+        registers_to_check = missing,
+        current_ts = current_ts,
+        stale_time = stale_time,
+      )
+
+    self._on_storage_results(results, missing, storage_results)
+
+    return {**results, **storage_results}
+
+  @staticmethod
+  async def get_cached_registers_batch(
+    requests: List[Tuple['DeyeRegistersTieredCacheManagerAsync', Dict[int, DeyeRegisterCacheData]]],
+    current_ts: float,
+    stale_time: int = 0,
+  ) -> List[Dict[int, DeyeRegisterCacheData]]:
+    """
+    Same as get_cached_registers(), but registers missing in memory are requested
+    for all inverters with one request. Underlying cache managers should be remote.
+    """
+    memory_results = [manager._get_from_memory(registers, current_ts) for manager, registers in requests]
+    missing = [{addr: reg
+                for addr, reg in registers.items()
+                if addr not in memory_result}
+               for (_, registers), memory_result in zip(requests, memory_results)]
+
+    storage_requests = [(cast(DeyeRegistersRemoteCacheManagerAsync, manager._cache_manager), manager_missing)
+                        for (manager, _), manager_missing in zip(requests, missing)
+                        if manager_missing]
+
+    storage_results = iter(await DeyeRegistersRemoteCacheManagerAsync.get_cached_registers_batch(
+      requests = storage_requests,
+      current_ts = current_ts,
+      stale_time = stale_time,
+    ) if storage_requests else [])
+
+    results: List[Dict[int, DeyeRegisterCacheData]] = []
+
+    for (manager, _), memory_result, manager_missing in zip(requests, memory_results, missing):
+      storage_result = next(storage_results) if manager_missing else {}
+      manager._on_storage_results(memory_result, manager_missing, storage_result)
+      results.append({**memory_result, **storage_result})
+
+    return results
+
+  async def save_to_cache(
+    self,
+    registers_to_save: Dict[int, DeyeRegisterCacheData],
+  ) -> None:
+    self._put_to_memory({addr: reg for addr, reg in registers_to_save.items() if reg.caching_time >= 0})
+    await self._cache_manager.save_to_cache(registers_to_save = registers_to_save)
+
+  async def remove_from_cache(
+    self,
+    registers_to_remove: Dict[int, DeyeRegisterCacheData],
+  ) -> None:
+    DeyeRegistersMemoryCache.remove(self._cache_key, registers_to_remove.keys())
+    await self._cache_manager.remove_from_cache(registers_to_remove = registers_to_remove)
+
+  async def reset_cache(self) -> None:
+    DeyeRegistersMemoryCache.clear(self._cache_key)
+    await self._cache_manager.reset_cache()
+
+  async def is_cache_available(self) -> bool:
+    return await self._cache_manager.is_cache_available()
+
+  async def get_cache_hit_rate(self) -> DeyeRegisterCacheHitRate:
+    return await self._cache_manager.get_cache_hit_rate()
+
+  async def update_cache_hit_rate(
+    self,
+    got_from_cache: int,
+    got_from_inverter: int,
+  ) -> DeyeRegisterCacheHitRate:
+    return await self._cache_manager.update_cache_hit_rate(
+      got_from_cache = got_from_cache,
+      got_from_inverter = got_from_inverter,
+    )
+
+  async def reset_cache_hit_rate(self) -> None:
+    with self._stats_lock:
+      self._stats.pop(self._cache_key, None)
+    await self._cache_manager.reset_cache_hit_rate()
+
+  def _get_from_memory(
+    self,
+    registers_to_check: Dict[int, DeyeRegisterCacheData],
+    current_ts: float,
+  ) -> Dict[int, DeyeRegisterCacheData]:
+    if not self._memory_cache_size or not registers_to_check:
+      return {}
+
+    entries = DeyeRegistersMemoryCache.get(self._cache_key, registers_to_check.keys())
+    if not entries:
+      return {}
+
+    # Memory cache has the same format as the cache JSON, so validity rules are the same.
+    # Stale registers are requested from the underlying cache, which can have fresher data
+    return self._get_valid_registers(
+      cache_content = {"registers": entries},
+      registers_to_check = registers_to_check,
+      current_ts = current_ts,
+    )
+
+  def _put_to_memory(self, registers: Dict[int, DeyeRegisterCacheData]) -> None:
+    if not self._memory_cache_size or not registers:
+      return
+
+    DeyeRegistersMemoryCache.put(
+      self._cache_key,
+      {
+        addr: {
+          "ts_label": int(reg.read_ts * self._ts_multiplier),
+          "data": list(reg.values),
+        }
+        for addr, reg in registers.items()
+      },
+    )
+
+  def _on_storage_results(
+    self,
+    memory_results: Dict[int, DeyeRegisterCacheData],
+    missing: Dict[int, DeyeRegisterCacheData],
+    storage_results: Dict[int, DeyeRegisterCacheData],
+  ) -> None:
+    self._put_to_memory(storage_results)
+
+    missing_count = DeyeUtils.get_quantity(missing)
+    storage_count = DeyeUtils.get_quantity(storage_results)
+
+    with self._stats_lock:
+      stats = self._stats.setdefault(self._cache_key, {
+        "memory": DeyeRegisterCacheTierStat(),
+        "storage": DeyeRegisterCacheTierStat(),
+      })
+
+      if self._memory_cache_size:
+        stats["memory"].hits += DeyeUtils.get_quantity(memory_results)
+        stats["memory"].misses += missing_count
+
+      stats["storage"].hits += storage_count
+      stats["storage"].misses += missing_count - storage_count
+
+    if self._memory_cache_size and self._verbose:
+      self._logger.info(f'{self._name} memory cache: {stats["memory"]}, storage cache: {stats["storage"]}')
+
+  async def _get_json(self, addresses: Optional[List[int]] = None) -> str:
+    return await self._cache_manager._get_json(addresses = addresses)
+
+  async def _read_json(self) -> str:
+    return await self._cache_manager._read_json()
+
+  async def _save_json(self, json_string: str) -> None:
+    await self._cache_manager._save_json(json_string)
+
+  async def _reset(self) -> None:
+    await self._cache_manager._reset()
@@ -1,3 +1,4 @@
+import time
 import logging
 
 from typing import Dict, List, Optional
@@ -5,8 +6,13 @@ from datetime import datetime, timedelta
 
 from deye_logger import DeyeLogger
 from deye_loggers import DeyeLoggers
+from deye_register_bank import DeyeRegisterBank
 from deye_register_cache_data import DeyeRegisterCacheData
 from deye_register_cache_hit_rate import DeyeRegisterCacheHitRate
+from deye_modbus_cost_model import DeyeModbusCostModel
+from deye_register_read_plan import DeyeRegisterReadPlan
+from deye_register_read_planner import DeyeRegisterReadPlanner
+from deye_register_write_planner import DeyeRegisterWritePlanner
 
 class DeyeModbusInteractor:
   def __init__(
@@ -22,11 +28,27 @@ class DeyeModbusInteractor:
     self._log = logging.getLogger()
     self._registers: Dict[int, DeyeRegisterCacheData] = dict()
     self._registers_to_write: Dict[int, DeyeRegisterCacheData] = dict()
+    # Compact image of read registers used for lookups in read_register()
+    self._bank = DeyeRegisterBank()
+    self._oldest_read_ts = 0.0
     self._verbose = bool(kwargs.get('verbose', False))
     self._default_caching_time = max(0, int(kwargs.get('caching_time', 3)))
+    # Stale-while-revalidate: serve registers up to max_stale_time seconds after caching_time
+    # expiry and refresh them in background. Currently supported by async interactor only
+    self._stale_while_revalidate = bool(kwargs.get('stale_while_revalidate', False))
+    self._max_stale_time = max(0, int(kwargs.get('max_stale_time', 60)))
     self._max_register_count = 120
     self._max_register_length = 10
+    # Modbus limit for write multiple registers (function code 16)
+    self._max_write_register_count = 123
     self._cache_hit_rate: DeyeRegisterCacheHitRate = DeyeRegisterCacheHitRate.zero()
+    self._cost_model = DeyeModbusCostModel.for_logger(logger, **kwargs)
+    self._read_planner = DeyeRegisterReadPlanner(
+      max_register_count = self._max_register_count,
+      cost_model = self._cost_model,
+    )
+    self._read_plan: DeyeRegisterReadPlan = DeyeRegisterReadPlan.empty()
+    self._write_planner = DeyeRegisterWritePlanner(max_register_count = self._max_write_register_count)
 
   @property
   def name(self) -> str:
@@ -40,6 +62,20 @@ class DeyeModbusInteractor:
   def cache_hit_rate(self) -> DeyeRegisterCacheHitRate:
     return self._cache_hit_rate
 
+  @property
+  def data_age(self) -> float:
+    """
+    Age in seconds of the oldest register value got on the last read
+    """
+    return max(0.0, time.time() - self._oldest_read_ts) if self._oldest_read_ts > 0 else 0.0
+
+  @property
+  def read_plan(self) -> DeyeRegisterReadPlan:
+    """
+    The plan used for the last read from inverter
+    """
+    return self._read_plan
+
   def enqueue_register(
     self,
     address: int,
@@ -68,40 +104,14 @@ class DeyeModbusInteractor:
       )
 
   def read_register(self, address: int, quantity: int) -> List[int]:
-    reg = self._registers.get(address)
-    if reg and len(reg.values) >= quantity:
-      return reg.values[:quantity]
-
-    self._log.warning(f'{self.name} constructing register at address {address}, quantity {quantity} from pieces')
-
-    # Initialize the result array with zeros of the requested size
-    result = [0] * quantity
-    requested_end = address + quantity
+    view = self._bank.get_view(address, quantity)
+    if view is not None:
+      return view.tolist()
 
-    # Iterate through all available registers to find overlaps
-    for reg_addr, reg in self._registers.items():
-      reg_end = reg_addr + reg.quantity
+    self._log.warning(f'{self.name} register at address {address}, quantity {quantity} is not fully read, '
+                      'missing values are filled with zeros')
 
-      # Check if current register overlaps with the requested range
-      # Overlap exists if: (start1 < end2) AND (end1 > start2)
-      if address < reg_end and requested_end > reg_addr:
-        # Determine the intersection range
-        intersect_start = max(address, reg_addr)
-        intersect_end = min(requested_end, reg_end)
-
-        # Calculate offsets
-        # Where to take from in the source register
-        src_offset = intersect_start - reg_addr
-        # Where to put in the result array
-        dest_offset = intersect_start - address
-
-        # Number of registers to copy in this intersection
-        copy_len = intersect_end - intersect_start
-
-        # Map the values into the result array
-        result[dest_offset:dest_offset + copy_len] = reg.values[src_offset:src_offset + copy_len]
-
-    return result
+    return self._bank.get_values(address, quantity)
 
   def write_register(self, address: int, values: List[int]) -> None:
     # Create a new data object for the updated register
@@ -118,30 +128,12 @@ class DeyeModbusInteractor:
     self,
     registers: Dict[int, DeyeRegisterCacheData],
   ) -> List[List[DeyeRegisterCacheData]]:
-    groups: List[List[DeyeRegisterCacheData]] = []
-    current_group: List[DeyeRegisterCacheData] = []
-
-    sorted_addrs = sorted(registers.keys())
-
-    for addr in sorted_addrs:
-      reg = registers[addr]
-      if not current_group:
-        current_group.append(reg)
-        continue
-
-      group_start = current_group[0].address
-      block_end = reg.address + reg.quantity
-
-      if (block_end - group_start) <= self._max_register_count:
-        current_group.append(reg)
-      else:
-        groups.append(current_group)
-        current_group = [reg]
-
-    if current_group:
-      groups.append(current_group)
+    self._read_plan = self._read_planner.plan(registers)
+    groups = self._read_plan.groups
 
     if self._verbose:
+      self._log.info(f'{self.name} read plan: {self._read_plan} ({self._cost_model})')
+
       formatted_groups = []
       for group in groups:
         group_str = ", ".join([f"{reg.address}={reg.quantity}" for reg in group])
@@ -153,6 +145,52 @@ class DeyeModbusInteractor:
 
     return groups
 
+  def _load_register_bank(self, *registers: Dict[int, DeyeRegisterCacheData]) -> None:
+    """
+    Rebuilds register bank from read registers, values from the following dictionaries win
+    """
+    self._bank.load(reg for regs in (self._registers, *registers) for reg in regs.values())
+
+    read_ts = [reg.read_ts for reg in self._registers.values() if reg.read_ts > 0]
+    self._oldest_read_ts = min(read_ts, default = 0.0)
+
+  def _get_written_registers(self, write_ts: float) -> Dict[int, DeyeRegisterCacheData]:
+    """
+    Returns pending registers with write timestamp, keyed by the same addresses they were enqueued with
+    """
+    return {
+      reg.address: DeyeRegisterCacheData(
+        address = reg.address,
+        quantity = reg.quantity,
+        caching_time = reg.caching_time,
+        read_ts = write_ts,
+        values = reg.values,
+      )
+      for reg in self._registers_to_write.values()
+    }
+
+  def _get_stale_time(self) -> int:
+    """
+    How many seconds after caching_time expiry cached registers are still accepted
+    """
+    return self._max_stale_time if self._stale_while_revalidate else 0
+
+  def _get_stale_registers(
+    self,
+    registers: Dict[int, DeyeRegisterCacheData],
+    current_ts: float,
+  ) -> Dict[int, DeyeRegisterCacheData]:
+    """
+    Returns registers which were served from the cache after their caching_time expiry
+    """
+    return {addr: reg for addr, reg in registers.items() if current_ts - reg.read_ts > reg.caching_time}
+
+  def _observe_read_duration(self, quantity: int, duration_ms: float) -> None:
+    self._cost_model.observe(quantity, duration_ms)
+
+    if self._verbose:
+      self._log.info(f'{self.name} read of {quantity} registers took {round(duration_ms)} ms')
+
   def _can_cache(self) -> bool:
     now = datetime.now()
     if_first_minutes = now.hour == 0 and now.minute <= 5
@@ -162,3 +200,4 @@ class DeyeModbusInteractor:
   def disconnect(self) -> None:
     self._registers.clear()
     self._registers_to_write.clear()
+    self._bank.clear()
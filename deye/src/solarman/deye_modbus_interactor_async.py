@@ -1,19 +1,26 @@
 import time
 import asyncio
 
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
 from deye_utils import DeyeUtils
 from deye_logger import DeyeLogger
 from deye_modbus_interactor import DeyeModbusInteractor
 from deye_modbus_solarman_async import DeyeModbusSolarmanAsync
 from deye_register_cache_data import DeyeRegisterCacheData
+from deye_register_read_flight_async import DeyeRegisterReadFlightAsync
 from deye_register_cache_hit_rate import DeyeRegisterCacheHitRate
+from deye_register_cache_tier_stat import DeyeRegisterCacheTierStat
 from deye_registers_base_cache_manager_async import DeyeRegistersBaseCacheManagerAsync
 from deye_registers_local_cache_manager_async import DeyeRegistersLocalCacheManagerAsync
 from deye_registers_remote_cache_manager_async import DeyeRegistersRemoteCacheManagerAsync
+from deye_registers_tiered_cache_manager_async import DeyeRegistersTieredCacheManagerAsync
 
 class DeyeModbusInteractorAsync(DeyeModbusInteractor):
+  # Background refreshes in progress, shared by all interactors
+  # in the process and keyed by (logger name, register address)
+  _revalidating: Dict[Tuple[str, int], 'asyncio.Task[None]'] = {}
+
   def __init__(
     self,
     logger: DeyeLogger,
@@ -25,71 +32,177 @@ class DeyeModbusInteractorAsync(DeyeModbusInteractor):
       **kwargs,
     )
 
+    self._kwargs = kwargs
     self._solarman = DeyeModbusSolarmanAsync(logger, **kwargs)
     self._wait_bg_tasks = wait_bg_tasks
 
     # Initialize cache manager
-    self._cache_manager: DeyeRegistersBaseCacheManagerAsync
+    storage_cache_manager: DeyeRegistersBaseCacheManagerAsync
     if self._loggers.remote_cache_server:
-      self._cache_manager = DeyeRegistersRemoteCacheManagerAsync(
+      storage_cache_manager = DeyeRegistersRemoteCacheManagerAsync(
         name = self._logger.name,
         serial = self._logger.serial,
         remote_cache_server = self._loggers.remote_cache_server,
       )
     else:
-      self._cache_manager = DeyeRegistersLocalCacheManagerAsync(
+      storage_cache_manager = DeyeRegistersLocalCacheManagerAsync(
         name = self._logger.name,
         serial = self._logger.serial,
       )
 
+    # Memory cache is used only if memory_cache_size > 0, but tiered cache manager is
+    # always used to invalidate registers in memory cache after writes and resets
+    self._cache_manager = DeyeRegistersTieredCacheManagerAsync(
+      cache_manager = storage_cache_manager,
+      memory_cache_size = int(kwargs.get('memory_cache_size', 0)),
+      verbose = self._verbose,
+    )
+
+  @property
+  def cache_tier_stats(self) -> Dict[str, DeyeRegisterCacheTierStat]:
+    return self._cache_manager.get_tier_stats()
+
   async def is_cache_available(self) -> bool:
     return await self._cache_manager.is_cache_available()
 
-  async def process_enqueued_registers(self) -> None:
+  @staticmethod
+  async def get_cached_registers_batch(
+    interactors: List['DeyeModbusInteractorAsync'],
+  ) -> Dict[str, Dict[int, DeyeRegisterCacheData]]:
+    """
+    Reads enqueued registers of several interactors from the remote cache with one request.
+    Result can be passed to process_enqueued_registers(). Interactors which can't
+    use the batch read (local cache, no caching, etc.) are skipped.
+
+    Returns:
+      Dict[str, Dict[int, DeyeRegisterCacheData]]: cached registers by interactor name
+    """
+    batch = [interactor for interactor in interactors if interactor._can_read_cache_batch()]
+    if len(batch) < 2:
+      return {}
+
+    stale_time = batch[0]._get_stale_time()
+    batch = [interactor for interactor in batch if interactor._get_stale_time() == stale_time]
+
+    results = await DeyeRegistersTieredCacheManagerAsync.get_cached_registers_batch(
+      requests = [(interactor._cache_manager, interactor._registers) for interactor in batch],
+      current_ts = time.time(),
+      stale_time = stale_time,
+    )
+
+    return {interactor.name: result for interactor, result in zip(batch, results)}
+
+  def _can_read_cache_batch(self) -> bool:
+    return (bool(self._registers) and self._default_caching_time >= 1 and self._can_cache()
+            and isinstance(self._cache_manager.cache_manager, DeyeRegistersRemoteCacheManagerAsync)
+            # Registers will be got from concurrent reads anyway
+            and not DeyeRegisterReadFlightAsync.can_join_all(
+              name = self.name,
+              registers = self._registers,
+              stale_time = self._get_stale_time(),
+              use_cache = True,
+            ))
+
+  async def process_enqueued_registers(
+    self,
+    cached_registers: Optional[Dict[int, DeyeRegisterCacheData]] = None,
+  ) -> None:
+    """
+    Reads enqueued registers from the cache and the inverter.
+    Registers which are being read by other interactors of the same inverter
+    in this process are not read again, but shared with them.
+
+    Args:
+      cached_registers: registers already got from the cache with get_cached_registers_batch().
+        The cache is read by the interactor itself if None.
+    """
     if not self._registers:
       return
 
+    flight = DeyeRegisterReadFlightAsync.start(
+      name = self.name,
+      registers = self._registers,
+      stale_time = self._get_stale_time(),
+      use_cache = self._default_caching_time >= 1 and self._can_cache(),
+    )
+
+    try:
+      own_registers = await self._read_registers(flight.own_registers, cached_registers)
+    except BaseException as e:
+      flight.fail(e)
+      raise
+
+    flight.complete(own_registers)
+
+    joined_registers, missing_registers = await flight.get_joined_registers()
+    if missing_registers:
+      own_registers.update(await self._read_registers(missing_registers, cached_registers))
+
+    if self._verbose and flight.joined_count:
+      self._log.info(f'{self.name} registers got from concurrent reads: {list(joined_registers.keys())}')
+
+    self._registers = {**joined_registers, **own_registers}
+    self._load_register_bank()
+
+  async def _read_registers(
+    self,
+    registers: Dict[int, DeyeRegisterCacheData],
+    cached_registers: Optional[Dict[int, DeyeRegisterCacheData]] = None,
+  ) -> Dict[int, DeyeRegisterCacheData]:
+    """
+    Reads registers from the cache and the inverter and returns a NEW dictionary
+    """
+    if not registers:
+      return {}
+
     if self._default_caching_time < 1:
       # Do NOT use any caching on read
-      self._registers = await self._read_from_inverter(self._registers)
+      polled_registers = await self._read_from_inverter(registers)
 
       if self._can_cache():
-        await self._cache_manager.save_to_cache(registers_to_save = self._registers)
-      return
+        await self._cache_manager.save_to_cache(registers_to_save = polled_registers)
+      return polled_registers
 
-    cached_registers: Dict[int, DeyeRegisterCacheData] = {}
+    current_ts = time.time()
 
-    if self._can_cache():
-      cached_registers = await self._cache_manager.get_cached_registers(
-        registers_to_check = self._registers,
-        current_ts = time.time(),
-      )
+    # Cached registers could be already got in a batch
+    if cached_registers is None:
+      cached_registers = {}
+
+      if self._can_cache():
+        cached_registers = await self._cache_manager.get_cached_registers(
+          registers_to_check = registers,
+          current_ts = current_ts,
+          stale_time = self._get_stale_time(),
+        )
+      else:
+        # Reset cache during the last and first 5 minutes of the day
+        if self._verbose:
+          self._log.info(f'{self.name} resetting cache because midnight...')
+        await self.reset_cache()
     else:
-      # Reset cache during the last and first 5 minutes of the day
-      if self._verbose:
-        self._log.info(f'{self.name} resetting cache because midnight...')
-      await self.reset_cache()
+      cached_registers = {addr: reg for addr, reg in cached_registers.items() if addr in registers}
 
     if self._verbose:
-      registers_caching_time = {addr: reg.caching_time for addr, reg in self._registers.items()}
+      registers_caching_time = {addr: reg.caching_time for addr, reg in registers.items()}
       self._log.info(f'{self.name} registers cache times: {registers_caching_time}')
       cached_data_map = {addr: reg.values for addr, reg in cached_registers.items()}
       self._log.info(f'{self.name} cached registers: {cached_data_map}')
 
     # Create a new dictionary containing only registers NOT found in cache
-    uncached_registers = {addr: val for addr, val in self._registers.items() if addr not in cached_registers}
+    uncached_registers = {addr: val for addr, val in registers.items() if addr not in cached_registers}
 
     if self._verbose:
       self._log.info(f'{self.name} uncached registers: {list(uncached_registers.keys())}')
 
+    results = dict(cached_registers)
+
     if uncached_registers:
       polled_registers = await self._read_from_inverter(uncached_registers)
 
       if self._can_cache():
         await self._cache_manager.save_to_cache(registers_to_save = polled_registers)
-      self._registers = {**cached_registers, **polled_registers}
-    else:
-      self._registers = cached_registers
+      results.update(polled_registers)
 
     # Launch the update in the background without blocking the current flow
     if self._can_cache():
@@ -102,6 +215,62 @@ class DeyeModbusInteractorAsync(DeyeModbusInteractor):
       if self._wait_bg_tasks:
         await task
 
+    if self._stale_while_revalidate:
+      stale_registers = self._get_stale_registers(cached_registers, current_ts)
+      revalidate_task = self._revalidate_in_background(stale_registers)
+
+      if revalidate_task is not None and self._wait_bg_tasks:
+        await revalidate_task
+
+    return results
+
+  def _revalidate_in_background(
+    self,
+    registers: Dict[int, DeyeRegisterCacheData],
+  ) -> Optional['asyncio.Task[None]']:
+    """
+    Schedules refresh of stale registers, unless they are already being refreshed
+    """
+    loop = asyncio.get_running_loop()
+    revalidating = DeyeModbusInteractorAsync._revalidating
+
+    def is_revalidating(address: int) -> bool:
+      task = revalidating.get((self.name, address))
+      return task is not None and not task.done() and task.get_loop() is loop
+
+    registers = {addr: reg for addr, reg in registers.items() if not is_revalidating(addr)}
+    if not registers:
+      return None
+
+    keys = [(self.name, addr) for addr in registers]
+    task = asyncio.create_task(self._revalidate(registers), name = f'{self.name}-revalidate')
+
+    for key in keys:
+      revalidating[key] = task
+
+    def on_done(done_task: 'asyncio.Task[None]') -> None:
+      for key in keys:
+        if revalidating.get(key) is done_task:
+          del revalidating[key]
+
+    task.add_done_callback(on_done)
+
+    if self._verbose:
+      self._log.info(f'{self.name} refreshing stale registers in background: {list(registers.keys())}')
+
+    return task
+
+  async def _revalidate(self, registers: Dict[int, DeyeRegisterCacheData]) -> None:
+    try:
+      # Use own connection to not interfere with the foreground requests
+      solarman = DeyeModbusSolarmanAsync(self._logger, **self._kwargs)
+      polled_registers = await self._read_from_inverter(registers, solarman)
+
+      if self._can_cache():
+        await self._cache_manager.save_to_cache(registers_to_save = polled_registers)
+    except Exception as e:
+      self._log.warning(f'{self.name} background refresh of stale registers failed: {e}')
+
   async def _update_cache_hit_rate(
     self,
     got_from_cache: Dict[int, DeyeRegisterCacheData],
@@ -118,11 +287,15 @@ class DeyeModbusInteractorAsync(DeyeModbusInteractor):
   async def _read_from_inverter(
     self,
     registers: Dict[int, DeyeRegisterCacheData],
+    solarman: Optional[DeyeModbusSolarmanAsync] = None,
   ) -> Dict[int, DeyeRegisterCacheData]:
     """Reads registers from inverter and returns a NEW dictionary with NEW objects."""
     if not registers:
       return {}
 
+    if solarman is None:
+      solarman = self._solarman
+
     groups = self._get_register_groups(registers)
 
     results: Dict[int, DeyeRegisterCacheData] = {}
@@ -135,9 +308,12 @@ class DeyeModbusInteractorAsync(DeyeModbusInteractor):
         max_end = max(reg.address + reg.quantity for reg in group)
         count = max_end - start
 
-        data = await self._solarman.read_holding_registers(address = start, quantity = count)
+        request_start = time.perf_counter()
+        data = await solarman.read_holding_registers(address = start, quantity = count)
         current_ts = time.time() # Should be exact after read_holding_registers() call
 
+        self._observe_read_duration(count, (time.perf_counter() - request_start) * 1000)
+
         if len(data) != count:
           raise RuntimeError(f'{self.name}: expected to read {count} values '
                              f'at address {start}, but got {len(data)}')
@@ -154,7 +330,7 @@ class DeyeModbusInteractorAsync(DeyeModbusInteractor):
     except Exception as e:
       raise DeyeUtils.get_reraised_exception(e, f'{self.name}: error while reading registers') from e
     finally:
-      await self._solarman.disconnect()
+      await solarman.disconnect()
 
     self._log.info(f'{self.name} got {DeyeUtils.get_quantity(results)} registers from inverter')
 
@@ -164,33 +340,37 @@ class DeyeModbusInteractorAsync(DeyeModbusInteractor):
     if not self._registers_to_write:
       return
 
+    # Merge adjacent and overlapping writes to send as few frames as possible
+    frames = self._write_planner.plan(self._registers_to_write)
+    written_frames_count = 0
+
     try:
-      for reg in self._registers_to_write.values():
-        result = await self._solarman.write_multiple_holding_registers(reg.address, reg.values)
-        current_ts = time.time() # Should be exact after write_multiple_holding_registers() call
-
-        self._log.info(f'{self.name} wrote register at address {reg.address} with data {reg.values} to inverter')
-
-        if result != len(reg.values):
-          raise RuntimeError(f'{self.name}: expected to write {len(reg.values)} values '
-                             f'at address {reg.address}, but wrote {result}')
-
-        # Update the local dictionary with the new object
-        # This ensures subsequent reads within this session get the new value
-        self._registers[reg.address] = reg
-
-        updated_reg = DeyeRegisterCacheData(
-          address = reg.address,
-          quantity = reg.quantity,
-          caching_time = reg.caching_time,
-          read_ts = current_ts,
-          values = reg.values,
-        )
+      try:
+        for frame in frames:
+          result = await self._solarman.write_multiple_holding_registers(frame.address, frame.values)
+
+          self._log.info(f'{self.name} wrote register at address {frame.address} with data {frame.values} to inverter')
 
-        # Remove saved registers from the cache to prevent desynchronization between
-        # the cache and the inverter. These registers will be fetched directly
-        # from the inverter during the next read cycle.
-        await self._cache_manager.remove_from_cache(registers_to_remove = {reg.address: updated_reg})
+          if result != len(frame.values):
+            raise RuntimeError(f'{self.name}: expected to write {len(frame.values)} values '
+                               f'at address {frame.address}, but wrote {result}')
+
+          written_frames_count += 1
+      except Exception:
+        if written_frames_count:
+          try:
+            await self._remove_written_registers_from_cache()
+          except Exception as e:
+            # Write error is the cause, so it is raised instead of the cache one
+            self._log.error(f'{self.name}: failed to remove written registers from cache: {e}')
+        raise
+
+      await self._remove_written_registers_from_cache()
+
+      # Update the local register bank with written values
+      # This ensures subsequent reads within this session get the new value
+      self._load_register_bank(self._registers_to_write)
+      self._registers.update(self._registers_to_write)
 
       self._registers_to_write.clear()
     except Exception as e:
@@ -198,6 +378,13 @@ class DeyeModbusInteractorAsync(DeyeModbusInteractor):
     finally:
       await self._solarman.disconnect()
 
+  async def _remove_written_registers_from_cache(self) -> None:
+    # Remove saved registers from the cache to prevent desynchronization between
+    # the cache and the inverter. These registers will be fetched directly
+    # from the inverter during the next read cycle.
+    # All pending registers are removed at once, even if some frames failed.
+    await self._cache_manager.remove_from_cache(registers_to_remove = self._get_written_registers(time.time()))
+
   async def get_cache_hit_rate(self) -> DeyeRegisterCacheHitRate:
     self._cache_hit_rate = await self._cache_manager.get_cache_hit_rate()
     return self._cache_hit_rate
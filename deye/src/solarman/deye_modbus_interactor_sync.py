@@ -50,6 +50,8 @@ class DeyeModbusInteractorSync(DeyeModbusInteractor):
       # Do NOT use any caching on read
       self._registers = self._read_from_inverter(self._registers)
 
+      self._load_register_bank()
+
       if self._can_cache():
         self._cache_manager.save_to_cache(registers_to_save = self._registers)
       return
@@ -88,6 +90,8 @@ class DeyeModbusInteractorSync(DeyeModbusInteractor):
     else:
       self._registers = cached_registers
 
+    self._load_register_bank()
+
     if self._can_cache():
       self._update_cache_hit_rate(
         got_from_cache = cached_registers,
@@ -127,9 +131,12 @@ class DeyeModbusInteractorSync(DeyeModbusInteractor):
         max_end = max(reg.address + reg.quantity for reg in group)
         count = max_end - start
 
+        request_start = time.perf_counter()
         data = self._solarman.read_holding_registers(address = start, quantity = count)
         current_ts = time.time() # Should be exact after read_holding_registers() call
 
+        self._observe_read_duration(count, (time.perf_counter() - request_start) * 1000)
+
         if len(data) != count:
           raise RuntimeError(f'{self.name}: expected to read {count} values '
                              f'at address {start}, but got {len(data)}')
@@ -156,33 +163,37 @@ class DeyeModbusInteractorSync(DeyeModbusInteractor):
     if not self._registers_to_write:
       return
 
+    # Merge adjacent and overlapping writes to send as few frames as possible
+    frames = self._write_planner.plan(self._registers_to_write)
+    written_frames_count = 0
+
     try:
-      for reg in self._registers_to_write.values():
-        result = self._solarman.write_multiple_holding_registers(reg.address, reg.values)
-        current_ts = time.time() # Should be exact after write_multiple_holding_registers() call
+      try:
+        for frame in frames:
+          result = self._solarman.write_multiple_holding_registers(frame.address, frame.values)
 
-        self._log.info(f'{self.name} wrote register at address {reg.address} with data {reg.values} to inverter')
+          self._log.info(f'{self.name} wrote register at address {frame.address} with data {frame.values} to inverter')
 
-        if result != len(reg.values):
-          raise RuntimeError(f'{self.name}: expected to write {len(reg.values)} values '
-                             f'at address {reg.address}, but wrote {result}')
+          if result != len(frame.values):
+            raise RuntimeError(f'{self.name}: expected to write {len(frame.values)} values '
+                               f'at address {frame.address}, but wrote {result}')
 
-        # Update the local dictionary with the new object
-        # This ensures subsequent reads within this session get the new value
-        self._registers[reg.address] = reg
+          written_frames_count += 1
+      except Exception:
+        if written_frames_count:
+          try:
+            self._remove_written_registers_from_cache()
+          except Exception as e:
+            # Write error is the cause, so it is raised instead of the cache one
+            self._log.error(f'{self.name}: failed to remove written registers from cache: {e}')
+        raise
 
-        updated_reg = DeyeRegisterCacheData(
-          address = reg.address,
-          quantity = reg.quantity,
-          caching_time = reg.caching_time,
-          read_ts = current_ts,
-          values = reg.values,
-        )
+      self._remove_written_registers_from_cache()
 
-        # Remove saved registers from the cache to prevent desynchronization between
-        # the cache and the inverter. These registers will be fetched directly
-        # from the inverter during the next read cycle.
-        self._cache_manager.remove_from_cache(registers_to_remove = {reg.address: updated_reg})
+      # Update the local register bank with written values
+      # This ensures subsequent reads within this session get the new value
+      self._load_register_bank(self._registers_to_write)
+      self._registers.update(self._registers_to_write)
 
       self._registers_to_write.clear()
     except Exception as e:
@@ -190,6 +201,13 @@ class DeyeModbusInteractorSync(DeyeModbusInteractor):
     finally:
       self._solarman.disconnect()
 
+  def _remove_written_registers_from_cache(self) -> None:
+    # Remove saved registers from the cache to prevent desynchronization between
+    # the cache and the inverter. These registers will be fetched directly
+    # from the inverter during the next read cycle.
+    # All pending registers are removed at once, even if some frames failed.
+    self._cache_manager.remove_from_cache(registers_to_remove = self._get_written_registers(time.time()))
+
   def get_cache_hit_rate(self) -> DeyeRegisterCacheHitRate:
     self._cache_hit_rate = self._cache_manager.get_cache_hit_rate()
     return self._cache_hit_rate
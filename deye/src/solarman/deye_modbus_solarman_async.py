@@ -1,60 +1,117 @@
+import asyncio
 import logging
 
-from typing import List
+from typing import Awaitable, Callable, List, TypeVar
 
 from deye_logger import DeyeLogger
-from pysolarmanv5 import PySolarmanV5Async
+from pysolarmanv5 import NoSocketAvailableError, PySolarmanV5Async
+from deye_solarman_connection_pool_async import DeyeSolarmanConnectionPoolAsync
+
+T = TypeVar('T')
 
 class DeyeModbusSolarmanAsync:
+  # Errors of the connection itself, the logger didn't answer the request.
+  # Modbus and V5 error replies are not retried
+  _connection_errors = (NoSocketAvailableError, OSError, EOFError, asyncio.TimeoutError)
+
   def __init__(self, logger: DeyeLogger, **kwargs):
     self._logger = logger
     self._kwargs = kwargs
     self._log = logging.getLogger()
     self._modbus: PySolarmanV5Async = None
     self._verbose = kwargs.get('verbose', False)
+    # Opt-in: reuse connections from the process-wide pool instead of reconnecting every cycle
+    self._keep_alive = bool(kwargs.get('keep_alive', False))
+    self._is_reused = False
+    self._is_broken = False
 
   async def read_holding_registers(self, address: int, quantity: int) -> List[int]:
     if self._verbose:
       self._log.info(f"{self._logger.name}: reading data from inverter for address = {address}, quantity = {quantity}")
 
+    return await self._execute(lambda modbus: modbus.read_holding_registers(address, quantity))
+
+  async def write_multiple_holding_registers(self, address: int, values: List[int]) -> int:
+    return await self._execute(lambda modbus: modbus.write_multiple_holding_registers(address, values))
+
+  async def disconnect(self) -> None:
     if self._modbus is None:
-      # We need a local variable "modbus" to handle the
-      # case when the connect() method throws an exception
-      modbus = PySolarmanV5Async(
-        self._logger.address,
-        self._logger.serial,
-        port = self._logger.port,
+      return
+
+    if self._keep_alive:
+      self._modbus = None
+      await DeyeSolarmanConnectionPoolAsync.release(
+        self._logger,
+        reusable = not self._is_broken,
         **self._kwargs,
       )
+      return
 
-      await modbus.connect()
-      self._modbus = modbus
+    try:
+      await self._modbus.disconnect()
+    except Exception as e:
+      if self._verbose:
+        self._log.error(f'{self._logger.name}: error while disconnecting from inverter')
+      raise
+    finally:
+      self._modbus = None
 
-    return await self._modbus.read_holding_registers(address, quantity)
+  async def _execute(self, request: Callable[[PySolarmanV5Async], Awaitable[T]]) -> T:
+    modbus = await self._connect()
 
-  async def write_multiple_holding_registers(self, address: int, values: List[int]) -> int:
-    if self._modbus is None:
-      # We need a local variable "modbus" to handle the
-      # case when the connect() method throws an exception
-      modbus = PySolarmanV5Async(
-        self._logger.address,
-        self._logger.serial,
-        port = self._logger.port,
-        **self._kwargs,
-      )
+    try:
+      return await request(modbus)
+    except asyncio.CancelledError:
+      # Response to the cancelled request may still arrive, so never reuse this connection
+      self._is_broken = True
+      raise
+    except self._connection_errors as e:
+      self._is_broken = True
+
+      # Pooled connection could be silently closed by the logger or proxy
+      # while it was idle, so reconnect once and repeat the request
+      if not self._keep_alive or not self._is_reused:
+        raise
 
-      await modbus.connect()
-      self._modbus = modbus
+      self._log.warning(f'{self._logger.name}: request over reused connection failed ({e}), reconnecting...')
 
-    return await self._modbus.write_multiple_holding_registers(address, values)
+      await self.disconnect()
+      modbus = await self._connect()
 
-  async def disconnect(self) -> None:
-    if self._modbus is not None:
       try:
-        await self._modbus.disconnect()
-      except Exception as e:
-        if self._verbose:
-          self._log.error(f'{self._logger.name}: error while disconnecting from inverter')
+        return await request(modbus)
+      except BaseException:
+        self._is_broken = True
         raise
-      finally:
-        self._modbus = None
+    except Exception:
+      self._is_broken = True
+      raise
+
+  async def _connect(self) -> PySolarmanV5Async:
+    if self._modbus is not None:
+      return self._modbus
+
+    self._is_broken = False
+
+    if self._keep_alive:
+      self._modbus, self._is_reused = await DeyeSolarmanConnectionPoolAsync.acquire(self._logger, **self._kwargs)
+
+      if self._verbose:
+        state = 'reused' if self._is_reused else 'new'
+        self._log.info(f'{self._logger.name}: using {state} pooled connection')
+
+      return self._modbus
+
+    # We need a local variable "modbus" to handle the
+    # case when the connect() method throws an exception
+    modbus = PySolarmanV5Async(
+      self._logger.address,
+      self._logger.serial,
+      port = self._logger.port,
+      **self._kwargs,
+    )
+
+    await modbus.connect()
+    self._modbus = modbus
+
+    return self._modbus
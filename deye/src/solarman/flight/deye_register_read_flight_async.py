@@ -0,0 +1,180 @@
+import asyncio
+
+from typing import Dict, List, Optional, Tuple
+
+from deye_register_cache_data import DeyeRegisterCacheData
+
+class DeyeRegisterReadFlightAsync:
+  """
+  Single-flight coalescing of concurrent register reads in the process.
+
+  A reader starts a flight for its registers with start(). Registers which are
+  already being read by another flight of the same logger are joined instead of read:
+  the reader gets them from that flight when it finishes. The rest of the registers
+  (own registers) should be read by the reader, and the result (or the error)
+  should be passed to complete() (or fail()) to share it with readers joined later.
+
+  A register can be joined if the in-flight read covers the same address with
+  the same or bigger quantity and accepts cached values of the same or lower age
+  (caching time plus stale time, zero without cache), so the shared result
+  is as fresh as the reader wants.
+  """
+  # In-flight registers by (logger name, register address)
+  _flights: Dict[Tuple[str, int], 'DeyeRegisterReadFlightAsync'] = {}
+
+  def __init__(
+    self,
+    name: str,
+    stale_time: int,
+    use_cache: bool,
+  ):
+    self._name = name
+    self._stale_time = stale_time
+    self._use_cache = use_cache
+    self._future: 'asyncio.Future[Dict[int, DeyeRegisterCacheData]]' = asyncio.get_running_loop().create_future()
+    # Joined registers by flight which reads them
+    self._joined: List[Tuple['DeyeRegisterReadFlightAsync', Dict[int, DeyeRegisterCacheData]]] = []
+    self._own: Dict[int, DeyeRegisterCacheData] = {}
+
+    # Mark error as retrieved, even if nobody joined the flight
+    self._future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+  @property
+  def own_registers(self) -> Dict[int, DeyeRegisterCacheData]:
+    """
+    Registers which should be read by the flight owner
+    """
+    return self._own
+
+  @property
+  def joined_count(self) -> int:
+    """
+    Number of registers got from other flights
+    """
+    return sum(len(registers) for _, registers in self._joined)
+
+  @classmethod
+  def start(
+    cls,
+    name: str,
+    registers: Dict[int, DeyeRegisterCacheData],
+    stale_time: int,
+    use_cache: bool,
+  ) -> 'DeyeRegisterReadFlightAsync':
+    """
+    Joins registers which are being read by other flights and registers the rest as in-flight
+
+    Args:
+      stale_time: how many seconds after caching_time expiry cached registers are accepted
+      use_cache: False if registers are read from the inverter only
+    """
+    flight = cls(name, stale_time, use_cache)
+    joined: Dict['DeyeRegisterReadFlightAsync', Dict[int, DeyeRegisterCacheData]] = {}
+
+    for addr, reg in registers.items():
+      other = cls._flights.get((name, addr))
+      if other is not None and other._can_share(reg, cls._get_max_age(reg, stale_time, use_cache)):
+        joined.setdefault(other, {})[addr] = reg
+      else:
+        flight._own[addr] = reg
+
+    for addr in flight._own:
+      cls._flights[(name, addr)] = flight
+
+    flight._joined = list(joined.items())
+    return flight
+
+  @classmethod
+  def can_join_all(
+    cls,
+    name: str,
+    registers: Dict[int, DeyeRegisterCacheData],
+    stale_time: int,
+    use_cache: bool,
+  ) -> bool:
+    """
+    Checks if all registers would be joined by start() with the same arguments
+    """
+    for addr, reg in registers.items():
+      other = cls._flights.get((name, addr))
+      if other is None or not other._can_share(reg, cls._get_max_age(reg, stale_time, use_cache)):
+        return False
+
+    return bool(registers)
+
+  def complete(self, results: Dict[int, DeyeRegisterCacheData]) -> None:
+    """
+    Shares read registers with joined readers
+    """
+    self._finish()
+    if not self._future.done():
+      self._future.set_result(results)
+
+  def fail(self, e: BaseException) -> None:
+    """
+    Shares the read error with joined readers. Joined readers read
+    registers by themselves if the flight was cancelled
+    """
+    self._finish()
+    if self._future.done():
+      return
+
+    if isinstance(e, Exception):
+      self._future.set_exception(e)
+    else:
+      self._future.cancel()
+
+  async def get_joined_registers(
+    self,
+  ) -> Tuple[Dict[int, DeyeRegisterCacheData], Dict[int, DeyeRegisterCacheData]]:
+    """
+    Waits for the joined flights.
+
+    Returns:
+      Tuple of registers got from the joined flights and registers which should be
+      read by the caller, because the flight reading them was cancelled
+    """
+    results: Dict[int, DeyeRegisterCacheData] = {}
+    missing: Dict[int, DeyeRegisterCacheData] = {}
+
+    for other, registers in self._joined:
+      # Shield the shared future, so cancellation of this reader doesn't affect others
+      try:
+        other_results: Optional[Dict[int, DeyeRegisterCacheData]] = await asyncio.shield(other._future)
+      except asyncio.CancelledError:
+        if not other._future.cancelled():
+          raise
+        other_results = None
+
+      for addr, reg in registers.items():
+        result = other_results.get(addr) if other_results is not None else None
+        if result is None or result.quantity < reg.quantity:
+          missing[addr] = reg
+          continue
+
+        results[addr] = DeyeRegisterCacheData(
+          address = addr,
+          quantity = reg.quantity,
+          caching_time = reg.caching_time,
+          read_ts = result.read_ts,
+          values = result.values[:reg.quantity],
+        )
+
+    return results, missing
+
+  def _can_share(self, reg: DeyeRegisterCacheData, max_age: int) -> bool:
+    own = self._own.get(reg.address)
+    return (own is not None and not self._future.done() and self._future.get_loop() is asyncio.get_running_loop()
+            and own.quantity >= reg.quantity
+            and self._get_max_age(own, self._stale_time, self._use_cache) <= max_age)
+
+  @staticmethod
+  def _get_max_age(reg: DeyeRegisterCacheData, stale_time: int, use_cache: bool) -> int:
+    # Max age in seconds of the register value accepted by the reader
+    return reg.caching_time + stale_time if use_cache else 0
+
+  def _finish(self) -> None:
+    flights = DeyeRegisterReadFlightAsync._flights
+    for addr in self._own:
+      if flights.get((self._name, addr)) is self:
+        del flights[(self._name, addr)]
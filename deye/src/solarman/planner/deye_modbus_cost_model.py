@@ -0,0 +1,72 @@
+import threading
+
+from typing import Dict
+
+from deye_logger import DeyeLogger
+
+class DeyeModbusCostModel:
+  """
+  Expected duration of a single modbus read request to the logger.
+
+  The cost of one request is modelled as a fixed per-request latency (frame
+  round-trip through the logger and proxy) plus a per-register transfer time.
+  The per-request latency is refined with an exponential moving average of
+  the durations actually observed for this logger.
+  """
+  _models: Dict[str, "DeyeModbusCostModel"] = {}
+  _lock = threading.Lock()
+
+  def __init__(
+    self,
+    request_cost_ms: float = 250.0,
+    register_cost_ms: float = 2.5,
+    smoothing: float = 0.2,
+  ):
+    self._request_cost_ms = max(0.0, float(request_cost_ms))
+    self._register_cost_ms = max(0.0, float(register_cost_ms))
+    self._smoothing = min(1.0, max(0.0, float(smoothing)))
+    self._observe_lock = threading.Lock()
+
+  @property
+  def request_cost_ms(self) -> float:
+    return self._request_cost_ms
+
+  @property
+  def register_cost_ms(self) -> float:
+    return self._register_cost_ms
+
+  def estimate(self, quantity: int) -> float:
+    """
+    Returns the expected duration in milliseconds of one request reading `quantity` registers
+    """
+    return self._request_cost_ms + quantity * self._register_cost_ms
+
+  def observe(self, quantity: int, duration_ms: float) -> None:
+    """
+    Updates the per-request latency with the measured duration of a finished request
+    """
+    overhead_ms = max(0.0, duration_ms - quantity * self._register_cost_ms)
+    with self._observe_lock:
+      self._request_cost_ms += self._smoothing * (overhead_ms - self._request_cost_ms)
+
+  @classmethod
+  def for_logger(cls, logger: DeyeLogger, **kwargs) -> "DeyeModbusCostModel":
+    """
+    Returns the process-wide cost model for the logger, so that latency learned
+    by one interactor is reused by the next one talking to the same logger.
+    Initial values are taken from `request_cost_ms` and `register_cost_ms` kwargs.
+    """
+    key = f'{logger.address}:{logger.port}:{logger.serial}'
+    with cls._lock:
+      model = cls._models.get(key)
+      if model is None:
+        model = cls(
+          request_cost_ms = kwargs.get('request_cost_ms', 250.0),
+          register_cost_ms = kwargs.get('register_cost_ms', 2.5),
+        )
+        cls._models[key] = model
+      return model
+
+  def __repr__(self) -> str:
+    return (f"CostModel(request: {round(self._request_cost_ms)} ms, "
+            f"register: {self._register_cost_ms:g} ms)")
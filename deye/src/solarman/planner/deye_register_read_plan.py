@@ -0,0 +1,36 @@
+from typing import List
+from dataclasses import dataclass
+
+from deye_register_cache_data import DeyeRegisterCacheData
+
+@dataclass
+class DeyeRegisterReadPlan:
+  groups: List[List[DeyeRegisterCacheData]]
+  predicted_cost_ms: float
+
+  @property
+  def requests_count(self) -> int:
+    return len(self.groups)
+
+  @property
+  def registers_count(self) -> int:
+    """
+    Total count of registers read by all requests, including gaps between enqueued registers
+    """
+    return sum(self.get_group_quantity(group) for group in self.groups)
+
+  @staticmethod
+  def get_group_quantity(group: List[DeyeRegisterCacheData]) -> int:
+    if not group:
+      return 0
+    start = group[0].address
+    max_end = max(reg.address + reg.quantity for reg in group)
+    return max_end - start
+
+  @classmethod
+  def empty(cls) -> "DeyeRegisterReadPlan":
+    return cls(groups = [], predicted_cost_ms = 0.0)
+
+  def __str__(self) -> str:
+    return (f"{self.requests_count} request(s), {self.registers_count} register(s), "
+            f"predicted {round(self.predicted_cost_ms)} ms")
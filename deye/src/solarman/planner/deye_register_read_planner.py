@@ -0,0 +1,64 @@
+from typing import Dict, List
+
+from deye_register_cache_data import DeyeRegisterCacheData
+from deye_modbus_cost_model import DeyeModbusCostModel
+from deye_register_read_plan import DeyeRegisterReadPlan
+
+class DeyeRegisterReadPlanner:
+  """
+  Splits enqueued registers into read requests with minimal expected read time.
+
+  Registers are sorted by address and every request covers a contiguous run of them,
+  so reading the gap between two registers is weighed against paying for one more
+  request. The optimal split is found by dynamic programming over the sorted list.
+  """
+  def __init__(
+    self,
+    max_register_count: int,
+    cost_model: DeyeModbusCostModel,
+  ):
+    self._max_register_count = max_register_count
+    self._cost_model = cost_model
+
+  def plan(self, registers: Dict[int, DeyeRegisterCacheData]) -> DeyeRegisterReadPlan:
+    regs = [registers[addr] for addr in sorted(registers.keys())]
+    count = len(regs)
+
+    if not count:
+      return DeyeRegisterReadPlan.empty()
+
+    # best_costs[i] is the minimal cost of reading the first i registers
+    # splits[i] is the start index of the last request in that optimal solution
+    best_costs: List[float] = [0.0] + [float('inf')] * count
+    splits: List[int] = [0] * (count + 1)
+
+    for end in range(1, count + 1):
+      max_end = 0
+      # Try every possible start of the last request, going backwards
+      for start in range(end - 1, -1, -1):
+        reg = regs[start]
+        max_end = max(max_end, reg.address + reg.quantity)
+        quantity = max_end - reg.address
+
+        # Going further back can only make the request longer
+        if quantity > self._max_register_count and start < end - 1:
+          break
+
+        cost = best_costs[start] + self._cost_model.estimate(quantity)
+        if cost < best_costs[end]:
+          best_costs[end] = cost
+          splits[end] = start
+
+    groups: List[List[DeyeRegisterCacheData]] = []
+    end = count
+    while end > 0:
+      start = splits[end]
+      groups.append(regs[start:end])
+      end = start
+
+    groups.reverse()
+
+    return DeyeRegisterReadPlan(
+      groups = groups,
+      predicted_cost_ms = best_costs[count],
+    )
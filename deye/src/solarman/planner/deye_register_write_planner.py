@@ -0,0 +1,52 @@
+from typing import Dict, List
+
+from deye_register_cache_data import DeyeRegisterCacheData
+
+class DeyeRegisterWritePlanner:
+  """
+  Merges pending register writes into the fewest write frames.
+
+  Adjacent and overlapping writes are joined into contiguous runs (later writes win
+  on overlapping addresses) and every run is split into frames not longer than
+  `max_register_count`. Writes separated by a gap are never joined, since values
+  of the registers in the gap are unknown.
+  """
+  def __init__(self, max_register_count: int):
+    self._max_register_count = max_register_count
+
+  def plan(self, registers: Dict[int, DeyeRegisterCacheData]) -> List[DeyeRegisterCacheData]:
+    # Apply writes in enqueue order, so the latest value wins for each address
+    values: Dict[int, int] = {}
+    caching_times: Dict[int, int] = {}
+
+    for reg in registers.values():
+      for offset, value in enumerate(reg.values):
+        values[reg.address + offset] = value
+        caching_times[reg.address + offset] = reg.caching_time
+
+    frames: List[DeyeRegisterCacheData] = []
+    run: List[int] = []
+
+    for addr in sorted(values.keys()):
+      if run and (addr != run[-1] + 1 or len(run) >= self._max_register_count):
+        frames.append(self._create_frame(run, values, caching_times))
+        run = []
+      run.append(addr)
+
+    if run:
+      frames.append(self._create_frame(run, values, caching_times))
+
+    return frames
+
+  def _create_frame(
+    self,
+    addresses: List[int],
+    values: Dict[int, int],
+    caching_times: Dict[int, int],
+  ) -> DeyeRegisterCacheData:
+    return DeyeRegisterCacheData(
+      address = addresses[0],
+      quantity = len(addresses),
+      caching_time = min(caching_times[addr] for addr in addresses),
+      values = [values[addr] for addr in addresses],
+    )
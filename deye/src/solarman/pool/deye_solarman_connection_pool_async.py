@@ -0,0 +1,132 @@
+import time
+import asyncio
+import logging
+
+from typing import Dict, Tuple
+
+from deye_logger import DeyeLogger
+from pysolarmanv5 import PySolarmanV5Async
+from deye_solarman_pooled_connection import DeyeSolarmanPooledConnection
+
+class DeyeSolarmanConnectionPoolAsync:
+  """
+  Process-wide keep-alive pool of Solarman connections keyed by (host, port, serial).
+
+  Each logger accepts only one connection at a time, so the pool holds at most one
+  connection per logger and hands it out exclusively. A connection is validated
+  before reuse and replaced when it was closed by the remote side, stayed idle
+  longer than `idle_timeout` or lives longer than `max_lifetime`.
+  Idle connections are closed in background after `idle_timeout`, so the logger
+  (or deyeproxy session) is released even if nobody reads it again.
+
+  When working through deyeproxy keep `idle_timeout` below CLIENT_IDLE_TIMEOUT
+  and `max_lifetime` below SESSION_TIMEOUT of the proxy.
+  """
+  _connections: Dict[Tuple[str, int, int], DeyeSolarmanPooledConnection] = {}
+
+  default_idle_timeout = 2.0
+  default_max_lifetime = 8.0
+
+  @classmethod
+  async def acquire(cls, logger: DeyeLogger, **kwargs) -> Tuple[PySolarmanV5Async, bool]:
+    """
+    Returns connected PySolarmanV5Async object and a flag that the connection was reused.
+    The connection is owned exclusively by the caller until release() is called.
+    """
+    log = logging.getLogger()
+    idle_timeout, max_lifetime = cls._get_timeouts(**kwargs)
+    connection = cls._get_connection(logger)
+
+    await connection.lock.acquire()
+
+    try:
+      connection.cancel_close()
+
+      if connection.modbus is not None:
+        if connection.is_alive() and not connection.is_expired(idle_timeout, max_lifetime):
+          connection.last_used_ts = time.monotonic()
+          return connection.modbus, True
+
+        log.info(f'{logger.name}: pooled connection is closed or expired, reconnecting...')
+        await connection.close()
+
+      # We need a local variable "modbus" to handle the
+      # case when the connect() method throws an exception
+      modbus = PySolarmanV5Async(
+        logger.address,
+        logger.serial,
+        port = logger.port,
+        **kwargs,
+      )
+
+      await modbus.connect()
+      connection.set(modbus)
+
+      return modbus, False
+    except BaseException:
+      connection.lock.release()
+      raise
+
+  @classmethod
+  async def release(cls, logger: DeyeLogger, reusable: bool, **kwargs) -> None:
+    """
+    Returns the connection to the pool. Broken connections should be released
+    with `reusable` set to False, so they are closed immediately.
+    """
+    idle_timeout, _ = cls._get_timeouts(**kwargs)
+    connection = cls._connections.get(cls._get_key(logger))
+
+    if connection is None or not connection.lock.locked():
+      return
+
+    try:
+      if reusable and connection.is_alive():
+        connection.last_used_ts = time.monotonic()
+        connection.close_handle = connection.loop.call_later(
+          idle_timeout,
+          lambda: asyncio.ensure_future(cls._close_idle(connection)),
+        )
+      else:
+        await connection.close()
+    finally:
+      connection.lock.release()
+
+  @classmethod
+  async def close_all(cls) -> None:
+    for connection in list(cls._connections.values()):
+      async with connection.lock:
+        await connection.close()
+
+  @classmethod
+  async def _close_idle(cls, connection: DeyeSolarmanPooledConnection) -> None:
+    # Connection was taken again before the timer fired
+    if connection.lock.locked():
+      return
+
+    async with connection.lock:
+      if connection.close_handle is not None:
+        await connection.close()
+
+  @classmethod
+  def _get_connection(cls, logger: DeyeLogger) -> DeyeSolarmanPooledConnection:
+    key = cls._get_key(logger)
+    loop = asyncio.get_running_loop()
+
+    connection = cls._connections.get(key)
+
+    # Connections and locks are bound to the event loop they were created in
+    if connection is None or connection.loop is not loop:
+      connection = DeyeSolarmanPooledConnection(name = logger.name, loop = loop)
+      cls._connections[key] = connection
+
+    return connection
+
+  @staticmethod
+  def _get_key(logger: DeyeLogger) -> Tuple[str, int, int]:
+    return (logger.address, logger.port, logger.serial)
+
+  @classmethod
+  def _get_timeouts(cls, **kwargs) -> Tuple[float, float]:
+    idle_timeout = float(kwargs.get('keep_alive_idle_timeout', cls.default_idle_timeout))
+    max_lifetime = float(kwargs.get('keep_alive_max_lifetime', cls.default_max_lifetime))
+    return max(0.0, idle_timeout), max(0.0, max_lifetime)
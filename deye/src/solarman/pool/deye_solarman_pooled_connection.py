@@ -0,0 +1,75 @@
+import time
+import asyncio
+import logging
+
+from typing import Optional
+
+from pysolarmanv5 import PySolarmanV5Async
+
+class DeyeSolarmanPooledConnection:
+  """
+  Single keep-alive connection to a logger with its usage metadata.
+  The lock guarantees that only one reader/writer uses the connection at a time.
+  """
+  def __init__(self, name: str, loop: asyncio.AbstractEventLoop):
+    self._name = name
+    self._loop = loop
+    self._lock = asyncio.Lock()
+    self._log = logging.getLogger()
+    self.modbus: Optional[PySolarmanV5Async] = None
+    self.created_ts = 0.0
+    self.last_used_ts = 0.0
+    self.close_handle: Optional[asyncio.TimerHandle] = None
+
+  @property
+  def loop(self) -> asyncio.AbstractEventLoop:
+    return self._loop
+
+  @property
+  def lock(self) -> asyncio.Lock:
+    return self._lock
+
+  def is_alive(self) -> bool:
+    """
+    Checks that the underlying socket wasn't closed by the logger or proxy
+    """
+    if self.modbus is None:
+      return False
+
+    writer = getattr(self.modbus, 'writer', None)
+    if writer is None or writer.is_closing():
+      return False
+
+    reader_task = getattr(self.modbus, 'reader_task', None)
+    if reader_task is not None and reader_task.done():
+      return False
+
+    return True
+
+  def is_expired(self, idle_timeout: float, max_lifetime: float) -> bool:
+    now = time.monotonic()
+    return (now - self.last_used_ts) > idle_timeout or (now - self.created_ts) > max_lifetime
+
+  def set(self, modbus: PySolarmanV5Async) -> None:
+    self.modbus = modbus
+    self.created_ts = time.monotonic()
+    self.last_used_ts = self.created_ts
+
+  def cancel_close(self) -> None:
+    if self.close_handle is not None:
+      self.close_handle.cancel()
+      self.close_handle = None
+
+  async def close(self) -> None:
+    self.cancel_close()
+
+    modbus = self.modbus
+    self.modbus = None
+
+    if modbus is None:
+      return
+
+    try:
+      await modbus.disconnect()
+    except Exception as e:
+      self._log.warning(f'{self._name}: error while closing pooled connection: {e}')
@@ -1,3 +1,4 @@
+import random
 import socket
 import threading
 import socketserver
@@ -19,6 +20,7 @@ from umodbus.functions import (
 from pysolarmanv5.pysolarmanv5 import CONTROL_CODE, PySolarmanV5, V5FrameError
 
 from mock_data_logger import MockDatalogger
+from solarman_server_stats import SolarmanServerStats
 
 _WIN_PLATFORM = True if platform.system() == "Windows" else False
 
@@ -42,6 +44,9 @@ class SolarmanBaseServer():
   - Generates valid Modbus CRC frames for responses.
   - Supports asynchronous streaming over TCP.
   - Can run either in the current asyncio event loop or in a dedicated thread.
+  - Can emulate slow loggers: per-frame latency with jitter and
+    a single client connection at a time (other clients wait for it).
+  - Counts connections, frames and bytes for benchmarks.
   """
   def __init__(
     self,
@@ -60,6 +65,13 @@ class SolarmanBaseServer():
 
     self._server: Optional[asyncio.AbstractServer] = None
 
+    self._latency = 0.0
+    self._jitter = 0.0
+    self._single_connection = False
+    self._connection_lock: Optional[asyncio.Lock] = None
+    self._stats = SolarmanServerStats()
+    self._stats_lock = threading.Lock()
+
     try:
       self._loop = asyncio.get_running_loop()
       self._loop.create_task(self.start_server())
@@ -72,6 +84,32 @@ class SolarmanBaseServer():
   def name(self) -> str:
     return self._name
 
+  @property
+  def stats(self) -> SolarmanServerStats:
+    """
+    Returns a copy of traffic counters
+    """
+    with self._stats_lock:
+      return SolarmanServerStats(**vars(self._stats))
+
+  def reset_stats(self) -> None:
+    with self._stats_lock:
+      self._stats = SolarmanServerStats()
+
+  def set_latency(self, latency_ms: float, jitter_ms: float = 0) -> None:
+    """
+    Sets delay before every response: latency_ms plus a random value up to jitter_ms
+    """
+    self._latency = max(0.0, latency_ms) / 1000
+    self._jitter = max(0.0, jitter_ms) / 1000
+
+  def set_single_connection(self, single_connection: bool) -> None:
+    """
+    Serves only one client connection at a time, like real loggers do.
+    Other clients are accepted, but their requests wait until the connection is closed
+    """
+    self._single_connection = single_connection
+
   async def start_server(self) -> None:
     """
     Start the asynchronous TCP server
@@ -152,12 +190,32 @@ class SolarmanBaseServer():
     writer : asyncio.StreamWriter
         Asynchronous stream writer for sending data to the client.
     """
+    with self._stats_lock:
+      self._stats.connections += 1
+
+    if self._single_connection:
+      if self._connection_lock is None:
+        self._connection_lock = asyncio.Lock()
+
+      async with self._connection_lock:
+        await self._handle_stream(reader, writer)
+    else:
+      await self._handle_stream(reader, writer)
+
+  async def _handle_stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
     sol = MockDatalogger(self._address, serial = self._serial, auto_reconnect = False)
     while True:
       data = await reader.read(1024)
       if data == b"":
         break
       else:
+        with self._stats_lock:
+          self._stats.frames += 1
+          self._stats.bytes_received += len(data)
+
+        if self._latency or self._jitter:
+          await asyncio.sleep(self._latency + random.uniform(0, self._jitter))
+
         sol.sequence_number = data[5]
         self._log.debug(f"{self._name}: RECD: {data.hex(' ')}")
         buffer = bytearray(data)
@@ -180,6 +238,9 @@ class SolarmanBaseServer():
           enc = sol.v5_frame_response_encoder(enc)
           self._log.debug(f'{self._name}: Sending frame: {bytes(enc).hex(" ")}')
           writer.write(bytes(enc))
+
+          with self._stats_lock:
+            self._stats.bytes_sent += len(enc)
           await writer.drain()
         except V5FrameError as e:
           # Close immediately - allows testing with wrong serial numbers, sequence numbers etc.
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+
+@dataclass
+class SolarmanServerStats:
+  """
+  Traffic counters of the solarman test server
+  """
+  connections: int = 0
+  frames: int = 0
+  bytes_received: int = 0
+  bytes_sent: int = 0
+
+  @property
+  def bytes_total(self) -> int:
+    return self.bytes_received + self.bytes_sent
@@ -2,7 +2,6 @@ import os
 import sys
 import asyncio
 import logging
-import uvicorn
 
 from datetime import datetime
 from contextlib import asynccontextmanager
@@ -19,6 +18,7 @@ for dir, dirs, files in os.walk(common_path):
 
 from log_utils import LogUtils
 from common_utils import CommonUtils
+from uvicorn_utils import UvicornUtils
 from src.deye_graph_server_config import DeyeGraphServerConfig
 from src.deye_graph_manager import DeyeGraphManager
 
@@ -48,6 +48,8 @@ async def lifespan_handler(app: FastAPI):
   actual_ip = external_ip if external_ip else config.SERVER_HOST
 
   logger.info(f"Listening on: {actual_ip}:{config.SERVER_PORT}")
+  if config.SERVER_SOCKET:
+    logger.info(f"Listening on: {config.SERVER_SOCKET}")
 
   # The application runs here
   yield
@@ -233,10 +235,11 @@ async def get_graphs_csv(graph_date: str):
 if __name__ == "__main__":
   config.print_usage(logger)
 
-  uvicorn.run(
+  UvicornUtils.run(
     app,
     host = config.SERVER_HOST,
     port = config.SERVER_PORT,
+    socket_path = config.SERVER_SOCKET,
     timeout_keep_alive = 15,
     proxy_headers = False,
     forwarded_allow_ips = None,
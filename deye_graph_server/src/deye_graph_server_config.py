@@ -8,12 +8,15 @@ from env_vars import EnvVars
 class DeyeGraphServerConfig:
   def __init__(self):
     self.__server_port = EnvVar("SERVER_PORT", "80", "Local port to listen on")
+    self.__server_socket = EnvVar("SERVER_SOCKET", "", "Unix domain socket path to listen on besides the port "
+                                  "(empty to listen only on the port)")
     self.__server_host = '0.0.0.0'
 
     self.__all_vars: List[EnvVar] = [
       EnvVars.DEYE_LOG_NAME,
       EnvVars.DEYE_DATA_COLLECTOR_DIR,
       self.__server_port,
+      self.__server_socket,
     ]
 
   @property
@@ -32,6 +35,10 @@ class DeyeGraphServerConfig:
   def SERVER_PORT(self) -> int:
     return self.__server_port.as_int()
 
+  @property
+  def SERVER_SOCKET(self) -> str:
+    return self.__server_socket.value
+
   def _get_max_var_length(self) -> int:
     return max((len(var.name) for var in self.__all_vars), default = 0)
 
@@ -1,24 +1,39 @@
 """
 Deye TCP Proxy Server
 
-Author: Dmitry Smirnov 
+Author: Dmitry Smirnov
 https://github.com/smirnovhub
 
-This module provides a thread-safe, exclusive-access proxy for communicating with 
-Solarman V5 data loggers (found in Deye, Sunsynk, and other inverters). 
+This module provides an exclusive-access proxy for communicating with
+Solarman V5 data loggers (found in Deye, Sunsynk, and other inverters).
 
-The proxy solves the "single-connection" limitation of the hardware by queuing 
-multiple client requests and ensuring only one session is active at a time 
-using a global threading lock.
+The proxy solves the "single-connection" limitation of the hardware by queuing
+multiple client requests and ensuring only one session is active at a time
+using a global queue.
 
 Architecture:
-    1.  Main thread listens for incoming TCP connections (e.g., from Home Assistant).
-    2.  Each client is handled in a separate 'ProxyMainThread'.
-    3.  A global 'logger_lock' ensures serialized access to the physical logger.
-    4.  Bi-directional data transfer is managed by two dedicated full-duplex threads.
-    5.  Strict timeouts and 'half-close' (TCP shutdown) patterns are used to 
+    1.  A single asyncio event loop accepts incoming TCP connections
+        (e.g., from Home Assistant) and serves all of them, no threads are used.
+    2.  Each client is handled in its own task.
+    3.  A global 'logger_queue' ensures serialized access to the physical logger.
+        Waiting clients are served by priority ('DeyeProxyPriorityMap'), in arrival
+        order within each priority, and rejected early when the queue is full.
+    4.  Bi-directional data transfer is managed by two full-duplex forwarding tasks.
+    5.  Strict timer-based timeouts and 'half-close' (TCP shutdown) patterns are used to
         ensure the logger is released promptly.
 
+    With PROXY_MODE=frame the logger is not locked for whole client sessions.
+    The proxy reads Solarman V5 request frames of the clients and sends them one
+    at a time over one persistent logger connection ('DeyeProxyMultiplexer'),
+    so concurrent clients wait only for single requests of each other.
+    Modbus reads are coalesced there ('DeyeProxyReadCoalescer'): repeated reads are
+    answered from a short-lived cache (READ_CACHE_TTL_MS) and overlapping queued
+    reads are merged into one logger request.
+
+    With METRICS_PORT set, queue wait, hold and logger connect times, transferred
+    bytes, timeouts by type and the queue depth are exposed for Prometheus at
+    /metrics on that port ('DeyeProxyMetricsServer').
+
 Usage:
     Run the script with the required environment variables.
     The proxy will listen on 0.0.0.0:8899 by default.
@@ -30,12 +45,11 @@ import os
 import sys
 import time
 import errno
+import asyncio
 import logging
-import socket
 import signal
-import threading
 
-from typing import Tuple, Optional
+from typing import List, Optional, Set
 
 utils_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "../common/utils"))
 sys.path.append(utils_path)
@@ -43,6 +57,14 @@ sys.path.append(utils_path)
 from log_utils import LogUtils
 from common_utils import CommonUtils
 from src.deye_proxy_config import DeyeProxyConfig
+from src.deye_proxy_frame import DeyeProxyFrame
+from src.deye_proxy_metrics import DeyeProxyMetrics
+from src.deye_proxy_metrics_server import DeyeProxyMetricsServer
+from src.deye_proxy_modbus import DeyeProxyModbus
+from src.deye_proxy_multiplexer import DeyeProxyMultiplexer
+from src.deye_proxy_priority import DeyeProxyPriority
+from src.deye_proxy_queue import DeyeProxyQueue, DeyeProxyQueueFullError
+from src.deye_proxy_read_coalescer import DeyeProxyReadCoalescer
 
 config = DeyeProxyConfig()
 
@@ -61,11 +83,30 @@ logger_wait = LogUtils.setup_hourly_overwrite_file_logger(
 
 config.validate_or_exit()
 
-# Global lock to synchronize access to the physical logger
-logger_lock: threading.Lock = threading.Lock()
+# Metrics exposed on METRICS_PORT
+metrics = DeyeProxyMetrics()
+
+# Global queue to synchronize access to the physical logger
+logger_queue = DeyeProxyQueue(max_depth = config.MAX_QUEUE_DEPTH, metrics = metrics)
+
+# Client priorities by client address and proxy port
+priority_map = config.PRIORITY_MAP
+
+# Stop flag: set by the signal handlers to stop the server
+shutdown_event = asyncio.Event()
+
+# Shared logger connection in frame mode
+multiplexer: Optional[DeyeProxyMultiplexer] = None
+coalescer: Optional[DeyeProxyReadCoalescer] = None
+
+# Tasks of the connected clients, cancelled on shutdown
+client_tasks: Set[asyncio.Task] = set()
 
-# Stop flag: A thread-safe way to manage the program's lifecycle
-shutdown_event = threading.Event()
+# Maximum number of bytes read from a socket at once
+receive_buffer_size = 64 * 1024
+
+# How often (in seconds) queue wait times by priority are written to the wait log
+queue_stats_interval = 10 * 60
 
 log_level = logging.INFO
 if config.LOG_LEVEL in logging._nameToLevel:
@@ -78,160 +119,154 @@ logging.basicConfig(
   handlers = [logging.StreamHandler(sys.stdout)],
 )
 
-def forward_data(
-  source: socket.socket,
-  destination: socket.socket,
+def close_writer(writer: Optional[asyncio.StreamWriter]) -> None:
+  if writer is not None:
+    try:
+      writer.close()
+    except Exception:
+      pass
+
+async def forward_data(
+  source: asyncio.StreamReader,
+  destination: asyncio.StreamWriter,
   source_timeout: float,
-  stop_event: threading.Event,
   direction: str,
+  metrics_direction: str,
+  timeout_type: str,
 ) -> None:
   """
-  Bi-directional data forwarding with specific timeout for the source socket.
+  One direction of data forwarding with specific inactivity timeout for the source.
   """
   total_bytes = 0
-  # Set the specific timeout for this direction
-  source.settimeout(source_timeout)
 
   try:
-    while not stop_event.is_set():
+    while True:
       try:
-        data = source.recv(1024)
-        if not data:
-          # Remote end closed connection
-          try:
-            destination.shutdown(socket.SHUT_WR)
-          except Exception:
-            pass
-          break
-
-        destination.sendall(data)
-        total_bytes += len(data)
-      except socket.timeout:
+        data = await asyncio.wait_for(source.read(receive_buffer_size), source_timeout)
+      except asyncio.TimeoutError:
         # This is where the specific timeout hits
         logger.error(f"{direction} timed out after {source_timeout}s of inactivity")
+        metrics.timeouts.inc(timeout_type)
         break
-      except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
-        logger.error(f"{direction} connection reset by peer")
+
+      if not data:
+        # Remote end closed connection
+        try:
+          if destination.can_write_eof():
+            destination.write_eof()
+        except Exception:
+          pass
         break
+
+      destination.write(data)
+      await destination.drain()
+      total_bytes += len(data)
+  except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+    logger.error(f"{direction} connection reset by peer")
   except Exception as e:
     logger.debug(f"{direction} exception: {e}")
   finally:
-    # Signals the other thread and main loop to stop
-    stop_event.set()
     logger.info(f"{direction} bytes sent: {total_bytes}")
-
-def handle_client(client_sock: socket.socket, client_ip: str, client_port: int) -> None:
+    metrics.bytes.observe(total_bytes, metrics_direction)
+
+async def handle_client(
+  client_reader: asyncio.StreamReader,
+  client_writer: asyncio.StreamWriter,
+  client_ip: str,
+  client_port: int,
+  priority: DeyeProxyPriority,
+) -> None:
   """
   Manages a single client session and enforces exclusive access to the logger.
   """
   if shutdown_event.is_set():
-    client_sock.close()
+    close_writer(client_writer)
     return
 
   start_wait = time.time()
   logger.info(f"{client_ip}:{client_port} Client wants connect "
-              f"to {config.LOGGER_HOST}:{config.LOGGER_PORT}...")
+              f"to {config.LOGGER_HOST}:{config.LOGGER_PORT} (priority {priority.name})...")
 
-  acquired = logger_lock.acquire(timeout = config.CLIENT_WAIT_TIMEOUT)
+  try:
+    acquired = await logger_queue.acquire(priority, config.CLIENT_WAIT_TIMEOUT)
+  except DeyeProxyQueueFullError as e:
+    logger.error(f"{client_ip}:{client_port} {e}. Connection rejected.")
+    close_writer(client_writer)
+    return
 
   if not acquired:
     logger.error(f"{client_ip}:{client_port} Could not acquire lock within "
                  f"{config.CLIENT_WAIT_TIMEOUT}s. Connection rejected.")
-    client_sock.close()
+    close_writer(client_writer)
     return
 
-  try:
-    session_start = time.time()
-    wait_duration = session_start - start_wait
+  session_start = time.time()
+  wait_duration = session_start - start_wait
+  logger_writer: Optional[asyncio.StreamWriter] = None
 
+  try:
     if shutdown_event.is_set():
-      client_sock.close()
       return
 
-    logger_sock: Optional[socket.socket] = None
-
     logger.info(f"{client_ip}:{client_port} Lock acquired "
                 f"(waited {wait_duration:.2f}s). Connecting to logger...")
 
     if wait_duration > 0.1:
-      logger_wait.warning(f"{client_ip}:{client_port} Wait duration: {wait_duration:.2f}s")
+      logger_wait.warning(f"{client_ip}:{client_port} Wait duration ({priority.name}): {wait_duration:.2f}s")
 
     # Open connection to the real hardware
-    logger_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    logger_sock.settimeout(config.CONNECT_TIMEOUT)
-    logger_sock.connect((config.LOGGER_HOST, config.LOGGER_PORT))
+    connect_start = time.time()
+    logger_reader, connected_writer = await asyncio.wait_for(
+      asyncio.open_connection(config.LOGGER_HOST, config.LOGGER_PORT, limit = receive_buffer_size),
+      config.CONNECT_TIMEOUT,
+    )
+    logger_writer = connected_writer
+    metrics.connect.observe(time.time() - connect_start)
 
-    logger_ip, logger_port = logger_sock.getpeername()
+    logger_ip, logger_port = connected_writer.get_extra_info("peername")[:2]
 
     logger.info(f"{client_ip}:{client_port} Bridge established: "
                 f"{client_ip}:{client_port} <-> {logger_ip}:{logger_port}")
 
-    stop_event = threading.Event()
-
-    # Start forwarding threads
-    # Using threads to handle full-duplex communication
-    c2l = threading.Thread(
-      target = forward_data,
-      daemon = True,
-      args = (
-        client_sock,
-        logger_sock,
+    # Full-duplex communication: the session ends when any direction ends
+    c2l = asyncio.create_task(
+      forward_data(
+        client_reader,
+        connected_writer,
         config.CLIENT_IDLE_TIMEOUT,
-        stop_event,
         f"{client_ip}:{client_port} Client -> Logger",
-      ),
-      name = "ClientToLoggerThread",
-    )
-
-    l2c = threading.Thread(
-      target = forward_data,
-      daemon = True,
-      args = (
-        logger_sock,
-        client_sock,
+        DeyeProxyMetrics.client_to_logger,
+        DeyeProxyMetrics.client_idle_timeout,
+      ))
+
+    l2c = asyncio.create_task(
+      forward_data(
+        logger_reader,
+        client_writer,
         config.LOGGER_IDLE_TIMEOUT,
-        stop_event,
         f"{client_ip}:{client_port} Logger -> Client",
-      ),
-      name = "LoggerToClientThread",
+        DeyeProxyMetrics.logger_to_client,
+        DeyeProxyMetrics.logger_idle_timeout,
+      ))
+
+    done, pending = await asyncio.wait(
+      [c2l, l2c],
+      timeout = config.SESSION_TIMEOUT,
+      return_when = asyncio.FIRST_COMPLETED,
     )
 
-    c2l.start()
-    l2c.start()
+    if not done:
+      logger.error(f"{client_ip}:{client_port} Session timed out after {config.SESSION_TIMEOUT}s")
+      metrics.timeouts.inc(DeyeProxyMetrics.session_timeout)
 
-    wait_interval = 1.0
-    elapsed_time = 0.0
+    for task in pending:
+      task.cancel()
 
-    while not stop_event.is_set() and not shutdown_event.is_set():
-      if stop_event.wait(timeout = wait_interval):
-        break
+    await asyncio.gather(*pending, return_exceptions = True)
 
-      elapsed_time += wait_interval
-      if elapsed_time >= config.SESSION_TIMEOUT:
-        logger.error(f"{client_ip}:{client_port} Session timed out after {config.SESSION_TIMEOUT}s")
-
-        stop_event.set()
-
-        try:
-          if logger_sock:
-            logger_sock.shutdown(socket.SHUT_RDWR)
-        except Exception:
-          pass
-
-        try:
-          client_sock.shutdown(socket.SHUT_RDWR)
-        except Exception:
-          pass
-
-        c2l.join(timeout = 1.5)
-        l2c.join(timeout = 1.5)
-
-        break
-
-    stop_event.set()
-
-  except socket.timeout:
+  except asyncio.TimeoutError:
     logger.error(f"{client_ip}:{client_port} Connection to logger timed out")
+    metrics.timeouts.inc(DeyeProxyMetrics.connect_timeout)
   except ConnectionRefusedError:
     logger.error(f"{client_ip}:{client_port} Logger refused connection")
   except OSError as e:
@@ -241,15 +276,16 @@ def handle_client(client_sock: socket.socket, client_ip: str, client_port: int)
       logger.error(f"{client_ip}:{client_port} Unexpected error: {type(e).__name__}: {e}")
   except Exception as ee:
     logger.error(f"{client_ip}:{client_port} Unexpected error: {type(ee).__name__}: {ee}")
+  except asyncio.CancelledError:
+    logger.info(f"{client_ip}:{client_port} Session cancelled")
+    raise
   finally:
     try:
       # Cleanup: ensure both sockets are closed and lock is released
-      if logger_sock:
-        logger_sock.close()
-
-      client_sock.close()
+      close_writer(logger_writer)
+      close_writer(client_writer)
 
-      time.sleep(0.015)
+      await asyncio.sleep(0.015)
 
       session_duration = time.time() - session_start + wait_duration
       logger.info(f"{client_ip}:{client_port} Session finished "
@@ -258,45 +294,182 @@ def handle_client(client_sock: socket.socket, client_ip: str, client_port: int)
     except Exception as e:
       logger.error(str(e))
     finally:
-      logger_lock.release()
+      logger_queue.release()
+
+async def handle_client_frames(
+  client_reader: asyncio.StreamReader,
+  client_writer: asyncio.StreamWriter,
+  client_ip: str,
+  client_port: int,
+  priority: DeyeProxyPriority,
+) -> None:
+  """
+  Relays V5 frames of a client over the shared logger connection, one request at a time.
+  Register writes are sent with high priority.
+  """
+  if shutdown_event.is_set() or coalescer is None:
+    close_writer(client_writer)
+    return
+
+  session_start = time.time()
+  frames_count = 0
+  received_bytes = 0
+  sent_bytes = 0
+  logger.info(f"{client_ip}:{client_port} Client connected (priority {priority.name})")
+
+  try:
+    while not shutdown_event.is_set():
+      try:
+        request = await asyncio.wait_for(DeyeProxyFrame.read(client_reader), config.CLIENT_IDLE_TIMEOUT)
+      except asyncio.TimeoutError:
+        logger.info(f"{client_ip}:{client_port} Client is idle for {config.CLIENT_IDLE_TIMEOUT}s")
+        metrics.timeouts.inc(DeyeProxyMetrics.client_idle_timeout)
+        break
+
+      if request is None:
+        break
+
+      received_bytes += len(request)
+
+      request_priority = priority
+      if DeyeProxyModbus.get_write_range(request) is not None:
+        request_priority = DeyeProxyPriority.high
+
+      start_exchange = time.time()
+      response = await coalescer.exchange(request, config.CLIENT_WAIT_TIMEOUT, request_priority)
+
+      if response is None:
+        logger.error(f"{client_ip}:{client_port} Logger is busy longer than "
+                     f"{config.CLIENT_WAIT_TIMEOUT}s. Connection closed.")
+        break
+
+      exchange_duration = time.time() - start_exchange
+      if exchange_duration > config.LOGGER_IDLE_TIMEOUT / 2:
+        logger_wait.warning(f"{client_ip}:{client_port} Request duration: {exchange_duration:.2f}s")
 
-def handle_exit(sig, frame):
+      client_writer.write(response)
+      await client_writer.drain()
+      frames_count += 1
+      sent_bytes += len(response)
+
+  except asyncio.TimeoutError:
+    logger.error(f"{client_ip}:{client_port} Logger timed out")
+  except ConnectionRefusedError:
+    logger.error(f"{client_ip}:{client_port} Logger refused connection")
+  except DeyeProxyQueueFullError as e:
+    logger.error(f"{client_ip}:{client_port} {e}. Connection rejected.")
+  except ValueError as e:
+    logger.error(f"{client_ip}:{client_port} {e}")
+  except OSError as e:
+    if e.errno == errno.EHOSTUNREACH:
+      logger.error(f"{client_ip}:{client_port} No route to host")
+    else:
+      logger.error(f"{client_ip}:{client_port} Unexpected error: {type(e).__name__}: {e}")
+  except Exception as ee:
+    logger.error(f"{client_ip}:{client_port} Unexpected error: {type(ee).__name__}: {ee}")
+  finally:
+    close_writer(client_writer)
+    metrics.bytes.observe(received_bytes, DeyeProxyMetrics.client_to_logger)
+    metrics.bytes.observe(sent_bytes, DeyeProxyMetrics.logger_to_client)
+    logger.info(f"{client_ip}:{client_port} Client disconnected "
+                f"(duration {time.time() - session_start:.2f}s, requests {frames_count})")
+
+async def on_client_connected(client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+  task = asyncio.current_task()
+  if task is not None:
+    client_tasks.add(task)
+
+  try:
+    client_ip, client_port = client_writer.get_extra_info("peername")[:2]
+    proxy_port = client_writer.get_extra_info("sockname")[1]
+    priority = priority_map.get_priority(client_ip, proxy_port)
+
+    if config.PROXY_MODE == "frame":
+      await handle_client_frames(client_reader, client_writer, client_ip, client_port, priority)
+    else:
+      await handle_client(client_reader, client_writer, client_ip, client_port, priority)
+  finally:
+    client_tasks.discard(task)
+
+def log_queue_stats() -> None:
+  for priority, stats in logger_queue.stats.items():
+    if stats.count or stats.timed_out or stats.rejected:
+      logger_wait.info(f"Queue wait ({priority.name}): {stats}")
+
+async def report_queue_stats() -> None:
+  """
+  Writes queue wait times by priority to the wait log periodically
+  """
+  while True:
+    await asyncio.sleep(queue_stats_interval)
+    log_queue_stats()
+
+def handle_exit(sig: int) -> None:
   """
   Signal handler function.
   Triggered when Docker sends SIGTERM or when you press Ctrl+C (SIGINT).
   """
   logger.info(f"Received signal {sig}. Shutting down gracefully...")
-  # This wakes up the .wait() method in the loop below immediately
+  # This wakes up the server task immediately
   shutdown_event.set()
 
-def main() -> None:
+async def serve() -> None:
+  global multiplexer, coalescer
+
+  loop = asyncio.get_running_loop()
+
   # Register the handlers for termination signals
   # SIGTERM is sent by 'docker stop'
-  signal.signal(signal.SIGTERM, handle_exit)
+  loop.add_signal_handler(signal.SIGTERM, handle_exit, signal.SIGTERM)
   # SIGINT is sent by Ctrl+C
-  signal.signal(signal.SIGINT, handle_exit)
+  loop.add_signal_handler(signal.SIGINT, handle_exit, signal.SIGINT)
+
+  if config.PROXY_MODE == "frame":
+    multiplexer = DeyeProxyMultiplexer(
+      host = config.LOGGER_HOST,
+      port = config.LOGGER_PORT,
+      connect_timeout = config.CONNECT_TIMEOUT,
+      response_timeout = config.LOGGER_IDLE_TIMEOUT,
+      logger = logger,
+      receive_buffer_size = receive_buffer_size,
+      queue = logger_queue,
+      metrics = metrics,
+    )
 
-  server: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    coalescer = DeyeProxyReadCoalescer(
+      multiplexer = multiplexer,
+      cache_ttl = config.READ_CACHE_TTL_MS / 1000,
+      logger = logger,
+      metrics = metrics,
+    )
 
-  try:
-    # Allow immediate reuse of the port after restart
-    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-  except Exception as e:
-    logger.error(f"Failed to call setsockopt: {e}")
+  # Clients connected to the additional ports get the priorities of the ports
+  ports = [config.PROXY_PORT] + [port for port in priority_map.ports if port != config.PROXY_PORT]
+  servers: List[asyncio.Server] = []
 
-  try:
-    server.bind((config.PROXY_HOST, config.PROXY_PORT))
-  except Exception as e:
-    logger.error(f"Failed to bind port {config.PROXY_PORT} on {config.PROXY_HOST}: {e}")
-    server.close()
-    sys.exit(1)
+  for port in ports:
+    try:
+      # Allow immediate reuse of the port after restart
+      servers.append(await asyncio.start_server(
+        on_client_connected,
+        host = config.PROXY_HOST,
+        port = port,
+        backlog = config.MAX_CONCURRENT_CONNECTIONS,
+        limit = receive_buffer_size,
+        reuse_address = True,
+      ))
+    except Exception as e:
+      logger.error(f"Failed to listen on port {port} on {config.PROXY_HOST}: {e}")
+      sys.exit(1)
 
-  try:
-    server.listen(config.MAX_CONCURRENT_CONNECTIONS)
-  except Exception as e:
-    logger.error(f"Failed to listen on port {config.PROXY_PORT}: {e}")
-    server.close()
-    sys.exit(1)
+  metrics_server: Optional[DeyeProxyMetricsServer] = None
+  if config.METRICS_PORT:
+    metrics_server = DeyeProxyMetricsServer(metrics, logger)
+    try:
+      await metrics_server.start(config.PROXY_HOST, config.METRICS_PORT)
+    except Exception as e:
+      logger.error(f"Failed to listen on metrics port {config.METRICS_PORT} on {config.PROXY_HOST}: {e}")
+      sys.exit(1)
 
   external_ip = CommonUtils.get_external_ip(config.LOGGER_HOST, config.LOGGER_PORT)
   actual_ip = external_ip if external_ip else config.PROXY_HOST
@@ -306,48 +479,57 @@ def main() -> None:
   logger.info(f"------- Deye Proxy started -------")
   logger.info(f"Target logger       : {config.LOGGER_HOST}:{config.LOGGER_PORT}")
   logger.info(f"Listening on        : {actual_ip}:{config.PROXY_PORT}")
+  for port, priority in priority_map.ports.items():
+    logger.info(f"Priority port       : {actual_ip}:{port} ({priority.name})")
+  if metrics_server is not None:
+    logger.info(f"Metrics on          : http://{actual_ip}:{config.METRICS_PORT}{DeyeProxyMetricsServer.path}")
   logger.info(f"Max connections     : {config.MAX_CONCURRENT_CONNECTIONS}")
+  logger.info(f"Max queue depth     : {config.MAX_QUEUE_DEPTH or 'no limit'}")
   logger.info(f"Client wait timeout : {config.CLIENT_WAIT_TIMEOUT}")
   logger.info(f"Connect timeout     : {config.CONNECT_TIMEOUT}s")
   logger.info(f"Client idle timeout : {config.CLIENT_IDLE_TIMEOUT}s")
   logger.info(f"Logger idle timeout : {config.LOGGER_IDLE_TIMEOUT}s")
   logger.info(f"Session timeout     : {config.SESSION_TIMEOUT}s")
+  logger.info(f"Proxy mode          : {config.PROXY_MODE}")
+  if config.PROXY_MODE == "frame":
+    logger.info(f"Read cache TTL      : {config.READ_CACHE_TTL_MS}ms")
   logger.info(f"Log level           : {log_level_name}")
   logger.info(f"----------------------------------")
 
-  server.settimeout(1.0)
+  stats_task = asyncio.create_task(report_queue_stats())
 
   try:
-    while not shutdown_event.is_set():
-      try:
-        # Accept returns a tuple of (socket object, address info)
-        client_info: Tuple[socket.socket, Tuple[str, int]] = server.accept()
-        client_sock, client_addr = client_info
-        client_ip, client_port = client_addr
-
-        # Spawn a thread for each client
-        thread = threading.Thread(
-          target = handle_client,
-          daemon = True,
-          args = (client_sock, client_ip, client_port),
-          name = "ProxyMainThread",
-        )
-
-        thread.start()
-      except socket.timeout:
-        continue
-      except Exception as e:
-        logger.error(f"Accept error: {e}")
-        time.sleep(1)
+    await shutdown_event.wait()
   finally:
-    server.close()
+    for server in servers:
+      server.close()
+    if metrics_server is not None:
+      metrics_server.close()
     logger.info("Server socket closed.")
 
+    # Active sessions are closed and release the logger
+    for task in list(client_tasks):
+      task.cancel()
+
+    await asyncio.gather(*client_tasks, return_exceptions = True)
+
+    if coalescer is not None:
+      coalescer.close()
+
+    if multiplexer is not None:
+      multiplexer.close()
+
+    stats_task.cancel()
+    log_queue_stats()
+
     for handler in logging.getLogger().handlers:
       handler.flush()
 
     sys.stdout.flush()
     sys.stderr.flush()
 
+def main() -> None:
+  asyncio.run(serve())
+
 if __name__ == "__main__":
   main()
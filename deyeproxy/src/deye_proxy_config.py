@@ -4,6 +4,7 @@ import logging
 from typing import List
 from env_var import EnvVar
 from env_vars import EnvVars
+from src.deye_proxy_priority_map import DeyeProxyPriorityMap
 
 class DeyeProxyConfig:
   def __init__(self):
@@ -20,6 +21,28 @@ class DeyeProxyConfig:
     # the maximum possible duration of an active session plus cleanup overhead.
     self.__client_wait_timeout = EnvVar("CLIENT_WAIT_TIMEOUT", "15", "Timeout for client queue wait")
 
+    # Maximum number of clients waiting for the logger at once.
+    # New clients are rejected at once when the queue is full, instead of waiting
+    # for CLIENT_WAIT_TIMEOUT. Zero means no limit.
+    self.__max_queue_depth = EnvVar("MAX_QUEUE_DEPTH", "0", "Max clients waiting for the logger, 0 - no limit")
+
+    # Waiting clients get the logger by priority ('high', 'normal' or 'low'),
+    # in arrival order within each priority. Clients connected to PRIORITY_PORTS
+    # get the priority of the port, other clients get the priority of their IP address
+    # or network in CLIENT_PRIORITIES, or DEFAULT_PRIORITY.
+    # In frame mode register writes are always high priority.
+    self.__default_priority = EnvVar("DEFAULT_PRIORITY", "normal", "Priority of not mapped clients")
+    self.__client_priorities = EnvVar(
+      "CLIENT_PRIORITIES",
+      "",
+      "Client priorities by IP address or network, e.g. '192.168.1.50=high,172.20.0.0/16=low'",
+    )
+    self.__priority_ports = EnvVar(
+      "PRIORITY_PORTS",
+      "",
+      "Additional ports to listen on with client priorities, e.g. '8898=high'",
+    )
+
     # Maximum time (in seconds) allowed to establish the TCP connection to the logger.
     # If the connection attempt does not complete within this time, a socket.timeout
     # exception is raised and the session is aborted.
@@ -40,6 +63,22 @@ class DeyeProxyConfig:
     # ensure the logger resource is eventually released.
     self.__session_timeout = EnvVar("SESSION_TIMEOUT", "10", "Maximum duration for session")
 
+    # 'session': every client gets exclusive access to the logger for its whole TCP session
+    # over a new logger connection.
+    # 'frame': Solarman V5 frames of all clients are sent one at a time over one persistent
+    # logger connection, so clients wait only for single requests of each other.
+    self.__proxy_mode = EnvVar("PROXY_MODE", "session", "Access mode: 'session' or 'frame'")
+
+    # How long (in milliseconds) register values read in frame mode are reused for
+    # identical or covered read requests of other clients. Zero disables the cache.
+    # Writes invalidate cached registers immediately.
+    self.__read_cache_ttl = EnvVar("READ_CACHE_TTL_MS", "0", "Register read cache TTL in frame mode, ms")
+
+    # Port of the HTTP listener which exposes metrics for Prometheus at /metrics:
+    # queue wait, hold and logger connect times, transferred bytes, timeouts by type
+    # and the current queue depth. Zero disables the listener.
+    self.__metrics_port = EnvVar("METRICS_PORT", "0", "Port for Prometheus metrics, 0 - disabled")
+
     self.__log_level = EnvVar("LOG_LEVEL", "INFO", "Log level for logging")
 
     self.__proxy_host = '0.0.0.0'
@@ -51,10 +90,17 @@ class DeyeProxyConfig:
       self.__proxy_port,
       self.__max_connections,
       self.__client_wait_timeout,
+      self.__max_queue_depth,
+      self.__default_priority,
+      self.__client_priorities,
+      self.__priority_ports,
       self.__connect_timeout,
       self.__client_idle_timeout,
       self.__logger_idle_timeout,
       self.__session_timeout,
+      self.__proxy_mode,
+      self.__read_cache_ttl,
+      self.__metrics_port,
       self.__log_level,
     ]
 
@@ -88,6 +134,18 @@ class DeyeProxyConfig:
   def CLIENT_WAIT_TIMEOUT(self) -> int:
     return self.__client_wait_timeout.as_int()
 
+  @property
+  def MAX_QUEUE_DEPTH(self) -> int:
+    return self.__max_queue_depth.as_int()
+
+  @property
+  def PRIORITY_MAP(self) -> DeyeProxyPriorityMap:
+    return DeyeProxyPriorityMap(
+      default = self.__default_priority.value,
+      clients = self.__client_priorities.value,
+      ports = self.__priority_ports.value,
+    )
+
   @property
   def CONNECT_TIMEOUT(self) -> float:
     return self.__connect_timeout.as_float()
@@ -104,6 +162,18 @@ class DeyeProxyConfig:
   def SESSION_TIMEOUT(self) -> float:
     return self.__session_timeout.as_float()
 
+  @property
+  def PROXY_MODE(self) -> str:
+    return self.__proxy_mode.value.lower()
+
+  @property
+  def READ_CACHE_TTL_MS(self) -> int:
+    return self.__read_cache_ttl.as_int()
+
+  @property
+  def METRICS_PORT(self) -> int:
+    return self.__metrics_port.as_int()
+
   @property
   def LOG_LEVEL(self) -> str:
     return self.__log_level.value
@@ -121,3 +191,13 @@ class DeyeProxyConfig:
         default_str = f" (default: {var.default})" if var.default else ""
         self.__logger.error(f"  {var.name:<{len}} - {var.description}{default_str}")
       sys.exit(1)
+
+    if self.PROXY_MODE not in ("session", "frame"):
+      self.__logger.error(f"Environment variable '{self.__proxy_mode.name}' should be 'session' or 'frame'. Exiting.")
+      sys.exit(1)
+
+    try:
+      self.PRIORITY_MAP
+    except ValueError as e:
+      self.__logger.error(f"Client priorities are invalid: {e}. Exiting.")
+      sys.exit(1)
@@ -0,0 +1,93 @@
+import struct
+import asyncio
+
+from typing import Optional, Union
+
+class DeyeProxyFrame:
+  """
+  Solarman V5 frame helpers.
+
+  Frame layout: start (0xA5), payload length (2 bytes LE), control code (2 bytes LE),
+  sequence number (2 bytes), logger serial (4 bytes), payload, checksum, end (0x15).
+  The low byte of the sequence number is set by the client and echoed back by the logger,
+  the high byte is the logger's own counter.
+  """
+  start = 0xA5
+  end = 0x15
+  header_length = 11
+  # Header, checksum and end
+  overhead_length = 13
+  sequence_offset = 5
+
+  request_control_code = 0x4510
+  response_control_code = 0x1510
+  # Counter (keep-alive) frames sent by the logger on its own
+  counter_control_code = 0x4710
+
+  @staticmethod
+  def get_length(header: bytes) -> int:
+    """
+    Returns the full frame length from the frame header
+    """
+    (payload_length,) = struct.unpack_from("<H", header, 1)
+    return DeyeProxyFrame.overhead_length + payload_length
+
+  @staticmethod
+  def get_control_code(frame: bytes) -> int:
+    (control_code,) = struct.unpack_from("<H", frame, 3)
+    return control_code
+
+  @staticmethod
+  def get_sequence(frame: bytes) -> int:
+    return frame[DeyeProxyFrame.sequence_offset]
+
+  @staticmethod
+  def get_checksum(frame: Union[bytes, bytearray]) -> int:
+    return sum(frame[1:-2]) & 0xFF
+
+  @staticmethod
+  def is_valid(frame: bytes) -> bool:
+    return (
+      len(frame) >= DeyeProxyFrame.overhead_length
+      and frame[0] == DeyeProxyFrame.start
+      and frame[-1] == DeyeProxyFrame.end
+      and len(frame) == DeyeProxyFrame.get_length(frame)
+      and frame[-2] == DeyeProxyFrame.get_checksum(frame)
+    )
+
+  @staticmethod
+  def with_sequence(frame: bytes, sequence: int) -> bytes:
+    """
+    Returns a copy of the frame with another sequence number and checksum
+    """
+    result = bytearray(frame)
+    result[DeyeProxyFrame.sequence_offset] = sequence & 0xFF
+    result[-2] = DeyeProxyFrame.get_checksum(result)
+    return bytes(result)
+
+  @staticmethod
+  async def read(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """
+    Reads one frame from the stream. Returns None when the peer closed the connection
+    before the frame start, raises ValueError on a malformed frame
+    """
+    try:
+      header = await reader.readexactly(DeyeProxyFrame.header_length)
+    except asyncio.IncompleteReadError as e:
+      if not e.partial:
+        return None
+      raise ValueError("Connection closed in the middle of a V5 frame") from e
+
+    if header[0] != DeyeProxyFrame.start:
+      raise ValueError(f"Not a V5 frame: {header.hex(' ')}")
+
+    try:
+      rest = await reader.readexactly(DeyeProxyFrame.get_length(header) - len(header))
+    except asyncio.IncompleteReadError as e:
+      raise ValueError("Connection closed in the middle of a V5 frame") from e
+
+    frame = header + rest
+    if not DeyeProxyFrame.is_valid(frame):
+      raise ValueError(f"Invalid V5 frame: {frame.hex(' ')}")
+
+    return frame
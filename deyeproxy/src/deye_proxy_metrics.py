@@ -0,0 +1,173 @@
+import bisect
+
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Sequence, Tuple
+
+class DeyeProxyMetric(ABC):
+  """
+  Metric in Prometheus text exposition format, optionally with labels
+  """
+  def __init__(self, name: str, description: str, metric_type: str, label_names: Sequence[str] = ()):
+    self.name = name
+    self.description = description
+    self.metric_type = metric_type
+    self.label_names = tuple(label_names)
+
+  def render(self) -> List[str]:
+    return [
+      f"# HELP {self.name} {self.description}",
+      f"# TYPE {self.name} {self.metric_type}",
+    ] + self._render_samples()
+
+  @abstractmethod
+  def _render_samples(self) -> List[str]:
+    """
+    Returns sample lines of the metric
+    """
+    pass
+
+  def _format_labels(self, label_values: Tuple[str, ...], *extra: Tuple[str, str]) -> str:
+    labels = list(zip(self.label_names, label_values)) + list(extra)
+    if not labels:
+      return ""
+    return "{" + ",".join(f'{name}="{self._escape(value)}"' for name, value in labels) + "}"
+
+  @staticmethod
+  def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+  @staticmethod
+  def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class DeyeProxyCounter(DeyeProxyMetric):
+  def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+    super().__init__(name, description, "counter", label_names)
+    self._values: Dict[Tuple[str, ...], float] = {}
+
+  def inc(self, *label_values: str, amount: float = 1) -> None:
+    self._values[label_values] = self._values.get(label_values, 0) + amount
+
+  def get(self, *label_values: str) -> float:
+    return self._values.get(label_values, 0)
+
+  def _render_samples(self) -> List[str]:
+    return [
+      f"{self.name}{self._format_labels(labels)} {self._format_value(value)}"
+      for labels, value in sorted(self._values.items())
+    ]
+
+class DeyeProxyGauge(DeyeProxyMetric):
+  """
+  Gauge which value is taken from the getter when the metrics are rendered
+  """
+  def __init__(self, name: str, description: str, getter: Callable[[], float]):
+    super().__init__(name, description, "gauge")
+    self._getter = getter
+
+  def _render_samples(self) -> List[str]:
+    return [f"{self.name} {self._format_value(self._getter())}"]
+
+class DeyeProxyHistogram(DeyeProxyMetric):
+  def __init__(self, name: str, description: str, buckets: Sequence[float], label_names: Sequence[str] = ()):
+    super().__init__(name, description, "histogram", label_names)
+    self._buckets = sorted(buckets)
+    # Not cumulative bucket counts (the last one is +Inf), sum and count by label values
+    self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+  def observe(self, value: float, *label_values: str) -> None:
+    counts, total = self._values.setdefault(label_values, ([0] * (len(self._buckets) + 1), [0.0]))
+    counts[bisect.bisect_left(self._buckets, value)] += 1
+    total[0] += value
+
+  def get_count(self, *label_values: str) -> int:
+    values = self._values.get(label_values)
+    return sum(values[0]) if values is not None else 0
+
+  def _render_samples(self) -> List[str]:
+    lines: List[str] = []
+    for labels, (counts, total) in sorted(self._values.items()):
+      cumulative = 0
+      for bound, count in zip(self._buckets + [float("inf")], counts):
+        cumulative += count
+        le = "+Inf" if bound == float("inf") else self._format_value(float(bound))
+        lines.append(f"{self.name}_bucket{self._format_labels(labels, ('le', le))} {cumulative}")
+      lines.append(f"{self.name}_sum{self._format_labels(labels)} {self._format_value(total[0])}")
+      lines.append(f"{self.name}_count{self._format_labels(labels)} {cumulative}")
+    return lines
+
+class DeyeProxyMetrics:
+  """
+  Metrics of the proxy exposed by DeyeProxyMetricsServer
+  """
+  time_buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60]
+  bytes_buckets = [64, 256, 1024, 4096, 16384, 65536, 262144, 1048576]
+
+  # Directions of the transferred bytes
+  client_to_logger = "client_to_logger"
+  logger_to_client = "logger_to_client"
+
+  # Timeout types
+  client_wait_timeout = "client_wait"
+  connect_timeout = "logger_connect"
+  logger_response_timeout = "logger_response"
+  client_idle_timeout = "client_idle"
+  logger_idle_timeout = "logger_idle"
+  session_timeout = "session"
+
+  def __init__(self):
+    self.queue_wait = DeyeProxyHistogram(
+      "deyeproxy_queue_wait_seconds",
+      "Time clients waited for the logger",
+      self.time_buckets,
+      ["priority"],
+    )
+    self.hold = DeyeProxyHistogram(
+      "deyeproxy_hold_seconds",
+      "Time the logger was held by a client session (session mode) or request (frame mode)",
+      self.time_buckets,
+    )
+    self.connect = DeyeProxyHistogram(
+      "deyeproxy_logger_connect_seconds",
+      "Time of connecting to the logger",
+      self.time_buckets,
+    )
+    self.bytes = DeyeProxyHistogram(
+      "deyeproxy_client_bytes",
+      "Bytes transferred per client connection",
+      self.bytes_buckets,
+      ["direction"],
+    )
+    self.timeouts = DeyeProxyCounter(
+      "deyeproxy_timeouts_total",
+      "Timeouts by type",
+      ["type"],
+    )
+    self.rejected = DeyeProxyCounter(
+      "deyeproxy_queue_rejected_total",
+      "Clients rejected because the queue was full",
+      ["priority"],
+    )
+    self.coalesced_reads = DeyeProxyCounter(
+      "deyeproxy_coalesced_reads_total",
+      "Register reads not sent to the logger on their own (frame mode)",
+      ["type"],
+    )
+    self._metrics: List[DeyeProxyMetric] = [
+      self.queue_wait,
+      self.hold,
+      self.connect,
+      self.bytes,
+      self.timeouts,
+      self.rejected,
+      self.coalesced_reads,
+    ]
+
+  def add_gauge(self, name: str, description: str, getter: Callable[[], float]) -> None:
+    self._metrics.append(DeyeProxyGauge(name, description, getter))
+
+  def render(self) -> str:
+    lines: List[str] = []
+    for metric in self._metrics:
+      lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
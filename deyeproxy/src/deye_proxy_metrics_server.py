@@ -0,0 +1,51 @@
+import asyncio
+import logging
+
+from typing import Optional
+
+from src.deye_proxy_metrics import DeyeProxyMetrics
+
+class DeyeProxyMetricsServer:
+  """
+  Minimal HTTP server which exposes the metrics for Prometheus at GET /metrics
+  """
+  path = "/metrics"
+  content_type = "text/plain; version=0.0.4; charset=utf-8"
+  request_timeout = 5
+
+  def __init__(self, metrics: DeyeProxyMetrics, logger: logging.Logger):
+    self._metrics = metrics
+    self._logger = logger
+    self._server: Optional[asyncio.Server] = None
+
+  async def start(self, host: str, port: int) -> None:
+    self._server = await asyncio.start_server(self._handle, host = host, port = port, reuse_address = True)
+
+  def close(self) -> None:
+    if self._server is not None:
+      self._server.close()
+
+  async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+      request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.request_timeout)
+      method, target = (request.split(b"\r\n", 1)[0].decode("latin-1").split(" ") + ["", ""])[:2]
+
+      if method not in ("GET", "HEAD"):
+        status, body = "405 Method Not Allowed", "Method not allowed\n"
+      elif target.split("?", 1)[0] != self.path:
+        status, body = "404 Not Found", "Not found\n"
+      else:
+        status, body = "200 OK", self._metrics.render()
+
+      content = body.encode("utf-8")
+      headers = (f"HTTP/1.1 {status}\r\n"
+                 f"Content-Type: {self.content_type}\r\n"
+                 f"Content-Length: {len(content)}\r\n"
+                 f"Connection: close\r\n\r\n")
+
+      writer.write(headers.encode("latin-1") + (content if method != "HEAD" else b""))
+      await writer.drain()
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, OSError) as e:
+      self._logger.debug(f"Metrics request failed: {type(e).__name__}: {e}")
+    finally:
+      writer.close()
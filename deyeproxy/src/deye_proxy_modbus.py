@@ -0,0 +1,142 @@
+import struct
+
+from typing import Optional
+
+from src.deye_proxy_frame import DeyeProxyFrame
+from src.deye_proxy_register_range import DeyeProxyRegisterRange
+
+class DeyeProxyModbus:
+  """
+  Modbus RTU frames inside Solarman V5 frames.
+
+  The V5 request payload is frame type, sensor type and three timestamps (15 bytes)
+  followed by the Modbus RTU request. The response payload is frame type, status
+  and three timestamps (14 bytes) followed by the Modbus RTU response.
+  """
+  request_offset = 26
+  response_offset = 25
+
+  read_holding_registers = 0x03
+  read_input_registers = 0x04
+  write_single_register = 0x06
+  write_multiple_registers = 0x10
+
+  # Maximum registers count of one read request
+  max_read_count = 125
+
+  @staticmethod
+  def get_crc(data: bytes) -> int:
+    crc = 0xFFFF
+    for byte in data:
+      crc ^= byte
+      for _ in range(8):
+        crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+  @staticmethod
+  def with_crc(data: bytes) -> bytes:
+    return data + struct.pack("<H", DeyeProxyModbus.get_crc(data))
+
+  @staticmethod
+  def has_valid_crc(data: bytes) -> bool:
+    return len(data) > 2 and DeyeProxyModbus.with_crc(data[:-2]) == data
+
+  @staticmethod
+  def get_read_range(frame: bytes) -> Optional[DeyeProxyRegisterRange]:
+    """
+    Returns registers read by the V5 request frame, None if it isn't a registers read
+    """
+    modbus = DeyeProxyModbus._get_request(frame)
+    if len(modbus) != 8 or not DeyeProxyModbus.has_valid_crc(modbus):
+      return None
+
+    slave, function, start, count = struct.unpack_from(">BBHH", modbus)
+    if function not in (DeyeProxyModbus.read_holding_registers, DeyeProxyModbus.read_input_registers):
+      return None
+
+    if not 1 <= count <= DeyeProxyModbus.max_read_count:
+      return None
+
+    return DeyeProxyRegisterRange(slave = slave, function = function, start = start, count = count)
+
+  @staticmethod
+  def get_write_range(frame: bytes) -> Optional[DeyeProxyRegisterRange]:
+    """
+    Returns holding registers written by the V5 request frame, None if it isn't a registers write
+    """
+    modbus = DeyeProxyModbus._get_request(frame)
+    if len(modbus) < 8 or not DeyeProxyModbus.has_valid_crc(modbus):
+      return None
+
+    slave, function, start, value = struct.unpack_from(">BBHH", modbus)
+    if function == DeyeProxyModbus.write_single_register:
+      count = 1
+    elif function == DeyeProxyModbus.write_multiple_registers:
+      count = value
+    else:
+      return None
+
+    return DeyeProxyRegisterRange(
+      slave = slave,
+      function = DeyeProxyModbus.read_holding_registers,
+      start = start,
+      count = count,
+    )
+
+  @staticmethod
+  def with_read_range(frame: bytes, registers: DeyeProxyRegisterRange) -> bytes:
+    """
+    Returns a copy of the V5 read request frame which reads other registers
+    """
+    modbus = DeyeProxyModbus.with_crc(
+      struct.pack(">BBHH", registers.slave, registers.function, registers.start, registers.count))
+    result = bytearray(frame[:DeyeProxyModbus.request_offset] + modbus + frame[-2:])
+    result[-2] = DeyeProxyFrame.get_checksum(result)
+    return bytes(result)
+
+  @staticmethod
+  def get_read_data(frame: bytes, registers: DeyeProxyRegisterRange) -> Optional[bytes]:
+    """
+    Returns register values from the V5 response frame to the read request,
+    None if the response is a Modbus exception or doesn't match the request
+    """
+    if DeyeProxyFrame.get_control_code(frame) != DeyeProxyFrame.response_control_code:
+      return None
+
+    modbus = frame[DeyeProxyModbus.response_offset:-2]
+    data_length = registers.count * 2
+    if len(modbus) != data_length + 5 or not DeyeProxyModbus.has_valid_crc(modbus):
+      return None
+
+    if modbus[0] != registers.slave or modbus[1] != registers.function or modbus[2] != data_length:
+      return None
+
+    return modbus[3:-2]
+
+  @staticmethod
+  def build_read_response(
+    template: bytes,
+    request: bytes,
+    registers: DeyeProxyRegisterRange,
+    data: bytes,
+  ) -> bytes:
+    """
+    Builds the V5 response frame to the read request from the response frame
+    of another read request (template) and register values
+    """
+    modbus = DeyeProxyModbus.with_crc(bytes([registers.slave, registers.function, len(data)]) + data)
+    payload = template[DeyeProxyFrame.header_length:DeyeProxyModbus.response_offset] + modbus
+
+    result = bytearray(template[:DeyeProxyFrame.header_length] + payload + template[-2:])
+    struct.pack_into("<H", result, 1, len(payload))
+    # Sequence number and logger serial are echoed from the request
+    result[DeyeProxyFrame.sequence_offset] = request[DeyeProxyFrame.sequence_offset]
+    result[7:DeyeProxyFrame.header_length] = request[7:DeyeProxyFrame.header_length]
+    result[-2] = DeyeProxyFrame.get_checksum(result)
+    return bytes(result)
+
+  @staticmethod
+  def _get_request(frame: bytes) -> bytes:
+    if DeyeProxyFrame.get_control_code(frame) != DeyeProxyFrame.request_control_code:
+      return b""
+    return frame[DeyeProxyModbus.request_offset:-2]
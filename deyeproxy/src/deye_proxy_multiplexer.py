@@ -0,0 +1,144 @@
+import time
+import asyncio
+import logging
+
+from typing import Callable, Optional, Tuple, Union
+
+from src.deye_proxy_frame import DeyeProxyFrame
+from src.deye_proxy_metrics import DeyeProxyMetrics
+from src.deye_proxy_priority import DeyeProxyPriority
+from src.deye_proxy_queue import DeyeProxyQueue
+
+class DeyeProxyMultiplexer:
+  """
+  Keeps one long-lived connection to the logger and sends V5 frames of many
+  clients over it one at a time.
+
+  Every request frame gets a sequence number of the proxy, so the response
+  can be told from responses to other (timed out) requests and from counter
+  frames of the logger. The sequence number of the client is put back into
+  the response before it is returned.
+
+  Requests wait for the logger in the queue by their priority.
+  """
+  def __init__(
+    self,
+    host: str,
+    port: int,
+    connect_timeout: float,
+    response_timeout: float,
+    logger: logging.Logger,
+    receive_buffer_size: int = 64 * 1024,
+    queue: Optional[DeyeProxyQueue] = None,
+    metrics: Optional[DeyeProxyMetrics] = None,
+  ):
+    self._host = host
+    self._port = port
+    self._connect_timeout = connect_timeout
+    self._response_timeout = response_timeout
+    self._logger = logger
+    self._receive_buffer_size = receive_buffer_size
+    self._metrics = metrics if metrics is not None else DeyeProxyMetrics()
+    self._queue = queue if queue is not None else DeyeProxyQueue(metrics = self._metrics)
+    self._reader: Optional[asyncio.StreamReader] = None
+    self._writer: Optional[asyncio.StreamWriter] = None
+    self._sequence = 0
+
+  @property
+  def queue(self) -> DeyeProxyQueue:
+    return self._queue
+
+  async def exchange(
+    self,
+    frame: Union[bytes, Callable[[], bytes]],
+    wait_timeout: float,
+    priority: DeyeProxyPriority = DeyeProxyPriority.normal,
+  ) -> Optional[bytes]:
+    """
+    Sends the request frame to the logger and returns the response frame.
+    Returns None if the logger is busy with other clients longer than wait_timeout,
+    raises DeyeProxyQueueFullError if too many requests are waiting.
+    The frame can be passed as a function, which is called when the logger is free
+    """
+    if not await self._queue.acquire(priority, wait_timeout):
+      return None
+
+    try:
+      request = frame() if callable(frame) else frame
+      try:
+        return await self._exchange(request)
+      except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError, EOFError) as e:
+        # Logger closes idle connections, the request wasn't processed
+        self._logger.info(f"Logger connection lost ({type(e).__name__}), reconnecting...")
+        self._close()
+        return await self._exchange(request)
+    except (Exception, asyncio.CancelledError):
+      # The response may still come and be taken for the response to the next request
+      self._close()
+      raise
+    finally:
+      self._queue.release()
+
+  def close(self) -> None:
+    self._close()
+
+  async def _exchange(self, frame: bytes) -> bytes:
+    reader, writer = await self._connect()
+    sequence = self._next_sequence()
+    writer.write(DeyeProxyFrame.with_sequence(frame, sequence))
+    await writer.drain()
+
+    try:
+      response = await asyncio.wait_for(self._read_response(reader, sequence), self._response_timeout)
+    except asyncio.TimeoutError:
+      self._metrics.timeouts.inc(DeyeProxyMetrics.logger_response_timeout)
+      raise
+
+    return DeyeProxyFrame.with_sequence(response, DeyeProxyFrame.get_sequence(frame))
+
+  async def _read_response(self, reader: asyncio.StreamReader, sequence: int) -> bytes:
+    while True:
+      response = await DeyeProxyFrame.read(reader)
+      if response is None:
+        raise EOFError("Logger closed connection")
+
+      if DeyeProxyFrame.get_sequence(response) == sequence and \
+          DeyeProxyFrame.get_control_code(response) != DeyeProxyFrame.counter_control_code:
+        return response
+
+      self._logger.debug(f"Skipped logger frame: {response.hex(' ')}")
+
+  async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    if self._reader is not None and self._writer is not None:
+      return self._reader, self._writer
+
+    start = time.time()
+    try:
+      reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(self._host, self._port, limit = self._receive_buffer_size),
+        self._connect_timeout,
+      )
+    except asyncio.TimeoutError:
+      self._metrics.timeouts.inc(DeyeProxyMetrics.connect_timeout)
+      raise
+
+    connect_duration = time.time() - start
+    self._metrics.connect.observe(connect_duration)
+    self._logger.info(f"Connected to logger {self._host}:{self._port} in {connect_duration:.2f}s")
+
+    self._reader, self._writer = reader, writer
+    return reader, writer
+
+  def _close(self) -> None:
+    if self._writer is not None:
+      try:
+        self._writer.close()
+      except Exception:
+        pass
+    self._reader = None
+    self._writer = None
+
+  def _next_sequence(self) -> int:
+    # Zero is skipped, pysolarmanv5 never uses it
+    self._sequence = self._sequence % 0xFF + 1
+    return self._sequence
@@ -0,0 +1,11 @@
+from enum import IntEnum
+
+class DeyeProxyPriority(IntEnum):
+  """
+  Priority classes of clients waiting for the logger, lower value is served first
+  """
+  # Interactive clients and register writes
+  high = 0
+  normal = 1
+  # Background pollers
+  low = 2
@@ -0,0 +1,64 @@
+import ipaddress
+
+from typing import Dict, List, Tuple, Union
+
+from src.deye_proxy_priority import DeyeProxyPriority
+
+IpNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+class DeyeProxyPriorityMap:
+  """
+  Priority classes of clients by the proxy port they connect to and by their address.
+
+  Both mappings are comma-separated '<key>=<priority>' lists, where priority is
+  'high', 'normal' or 'low':
+    ports: '8898=high' - clients connected to the additional proxy port 8898 are high priority
+    clients: '192.168.1.50=high,172.20.0.0/16=low' - client IP addresses or networks
+
+  The port mapping is checked first, then the first matching client network,
+  then the default priority is used.
+  """
+  def __init__(self, default: str, clients: str = "", ports: str = ""):
+    self._default = self._parse_priority(default)
+    self._clients: List[Tuple[IpNetwork, DeyeProxyPriority]] = [
+      (ipaddress.ip_network(key, strict = False), priority) for key, priority in self._parse(clients)
+    ]
+    self._ports: Dict[int, DeyeProxyPriority] = {int(key): priority for key, priority in self._parse(ports)}
+
+  @property
+  def ports(self) -> Dict[int, DeyeProxyPriority]:
+    return self._ports
+
+  def get_priority(self, client_ip: str, proxy_port: int) -> DeyeProxyPriority:
+    priority = self._ports.get(proxy_port)
+    if priority is not None:
+      return priority
+
+    try:
+      address = ipaddress.ip_address(client_ip)
+    except ValueError:
+      return self._default
+
+    for network, priority in self._clients:
+      if address.version == network.version and address in network:
+        return priority
+
+    return self._default
+
+  @staticmethod
+  def _parse(mapping: str) -> List[Tuple[str, DeyeProxyPriority]]:
+    result: List[Tuple[str, DeyeProxyPriority]] = []
+    for item in filter(None, (item.strip() for item in mapping.split(","))):
+      key, separator, priority = item.partition("=")
+      if not separator or not key.strip():
+        raise ValueError(f"Priority mapping '{item}' should be '<key>=<priority>'")
+      result.append((key.strip(), DeyeProxyPriorityMap._parse_priority(priority)))
+    return result
+
+  @staticmethod
+  def _parse_priority(name: str) -> DeyeProxyPriority:
+    try:
+      return DeyeProxyPriority[name.strip().lower()]
+    except KeyError:
+      names = ", ".join(f"'{priority.name}'" for priority in DeyeProxyPriority)
+      raise ValueError(f"Unknown priority '{name}', should be one of {names}") from None
@@ -0,0 +1,130 @@
+import time
+import asyncio
+
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from src.deye_proxy_metrics import DeyeProxyMetrics
+from src.deye_proxy_priority import DeyeProxyPriority
+
+class DeyeProxyQueueFullError(Exception):
+  pass
+
+class DeyeProxyQueueStats:
+  """
+  Wait times of clients of one priority class
+  """
+  def __init__(self):
+    self.count = 0
+    self.total_wait = 0.0
+    self.max_wait = 0.0
+    self.timed_out = 0
+    self.rejected = 0
+
+  def add_wait(self, wait: float) -> None:
+    self.count += 1
+    self.total_wait += wait
+    self.max_wait = max(self.max_wait, wait)
+
+  def __str__(self) -> str:
+    average = self.total_wait / self.count if self.count else 0
+    return (f"acquired {self.count}, average wait {average:.2f}s, max wait {self.max_wait:.2f}s, "
+            f"timed out {self.timed_out}, rejected {self.rejected}")
+
+class DeyeProxyQueue:
+  """
+  Exclusive access to the logger for one client at a time.
+
+  Waiting clients get the access by priority, and in arrival order within each priority.
+  If max_depth clients are already waiting, new clients are rejected at once
+  instead of waiting for the timeout. Zero max_depth means no limit.
+  """
+  def __init__(self, max_depth: int = 0, metrics: Optional[DeyeProxyMetrics] = None):
+    self._max_depth = max_depth
+    self._metrics = metrics if metrics is not None else DeyeProxyMetrics()
+    self._locked = False
+    self._hold_start = 0.0
+    self._waiters: Dict[DeyeProxyPriority, Deque['asyncio.Future[None]']] = {
+      priority: deque() for priority in DeyeProxyPriority
+    }
+    self._stats: Dict[DeyeProxyPriority, DeyeProxyQueueStats] = {
+      priority: DeyeProxyQueueStats() for priority in DeyeProxyPriority
+    }
+    self._metrics.add_gauge("deyeproxy_queue_depth", "Clients waiting for the logger", lambda: self.depth)
+
+  @property
+  def depth(self) -> int:
+    """
+    Number of waiting clients
+    """
+    return sum(len(waiters) for waiters in self._waiters.values())
+
+  @property
+  def stats(self) -> Dict[DeyeProxyPriority, DeyeProxyQueueStats]:
+    return self._stats
+
+  def locked(self) -> bool:
+    return self._locked
+
+  async def acquire(self, priority: DeyeProxyPriority, timeout: float) -> bool:
+    """
+    Waits for the access. Returns False if it isn't got within timeout,
+    raises DeyeProxyQueueFullError if the queue is full
+    """
+    stats = self._stats[priority]
+
+    if not self._locked and not self.depth:
+      self._locked = True
+      self._hold_start = time.monotonic()
+      self._add_wait(priority, 0)
+      return True
+
+    if self._max_depth and self.depth >= self._max_depth:
+      stats.rejected += 1
+      self._metrics.rejected.inc(priority.name)
+      raise DeyeProxyQueueFullError(f"Queue is full ({self.depth} clients are waiting)")
+
+    start = time.monotonic()
+    waiter: 'asyncio.Future[None]' = asyncio.get_running_loop().create_future()
+    waiters = self._waiters[priority]
+    waiters.append(waiter)
+
+    try:
+      # Unlike wait_for(), wait() doesn't cancel the waiter on timeout
+      await asyncio.wait([waiter], timeout = timeout)
+    except asyncio.CancelledError:
+      if waiter.done():
+        # The access was passed to this client already
+        self.release()
+      else:
+        waiters.remove(waiter)
+      raise
+
+    if not waiter.done():
+      waiters.remove(waiter)
+      stats.timed_out += 1
+      self._metrics.timeouts.inc(DeyeProxyMetrics.client_wait_timeout)
+      return False
+
+    self._add_wait(priority, time.monotonic() - start)
+    return True
+
+  def release(self) -> None:
+    """
+    Passes the access to the next waiting client
+    """
+    now = time.monotonic()
+    self._metrics.hold.observe(now - self._hold_start)
+    self._hold_start = now
+
+    for priority in sorted(self._waiters):
+      waiters = self._waiters[priority]
+      if waiters:
+        waiters.popleft().set_result(None)
+        return
+
+    self._locked = False
+
+  def _add_wait(self, priority: DeyeProxyPriority, wait: float) -> None:
+    self._stats[priority].add_wait(wait)
+    self._metrics.queue_wait.observe(wait, priority.name)
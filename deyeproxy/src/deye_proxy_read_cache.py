@@ -0,0 +1,65 @@
+import time
+
+from typing import Dict, List, Optional, Tuple
+
+from src.deye_proxy_register_range import DeyeProxyRegisterRange
+
+class DeyeProxyReadCacheEntry:
+  def __init__(self, registers: DeyeProxyRegisterRange, data: bytes, template: bytes, expires_ts: float):
+    self.registers = registers
+    self.data = data
+    # Logger response frame, the responses from the cache are built from it
+    self.template = template
+    self.expires_ts = expires_ts
+
+class DeyeProxyReadCache:
+  """
+  Register values read by recent read requests, kept for ttl seconds.
+  A read is answered from the cache if one of the cached ranges covers it.
+  """
+  def __init__(self, ttl: float):
+    self._ttl = ttl
+    # Cached ranges by (slave, function)
+    self._entries: Dict[Tuple[int, int], List[DeyeProxyReadCacheEntry]] = {}
+
+  @property
+  def enabled(self) -> bool:
+    return self._ttl > 0
+
+  def get(self, registers: DeyeProxyRegisterRange) -> Optional[Tuple[bytes, bytes]]:
+    """
+    Returns register values and the response frame template, None on cache miss
+    """
+    now = time.monotonic()
+    for entry in self._entries.get((registers.slave, registers.function), []):
+      if entry.expires_ts > now and entry.registers.covers(registers):
+        offset = (registers.start - entry.registers.start) * 2
+        return entry.data[offset:offset + registers.count * 2], entry.template
+
+    return None
+
+  def put(self, registers: DeyeProxyRegisterRange, data: bytes, template: bytes) -> None:
+    if not self.enabled:
+      return
+
+    now = time.monotonic()
+    key = (registers.slave, registers.function)
+
+    # Expired ranges and ranges covered by the new one aren't needed anymore
+    entries = [
+      entry for entry in self._entries.get(key, [])
+      if entry.expires_ts > now and not registers.covers(entry.registers)
+    ]
+    entries.append(DeyeProxyReadCacheEntry(registers, data, template, now + self._ttl))
+    self._entries[key] = entries
+
+  def invalidate(self, registers: DeyeProxyRegisterRange) -> None:
+    """
+    Removes cached ranges which overlap written registers
+    """
+    for key in [key for key in self._entries if key[0] == registers.slave]:
+      entries = [entry for entry in self._entries[key] if not entry.registers.overlaps(registers)]
+      if entries:
+        self._entries[key] = entries
+      else:
+        del self._entries[key]
@@ -0,0 +1,212 @@
+import time
+import asyncio
+import logging
+
+from typing import List, Optional, Set
+
+from src.deye_proxy_frame import DeyeProxyFrame
+from src.deye_proxy_metrics import DeyeProxyMetrics
+from src.deye_proxy_modbus import DeyeProxyModbus
+from src.deye_proxy_multiplexer import DeyeProxyMultiplexer
+from src.deye_proxy_priority import DeyeProxyPriority
+from src.deye_proxy_read_cache import DeyeProxyReadCache
+from src.deye_proxy_register_range import DeyeProxyRegisterRange
+
+class DeyeProxyReadGroup:
+  """
+  Read requests of several clients sent to the logger as one request
+  """
+  def __init__(self, registers: DeyeProxyRegisterRange, frame: bytes, priority: DeyeProxyPriority):
+    self.registers = registers
+    self.priority = priority
+    # Request frame of the first client, the merged request is built from it
+    self.frame = frame
+    self.sent = False
+    # False if registers were written while the group was read
+    self.cacheable = True
+    # Register values, None if the logger answered with an error
+    self.data: Optional[bytes] = None
+    # Logger response frame, None if the logger was busy
+    self.future: 'asyncio.Future[Optional[bytes]]' = asyncio.get_running_loop().create_future()
+    # Mark error as retrieved, even if all clients are gone
+    self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+class DeyeProxyReadCoalescer:
+  """
+  Reduces the number of Modbus read requests sent to the logger over the multiplexer.
+
+  Repeated reads are answered from the cache for cache_ttl seconds. Reads of overlapping
+  or adjoining registers which wait for the logger at the same time are merged into one
+  request, and the response is sliced for every client. A read is also joined to
+  the request already sent to the logger if that request covers its registers.
+  Writes invalidate overlapping cached and queued reads immediately.
+  A read isn't merged into a queued read of lower priority.
+  Other frames are sent to the logger as is.
+  """
+  # Responses which didn't wait for the logger are delayed: the synchronous
+  # pysolarmanv5 client drops responses which come before it marks that it waits for them
+  min_response_time = 0.01
+
+  def __init__(
+    self,
+    multiplexer: DeyeProxyMultiplexer,
+    cache_ttl: float,
+    logger: logging.Logger,
+    metrics: Optional[DeyeProxyMetrics] = None,
+  ):
+    self._multiplexer = multiplexer
+    self._metrics = metrics if metrics is not None else DeyeProxyMetrics()
+    self._cache = DeyeProxyReadCache(cache_ttl)
+    self._logger = logger
+    # Groups which can be joined by new reads
+    self._groups: List[DeyeProxyReadGroup] = []
+    self._tasks: Set[asyncio.Task] = set()
+
+  async def exchange(
+    self,
+    frame: bytes,
+    wait_timeout: float,
+    priority: DeyeProxyPriority = DeyeProxyPriority.normal,
+  ) -> Optional[bytes]:
+    """
+    Returns the response frame to the request frame.
+    Returns None if the logger is busy with other clients longer than wait_timeout,
+    raises DeyeProxyQueueFullError if too many requests are waiting
+    """
+    registers = DeyeProxyModbus.get_read_range(frame)
+    if registers is None:
+      return await self._exchange_other(frame, wait_timeout, priority)
+
+    start = time.monotonic()
+
+    cached = self._cache.get(registers)
+    if cached is not None:
+      data, template = cached
+      self._logger.debug(f"Read of {registers} answered from the cache")
+      self._metrics.coalesced_reads.inc("cache")
+      await self._wait_min_response_time(start)
+      return DeyeProxyModbus.build_read_response(template, frame, registers, data)
+
+    group = self._join(registers, frame, wait_timeout, priority)
+
+    # Shield the shared future, so cancellation of this client doesn't affect others
+    try:
+      response: Optional[bytes] = await asyncio.shield(group.future)
+    except asyncio.CancelledError:
+      if not group.future.cancelled():
+        raise
+      return await self._multiplexer.exchange(frame, wait_timeout, priority)
+
+    if response is None:
+      return None
+
+    if group.data is None:
+      # Modbus error of the merged request can be caused by registers of other clients
+      if group.registers == registers:
+        return DeyeProxyFrame.with_sequence(response, DeyeProxyFrame.get_sequence(frame))
+      return await self._multiplexer.exchange(frame, wait_timeout, priority)
+
+    offset = (registers.start - group.registers.start) * 2
+    data = group.data[offset:offset + registers.count * 2]
+    await self._wait_min_response_time(start)
+    return DeyeProxyModbus.build_read_response(response, frame, registers, data)
+
+  def close(self) -> None:
+    for task in list(self._tasks):
+      task.cancel()
+
+  def _join(
+    self,
+    registers: DeyeProxyRegisterRange,
+    frame: bytes,
+    wait_timeout: float,
+    priority: DeyeProxyPriority,
+  ) -> DeyeProxyReadGroup:
+    serial = frame[7:DeyeProxyFrame.header_length]
+
+    for group in self._groups:
+      if group.frame[7:DeyeProxyFrame.header_length] != serial:
+        continue
+
+      if group.sent:
+        if group.registers.covers(registers):
+          self._logger.debug(f"Read of {registers} joined to the sent read of {group.registers}")
+          self._metrics.coalesced_reads.inc("joined")
+          return group
+      elif group.priority <= priority and group.registers.touches(registers):
+        merged = group.registers.merge(registers)
+        if merged.count <= DeyeProxyModbus.max_read_count:
+          self._logger.debug(f"Read of {registers} merged into the queued read of {merged}")
+          self._metrics.coalesced_reads.inc("merged")
+          group.registers = merged
+          return group
+
+    group = DeyeProxyReadGroup(registers, frame, priority)
+    self._groups.append(group)
+
+    # The group is sent by its own task, so it isn't cancelled with the client
+    task = asyncio.create_task(self._send(group, wait_timeout))
+    self._tasks.add(task)
+    task.add_done_callback(self._tasks.discard)
+
+    return group
+
+  async def _send(self, group: DeyeProxyReadGroup, wait_timeout: float) -> None:
+    def build_request() -> bytes:
+      # Called when the logger is free, the group can't be merged anymore
+      group.sent = True
+      return DeyeProxyModbus.with_read_range(group.frame, group.registers)
+
+    try:
+      response = await self._multiplexer.exchange(build_request, wait_timeout, group.priority)
+    except Exception as e:
+      self._finish(group)
+      group.future.set_exception(e)
+      return
+    except asyncio.CancelledError:
+      self._finish(group)
+      group.future.cancel()
+      raise
+
+    self._finish(group)
+
+    if response is not None:
+      group.data = DeyeProxyModbus.get_read_data(response, group.registers)
+      if group.data is not None and group.cacheable:
+        self._cache.put(group.registers, group.data, response)
+
+    group.future.set_result(response)
+
+  async def _exchange_other(
+    self,
+    frame: bytes,
+    wait_timeout: float,
+    priority: DeyeProxyPriority,
+  ) -> Optional[bytes]:
+    written = DeyeProxyModbus.get_write_range(frame)
+    if written is None:
+      return await self._multiplexer.exchange(frame, wait_timeout, priority)
+
+    self._invalidate(written)
+    try:
+      return await self._multiplexer.exchange(frame, wait_timeout, priority)
+    finally:
+      # Reads sent to the logger after this write arrived could be cached meanwhile
+      self._invalidate(written)
+
+  def _invalidate(self, written: DeyeProxyRegisterRange) -> None:
+    self._cache.invalidate(written)
+
+    for group in [group for group in self._groups if group.registers.overlaps(written)]:
+      group.cacheable = False
+      # New reads shouldn't get the values read before the write
+      self._groups.remove(group)
+
+  async def _wait_min_response_time(self, start: float) -> None:
+    delay = start + self.min_response_time - time.monotonic()
+    if delay > 0:
+      await asyncio.sleep(delay)
+
+  def _finish(self, group: DeyeProxyReadGroup) -> None:
+    if group in self._groups:
+      self._groups.remove(group)
@@ -0,0 +1,44 @@
+from dataclasses import dataclass
+
+@dataclass(frozen = True)
+class DeyeProxyRegisterRange:
+  """
+  Registers of one Modbus slave read (or written) by one request.
+  Ranges of different read functions are different address spaces.
+  """
+  slave: int
+  function: int
+  start: int
+  count: int
+
+  @property
+  def end(self) -> int:
+    return self.start + self.count
+
+  def is_same_space(self, other: 'DeyeProxyRegisterRange') -> bool:
+    return self.slave == other.slave and self.function == other.function
+
+  def covers(self, other: 'DeyeProxyRegisterRange') -> bool:
+    return self.is_same_space(other) and self.start <= other.start and other.end <= self.end
+
+  def overlaps(self, other: 'DeyeProxyRegisterRange') -> bool:
+    """
+    Checks if the ranges share registers of the slave in any address space,
+    so a write invalidates reads of all functions
+    """
+    return self.slave == other.slave and self.start < other.end and other.start < self.end
+
+  def touches(self, other: 'DeyeProxyRegisterRange') -> bool:
+    """
+    Checks if the ranges overlap or adjoin each other in the same address space
+    """
+    return self.is_same_space(other) and self.start <= other.end and other.start <= self.end
+
+  def merge(self, other: 'DeyeProxyRegisterRange') -> 'DeyeProxyRegisterRange':
+    start = min(self.start, other.start)
+    return DeyeProxyRegisterRange(
+      slave = self.slave,
+      function = self.function,
+      start = start,
+      count = max(self.end, other.end) - start,
+    )
@@ -1,9 +1,9 @@
 import os
 import logging
 import sys
-import uvicorn
+import asyncio
 
-from typing import Dict, Any
+from typing import Dict, List, Optional
 
 from contextlib import asynccontextmanager
 from fastapi.responses import JSONResponse
@@ -15,37 +15,101 @@ sys.path.append(utils_path)
 
 from log_utils import LogUtils
 from common_utils import CommonUtils
+from uvicorn_utils import UvicornUtils
 from src.deye_storage_config import DeyeStorageConfig
+from src.deye_storage_backend import DeyeStorageBackend
 from src.deye_storage_manager import DeyeStorageManager
+from src.deye_storage_history import DeyeStorageHistory
+from src.deye_storage_memory_backend import DeyeStorageMemoryBackend
+from src.deye_storage_sqlite_backend import DeyeStorageSqliteBackend
+from src.deye_storage_persistence import DeyeStoragePersistence
+from src.deye_storage_response_cache import DeyeStorageResponseCache
 
 config = DeyeStorageConfig()
 
-DATA_DIR = f"data/{config.LOG_NAME}"
-# Path for the persistent storage file
-STORAGE_FILE_PATH = os.path.join(DATA_DIR, "storage.json")
-CACHE_FILE_PATH = os.path.join(DATA_DIR, "cache.json")
-AVERAGE_FILE_PATH = os.path.join(DATA_DIR, "average.json")
+DATA_DIR = config.DATA_DIR
 
 logger = LogUtils.setup_hourly_overwrite_file_logger(
   log_dir = DATA_DIR,
   log_file_template = "deye-storage-{0}.log",
 )
 
+def create_backend(name: str) -> DeyeStorageBackend:
+  if config.STORAGE_BACKEND == "memory":
+    return DeyeStorageMemoryBackend()
+  if config.STORAGE_BACKEND == "sqlite":
+    # Every worker process opens its own connection to the same database
+    return DeyeStorageSqliteBackend(os.path.join(DATA_DIR, f"{name}.sqlite"))
+  raise ValueError(f"Unknown STORAGE_BACKEND '{config.STORAGE_BACKEND}', should be 'memory' or 'sqlite'")
+
+def create_history() -> Optional[DeyeStorageHistory]:
+  if config.HISTORY_SIZE <= 0:
+    return None
+  # Memory backend runs a single worker anyway
+  if config.WORKERS > 1 and config.STORAGE_BACKEND == "sqlite":
+    # Every worker would keep the history of its own updates only
+    logger.warning(f"WORKERS = {config.WORKERS} doesn't support history, HISTORY_SIZE is ignored")
+    return None
+  return DeyeStorageHistory(
+    size = config.HISTORY_SIZE,
+    max_series = config.HISTORY_MAX_SERIES,
+  )
+
 cache_manager = DeyeStorageManager(
   config = config,
   logger = logger,
+  ttl_grace = config.CACHE_TTL_GRACE,
+  memory_budget = config.CACHE_MEMORY_BUDGET,
+  backend = create_backend("cache"),
+  history = create_history(),
 )
 
 average_manager = DeyeStorageManager(
   config = config,
   logger = logger,
+  backend = create_backend("average"),
 )
 
 storage_manager = DeyeStorageManager(
   config = config,
   logger = logger,
+  backend = create_backend("storage"),
 )
 
+managers = [storage_manager, cache_manager, average_manager]
+
+# Serialized and compressed bodies of GET responses by entry version
+cache_responses = DeyeStorageResponseCache()
+storage_responses = DeyeStorageResponseCache()
+
+# Snapshots (storage.json, cache.json, average.json) and write-ahead logs.
+# SQLite database is durable by itself
+persistences = [] if config.STORAGE_BACKEND == "sqlite" else [
+  DeyeStoragePersistence(
+    manager = storage_manager,
+    config = config,
+    logger = logger,
+    data_dir = DATA_DIR,
+    name = "storage",
+  ),
+  DeyeStoragePersistence(
+    manager = cache_manager,
+    config = config,
+    logger = logger,
+    data_dir = DATA_DIR,
+    name = "cache",
+    restore_max_age = config.CACHE_RESTORE_MAX_AGE,
+  ),
+  DeyeStoragePersistence(
+    manager = average_manager,
+    config = config,
+    logger = logger,
+    data_dir = DATA_DIR,
+    name = "average",
+    restore_max_age = config.AVERAGE_RESTORE_MAX_AGE,
+  ),
+]
+
 # Define the lifespan context manager
 @asynccontextmanager
 async def lifespan_handler(app: FastAPI):
@@ -63,23 +127,34 @@ async def lifespan_handler(app: FastAPI):
   actual_ip = external_ip if external_ip else config.SERVER_HOST
 
   logger.info(f"Listening on: {actual_ip}:{config.SERVER_PORT}")
+  if config.SERVER_SOCKET:
+    logger.info(f"Listening on: {config.SERVER_SOCKET}")
 
   # Storage restoring logic
-  storage_manager.load_from_file(STORAGE_FILE_PATH)
+  for persistence in persistences:
+    persistence.restore()
+
+  # Write-ahead logs are merged into snapshots in background
+  tasks = [asyncio.create_task(persistence.run()) for persistence in persistences]
+
+  # Expired registers are removed from the cache in background
+  if config.CACHE_SWEEP_INTERVAL > 0:
+    tasks.append(asyncio.create_task(cache_manager.run_expiry(config.CACHE_SWEEP_INTERVAL)))
 
   # The application runs here
   yield
 
-  try:
-    # Ensure directory exists before saving
-    os.makedirs(DATA_DIR, exist_ok = True)
-  except Exception:
-    pass
+  for task in tasks:
+    task.cancel()
+
+  await asyncio.gather(*tasks, return_exceptions = True)
 
   # Storage save logic
-  storage_manager.save_to_file(STORAGE_FILE_PATH)
-  cache_manager.save_to_file(CACHE_FILE_PATH)
-  average_manager.save_to_file(AVERAGE_FILE_PATH)
+  for persistence in persistences:
+    await persistence.close()
+
+  for manager in managers:
+    manager.close()
 
   # This code runs on shutdown
   logger.info("Deye Storage service is shutting down...")
@@ -99,6 +174,14 @@ app = FastAPI(
 
 app.add_middleware(GZipMiddleware, minimum_size = 1024)
 
+# Update handlers parse the raw body themselves (hot path), the schema is only for the docs
+JSON_OBJECT_BODY = {
+  "requestBody": {
+    "required": True,
+    "content": {"application/json": {"schema": {"type": "object"}}},
+  },
+}
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
   # Log the path and stack trace once for the entire application
@@ -130,21 +213,91 @@ def ping():
 #######################################
 
 @app.get("/cache/{key}", tags = ["Cache Read Operations"])
-async def get_cache_by_key(key: str):
+async def get_cache_by_key(
+  key: str,
+  request: Request,
+  registers: Optional[str] = None,
+):
+  """
+  Returns cached data for the specified key.
+  If registers are specified (comma separated addresses), only these registers are returned.
+  Registers with 'ttl' expired more than CACHE_TTL_GRACE seconds ago are omitted.
+  Returns 304 if If-None-Match header contains ETag of the current version of the data
+  """
+  items = _split_items(registers)
+
+  def render():
+    content = cache_manager.get_items(key = key, field = "registers", items = items)
+    return content, cache_manager.get_valid_until(key = key, field = "registers")
+
+  return cache_responses.respond(
+    request = request,
+    key = key,
+    etag = cache_manager.get_etag(key),
+    variant = f"{registers}",
+    render = render,
+  )
+
+@app.post("/batch/cache", tags = ["Cache Read Operations"])
+async def get_cache_by_keys(keys: Dict[str, Optional[List[str]]]):
+  """
+  Returns cached data for multiple keys in one response: {"key": ["100", "200"], "other_key": null}.
+  Only listed registers are returned for each key (all registers if null). Missing keys are omitted.
+  Registers with 'ttl' expired more than CACHE_TTL_GRACE seconds ago are omitted
+  """
+  return cache_manager.get_many(
+    keys = keys,
+    field = "registers",
+  )
+
+@app.get("/watch/cache", tags = ["Cache Read Operations"])
+async def watch_cache(keys: str, since: Optional[str] = None, timeout: float = 30):
+  """
+  Long-poll subscription to cache changes. Waits up to timeout seconds (max 60) until any of the
+  keys (comma separated) is changed after the 'since' cursor and returns changed registers:
+  {"cursor": "...", "changes": {"key": {..., "registers": {...}}}}. Removed keys are null.
+  Pass the returned cursor to the next call. Without a cursor all data is returned immediately
+  """
+  return await cache_manager.wait_for_changes(
+    keys = _split_items(keys) or [],
+    field = "registers",
+    since = since,
+    timeout = min(timeout, 60),
+  )
+
+@app.get("/history/cache/{key}", tags = ["Cache Read Operations"])
+async def get_cache_history(
+  key: str,
+  registers: Optional[str] = None,
+  since: Optional[float] = None,
+  until: Optional[float] = None,
+  step: Optional[float] = None,
+  signed: bool = False,
+):
   """
-  Returns cached data for the specified key
+  Returns recent values of the cached registers (comma separated addresses, all if not set)
+  between since and until (unix time in seconds) as {"registers": {"100": {"ts": [...], "value": [...]}}}.
+  Values are raw register words combined (the low word first), 'signed' makes them two's complement.
+  If step (seconds) is set, values are grouped into intervals with "min", "max" and "avg".
+  Requires HISTORY_SIZE > 0 and a single worker process
   """
-  return cache_manager.get(key)
+  return cache_manager.get_history(
+    key = key,
+    items = _split_items(registers),
+    since = since,
+    until = until,
+    step = step,
+    signed = signed,
+  )
 
-@app.post("/cache/{key}", tags = ["Cache Update Operations"])
-async def update_cache_by_key(key: str, json_data: Dict[str, Any], request: Request):
+@app.post("/cache/{key}", tags = ["Cache Update Operations"], openapi_extra = JSON_OBJECT_BODY)
+async def update_cache_by_key(key: str, request: Request):
   """
   Updates the storage data for the specified key using a recursive deep merge.
   Works with any nested JSON structure
   """
-  return await cache_manager.update(
+  return await cache_manager.update_raw(
     key = key,
-    json_data = json_data,
     request = request,
   )
 
@@ -171,21 +324,39 @@ async def get_cache_stat():
 #########################################
 
 @app.get("/storage/{key}", tags = ["Storage Read Operations"])
-async def get_storage_by_key(key: str):
+async def get_storage_by_key(key: str, request: Request):
   """
-  Returns stored data for the specified key
+  Returns stored data for the specified key.
+  Returns 304 if If-None-Match header contains ETag of the current version of the data
   """
-  return storage_manager.get(key)
+  return storage_responses.respond(
+    request = request,
+    key = key,
+    etag = storage_manager.get_etag(key),
+    variant = "",
+    render = lambda: (storage_manager.get(key), float("inf")),
+  )
 
-@app.post("/storage/{key}", tags = ["Storage Update Operations"])
-async def update_storage_by_key(key: str, json_data: Dict[str, Any], request: Request):
+@app.get("/watch/storage", tags = ["Storage Read Operations"])
+async def watch_storage(keys: str, since: Optional[str] = None, timeout: float = 30):
+  """
+  Long-poll subscription to storage changes, the same as /watch/cache
+  """
+  return await storage_manager.wait_for_changes(
+    keys = _split_items(keys) or [],
+    field = "registers",
+    since = since,
+    timeout = min(timeout, 60),
+  )
+
+@app.post("/storage/{key}", tags = ["Storage Update Operations"], openapi_extra = JSON_OBJECT_BODY)
+async def update_storage_by_key(key: str, request: Request):
   """
   Updates the storage data for the specified key using a recursive deep merge.
   Works with any nested JSON structure
   """
-  return await storage_manager.update(
+  return await storage_manager.update_raw(
     key = key,
-    json_data = json_data,
     request = request,
   )
 
@@ -205,11 +376,13 @@ async def get_storage_stat():
 #########################################
 
 @app.get("/average/{key}", tags = ["Average Operations"])
-async def get_average(key: str):
+async def get_average(key: str, window: Optional[str] = None):
   """
   Get the current calculated average and both totals for the specified key.
+  The 'windows' contain averages of the recent values (1m, 15m, 24h),
+  only the specified window is returned if it is set.
   """
-  return average_manager.get_average(key)
+  return average_manager.get_average(key, window)
 
 @app.delete("/average/{key}", tags = ["Average Operations"])
 async def remove_average(key: str):
@@ -218,6 +391,14 @@ async def remove_average(key: str):
   """
   return await average_manager.remove(key = key)
 
+@app.delete("/average/{key}/totals", tags = ["Average Operations"])
+async def reset_average_totals(key: str, request: Request):
+  """
+  Reset the totals and the average for the specified key.
+  The 'windows' are kept, old values fade out of them anyway.
+  """
+  return await average_manager.reset_average_totals(key = key, request = request)
+
 @app.post("/average/{key}/{count1}/{count2}", tags = ["Average Operations"])
 async def update_average(key: str, count1: float, count2: float, request: Request):
   """
@@ -231,14 +412,29 @@ async def update_average(key: str, count1: float, count2: float, request: Reques
     request = request,
   )
 
+def _split_items(items: Optional[str]) -> Optional[List[str]]:
+  if items is None:
+    return None
+  return [item.strip() for item in items.split(",") if item.strip()]
+
 if __name__ == "__main__":
   config.print_usage(logger)
 
-  uvicorn.run(
-    app,
+  workers = config.WORKERS
+  if workers > 1 and config.STORAGE_BACKEND != "sqlite":
+    logger.warning(f"WORKERS = {workers} requires STORAGE_BACKEND = sqlite, running a single worker")
+    workers = 1
+
+  UvicornUtils.run(
+    # Worker processes import the application by name
+    "deye_storage:app" if workers > 1 else app,
+    workers = workers,
     host = config.SERVER_HOST,
     port = config.SERVER_PORT,
+    socket_path = config.SERVER_SOCKET,
     timeout_keep_alive = 15,
+    # Don't wait for long-poll subscriptions on shutdown
+    timeout_graceful_shutdown = 5,
     proxy_headers = False,
     forwarded_allow_ips = None,
     log_config = None,
@@ -0,0 +1,145 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+class DeyeStorageBackend(ABC):
+  """
+  Keeps storage entries of DeyeStorageManager with their JSON sizes and versions.
+
+  Every write takes the next value of the version counter as the version of the entry,
+  so versions are unique and grow across all keys. The epoch distinguishes counters
+  of different storages (e.g. process runs of the in-memory backend).
+
+  Items are values of the nested dictionaries at the top level of the entry data,
+  e.g. registers by address. Items changed by put() get the version of the write,
+  other items have the version of the last full replacement of the entry.
+
+  Entries returned by get() can be changed in place only inside transaction()
+  and should be written back with put() in the same transaction.
+  """
+  # True if the data can be changed by other processes
+  shared = False
+
+  @property
+  @abstractmethod
+  def epoch(self) -> str:
+    pass
+
+  @property
+  @abstractmethod
+  def counter(self) -> int:
+    """
+    The last version given to a change
+    """
+    pass
+
+  @property
+  @abstractmethod
+  def total_bytes(self) -> int:
+    pass
+
+  @contextmanager
+  def transaction(self) -> Iterator[None]:
+    """
+    Makes reads and writes inside the block atomic. Transactions can be nested
+    """
+    yield
+
+  @abstractmethod
+  def get(self, key: str) -> Optional[Dict[str, Any]]:
+    pass
+
+  @abstractmethod
+  def contains(self, key: str) -> bool:
+    pass
+
+  @abstractmethod
+  def count(self) -> int:
+    pass
+
+  @abstractmethod
+  def keys(self) -> List[str]:
+    pass
+
+  def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    for key in self.keys():
+      entry = self.get(key)
+      if entry is not None:
+        yield key, entry
+
+  @abstractmethod
+  def get_size(self, key: str) -> int:
+    pass
+
+  @abstractmethod
+  def get_sizes(self) -> Dict[str, int]:
+    pass
+
+  @abstractmethod
+  def get_version(self, key: str) -> Optional[int]:
+    pass
+
+  @abstractmethod
+  def get_item_version(self, key: str, field: str, item: str) -> int:
+    pass
+
+  @abstractmethod
+  def get_removed_version(self, key: str) -> Optional[int]:
+    pass
+
+  @abstractmethod
+  def put(
+    self,
+    key: str,
+    entry: Dict[str, Any],
+    size: int,
+    items: Optional[Dict[str, List[str]]] = None,
+  ) -> None:
+    """
+    Saves the entry with its JSON size.
+
+    Args:
+      items: changed items by field, None if the whole entry is replaced.
+    """
+    pass
+
+  @abstractmethod
+  def store(self, key: str, entry: Dict[str, Any], size: int) -> None:
+    """
+    Saves the entry changed in a way which readers can't see (e.g. expired objects removed).
+    Versions and the least recently used order are kept
+    """
+    pass
+
+  @abstractmethod
+  def delete(self, key: str) -> bool:
+    """
+    Removes the entry. Returns False if it doesn't exist
+    """
+    pass
+
+  def clear(self) -> List[str]:
+    """
+    Removes all entries and returns their keys
+    """
+    with self.transaction():
+      keys = self.keys()
+      for key in keys:
+        self.delete(key)
+      return keys
+
+  def touch(self, key: str) -> None:
+    """
+    Marks the entry as recently used
+    """
+    pass
+
+  @abstractmethod
+  def get_lru_keys(self) -> List[str]:
+    """
+    Returns keys from the least to the most recently used
+    """
+    pass
+
+  def close(self) -> None:
+    pass
@@ -0,0 +1,76 @@
+import asyncio
+
+from typing import Dict, List, Optional
+
+from src.deye_storage_backend import DeyeStorageBackend
+
+class DeyeStorageChangeTracker:
+  """
+  Cursors and ETags made of backend versions, and notifications about changes.
+
+  A cursor ("epoch-counter") tells which changes a client has already seen.
+
+  Waiters for the next change of a key wait on its event. The event is
+  replaced on every change, so it works like a condition variable which
+  can be notified from synchronous code. Changes made by other processes
+  are not notified, so waiters of a shared backend should wake up periodically.
+  """
+  def __init__(self, backend: DeyeStorageBackend):
+    self._backend = backend
+    self._events: Dict[str, asyncio.Event] = {}
+    # Number of waiters by key, events are removed when nobody waits for them
+    self._waiters: Dict[str, int] = {}
+
+  @property
+  def cursor(self) -> str:
+    return f"{self._backend.epoch}-{self._backend.counter}"
+
+  def get_etag(self, key: str) -> Optional[str]:
+    version = self._backend.get_version(key)
+    return f'"{self._backend.epoch}-{version}"' if version is not None else None
+
+  def parse_cursor(self, cursor: Optional[str]) -> int:
+    """
+    Returns the counter value of the cursor, or 0 (all changes) if the cursor
+    is missing, malformed or was issued for another epoch
+    """
+    if not cursor:
+      return 0
+
+    epoch, _, counter = cursor.rpartition("-")
+    if epoch != self._backend.epoch or not counter.isdigit():
+      return 0
+
+    return min(int(counter), self._backend.counter)
+
+  def notify(self, key: str) -> None:
+    event = self._events.pop(key, None)
+    if event is not None:
+      event.set()
+
+  async def wait(self, keys: List[str], timeout: float) -> bool:
+    """
+    Waits for the next change of any of the keys. Returns False on timeout
+    """
+    if not keys:
+      await asyncio.sleep(timeout)
+      return False
+
+    events = [self._events.setdefault(key, asyncio.Event()) for key in keys]
+    waiters = [asyncio.ensure_future(event.wait()) for event in events]
+
+    for key in keys:
+      self._waiters[key] = self._waiters.get(key, 0) + 1
+
+    try:
+      done, _ = await asyncio.wait(waiters, timeout = timeout, return_when = asyncio.FIRST_COMPLETED)
+      return bool(done)
+    finally:
+      for waiter in waiters:
+        waiter.cancel()
+
+      for key in keys:
+        self._waiters[key] -= 1
+        if not self._waiters[key]:
+          del self._waiters[key]
+          self._events.pop(key, None)
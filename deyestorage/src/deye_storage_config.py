@@ -7,19 +7,63 @@ from env_vars import EnvVars
 class DeyeStorageConfig:
   def __init__(self):
     self.__server_port = EnvVar("SERVER_PORT", "80", "Local port to listen on")
+    self.__server_socket = EnvVar("SERVER_SOCKET", "", "Unix domain socket path to listen on besides the port "
+                                  "(empty to listen only on the port)")
+    self.__data_dir = EnvVar("DATA_DIR", "", "Directory for logs, snapshots and write-ahead logs "
+                             "(empty for data/<DEYE_LOG_NAME>)")
     self.__max_keys_count = EnvVar("MAX_KEYS_COUNT", "32", "Maximum number of top-level keys in storage")
     self.__max_json_size = EnvVar("MAX_JSON_SIZE", str(32 * 1024), "Maximum JSON size in bytes for incoming POST body")
     self.__max_json_storage_size = EnvVar("MAX_JSON_STORAGE_SIZE", str(256 * 1024),
                                           "Maximum total JSON storage size per key in bytes")
+    self.__snapshot_interval = EnvVar("SNAPSHOT_INTERVAL", "60",
+                                      "Interval in seconds to merge write-ahead log into data snapshots")
+    self.__max_wal_size = EnvVar("MAX_WAL_SIZE", str(4 * 1024 * 1024),
+                                 "Write-ahead log size in bytes to merge it into data snapshot earlier")
+    self.__cache_restore_max_age = EnvVar("CACHE_RESTORE_MAX_AGE", "3600",
+                                          "Cache entries older than this number of seconds are discarded "
+                                          "on restore (0 to keep all)")
+    self.__average_restore_max_age = EnvVar("AVERAGE_RESTORE_MAX_AGE", "86400",
+                                            "Average entries not updated for this number of seconds are discarded "
+                                            "on restore (0 to keep all)")
+    self.__cache_ttl_grace = EnvVar("CACHE_TTL_GRACE", "300",
+                                    "Cached registers are kept this number of seconds after their caching time "
+                                    "expiry to be served stale")
+    self.__cache_sweep_interval = EnvVar("CACHE_SWEEP_INTERVAL", "60",
+                                         "Interval in seconds to remove expired registers from the cache")
+    self.__cache_memory_budget = EnvVar("CACHE_MEMORY_BUDGET", str(4 * 1024 * 1024),
+                                        "Maximum total JSON size of the cache in bytes, least recently used keys "
+                                        "are evicted above it (0 for no limit)")
+    self.__storage_backend = EnvVar("STORAGE_BACKEND", "memory",
+                                    "Where the data is kept: 'memory' (with snapshots and write-ahead logs) "
+                                    "or 'sqlite' (database shared by workers)")
+    self.__history_size = EnvVar("HISTORY_SIZE", "0",
+                                 "Number of recent values kept for every cached register "
+                                 "(0 to disable history, works only with WORKERS = 1)")
+    self.__history_max_series = EnvVar("HISTORY_MAX_SERIES", "2048",
+                                       "Maximum number of registers with history, each takes HISTORY_SIZE * 16 bytes")
+    self.__workers = EnvVar("WORKERS", "1", "Number of server worker processes (more than 1 requires sqlite backend)")
 
     self.__server_host = '0.0.0.0'
 
     self.__all_vars: List[EnvVar] = [
       EnvVars.DEYE_LOG_NAME,
       self.__server_port,
+      self.__server_socket,
+      self.__data_dir,
       self.__max_keys_count,
       self.__max_json_size,
       self.__max_json_storage_size,
+      self.__snapshot_interval,
+      self.__max_wal_size,
+      self.__cache_restore_max_age,
+      self.__average_restore_max_age,
+      self.__cache_ttl_grace,
+      self.__cache_sweep_interval,
+      self.__cache_memory_budget,
+      self.__storage_backend,
+      self.__history_size,
+      self.__history_max_series,
+      self.__workers,
     ]
 
   @property
@@ -34,6 +78,14 @@ class DeyeStorageConfig:
   def SERVER_PORT(self) -> int:
     return self.__server_port.as_int()
 
+  @property
+  def SERVER_SOCKET(self) -> str:
+    return self.__server_socket.value
+
+  @property
+  def DATA_DIR(self) -> str:
+    return self.__data_dir.value or f"data/{self.LOG_NAME}"
+
   @property
   def MAX_KEYS_COUNT(self) -> int:
     return self.__max_keys_count.as_int()
@@ -46,6 +98,50 @@ class DeyeStorageConfig:
   def MAX_JSON_STORAGE_SIZE(self) -> int:
     return self.__max_json_storage_size.as_int()
 
+  @property
+  def SNAPSHOT_INTERVAL(self) -> int:
+    return self.__snapshot_interval.as_int()
+
+  @property
+  def MAX_WAL_SIZE(self) -> int:
+    return self.__max_wal_size.as_int()
+
+  @property
+  def CACHE_RESTORE_MAX_AGE(self) -> int:
+    return self.__cache_restore_max_age.as_int()
+
+  @property
+  def AVERAGE_RESTORE_MAX_AGE(self) -> int:
+    return self.__average_restore_max_age.as_int()
+
+  @property
+  def CACHE_TTL_GRACE(self) -> int:
+    return self.__cache_ttl_grace.as_int()
+
+  @property
+  def CACHE_SWEEP_INTERVAL(self) -> int:
+    return self.__cache_sweep_interval.as_int()
+
+  @property
+  def CACHE_MEMORY_BUDGET(self) -> int:
+    return self.__cache_memory_budget.as_int()
+
+  @property
+  def STORAGE_BACKEND(self) -> str:
+    return self.__storage_backend.value.strip().lower()
+
+  @property
+  def HISTORY_SIZE(self) -> int:
+    return self.__history_size.as_int()
+
+  @property
+  def HISTORY_MAX_SERIES(self) -> int:
+    return self.__history_max_series.as_int()
+
+  @property
+  def WORKERS(self) -> int:
+    return self.__workers.as_int()
+
   def _get_max_var_length(self) -> int:
     return max((len(var.name) for var in self.__all_vars), default = 0)
 
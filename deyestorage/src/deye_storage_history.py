@@ -0,0 +1,208 @@
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+@dataclass
+class DeyeStorageHistorySeries:
+  """
+  Ring buffer of (ts, value) samples of one register in preallocated arrays of doubles
+  """
+  timestamps: array
+  values: array
+  # Number of 16-bit words of the register value
+  words: int
+  # Index of the oldest sample
+  start: int = 0
+  count: int = 0
+
+  @property
+  def capacity(self) -> int:
+    return len(self.timestamps)
+
+  @property
+  def last_ts(self) -> Optional[float]:
+    if not self.count:
+      return None
+    return self.timestamps[(self.start + self.count - 1) % self.capacity]
+
+  def append(self, ts: float, value: float) -> None:
+    if self.count < self.capacity:
+      index = (self.start + self.count) % self.capacity
+      self.count += 1
+    else:
+      # The oldest sample is overwritten
+      index = self.start
+      self.start = (self.start + 1) % self.capacity
+
+    self.timestamps[index] = ts
+    self.values[index] = value
+
+  def samples(self) -> Iterator[Tuple[float, float]]:
+    """
+    Returns samples from the oldest to the newest
+    """
+    for i in range(self.count):
+      index = (self.start + i) % self.capacity
+      yield self.timestamps[index], self.values[index]
+
+class DeyeStorageHistory:
+  """
+  Recent history of register values, fed from the merges of the cache.
+
+  Every register of every key has a ring buffer of the last `size` samples,
+  so the memory is bounded by size * max_series * 16 bytes. When there are
+  more registers than max_series, the series which wasn't updated for the
+  longest time is dropped.
+
+  A sample is taken from a register object with numeric 'ts_label' and 'data'
+  with 16-bit words (the low word first, as in the Deye long registers).
+  Values are stored unsigned, 'signed' query interprets them as two's complement
+  of the register width. Scaling is up to the client, which knows the registers.
+  """
+  # Values up to 48 bits are exact in doubles
+  max_words = 3
+
+  def __init__(self, size: int, max_series: int, field: str = "registers"):
+    self._size = size
+    self._max_series = max_series
+    self._field = field
+    # Series by (key, register) from the least to the most recently updated
+    self._series: OrderedDict[Tuple[str, str], DeyeStorageHistorySeries] = OrderedDict()
+
+  @property
+  def series_count(self) -> int:
+    return len(self._series)
+
+  @property
+  def bytes_used(self) -> int:
+    return sum(series.timestamps.itemsize * series.capacity * 2 for series in self._series.values())
+
+  def record(self, key: str, update: Dict[str, Any], changed_items: Dict[str, List[str]]) -> None:
+    """
+    Adds samples of the registers changed by the merge of the update
+    """
+    registers = update.get(self._field)
+    if not isinstance(registers, dict):
+      return
+
+    for name in changed_items.get(self._field, []):
+      sample = self._get_sample(registers.get(name))
+      if sample is not None:
+        self._append(key, name, *sample)
+
+  def remove(self, key: str) -> None:
+    for series_key in [series_key for series_key in self._series if series_key[0] == key]:
+      del self._series[series_key]
+
+  def clear(self) -> None:
+    self._series.clear()
+
+  def query(
+    self,
+    key: str,
+    registers: Optional[List[str]] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    step: Optional[float] = None,
+    signed: bool = False,
+  ) -> Dict[str, Dict[str, List[float]]]:
+    """
+    Returns samples of the key registers in the time range as columns:
+    {"100": {"ts": [...], "value": [...]}}. If step (seconds) is set, samples are
+    grouped into intervals aligned to the step: {"100": {"ts": [...], "min": [...], "max": [...], "avg": [...]}}
+    where ts is the start of the interval. Intervals without samples are omitted
+    """
+    result: Dict[str, Dict[str, List[float]]] = {}
+
+    for (series_key, name), series in self._series.items():
+      if series_key != key or (registers is not None and name not in registers):
+        continue
+
+      samples = [
+        (ts, self._to_signed(value, series.words) if signed else value)
+        for ts, value in series.samples()
+        if (since is None or ts >= since) and (until is None or ts <= until)
+      ]
+
+      result[name] = self._downsample(samples, step) if step else {
+        "ts": [ts for ts, _ in samples],
+        "value": [value for _, value in samples],
+      }
+
+    return result
+
+  def _append(self, key: str, name: str, ts: float, value: float, words: int) -> None:
+    series_key = (key, name)
+    series = self._series.get(series_key)
+
+    if series is None or series.words != words:
+      if series is None and len(self._series) >= self._max_series:
+        self._series.popitem(last = False)
+
+      series = DeyeStorageHistorySeries(
+        timestamps = array("d", bytes(8 * self._size)),
+        values = array("d", bytes(8 * self._size)),
+        words = words,
+      )
+      self._series[series_key] = series
+    elif series.last_ts is not None and ts <= series.last_ts:
+      # The same reading merged again
+      return
+
+    series.append(ts, value)
+    self._series.move_to_end(series_key)
+
+  def _get_sample(self, register: Any) -> Optional[Tuple[float, float, int]]:
+    if not isinstance(register, dict):
+      return None
+
+    ts_label = register.get("ts_label")
+    data = register.get("data")
+    if not isinstance(ts_label, (int, float)) or isinstance(ts_label, bool):
+      return None
+
+    if not isinstance(data, list) or not 1 <= len(data) <= self.max_words:
+      return None
+
+    value = 0
+    for i, word in enumerate(data):
+      if not isinstance(word, int) or isinstance(word, bool) or not 0 <= word <= 0xFFFF:
+        return None
+      value |= word << (16 * i)
+
+    # Label in seconds or milliseconds, the same as DeyeStorageManager._get_ts()
+    ts = ts_label / 1000 if ts_label > 1e11 else ts_label
+    return float(ts), float(value), len(data)
+
+  def _to_signed(self, value: float, words: int) -> float:
+    bits = 16 * words
+    return value - (1 << bits) if value >= (1 << (bits - 1)) else value
+
+  def _downsample(self, samples: List[Tuple[float, float]], step: float) -> Dict[str, List[float]]:
+    result: Dict[str, List[float]] = {"ts": [], "min": [], "max": [], "avg": []}
+    bucket: Optional[float] = None
+    total = 0.0
+    count = 0
+
+    for ts, value in samples:
+      start = ts - ts % step
+      if start != bucket:
+        if count:
+          result["avg"].append(total / count)
+        bucket = start
+        total = 0.0
+        count = 0
+        result["ts"].append(start)
+        result["min"].append(value)
+        result["max"].append(value)
+
+      result["min"][-1] = min(result["min"][-1], value)
+      result["max"][-1] = max(result["max"][-1], value)
+      total += value
+      count += 1
+
+    if count:
+      result["avg"].append(total / count)
+
+    return result
@@ -0,0 +1,24 @@
+import json
+
+from typing import Any
+
+try:
+  import orjson
+except ImportError:
+  orjson = None # type: ignore
+
+class DeyeStorageJson:
+  """
+  Decodes JSON request bodies with orjson when it is installed, the standard json module otherwise
+  """
+  @staticmethod
+  def loads(data: bytes) -> Any:
+    if orjson is None:
+      return json.loads(data)
+
+    try:
+      return orjson.loads(data)
+    except orjson.JSONDecodeError:
+      # The standard module accepts more (NaN, big integers), so the result is the same
+      # as without orjson. Really invalid JSON raises the error again
+      return json.loads(data)
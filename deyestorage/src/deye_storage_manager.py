@@ -1,29 +1,78 @@
 import os
 import json
+import math
 import logging
 import time
 import asyncio
 
-from typing import Dict, Any, Union
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
 from datetime import datetime
+from json.encoder import encode_basestring_ascii
 from fastapi import HTTPException, Request
 
 from src.deye_storage_config import DeyeStorageConfig
+from src.deye_storage_backend import DeyeStorageBackend
+from src.deye_storage_json import DeyeStorageJson
+from src.deye_storage_change_tracker import DeyeStorageChangeTracker
+from src.deye_storage_history import DeyeStorageHistory
+from src.deye_storage_memory_backend import DeyeStorageMemoryBackend
 
 class DeyeStorageManager:
+  """
+  JSON storage with deep merge updates. Entries are kept by the backend:
+  in memory (default) or in a database shared by several processes.
+
+  Temporary data can be bounded with two optional mechanisms:
+    - TTL: nested objects with numeric 'ts_label' and 'ttl' (in seconds) fields expire
+      ttl_grace seconds after ts_label + ttl. Expired objects are not returned
+      and are removed by expire() regularly.
+    - LRU eviction: if memory_budget is set, least recently used keys are evicted
+      when the total JSON size exceeds the budget (0 for no budget) or a new key
+      doesn't fit into MAX_KEYS_COUNT, instead of rejecting the new data.
+  """
+  # How often waiters check changes made by other processes of a shared backend
+  shared_poll_interval = 0.2
+  # Windows of the decayed averages: name -> time constant in seconds
+  average_windows = {"1m": 60, "15m": 15 * 60, "24h": 24 * 60 * 60}
+
   def __init__(
     self,
     config: DeyeStorageConfig,
     logger: logging.Logger,
+    ttl_grace: Optional[int] = None,
+    memory_budget: Optional[int] = None,
+    backend: Optional[DeyeStorageBackend] = None,
+    history: Optional[DeyeStorageHistory] = None,
   ):
     self._config = config
     self._logger = logger
-    # In-memory storage for any JSON data
-    self._storage: Dict[str, Any] = {}
-    # Lock per inverter
+    # None disables TTL of nested objects
+    self._ttl_grace = ttl_grace
+    # None disables LRU eviction of keys
+    self._memory_budget = memory_budget
+    self._expired_count = 0
+    self._evicted_count = 0
+    # Storage for any JSON data with sizes of json.dumps() of every entry in bytes
+    # (maintained incrementally on every change) and versions of the entries
+    self._backend = backend if backend is not None else DeyeStorageMemoryBackend()
+    # Notifies subscribers about changes
+    self._changes = DeyeStorageChangeTracker(self._backend)
+    # Recent values of the merged registers, None disables the history
+    self._history = history
+    # Lock per inverter, created on the first change of the key
     self._locks: Dict[str, asyncio.Lock] = {}
-    # Global lock to protect access to the locks dictionary
-    self._locks_lock = asyncio.Lock()
+    # Global lock to protect access to the locks dictionary. Locks are created only in coroutines,
+    # because Python < 3.10 can't create them in threads without event loop (snapshot compaction)
+    self._locks_lock: Optional[asyncio.Lock] = None
+    # Receives every change as a record and optional raw JSON payload, used for write-ahead logging
+    self._journal: Optional[Callable[[Dict[str, Any], Optional[bytes]], None]] = None
+
+  def set_journal(self, journal: Optional[Callable[[Dict[str, Any], Optional[bytes]], None]]) -> None:
+    """
+    Sets the callback which receives every change of the storage.
+    Changes can be applied again with apply_record()
+    """
+    self._journal = journal
 
   def get(self, key: str) -> Dict[str, Any]:
     """
@@ -41,35 +90,245 @@ class DeyeStorageManager:
     Raises:
         HTTPException: If the specified key is not found in the storage (404).
     """
-    entry = self._storage.get(key)
+    entry = self._backend.get(key)
     if entry is None:
       # Return 404 if the key was not found in the storage
       raise HTTPException(status_code = 404, detail = f"Key not found")
 
+    self._touch(key)
+
     # Return only the inner data payload to the client
     return entry.get("data", {})
 
+  def get_etag(self, key: str) -> str:
+    """
+    Returns ETag of the current version of the entry.
+
+    Raises:
+        HTTPException: If the specified key is not found in the storage (404).
+    """
+    etag = self._changes.get_etag(key)
+    if etag is None:
+      raise HTTPException(status_code = 404, detail = "Key not found")
+
+    self._touch(key)
+    return etag
+
+  def get_valid_until(self, key: str, field: str) -> float:
+    """
+    Returns the time when the first item in the field expires for get_items(),
+    so its result changes even without updates. Infinity if TTL is disabled
+    """
+    valid_until = float("inf")
+    if self._ttl_grace is None:
+      return valid_until
+
+    field_data = (self._backend.get(key) or {}).get("data", {}).get(field)
+    if not isinstance(field_data, dict):
+      return valid_until
+
+    now = time.time()
+    allowance = now - self._get_expiry_ts(now)
+
+    for value in field_data.values():
+      if isinstance(value, dict):
+        ts_label, ttl = value.get("ts_label"), value.get("ttl")
+        if isinstance(ts_label, (int, float)) and isinstance(ttl, (int, float)):
+          expiry = self._get_ts(ts_label) + ttl + allowance
+          if expiry >= now:
+            valid_until = min(valid_until, expiry)
+
+    return valid_until
+
+  def get_items(
+    self,
+    key: str,
+    field: str,
+    items: Optional[List[str]],
+  ) -> Dict[str, Any]:
+    """
+    Retrieves the inner data payload for the specified key, leaving
+    only the requested items inside the specified field.
+    If TTL is enabled, items are skipped ttl_grace seconds after their 'ttl' expired.
+    'ttl' is the caching time of the writer, so readers check freshness themselves.
+
+    Args:
+        key: The unique identifier for the storage entry.
+        field: Name of the nested dictionary to select items from.
+        items: Item names to keep in the field. All items are kept if None.
+
+    Returns:
+        Dict[str, Any]: The data payload. Missing items are silently skipped.
+
+    Raises:
+        HTTPException: If the specified key is not found in the storage (404).
+    """
+    data = self.get(key)
+    if items is None and self._ttl_grace is None:
+      return data
+
+    field_data = data.get(field)
+    if not isinstance(field_data, dict):
+      return data
+
+    names = field_data.keys() if items is None else [item for item in items if item in field_data]
+
+    if self._ttl_grace is None:
+      return {**data, field: {item: field_data[item] for item in names}}
+
+    before = self._get_expiry_ts(time.time())
+    return {**data, field: {item: field_data[item] for item in names if not self._is_expired(field_data[item], before)}}
+
+  def get_history(
+    self,
+    key: str,
+    items: Optional[List[str]] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    step: Optional[float] = None,
+    signed: bool = False,
+  ) -> Dict[str, Any]:
+    """
+    Returns recent values of the key registers, see DeyeStorageHistory.query()
+    """
+    if self._history is None:
+      raise HTTPException(status_code = 404, detail = "History is disabled")
+
+    if step is not None and step <= 0:
+      raise HTTPException(status_code = 422, detail = "Step should be positive")
+
+    return {
+      "key": key,
+      "registers": self._history.query(key, items, since, until, step, signed),
+    }
+
+  def get_many(
+    self,
+    keys: Dict[str, Optional[List[str]]],
+    field: str,
+  ) -> Dict[str, Any]:
+    """
+    Retrieves data payloads for multiple keys at once.
+
+    Args:
+        keys: Storage keys mapped to item names to keep inside the field (None to keep all).
+        field: Name of the nested dictionary to select items from.
+
+    Returns:
+        Dict[str, Any]: Data payloads by key. Keys which are not found are omitted.
+
+    Raises:
+        HTTPException: If too many keys are requested (400).
+    """
+    if len(keys) > self._config.MAX_KEYS_COUNT:
+      raise HTTPException(status_code = 400, detail = "Maximum number of keys exceeded")
+
+    return {
+      key: self.get_items(key, field, items)
+      for key, items in keys.items()
+      if self._backend.contains(key)
+    }
+
+  async def wait_for_changes(
+    self,
+    keys: List[str],
+    field: str,
+    since: Optional[str],
+    timeout: float,
+  ) -> Dict[str, Any]:
+    """
+    Long-poll subscription: waits until any of the keys is changed after the cursor.
+
+    Args:
+        keys: Storage keys to watch. Keys which don't exist yet can be watched too.
+        field: Name of the nested dictionary with items (e.g. registers) which are
+            returned only if they were changed after the cursor.
+        since: Cursor returned by the previous call. All data is returned
+            immediately if it's empty or issued by another run of the server.
+        timeout: Maximum number of seconds to wait.
+
+    Returns:
+        Dict[str, Any]: {"cursor": ..., "changes": {key: data or None if removed}}.
+            Changes are empty on timeout. The returned cursor should be passed to the next call.
+
+    Raises:
+        HTTPException: If too many keys are requested (400).
+    """
+    if len(keys) > self._config.MAX_KEYS_COUNT:
+      raise HTTPException(status_code = 400, detail = "Maximum number of keys exceeded")
+
+    since_version = self._changes.parse_cursor(since)
+    deadline = time.monotonic() + max(0.0, timeout)
+
+    while True:
+      changes = self._get_changes(keys, field, since_version)
+      remaining = deadline - time.monotonic()
+
+      if changes or remaining <= 0:
+        return {"cursor": self._changes.cursor, "changes": changes}
+
+      if self._backend.shared:
+        remaining = min(remaining, self.shared_poll_interval)
+
+      await self._changes.wait(keys, remaining)
+
+  def _get_changes(self, keys: List[str], field: str, since_version: int) -> Dict[str, Any]:
+    changes: Dict[str, Any] = {}
+    before = self._get_expiry_ts(time.time())
+
+    for key in keys:
+      entry = self._backend.get(key)
+
+      if entry is None:
+        removed_version = self._backend.get_removed_version(key)
+        if removed_version is not None and removed_version > since_version:
+          changes[key] = None
+        continue
+
+      if (self._backend.get_version(key) or 0) <= since_version:
+        continue
+
+      data = entry.get("data", {})
+      field_data = data.get(field)
+      if not isinstance(field_data, dict):
+        changes[key] = data
+        continue
+
+      changes[key] = {
+        **data,
+        field: {
+          item: value
+          for item, value in field_data.items()
+          if self._backend.get_item_version(key, field, item) > since_version
+          and (self._ttl_grace is None or not self._is_expired(value, before))
+        },
+      }
+
+    return changes
+
   async def clear(self) -> Dict[str, Any]:
     """
     Remove all stored data for all keys
     """
-    async with self._locks_lock:
-      self._storage.clear()
+    async with self._get_locks_lock():
+      self._clear()
+      self._write_journal({"op": "clear"})
     return {"status": "success"}
 
   async def remove(self, key: str) -> Dict[str, Any]:
     """
     Remove the store data for the specific key
     """
-    async with self._locks_lock:
-      if key not in self._storage:
+    async with self._get_locks_lock():
+      if not self._backend.contains(key):
         raise HTTPException(status_code = 404, detail = "Key not found")
 
-      # Getting key lock inside locks_lock
-      lock = self._locks[key]
+      # Getting key lock inside locks_lock. The key could be created by another process
+      lock = self._locks.setdefault(key, asyncio.Lock())
 
     async with lock:
-      del self._storage[key]
+      self._remove_key(key)
+      self._write_journal({"op": "remove", "key": key})
       return {"status": "success"}
 
   async def update(
@@ -82,6 +341,27 @@ class DeyeStorageManager:
     Updates the storage data for the specified key using a recursive deep merge.
     Works with any nested JSON structure
     """
+    body = await self._read_body(request)
+    return await self._update(key, json_data, body, request)
+
+  async def update_raw(self, key: str, request: Request) -> Dict[str, Any]:
+    """
+    The same as update(), but the request body is parsed here: it is read once
+    and decoded only after the size check, without model validation
+    """
+    body = await self._read_body(request)
+
+    try:
+      json_data = DeyeStorageJson.loads(body)
+    except ValueError:
+      raise HTTPException(status_code = 422, detail = "Invalid JSON body")
+
+    if not isinstance(json_data, dict):
+      raise HTTPException(status_code = 422, detail = "JSON body should be an object")
+
+    return await self._update(key, json_data, body, request)
+
+  async def _read_body(self, request: Request) -> bytes:
     # Check for maximum JSON size limit by checking Content-Length header
     content_length = request.headers.get("Content-Length")
     if content_length:
@@ -96,10 +376,21 @@ class DeyeStorageManager:
     if len(body) > self._config.MAX_JSON_SIZE:
       raise HTTPException(status_code = 413, detail = "JSON body size exceeded")
 
-    async with self._locks_lock:
-      is_new_key = key not in self._storage
-      if is_new_key and len(self._storage) >= self._config.MAX_KEYS_COUNT:
-        raise HTTPException(status_code = 403, detail = "Maximum number of keys exceeded")
+    return body
+
+  async def _update(
+    self,
+    key: str,
+    json_data: Dict[str, Any],
+    body: bytes,
+    request: Request,
+  ) -> Dict[str, Any]:
+    async with self._get_locks_lock():
+      is_new_key = not self._backend.contains(key)
+      keys_count = self._backend.count()
+      if is_new_key and keys_count >= self._config.MAX_KEYS_COUNT:
+        if self._memory_budget is None or not self._evict_keys(keys_count - self._config.MAX_KEYS_COUNT + 1):
+          raise HTTPException(status_code = 403, detail = "Maximum number of keys exceeded")
 
       # Can't use get_lock() here, because we need to
       # check keys and get new lock inssde locks_lock
@@ -108,61 +399,366 @@ class DeyeStorageManager:
 
       lock = self._locks[key]
 
+    # Backend transaction makes the read-modify-write atomic for other processes
     async with lock:
-      header = self._get_header(request)
-      current_entry = self._storage.get(key)
+      with self._backend.transaction():
+        header = self._get_header(request)
+        current_entry = self._backend.get(key)
 
-      if not current_entry:
-        current_entry = {**header, "data": {}}
+        if not current_entry:
+          current_entry = {**header, "data": {}}
+          current_size = self._get_json_size(current_entry)
+        else:
+          current_size = self._backend.get_size(key)
 
-      current_data_json_str = json.dumps(current_entry).encode("utf-8")
-      if len(current_data_json_str) > self._config.MAX_JSON_STORAGE_SIZE:
-        raise HTTPException(status_code = 413, detail = f"JSON storage size exceeded")
+        if current_size > self._config.MAX_JSON_STORAGE_SIZE and self._ttl_grace is not None:
+          # Expired objects are removed first to give place to the new data
+          self._expire_key(key, time.time())
+          current_size = self._backend.get_size(key)
 
-      # Perform the recursive merge inside the 'data' field
-      self._deep_merge(current_entry["data"], json_data)
+        if current_size > self._config.MAX_JSON_STORAGE_SIZE:
+          raise HTTPException(status_code = 413, detail = f"JSON storage size exceeded")
 
-      # Update top-level metadata headers
-      current_entry.update(header)
+        if self._merge_entry(key, current_entry, current_size, header, json_data):
+          # Raw body is logged as is to not serialize the data again
+          self._write_journal({"op": "merge", "key": key, "header": header}, body)
 
-      self._storage[key] = current_entry
+        if self._memory_budget:
+          self._evict_over_budget(keep = key)
 
     return {"status": "success"}
 
-  def get_stat(self) -> Dict[str, Any]:
+  def apply_record(self, record: Dict[str, Any], payload: Optional[bytes] = None) -> None:
+    """
+    Applies the change got from the journal. Limits are not checked, because
+    they were checked when the change was made. The change is not journaled again
+    """
+    op = record.get("op")
+    # Clear has no key
+    key: str = record.get("key") or ""
+
+    if op == "clear":
+      self._clear()
+    elif op == "remove":
+      self._remove_key(key)
+    elif op == "expire":
+      if self._backend.contains(key):
+        self._expire_objects_of(key, record["before"])
+    elif op == "set":
+      self._backend.put(key, record["entry"], self._get_json_size(record["entry"]))
+      self._changes.notify(key)
+    elif op == "merge":
+      json_data = json.loads(payload) if payload else {}
+      if not isinstance(json_data, dict):
+        raise ValueError(f"Invalid merge payload for key '{key}'")
+
+      current_entry = self._backend.get(key)
+      if not current_entry:
+        current_entry = {**record["header"], "data": {}}
+        current_size = self._get_json_size(current_entry)
+      else:
+        current_size = self._backend.get_size(key)
+
+      self._merge_entry(key, current_entry, current_size, record["header"], json_data, log_stale = False)
+    else:
+      raise ValueError(f"Unknown journal operation '{op}'")
+
+  def _get_locks_lock(self) -> asyncio.Lock:
+    if self._locks_lock is None:
+      self._locks_lock = asyncio.Lock()
+    return self._locks_lock
+
+  def discard_stale(self, max_age: float) -> int:
+    """
+    Removes entries which were not updated for max_age seconds and nested objects
+    with 'ts_label' older than max_age. Used after restore of temporary data.
+
+    Returns:
+        int: number of removed entries and objects
+    """
+    now = time.time()
+    min_ts = now - max_age
+    removed = 0
+
+    for key, entry in list(self._backend.items()):
+      if not isinstance(entry, dict) or entry.get("last_update_ts", now) < min_ts:
+        self._remove_key(key)
+        removed += 1
+        continue
+
+      data = entry.get("data")
+      if isinstance(data, dict):
+        count, size_change = self._remove_objects(data, lambda value: self._get_ts(value["ts_label"]) < min_ts)
+        if count:
+          removed += count
+          self._backend.put(key, entry, self._backend.get_size(key) + size_change, {})
+          self._changes.notify(key)
+
+    return removed
+
+  def expire(self) -> int:
+    """
+    Removes expired objects from all keys. Does nothing if TTL is disabled
+
+    Returns:
+        int: number of removed objects
+    """
+    if self._ttl_grace is None:
+      return 0
+
+    now = time.time()
+    return sum(self._expire_key(key, now) for key in self._backend.keys())
+
+  async def run_expiry(self, interval: float) -> None:
+    """
+    Calls expire() periodically. Should be run as a task
+    """
+    while True:
+      await asyncio.sleep(interval)
+
+      try:
+        start_time = time.perf_counter()
+        removed = self.expire()
+        if removed:
+          duration_ms = round((time.perf_counter() - start_time) * 1000)
+          self._logger.info(f"Expired {removed} objects in {duration_ms} ms")
+      except Exception as e:
+        self._logger.error(f"Expiry failed: {e}")
+
+  def _expire_key(self, key: str, now: float) -> int:
+    before = self._get_expiry_ts(now)
+
+    with self._backend.transaction():
+      removed = self._expire_objects_of(key, before)
+
+      if removed:
+        self._expired_count += removed
+        # Expiry time is logged, so replay removes the same objects
+        self._write_journal({"op": "expire", "key": key, "before": before})
+
+    return removed
+
+  def _expire_objects_of(self, key: str, before: float) -> int:
+    entry = self._backend.get(key)
+    data = entry.get("data") if entry is not None else None
+    if not isinstance(data, dict):
+      return 0
+
+    removed, size_change = self._remove_objects(data, lambda value: self._is_expired(value, before))
+    if removed and entry is not None:
+      # Readers already skip expired objects, so the version and ETag are kept
+      self._backend.store(key, entry, self._backend.get_size(key) + size_change)
+
+    return removed
+
+  def _remove_objects(self, source: Dict[str, Any], predicate: Callable[[Dict[str, Any]], bool]) -> Tuple[int, int]:
+    """
+    Recursively removes objects with numeric 'ts_label' matching the predicate.
+    Returns the number of removed objects and the change of the 'source' JSON size in bytes.
+    """
+    removed = 0
+    size_change = 0
+
+    for key in list(source.keys()):
+      value = source[key]
+      if not isinstance(value, dict):
+        continue
+
+      if isinstance(value.get("ts_label"), (int, float)):
+        if predicate(value):
+          size_change += self._remove_item(source, key)
+          removed += 1
+      else:
+        count, change = self._remove_objects(value, predicate)
+        removed += count
+        size_change += change
+
+    return removed, size_change
+
+  def _is_expired(self, value: Any, before: float) -> bool:
+    # Objects without TTL never expire
+    if not isinstance(value, dict):
+      return False
+
+    ts_label = value.get("ts_label")
+    ttl = value.get("ttl")
+    if not isinstance(ts_label, (int, float)) or not isinstance(ttl, (int, float)):
+      return False
+
+    return self._get_ts(ts_label) + ttl < before
+
+  def _get_expiry_ts(self, now: float) -> float:
+    # Objects which expired before the returned time are treated as expired
+    return now - (self._ttl_grace or 0)
+
+  @staticmethod
+  def _get_ts(ts_label: Union[int, float]) -> float:
+    # Labels above 10^11 can only be in milliseconds (10^11 seconds is year 5138)
+    return ts_label / 1000 if ts_label > 1e11 else ts_label
+
+  def _touch(self, key: str) -> None:
+    if self._memory_budget is not None:
+      self._backend.touch(key)
+
+  def _evict_keys(self, count: int, keep: Optional[str] = None) -> bool:
+    """
+    Evicts count least recently used keys except keep. Returns False if there are not enough keys
+    """
+    candidates = [key for key in self._backend.get_lru_keys() if key != keep][:count]
+    if len(candidates) < count:
+      return False
+
+    for key in candidates:
+      self._logger.info(f"Key '{key}' ({self._backend.get_size(key)} bytes) evicted")
+      self._remove_key(key)
+      self._evicted_count += 1
+      self._write_journal({"op": "remove", "key": key})
+
+    return True
+
+  def _evict_over_budget(self, keep: str) -> None:
+    while self._backend.total_bytes > (self._memory_budget or 0) and self._evict_keys(1, keep = keep):
+      pass
+
+  def _clear(self) -> None:
+    for key in self._backend.clear():
+      self._changes.notify(key)
+
+    if self._history is not None:
+      self._history.clear()
+
+  def _remove_key(self, key: str) -> None:
+    if self._backend.delete(key):
+      self._changes.notify(key)
+
+    if self._history is not None:
+      self._history.remove(key)
+
+  def _merge_entry(
+    self,
+    key: str,
+    current_entry: Dict[str, Any],
+    current_size: int,
+    header: Dict[str, Any],
+    json_data: Dict[str, Any],
+    log_stale: bool = True,
+  ) -> bool:
     """
-    Get storage statistics
+    Merges json_data into the entry. Returns False if nothing was changed,
+    e.g. all objects are stale. The entry isn't saved then, so its version is kept
     """
-    total_bytes = 0
+    is_new = not self._backend.contains(key)
+    # Changed items of the new key are needed only for the history
+    changed_items: Dict[str, List[str]] = {}
+    if not is_new or self._history is not None:
+      changed_items = self._get_changed_items(current_entry["data"], json_data)
+
+    if not is_new and not self._has_changes(current_entry["data"], json_data, changed_items):
+      # Only to log stale objects, nothing is changed by the merge
+      self._deep_merge(current_entry["data"], json_data, log_stale)
+      return False
+
+    # Perform the recursive merge inside the 'data' field
+    current_size += self._deep_merge(current_entry["data"], json_data, log_stale)
+
+    # Update top-level metadata headers
+    for name, value in header.items():
+      current_size += self._set_item(current_entry, name, value)
+
+    self._backend.put(key, current_entry, current_size, None if is_new else changed_items)
+    self._changes.notify(key)
 
-    for data in self._storage.values():
-      # Calculate raw JSON size in bytes
-      entry_json = json.dumps(data).encode("utf-8")
-      total_bytes += len(entry_json)
+    if self._history is not None:
+      self._history.record(key, json_data, changed_items)
+
+    return True
+
+  def _has_changes(self, data: Dict[str, Any], update: Dict[str, Any], changed_items: Dict[str, List[str]]) -> bool:
+    """
+    Checks if merging the update changes the data. changed_items are got from _get_changed_items()
+    """
+    for field, value in update.items():
+      current = data.get(field)
+      if isinstance(value, dict) and isinstance(current, dict):
+        if changed_items.get(field):
+          return True
+      elif field not in data or current != value:
+        return True
+
+    return False
+
+  def _get_changed_items(self, data: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, List[str]]:
+    """
+    Returns items of the nested dictionaries which are changed by merging the update into data
+    """
+    changed: Dict[str, List[str]] = {}
+
+    for field, values in update.items():
+      if not isinstance(values, dict):
+        continue
+
+      current = data.get(field)
+      if not isinstance(current, dict):
+        current = {}
+
+      changed[field] = [item for item, value in values.items() if not self._is_stale(value, current.get(item))]
+
+    return changed
+
+  def _write_journal(self, record: Dict[str, Any], payload: Optional[bytes] = None) -> None:
+    if self._journal is not None:
+      self._journal(record, payload)
+
+  def close(self) -> None:
+    self._backend.close()
+
+  def get_stat(self) -> Dict[str, Any]:
+    """
+    Get storage statistics. Sizes are raw JSON sizes of the entries in bytes,
+    which are maintained on every change, so the storage is not serialized here
+    """
+    total_bytes = self._backend.total_bytes
+    keys_count = self._backend.count()
 
     # Max possible size if every key reached its limit
     max_possible_bytes = self._config.MAX_KEYS_COUNT * self._config.MAX_JSON_STORAGE_SIZE
+    if self._memory_budget:
+      max_possible_bytes = min(max_possible_bytes, self._memory_budget)
 
     return {
-      "keys_used": len(self._storage),
+      "keys_used": keys_count,
       "keys_limit": self._config.MAX_KEYS_COUNT,
       "bytes_used": total_bytes,
       "bytes_limit": max_possible_bytes,
+      "key_bytes_used": self._backend.get_sizes(),
+      "key_bytes_limit": self._config.MAX_JSON_STORAGE_SIZE,
+      "expired_objects": self._expired_count,
+      "evicted_keys": self._evicted_count,
+      **({
+        "history_series": self._history.series_count,
+        "history_bytes": self._history.bytes_used,
+      } if self._history is not None else {}),
       "usage_percent": {
-        "keys": round((len(self._storage) / self._config.MAX_KEYS_COUNT) * 100),
+        "keys": round((keys_count / self._config.MAX_KEYS_COUNT) * 100),
         "memory": round((total_bytes / max_possible_bytes) * 100),
       },
     }
 
-  def save_to_file(self, filename: str) -> None:
+  def save_to_file(self, filename: str) -> bool:
     # Storage save logic
     self._logger.info(f"Saving storage to {filename}...")
     try:
-      with open(filename, "w", encoding = "utf-8") as f:
-        json.dump(self._storage, f, ensure_ascii = False, indent = 2)
-      self._logger.info(f"Successfully saved {len(self._storage)} keys to {filename}")
+      # Write to a temporary file first, so the previous file is kept if saving fails
+      temp_filename = f"{filename}.tmp"
+      storage = dict(self._backend.items())
+      with open(temp_filename, "w", encoding = "utf-8") as f:
+        json.dump(storage, f, ensure_ascii = False, indent = 2)
+      os.replace(temp_filename, filename)
+      self._logger.info(f"Successfully saved {len(storage)} keys to {filename}")
+      return True
     except Exception as e:
       self._logger.error(f"Failed to save storage to {filename}: {e}")
+      return False
 
   def load_from_file(self, filename: str) -> None:
     # Storage restoring logic
@@ -175,21 +771,28 @@ class DeyeStorageManager:
           if not isinstance(loaded_data, dict):
             raise ValueError("Invalid storage format")
 
-          self._storage.update(loaded_data)
-          self._locks = {key: asyncio.Lock() for key in self._storage}
+          with self._backend.transaction():
+            for key, entry in loaded_data.items():
+              self._backend.put(key, entry, self._get_json_size(entry))
+
           self._logger.info(f"Restored {len(loaded_data)} keys from {filename}")
       except Exception as e:
         self._logger.error(f"Failed to load storage from {filename}: {e}")
     else:
       self._logger.warning(f"File {filename} doesn't exist.")
 
-  def get_average(self, key: str) -> Dict[str, Any]:
+  def get_average(self, key: str, window: Optional[str] = None) -> Dict[str, Any]:
     """
     Retrieves the current average and totals for the specified key.
-    Returns the data directly from storage payload.
+    Returns the data directly from storage payload, with the decayed
+    averages of all windows (or only of the specified one).
     """
+    if window is not None and window not in self.average_windows:
+      raise HTTPException(status_code = 422, detail = f"Window should be one of: {', '.join(self.average_windows)}")
+
     # Use existing get method to extract inner 'data' payload and handle 404
     inner_data = self.get(key)
+    windows = self._get_average_windows(inner_data, time.time())
 
     return {
       "status": "success",
@@ -198,6 +801,11 @@ class DeyeStorageManager:
       "count2": self._clean_num(inner_data.get("count2", 0.0)),
       "total": self._clean_num(inner_data.get("total", 0.0)),
       "average": self._clean_num(inner_data.get("average", 0.0)),
+      "windows": {
+        name: self._get_window_values(counts)
+        for name, counts in windows.items()
+        if window is None or name == window
+      },
     }
 
   async def update_average(
@@ -210,83 +818,208 @@ class DeyeStorageManager:
     """
     Updates two totals and returns the calculated average in the response.
     Formula: average = count1 / (count1 + count2)
+
+    The same average is calculated over the recent values for every window
+    in average_windows, see _get_average_windows().
     """
-    async with self._locks_lock:
+    async with self._get_locks_lock():
       # Key initialization and storage limit check
       if key not in self._locks:
-        if len(self._storage) >= self._config.MAX_KEYS_COUNT:
+        if not self._backend.contains(key) and self._backend.count() >= self._config.MAX_KEYS_COUNT:
           raise HTTPException(status_code = 403, detail = "Maximum number of keys exceeded")
         self._locks[key] = asyncio.Lock()
       lock = self._locks[key]
 
     async with lock:
-      # Get current entry from storage or set defaults
-      entry = self._storage.get(key, {})
-      inner_data = entry.get("data", {})
+      with self._backend.transaction():
+        # Get current entry from storage or set defaults
+        entry = self._backend.get(key) or {}
+        inner_data = entry.get("data", {})
 
-      new_count1 = inner_data.get("count1", 0.0) + count1
-      new_count2 = inner_data.get("count2", 0.0) + count2
+        new_count1 = inner_data.get("count1", 0.0) + count1
+        new_count2 = inner_data.get("count2", 0.0) + count2
 
-      total = new_count1 + new_count2
-      average = new_count1 / total if total != 0 else 0.0
+        total = new_count1 + new_count2
+        average = new_count1 / total if total != 0 else 0.0
 
-      raw_values = {
-        "count1": new_count1,
-        "count2": new_count2,
-        "total": total,
-        "average": average,
-      }
+        now = time.time()
+        windows = self._get_average_windows(inner_data, now)
+        for counts in windows.values():
+          counts["count1"] += count1
+          counts["count2"] += count2
+
+        raw_values = {
+          "count1": new_count1,
+          "count2": new_count2,
+          "total": total,
+          "average": average,
+          "windows": windows,
+          "windows_ts": now,
+        }
+
+        # Restructure to keep headers at root and payload inside 'data'
+        entry = {**self._get_header(request), "data": raw_values}
+        self._backend.put(key, entry, self._get_json_size(entry))
+        self._changes.notify(key)
+        self._write_journal({"op": "set", "key": key, "entry": entry})
+
+        clean_values = {k: self._clean_num(raw_values[k]) for k in ("count1", "count2", "total", "average")}
 
-      # Restructure to keep headers at root and payload inside 'data'
-      self._storage[key] = {**self._get_header(request), "data": raw_values}
+        # The response body will contain the new average immediately
+        return {
+          "status": "success",
+          "key": key,
+          **clean_values,
+          "windows": {name: self._get_window_values(counts) for name, counts in windows.items()},
+        }
 
-      clean_values = {k: self._clean_num(v) for k, v in raw_values.items()}
+  async def reset_average_totals(self, key: str, request: Request) -> Dict[str, Any]:
+    """
+    Resets the totals and the average of the key. The windows are kept,
+    because they forget the old values themselves
 
-      # The response body will contain the new average immediately
-      return {
-        "status": "success",
-        "key": key,
-        **clean_values,
+    Raises:
+        HTTPException: If the specified key is not found in the storage (404).
+    """
+    async with self._get_locks_lock():
+      if not self._backend.contains(key):
+        raise HTTPException(status_code = 404, detail = "Key not found")
+
+      lock = self._locks.setdefault(key, asyncio.Lock())
+
+    async with lock:
+      with self._backend.transaction():
+        entry = self._backend.get(key)
+        if entry is None:
+          raise HTTPException(status_code = 404, detail = "Key not found")
+
+        inner_data = {**entry.get("data", {}), "count1": 0.0, "count2": 0.0, "total": 0.0, "average": 0.0}
+        entry = {**self._get_header(request), "data": inner_data}
+        self._backend.put(key, entry, self._get_json_size(entry))
+        self._changes.notify(key)
+        self._write_journal({"op": "set", "key": key, "entry": entry})
+
+    return {"status": "success"}
+
+  def _get_average_windows(self, inner_data: Dict[str, Any], now: float) -> Dict[str, Dict[str, float]]:
+    """
+    Returns the counts of every window decayed to the specified time.
+
+    Counts decay exponentially with the window as the time constant, so an update
+    is O(1) and values older than the window have less than 1/e of their weight.
+    Both counts decay equally, so the average changes only with the new values.
+    """
+    windows = inner_data.get("windows", {})
+    elapsed = max(0.0, now - inner_data.get("windows_ts", now))
+
+    result: Dict[str, Dict[str, float]] = {}
+    for name, seconds in self.average_windows.items():
+      counts = windows.get(name, {})
+      factor = math.exp(-elapsed / seconds)
+      result[name] = {
+        "count1": counts.get("count1", 0.0) * factor,
+        "count2": counts.get("count2", 0.0) * factor,
       }
 
+    return result
+
+  def _get_window_values(self, counts: Dict[str, float]) -> Dict[str, Union[float, int]]:
+    total = counts["count1"] + counts["count2"]
+    return {
+      "count1": self._clean_num(counts["count1"]),
+      "count2": self._clean_num(counts["count2"]),
+      "total": self._clean_num(total),
+      "average": self._clean_num(counts["count1"] / total if total != 0 else 0.0),
+    }
+
   def _deep_merge(
     self,
     source: Dict[str, Any],
     update: Dict[str, Any],
-  ) -> None:
+    log_stale: bool = True,
+  ) -> int:
     """
       Recursively merge dictionary 'update' into 'source' with race condition protection.
 
       The merge is performed in-place. If a dictionary contains a 'time' key, 
       the update is only applied if the incoming timestamp is strictly newer.
+
+      Returns the change of the 'source' JSON size in bytes.
       """
+    size_change = 0
+
     for key, value in update.items():
       src_value = source.get(key)
 
-      # Check if we are dealing with an object that has a timestamp
+      # Standard recursive logic for nested structures
       if isinstance(value, dict) and isinstance(src_value, dict):
-        value_time = value.get("ts_label")
-        src_time = src_value.get("ts_label")
-
         # If the cached timestamp is newer or equal, skip updating this specific object.
         # This prevents older network packets from overwriting fresh data.
-        if isinstance(value_time, (int, float)) and isinstance(src_time, (int, float)) and src_time >= value_time:
+        if self._is_stale(value, src_value):
           # Log the skip event with details for debugging
-          self._logger.warning(
-            "Stale data ignored for key '%s': incoming time (%s) <= cached time (%s)",
-            key,
-            value_time,
-            src_time,
-          )
+          if log_stale:
+            self._logger.warning(
+              "Stale data ignored for key '%s': incoming time (%s) <= cached time (%s)",
+              key,
+              value.get("ts_label"),
+              src_value.get("ts_label"),
+            )
           continue
 
-      # Standard recursive logic for nested structures
-      if isinstance(value, dict) and isinstance(src_value, dict):
         # If both are dictionaries, proceed deeper into the tree
-        self._deep_merge(src_value, value)
+        size_change += self._deep_merge(src_value, value, log_stale)
       else:
         # Otherwise, just overwrite or add the value
-        source[key] = value
+        size_change += self._set_item(source, key, value)
+
+    return size_change
+
+  def _is_stale(self, value: Any, src_value: Any) -> bool:
+    """
+    Checks if both are objects with a timestamp and the incoming one is not newer
+    """
+    if not isinstance(value, dict) or not isinstance(src_value, dict):
+      return False
+
+    value_time = value.get("ts_label")
+    src_time = src_value.get("ts_label")
+    return isinstance(value_time, (int, float)) and isinstance(src_time, (int, float)) and src_time >= value_time
+
+  def _set_item(self, source: Dict[str, Any], key: str, value: Any) -> int:
+    """
+    Sets the value in the dictionary and returns the change of its JSON size in bytes.
+    Only the changed item is serialized.
+    """
+    if key in source:
+      size_change = self._get_json_size(value) - self._get_json_size(source[key])
+    else:
+      # '"key": value' plus ', ' separator if the dictionary isn't empty
+      size_change = self._get_json_size(key) + 2 + self._get_json_size(value) + (2 if source else 0)
+
+    source[key] = value
+    return size_change
+
+  def _remove_item(self, source: Dict[str, Any], key: str) -> int:
+    """
+    Removes the item from the dictionary and returns the change of its JSON size in bytes
+    """
+    value = source.pop(key)
+    return -(self._get_json_size(key) + 2 + self._get_json_size(value) + (2 if source else 0))
+
+  def _get_json_size(self, value: Any) -> int:
+    # Size of json.dumps() with default separators. Output is ASCII
+    # with default ensure_ascii, so its length is the size in bytes.
+    # Integers, strings and short lists (most of the keys and register values)
+    # are measured without the encoder, which is slower for small values
+    value_type = type(value)
+    if value_type is int:
+      return len(str(value))
+    if value_type is str:
+      return len(encode_basestring_ascii(value))
+    if value_type is list and len(value) <= 8:
+      # Items and ', ' separators in brackets
+      return sum(map(self._get_json_size, value)) + 2 * len(value) if value else 2
+    return len(json.dumps(value))
 
   def _get_header(self, request: Request) -> Dict[str, Any]:
     return {
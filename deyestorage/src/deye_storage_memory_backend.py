@@ -0,0 +1,125 @@
+import time
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from src.deye_storage_backend import DeyeStorageBackend
+
+class DeyeStorageMemoryBackend(DeyeStorageBackend):
+  """
+  Keeps entries in the process memory. Durability is provided by DeyeStoragePersistence
+  """
+  def __init__(self):
+    # Counter starts from zero on every run, so the epoch is unique for the run
+    self._epoch = f"{time.time_ns():x}"
+    self._counter = 0
+    self._entries: Dict[str, Dict[str, Any]] = {}
+    # Size of json.dumps() of every entry in bytes
+    self._sizes: Dict[str, int] = {}
+    self._total_bytes = 0
+    self._versions: Dict[str, int] = {}
+    # Version of the last full replacement (or creation) of the entry
+    self._replaced: Dict[str, int] = {}
+    # Versions of items changed after the replacement: key -> field -> item -> version
+    self._items: Dict[str, Dict[str, Dict[str, int]]] = {}
+    # Versions when keys were removed
+    self._removed: Dict[str, int] = {}
+    # Keys from the least to the most recently used
+    self._lru: 'OrderedDict[str, None]' = OrderedDict()
+
+  @property
+  def epoch(self) -> str:
+    return self._epoch
+
+  @property
+  def counter(self) -> int:
+    return self._counter
+
+  @property
+  def total_bytes(self) -> int:
+    return self._total_bytes
+
+  def get(self, key: str) -> Optional[Dict[str, Any]]:
+    return self._entries.get(key)
+
+  def contains(self, key: str) -> bool:
+    return key in self._entries
+
+  def count(self) -> int:
+    return len(self._entries)
+
+  def keys(self) -> List[str]:
+    return list(self._entries.keys())
+
+  def get_size(self, key: str) -> int:
+    return self._sizes.get(key, 0)
+
+  def get_sizes(self) -> Dict[str, int]:
+    return dict(self._sizes)
+
+  def get_version(self, key: str) -> Optional[int]:
+    return self._versions.get(key)
+
+  def get_item_version(self, key: str, field: str, item: str) -> int:
+    return self._items.get(key, {}).get(field, {}).get(item, self._replaced.get(key, 0))
+
+  def get_removed_version(self, key: str) -> Optional[int]:
+    return self._removed.get(key)
+
+  def put(
+    self,
+    key: str,
+    entry: Dict[str, Any],
+    size: int,
+    items: Optional[Dict[str, List[str]]] = None,
+  ) -> None:
+    self._counter += 1
+    version = self._counter
+
+    self._entries[key] = entry
+    self._total_bytes += size - self._sizes.get(key, 0)
+    self._sizes[key] = size
+    self._versions[key] = version
+    self._removed.pop(key, None)
+    self._lru[key] = None
+    self._lru.move_to_end(key)
+
+    if items is None:
+      self._replaced[key] = version
+      self._items.pop(key, None)
+      return
+
+    self._replaced.setdefault(key, version)
+    fields = self._items.setdefault(key, {})
+    for field, names in items.items():
+      field_versions = fields.setdefault(field, {})
+      for name in names:
+        field_versions[name] = version
+
+  def store(self, key: str, entry: Dict[str, Any], size: int) -> None:
+    if key not in self._entries:
+      return
+
+    self._entries[key] = entry
+    self._total_bytes += size - self._sizes.get(key, 0)
+    self._sizes[key] = size
+
+  def delete(self, key: str) -> bool:
+    if self._entries.pop(key, None) is None:
+      return False
+
+    self._counter += 1
+    self._total_bytes -= self._sizes.pop(key, 0)
+    self._versions.pop(key, None)
+    self._replaced.pop(key, None)
+    self._items.pop(key, None)
+    self._lru.pop(key, None)
+    self._removed[key] = self._counter
+    return True
+
+  def touch(self, key: str) -> None:
+    if key in self._lru:
+      self._lru.move_to_end(key)
+
+  def get_lru_keys(self) -> List[str]:
+    return list(self._lru.keys())
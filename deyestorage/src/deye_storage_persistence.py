@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import asyncio
+import logging
+
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+from src.deye_storage_config import DeyeStorageConfig
+from src.deye_storage_manager import DeyeStorageManager
+
+class DeyeStoragePersistence:
+  """
+  Keeps DeyeStorageManager data on disk as a snapshot and a write-ahead log (WAL).
+
+  Every change of the storage is appended to the current WAL segment before the
+  response is sent, so the data survives a crash or OOM kill of the process.
+  When the segment grows over MAX_WAL_SIZE or SNAPSHOT_INTERVAL passes, a new segment
+  is started and closed segments are merged into the snapshot in a background thread.
+  The thread replays the segments over the previous snapshot file, so the event loop
+  doesn't serialize the storage and the in-memory data is never accessed from other threads.
+
+  On startup the snapshot is loaded and the segments which weren't merged yet
+  are replayed. Replay is bounded by the WAL size, because segments are merged
+  regularly. Temporary data (cache, averages) older than restore_max_age is discarded.
+
+  WAL record is a JSON line with the change description and the payload size,
+  followed by the raw JSON payload and a new line. Torn record at the end
+  of a segment (crash during write) is ignored.
+  """
+  check_interval = 1.0
+
+  def __init__(
+    self,
+    manager: DeyeStorageManager,
+    config: DeyeStorageConfig,
+    logger: logging.Logger,
+    data_dir: str,
+    name: str,
+    restore_max_age: int = 0,
+  ):
+    self._manager = manager
+    self._config = config
+    self._logger = logger
+    self._data_dir = data_dir
+    self._name = name
+    self._restore_max_age = restore_max_age
+    self._snapshot_path = os.path.join(data_dir, f"{name}.json")
+    self._wal_prefix = f"{name}.wal."
+    self._wal: Optional[IO[bytes]] = None
+    self._wal_seq = 0
+    self._wal_size = 0
+    self._closed_segments: List[str] = []
+    self._compaction: Optional[asyncio.Future] = None
+    self._last_compaction_time = time.monotonic()
+
+  @property
+  def snapshot_path(self) -> str:
+    return self._snapshot_path
+
+  def restore(self) -> None:
+    """
+    Restores the storage from the snapshot and the WAL and starts logging changes
+    """
+    os.makedirs(self._data_dir, exist_ok = True)
+
+    self._manager.load_from_file(self._snapshot_path)
+
+    segments = self._get_segments()
+    for _, path in segments:
+      count = self._replay_segment(self._manager, path)
+      self._logger.info(f"{self._name}: replayed {count} WAL records from {path}")
+
+    self._discard_stale(self._manager)
+
+    # Replayed segments are merged into the snapshot on the next check
+    self._closed_segments = [path for _, path in segments]
+    self._wal_seq = segments[-1][0] + 1 if segments else 1
+    self._open_wal()
+
+    self._manager.set_journal(self._append)
+
+  async def run(self) -> None:
+    """
+    Merges the WAL into the snapshot periodically. Should be run as a task
+    """
+    while True:
+      await asyncio.sleep(self.check_interval)
+
+      try:
+        if self._should_compact():
+          await self.compact()
+      except Exception as e:
+        self._logger.error(f"{self._name}: snapshot failed: {e}")
+
+  async def compact(self) -> None:
+    """
+    Starts a new WAL segment and merges closed segments into the snapshot in a background thread
+    """
+    if self._compaction is not None:
+      return
+
+    self._rotate_wal()
+    segments = list(self._closed_segments)
+    if not segments:
+      return
+
+    loop = asyncio.get_running_loop()
+    self._compaction = loop.run_in_executor(None, self._compact_segments, segments)
+
+    try:
+      if await self._compaction:
+        self._closed_segments = [path for path in self._closed_segments if path not in segments]
+    finally:
+      self._compaction = None
+      self._last_compaction_time = time.monotonic()
+
+  async def close(self) -> None:
+    """
+    Saves the snapshot of the current data and removes the WAL
+    """
+    if self._compaction is not None:
+      try:
+        await self._compaction
+      except Exception:
+        pass
+
+    self._manager.set_journal(None)
+    self._close_wal()
+
+    if self._manager.save_to_file(self._snapshot_path):
+      for _, path in self._get_segments():
+        self._remove_file(path)
+
+  def _should_compact(self) -> bool:
+    if self._compaction is not None:
+      return False
+
+    if self._closed_segments or self._wal_size >= self._config.MAX_WAL_SIZE:
+      return True
+
+    return self._wal_size > 0 and time.monotonic() - self._last_compaction_time >= self._config.SNAPSHOT_INTERVAL
+
+  def _append(self, record: Dict[str, Any], payload: Optional[bytes]) -> None:
+    if self._wal is None:
+      return
+
+    payload = payload or b""
+    meta = json.dumps({**record, "size": len(payload)}, ensure_ascii = False).encode("utf-8")
+    line = meta + b"\n" + payload + b"\n"
+
+    try:
+      self._wal.write(line)
+      # Flush to the OS, so the record survives the process crash
+      self._wal.flush()
+      self._wal_size += len(line)
+    except Exception as e:
+      self._logger.error(f"{self._name}: failed to write WAL record: {e}")
+
+  def _compact_segments(self, segments: List[str]) -> bool:
+    """
+    Runs in a background thread: replays segments over the snapshot file
+    into a separate manager and saves the result as a new snapshot
+    """
+    start_time = time.perf_counter()
+    manager = DeyeStorageManager(config = self._config, logger = self._logger)
+
+    if os.path.exists(self._snapshot_path):
+      manager.load_from_file(self._snapshot_path)
+
+    count = 0
+    for path in segments:
+      count += self._replay_segment(manager, path)
+
+    self._discard_stale(manager)
+
+    if not manager.save_to_file(self._snapshot_path):
+      return False
+
+    for path in segments:
+      self._remove_file(path)
+
+    duration_ms = round((time.perf_counter() - start_time) * 1000)
+    self._logger.info(f"{self._name}: merged {count} WAL records into snapshot in {duration_ms} ms")
+    return True
+
+  def _replay_segment(self, manager: DeyeStorageManager, path: str) -> int:
+    count = 0
+
+    with open(path, "rb") as f:
+      while True:
+        meta_line = f.readline()
+        if not meta_line:
+          break
+
+        try:
+          if not meta_line.endswith(b"\n"):
+            raise ValueError("record is not complete")
+
+          record = json.loads(meta_line)
+          size = int(record.pop("size", 0))
+          payload = f.read(size + 1)
+
+          if len(payload) != size + 1:
+            raise ValueError("payload is not complete")
+
+          manager.apply_record(record, payload[:size])
+          count += 1
+        except Exception as e:
+          # Crash during write can leave only the last record broken
+          self._logger.warning(f"{self._name}: WAL replay of {path} stopped at record {count + 1}: {e}")
+          break
+
+    return count
+
+  def _discard_stale(self, manager: DeyeStorageManager) -> None:
+    if self._restore_max_age > 0:
+      removed = manager.discard_stale(self._restore_max_age)
+      if removed:
+        self._logger.info(f"{self._name}: discarded {removed} stale entries")
+
+    removed = manager.expire()
+    if removed:
+      self._logger.info(f"{self._name}: discarded {removed} expired entries")
+
+  def _get_segments(self) -> List[Tuple[int, str]]:
+    segments: List[Tuple[int, str]] = []
+
+    for file_name in os.listdir(self._data_dir):
+      if file_name.startswith(self._wal_prefix) and file_name[len(self._wal_prefix):].isdigit():
+        segments.append((int(file_name[len(self._wal_prefix):]), os.path.join(self._data_dir, file_name)))
+
+    return sorted(segments)
+
+  def _get_segment_path(self, seq: int) -> str:
+    return os.path.join(self._data_dir, f"{self._wal_prefix}{seq:08d}")
+
+  def _open_wal(self) -> None:
+    self._wal = open(self._get_segment_path(self._wal_seq), "ab")
+    self._wal_size = self._wal.tell()
+
+  def _close_wal(self) -> None:
+    if self._wal is not None:
+      self._wal.close()
+      self._wal = None
+
+  def _rotate_wal(self) -> None:
+    if self._wal_size == 0:
+      return
+
+    self._close_wal()
+    self._closed_segments.append(self._get_segment_path(self._wal_seq))
+    self._wal_seq += 1
+    self._open_wal()
+
+  def _remove_file(self, path: str) -> None:
+    try:
+      os.remove(path)
+    except FileNotFoundError:
+      pass
+    except Exception as e:
+      self._logger.error(f"{self._name}: failed to remove {path}: {e}")
@@ -0,0 +1,107 @@
+import gzip
+import time
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+@dataclass
+class DeyeStorageCachedBody:
+  etag: str
+  body: bytes
+  gzip_body: Optional[bytes]
+  # Time when the body becomes outdated even if the entry wasn't changed (TTL expiry)
+  valid_until: float
+
+class DeyeStorageResponseCache:
+  """
+  Conditional GET support and serialized response bodies by entry version.
+
+  Responses have the ETag of the entry version. If the client sends the same
+  version in If-None-Match, 304 is returned without serializing anything.
+  Otherwise the body is serialized and compressed once per version and query
+  and reused until the entry is changed. Least recently used bodies are dropped
+  when their total size exceeds max_bytes.
+  """
+  def __init__(
+    self,
+    max_bytes: int = 8 * 1024 * 1024,
+    minimum_size: int = 1024,
+  ):
+    self._max_bytes = max_bytes
+    # Bodies shorter than this are not compressed, the same as in GZipMiddleware
+    self._minimum_size = minimum_size
+    self._bodies: OrderedDict[Tuple[str, str], DeyeStorageCachedBody] = OrderedDict()
+    self._total_bytes = 0
+
+  def respond(
+    self,
+    request: Request,
+    key: str,
+    etag: str,
+    variant: str,
+    render: Callable[[], Tuple[Any, float]],
+  ) -> Response:
+    """
+    Returns 304 if the client has the current version, or the cached body
+
+    Args:
+      key: storage key.
+      etag: current ETag of the entry.
+      variant: query parameters which change the body for the same entry version.
+      render: returns the content and the time until it is valid (inf if not limited).
+    """
+    headers = {"ETag": etag}
+
+    if self._is_not_modified(request, etag):
+      return Response(status_code = 304, headers = headers)
+
+    cache_key = (key, variant)
+    cached = self._bodies.get(cache_key)
+
+    if cached is None or cached.etag != etag or cached.valid_until < time.time():
+      content, valid_until = render()
+      body = bytes(JSONResponse(content).body)
+      gzip_body = gzip.compress(body, compresslevel = 9) if len(body) >= self._minimum_size else None
+      cached = DeyeStorageCachedBody(etag = etag, body = body, gzip_body = gzip_body, valid_until = valid_until)
+      self._put(cache_key, cached)
+    else:
+      self._bodies.move_to_end(cache_key)
+
+    if cached.gzip_body is not None:
+      headers["Vary"] = "Accept-Encoding"
+      if "gzip" in request.headers.get("Accept-Encoding", ""):
+        # GZipMiddleware doesn't compress responses with Content-Encoding
+        headers["Content-Encoding"] = "gzip"
+        return Response(content = cached.gzip_body, media_type = "application/json", headers = headers)
+
+    return Response(content = cached.body, media_type = "application/json", headers = headers)
+
+  def _put(self, cache_key: Tuple[str, str], cached: DeyeStorageCachedBody) -> None:
+    self._remove(cache_key)
+
+    self._bodies[cache_key] = cached
+    self._total_bytes += self._get_size(cached)
+
+    while self._total_bytes > self._max_bytes and len(self._bodies) > 1:
+      self._remove(next(iter(self._bodies)))
+
+  def _remove(self, cache_key: Tuple[str, str]) -> None:
+    cached = self._bodies.pop(cache_key, None)
+    if cached is not None:
+      self._total_bytes -= self._get_size(cached)
+
+  def _get_size(self, cached: DeyeStorageCachedBody) -> int:
+    return len(cached.body) + len(cached.gzip_body or b"")
+
+  def _is_not_modified(self, request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+      return False
+
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as required for If-None-Match
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
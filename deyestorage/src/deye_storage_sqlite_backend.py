@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import sqlite3
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.deye_storage_backend import DeyeStorageBackend
+
+@dataclass
+class DeyeStorageSqliteRow:
+  entry: Dict[str, Any]
+  size: int
+  version: int
+  replaced_version: int
+  item_versions: Dict[str, Dict[str, int]] = field(default_factory = dict)
+
+class DeyeStorageSqliteBackend(DeyeStorageBackend):
+  """
+  Keeps entries in an SQLite database in WAL mode, so several server processes
+  (uvicorn workers) can share the data. Readers don't block each other and the writer.
+
+  Changes are made in IMMEDIATE transactions, which exclude other writers, so the
+  read-modify-write of a deep merge is atomic across processes. Parsed entries are
+  cached by the process and dropped when PRAGMA data_version tells that another
+  process has committed changes.
+
+  Least recently used order is the order of the last writes, because reads
+  of other processes are not visible.
+  """
+  shared = True
+
+  def __init__(self, path: str, busy_timeout: float = 5.0):
+    directory = os.path.dirname(path)
+    if directory:
+      os.makedirs(directory, exist_ok = True)
+
+    # Transactions are controlled explicitly
+    self._db = sqlite3.connect(path, timeout = busy_timeout, isolation_level = None)
+    self._db.execute("PRAGMA journal_mode = WAL")
+    # Commits survive process crashes, only OS crash can lose the last ones
+    self._db.execute("PRAGMA synchronous = NORMAL")
+
+    self._depth = 0
+    self._counter = 0
+    self._rows: Dict[str, Optional[DeyeStorageSqliteRow]] = {}
+    self._data_version: Optional[int] = None
+
+    # Plain transaction, because transaction() reads the counter from the tables
+    self._db.execute("BEGIN IMMEDIATE")
+    with self._db:
+      self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+      self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, entry TEXT NOT NULL, "
+                       "size INTEGER NOT NULL, version INTEGER NOT NULL, replaced_version INTEGER NOT NULL, "
+                       "item_versions TEXT NOT NULL)")
+      self._db.execute("CREATE TABLE IF NOT EXISTS removed (key TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+      # Epoch is created with the database, so versions survive restarts
+      self._db.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('epoch', ?)", (f"{time.time_ns():x}", ))
+      self._db.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('counter', '0')")
+
+    self._epoch = self._get_meta("epoch")
+
+  @property
+  def epoch(self) -> str:
+    return self._epoch
+
+  @property
+  def counter(self) -> int:
+    if self._depth:
+      return self._counter
+    return int(self._get_meta("counter"))
+
+  @property
+  def total_bytes(self) -> int:
+    return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+  @contextmanager
+  def transaction(self) -> Iterator[None]:
+    if self._depth:
+      self._depth += 1
+      try:
+        yield
+      finally:
+        self._depth -= 1
+      return
+
+    self._db.execute("BEGIN IMMEDIATE")
+    self._depth = 1
+    try:
+      self._refresh()
+      self._counter = int(self._get_meta("counter"))
+      yield
+      self._db.execute("UPDATE meta SET value = ? WHERE name = 'counter'", (str(self._counter), ))
+      self._db.execute("COMMIT")
+    except BaseException:
+      self._db.execute("ROLLBACK")
+      # Cached entries could be changed in place before the failure
+      self._rows.clear()
+      raise
+    finally:
+      self._depth = 0
+
+    # Own commit changes data_version only for other connections
+    self._data_version = self._get_data_version()
+
+  def get(self, key: str) -> Optional[Dict[str, Any]]:
+    row = self._get_row(key)
+    return row.entry if row is not None else None
+
+  def contains(self, key: str) -> bool:
+    return self._get_row(key) is not None
+
+  def count(self) -> int:
+    return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+  def keys(self) -> List[str]:
+    return [row[0] for row in self._db.execute("SELECT key FROM entries ORDER BY version")]
+
+  def get_size(self, key: str) -> int:
+    row = self._get_row(key)
+    return row.size if row is not None else 0
+
+  def get_sizes(self) -> Dict[str, int]:
+    return {key: size for key, size in self._db.execute("SELECT key, size FROM entries")}
+
+  def get_version(self, key: str) -> Optional[int]:
+    row = self._get_row(key)
+    return row.version if row is not None else None
+
+  def get_item_version(self, key: str, field: str, item: str) -> int:
+    row = self._get_row(key)
+    if row is None:
+      return 0
+    return row.item_versions.get(field, {}).get(item, row.replaced_version)
+
+  def get_removed_version(self, key: str) -> Optional[int]:
+    row = self._db.execute("SELECT version FROM removed WHERE key = ?", (key, )).fetchone()
+    return row[0] if row is not None else None
+
+  def put(
+    self,
+    key: str,
+    entry: Dict[str, Any],
+    size: int,
+    items: Optional[Dict[str, List[str]]] = None,
+  ) -> None:
+    with self.transaction():
+      self._counter += 1
+      version = self._counter
+      row = self._get_row(key)
+
+      if row is None or items is None:
+        row = DeyeStorageSqliteRow(entry = entry, size = size, version = version, replaced_version = version)
+      else:
+        row.entry, row.size, row.version = entry, size, version
+        for field_name, names in items.items():
+          field_versions = row.item_versions.setdefault(field_name, {})
+          for name in names:
+            field_versions[name] = version
+
+      self._db.execute(
+        "INSERT OR REPLACE INTO entries (key, entry, size, version, replaced_version, item_versions) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (key, json.dumps(entry, ensure_ascii = False), size, version, row.replaced_version,
+         json.dumps(row.item_versions)),
+      )
+      self._db.execute("DELETE FROM removed WHERE key = ?", (key, ))
+      self._rows[key] = row
+
+  def store(self, key: str, entry: Dict[str, Any], size: int) -> None:
+    with self.transaction():
+      row = self._get_row(key)
+      if row is None:
+        return
+
+      row.entry, row.size = entry, size
+      self._db.execute(
+        "UPDATE entries SET entry = ?, size = ? WHERE key = ?",
+        (json.dumps(entry, ensure_ascii = False), size, key),
+      )
+
+  def delete(self, key: str) -> bool:
+    with self.transaction():
+      if self._get_row(key) is None:
+        return False
+
+      self._counter += 1
+      self._db.execute("DELETE FROM entries WHERE key = ?", (key, ))
+      self._db.execute("INSERT OR REPLACE INTO removed (key, version) VALUES (?, ?)", (key, self._counter))
+      self._rows[key] = None
+      return True
+
+  def get_lru_keys(self) -> List[str]:
+    return self.keys()
+
+  def close(self) -> None:
+    self._db.close()
+
+  def _get_row(self, key: str) -> Optional[DeyeStorageSqliteRow]:
+    if not self._depth:
+      self._refresh()
+
+    if key in self._rows:
+      return self._rows[key]
+
+    result = self._db.execute(
+      "SELECT entry, size, version, replaced_version, item_versions FROM entries WHERE key = ?",
+      (key, ),
+    ).fetchone()
+
+    row = None
+    if result is not None:
+      row = DeyeStorageSqliteRow(
+        entry = json.loads(result[0]),
+        size = result[1],
+        version = result[2],
+        replaced_version = result[3],
+        item_versions = json.loads(result[4]),
+      )
+
+    self._rows[key] = row
+    return row
+
+  def _refresh(self) -> None:
+    # data_version changes when other connections commit
+    data_version = self._get_data_version()
+    if data_version != self._data_version:
+      self._rows.clear()
+      self._data_version = data_version
+
+  def _get_data_version(self) -> int:
+    return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+  def _get_meta(self, name: str) -> str:
+    return self._db.execute("SELECT value FROM meta WHERE name = ?", (name, )).fetchone()[0]
@@ -2,7 +2,6 @@ import os
 import sys
 import logging
 import traceback
-import uvicorn
 
 from typing import Dict, Any
 
@@ -26,6 +25,7 @@ import_dirs(current_path, ['src', '../deye/src', '../common'])
 
 from log_utils import LogUtils
 from common_utils import CommonUtils
+from uvicorn_utils import UvicornUtils
 from backserver_config import BackServerConfig
 from deye_web_dependency_provider import DeyeWebDependencyProvider
 from http_session_singleton_async import HttpSessionSingletonAsync
@@ -54,6 +54,8 @@ async def lifespan_handler(app: FastAPI):
   actual_ip = external_ip if external_ip else config.SERVER_HOST
 
   logger.info(f"Listening on: {actual_ip}:{config.SERVER_PORT}")
+  if config.SERVER_SOCKET:
+    logger.info(f"Listening on: {config.SERVER_SOCKET}")
 
   # The application runs here
   yield
@@ -156,10 +158,11 @@ def get_error_result(message: str, callstack: str = '') -> Dict[str, Any]:
 if __name__ == "__main__":
   config.print_usage(logger)
 
-  uvicorn.run(
+  UvicornUtils.run(
     app,
     host = config.SERVER_HOST,
     port = config.SERVER_PORT,
+    socket_path = config.SERVER_SOCKET,
     timeout_keep_alive = 15,
     proxy_headers = False,
     forwarded_allow_ips = None,
@@ -41,6 +41,7 @@ class DeyeWebForecastCommandProcessor(DeyeWebBaseCommandProcessor):
       name = 'deyeweb',
       loggers = self.loggers.loggers,
       caching_time = 5,
+      memory_cache_size = 4096,
       socket_timeout = 5,
       register_creator = lambda prefix: DeyeWebForecastRegisters(prefix),
     )
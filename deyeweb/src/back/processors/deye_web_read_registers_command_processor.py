@@ -27,6 +27,7 @@ class DeyeWebReadRegistersCommandProcessor(DeyeWebBaseCommandProcessor):
       name = 'deyeweb',
       loggers = self.loggers.loggers,
       caching_time = 5,
+      memory_cache_size = 4096,
       socket_timeout = 5,
       register_creator = lambda prefix: DeyeWebCustomRegisters(
         register_names = self.sections_holder.used_registers,
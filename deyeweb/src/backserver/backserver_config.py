@@ -7,12 +7,15 @@ from env_vars import EnvVars
 class BackServerConfig:
   def __init__(self):
     self.__server_port = EnvVar("SERVER_PORT", "80", "Local port to listen on")
+    self.__server_socket = EnvVar("SERVER_SOCKET", "", "Unix domain socket path to listen on besides the port "
+                                  "(empty to listen only on the port)")
     self.__back_execution_timeout = EnvVar("BACK_EXECUTION_TIMEOUT", "15", "Timeout for back requests execution, s")
     self.__server_host = '0.0.0.0'
 
     self.__all_vars: List[EnvVar] = [
       EnvVars.DEYE_LOG_NAME,
       self.__server_port,
+      self.__server_socket,
       self.__back_execution_timeout,
     ]
 
@@ -28,6 +31,10 @@ class BackServerConfig:
   def SERVER_PORT(self) -> int:
     return self.__server_port.as_int()
 
+  @property
+  def SERVER_SOCKET(self) -> str:
+    return self.__server_socket.value
+
   @property
   def BACK_EXECUTION_TIMEOUT(self) -> float:
     return self.__back_execution_timeout.as_float()
@@ -17,6 +17,7 @@ class TelebotDeyeHelper:
     'name': 'telebot',
     'socket_timeout': 10,
     'caching_time': 5,
+    'memory_cache_size': 4096,
     'verbose': False,
   }
 
@@ -41,6 +41,8 @@ class TelebotMenuCache(TelebotMenuItemHandlerAsync):
       result += f"Got from cache : {rate.got_from_cache_count}\n"
       result += f"Total count    : {rate.total_count}\n"
       result += f"Cache hit rate : {rate.cache_hit_rate_percent}%\n"
+      for window, hit_rate in rate.windowed_cache_hit_rates.items():
+        result += f"{'Last ' + window:<15}: {round(hit_rate * 100)}%\n"
       result += "</pre>"
 
     self.bot.send_message(
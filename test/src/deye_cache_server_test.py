@@ -35,6 +35,7 @@ from deye_storage_config import DeyeStorageConfig
 # Configuration
 BASE_URL = f"http://{DeyeTestUtils.storage_server_host}:{DeyeTestUtils.storage_server_port}"
 CACHE_URL = f"{BASE_URL}/cache"
+STORAGE_URL = f"{BASE_URL}/storage"
 PING_URL = f"{BASE_URL}/ping"
 
 log = logging.getLogger()
@@ -152,7 +153,7 @@ class TestDeyeCacheExtended(unittest.TestCase):
 
   def test_max_keys_limit(self):
     """
-    Test that server returns 403 when trying to exceed MAX_KEYS_COUNT.
+    Test that cache evicts the least recently used key when MAX_KEYS_COUNT is reached.
     Note: This test assumes MAX_KEYS_COUNT is small enough to test (e.g., 32).
     """
     # Clear first
@@ -163,10 +164,35 @@ class TestDeyeCacheExtended(unittest.TestCase):
     for i in range(limit):
       self.assertEqual(self.session.post(f"{CACHE_URL}/dev_{i}", json = {"data": i}).status_code, 200)
 
+    # Reading makes dev_0 recently used, so dev_1 is the least recently used key
+    self.assertEqual(self.session.get(f"{CACHE_URL}/dev_0").status_code, 200)
+
     # Try to add 33rd key
-    res = self.session.post(f"{CACHE_URL}/overflow_key", json = {"data": "fail"})
-    self.assertEqual(res.status_code, 403)
-    self.assertIn("Maximum number of keys exceeded", res.json()["detail"])
+    res = self.session.post(f"{CACHE_URL}/overflow_key", json = {"data": "stored"})
+    self.assertEqual(res.status_code, 200)
+
+    self.assertEqual(self.session.get(f"{CACHE_URL}/dev_1").status_code, 404)
+    self.assertEqual(self.session.get(f"{CACHE_URL}/dev_0").json()["data"], 0)
+    self.assertEqual(self.session.get(f"{CACHE_URL}/overflow_key").json()["data"], "stored")
+    self.assertEqual(self.session.options(CACHE_URL).json()["keys_used"], limit)
+
+  def test_max_keys_limit_without_eviction(self):
+    """
+    Test that storage (no memory budget) returns 403 when trying to exceed MAX_KEYS_COUNT.
+    """
+    keys_used = self.session.options(STORAGE_URL).json()["keys_used"]
+    keys = [f"dev_{i}" for i in range(self.config.MAX_KEYS_COUNT - keys_used)]
+
+    try:
+      for key in keys:
+        self.assertEqual(self.session.post(f"{STORAGE_URL}/{key}", json = {"data": key}).status_code, 200)
+
+      res = self.session.post(f"{STORAGE_URL}/overflow_key", json = {"data": "fail"})
+      self.assertEqual(res.status_code, 403)
+      self.assertIn("Maximum number of keys exceeded", res.json()["detail"])
+    finally:
+      for key in keys:
+        self.session.delete(f"{STORAGE_URL}/{key}")
 
   def test_json_size_limit_per_reqeust(self):
     """
@@ -670,6 +696,102 @@ class TestDeyeCacheExtended(unittest.TestCase):
     self.assertEqual(res["obj"]["val"], 2)
     self.assertEqual(res["obj"]["ts_label"], "100")
 
+  def test_get_selected_registers(self):
+    """
+    Verify that GET /cache/{key}?registers=... returns only requested registers.
+    """
+    key = "selective_dev"
+    payload = {
+      "inverter": "test",
+      "registers": {
+        "100": {"ts_label": 1700000000, "data": [1]},
+        "200": {"ts_label": 1700000000, "data": [2]},
+        "300": {"ts_label": 1700000000, "data": [3]},
+      },
+    }
+    self.assertEqual(self.session.post(f"{CACHE_URL}/{key}", json = payload).status_code, 200)
+
+    res = self.session.get(f"{CACHE_URL}/{key}", params = {"registers": "100,300,400"})
+    self.assertEqual(res.status_code, 200)
+
+    res_json = res.json()
+    # Other fields are kept, missing registers are skipped
+    self.assertEqual(res_json["inverter"], "test")
+    self.assertEqual(set(res_json["registers"].keys()), {"100", "300"})
+    self.assertEqual(res_json["registers"]["300"]["data"], [3])
+
+    # Unknown key is still 404
+    res = self.session.get(f"{CACHE_URL}/unknown_key", params = {"registers": "100"})
+    self.assertEqual(res.status_code, 404)
+
+  def test_get_batch(self):
+    """
+    Verify that POST /batch/cache returns selected registers for multiple keys in one response.
+    """
+    payload = {
+      "registers": {
+        "100": {"ts_label": 1700000000, "data": [1]},
+        "200": {"ts_label": 1700000000, "data": [2]},
+      },
+    }
+    self.assertEqual(self.session.post(f"{CACHE_URL}/batch_dev1", json = payload).status_code, 200)
+    self.assertEqual(self.session.post(f"{CACHE_URL}/batch_dev2", json = payload).status_code, 200)
+
+    res = self.session.post(f"{BASE_URL}/batch/cache",
+                            json = {
+                              "batch_dev1": ["200"],
+                              "batch_dev2": None,
+                              "batch_missing": ["100"],
+                            })
+    self.assertEqual(res.status_code, 200)
+
+    res_json = res.json()
+    # Missing keys are omitted
+    self.assertEqual(set(res_json.keys()), {"batch_dev1", "batch_dev2"})
+    self.assertEqual(set(res_json["batch_dev1"]["registers"].keys()), {"200"})
+    self.assertEqual(set(res_json["batch_dev2"]["registers"].keys()), {"100", "200"})
+
+  def test_conditional_get(self):
+    """
+    Verify that GET returns 304 for the current ETag and a new ETag after update.
+    """
+    key = "etag_dev"
+    payload = {"registers": {"100": {"ts_label": 1700000000, "data": [1]}}}
+    self.assertEqual(self.session.post(f"{CACHE_URL}/{key}", json = payload).status_code, 200)
+
+    res = self.session.get(f"{CACHE_URL}/{key}", params = {"registers": "100"})
+    self.assertEqual(res.status_code, 200)
+    etag = res.headers["ETag"]
+
+    res = self.session.get(f"{CACHE_URL}/{key}", params = {"registers": "100"}, headers = {"If-None-Match": etag})
+    self.assertEqual(res.status_code, 304)
+    self.assertEqual(res.content, b"")
+
+    payload["registers"]["100"] = {"ts_label": 1700000001, "data": [2]}
+    self.assertEqual(self.session.post(f"{CACHE_URL}/{key}", json = payload).status_code, 200)
+
+    res = self.session.get(f"{CACHE_URL}/{key}", params = {"registers": "100"}, headers = {"If-None-Match": etag})
+    self.assertEqual(res.status_code, 200)
+    self.assertNotEqual(res.headers["ETag"], etag)
+    self.assertEqual(res.json()["registers"]["100"]["data"], [2])
+
+  def test_conditional_get_compressed(self):
+    """
+    Verify that big responses are compressed and 304 is returned for them too.
+    """
+    key = "etag_big_dev"
+    payload = {"registers": {str(addr): {"ts_label": 1700000000, "data": [addr] * 10} for addr in range(100)}}
+    self.assertEqual(self.session.post(f"{CACHE_URL}/{key}", json = payload).status_code, 200)
+
+    for _ in range(2):
+      res = self.session.get(f"{CACHE_URL}/{key}", headers = {"Accept-Encoding": "gzip"})
+      self.assertEqual(res.status_code, 200)
+      self.assertEqual(res.headers.get("Content-Encoding"), "gzip")
+      self.assertEqual(res.json()["registers"]["99"]["data"], [99] * 10)
+
+    res = self.session.get(f"{CACHE_URL}/{key}", headers = {"If-None-Match": res.headers["ETag"]})
+    self.assertEqual(res.status_code, 304)
+
   def test_update_and_get_average_int(self):
     """
     LOGIC TEST:
@@ -0,0 +1,106 @@
+import os
+import sys
+import asyncio
+import logging
+import unittest
+
+from pathlib import Path
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+sys.path.append(str((current_path / base_path / 'deyeproxy').resolve()))
+
+from src.deye_proxy_metrics import DeyeProxyCounter, DeyeProxyHistogram, DeyeProxyMetrics
+from src.deye_proxy_metrics_server import DeyeProxyMetricsServer
+from src.deye_proxy_priority import DeyeProxyPriority
+from src.deye_proxy_queue import DeyeProxyQueue, DeyeProxyQueueFullError
+
+class TestDeyeProxyMetrics(unittest.IsolatedAsyncioTestCase):
+  def test_histogram(self):
+    histogram = DeyeProxyHistogram("test_seconds", "Test", [0.1, 1], ["type"])
+    histogram.observe(0.05, "a")
+    histogram.observe(0.1, "a")
+    histogram.observe(5, "a")
+
+    self.assertEqual(histogram.get_count("a"), 3)
+    self.assertEqual(histogram.get_count("b"), 0)
+    self.assertEqual(histogram.render(), [
+      "# HELP test_seconds Test",
+      "# TYPE test_seconds histogram",
+      'test_seconds_bucket{type="a",le="0.1"} 2',
+      'test_seconds_bucket{type="a",le="1.0"} 2',
+      'test_seconds_bucket{type="a",le="+Inf"} 3',
+      'test_seconds_sum{type="a"} 5.15',
+      'test_seconds_count{type="a"} 3',
+    ])
+
+  def test_counter(self):
+    counter = DeyeProxyCounter("test_total", "Test", ["type"])
+    counter.inc("b")
+    counter.inc("a", amount = 2)
+    counter.inc("b")
+
+    self.assertEqual(counter.get("b"), 2)
+    self.assertEqual(counter.render()[2:], ['test_total{type="a"} 2', 'test_total{type="b"} 2'])
+
+  async def test_queue_metrics(self):
+    metrics = DeyeProxyMetrics()
+    queue = DeyeProxyQueue(max_depth = 1, metrics = metrics)
+
+    self.assertTrue(await queue.acquire(DeyeProxyPriority.normal, 1))
+    waiter = asyncio.create_task(queue.acquire(DeyeProxyPriority.high, 1))
+    await asyncio.sleep(0.05)
+
+    self.assertIn("deyeproxy_queue_depth 1\n", metrics.render())
+
+    with self.assertRaises(DeyeProxyQueueFullError):
+      await queue.acquire(DeyeProxyPriority.low, 1)
+
+    queue.release()
+    self.assertTrue(await waiter)
+    self.assertFalse(await queue.acquire(DeyeProxyPriority.normal, 0.01))
+    queue.release()
+
+    self.assertEqual(metrics.queue_wait.get_count("normal"), 1)
+    self.assertEqual(metrics.queue_wait.get_count("high"), 1)
+    self.assertEqual(metrics.hold.get_count(), 2)
+    self.assertEqual(metrics.rejected.get("low"), 1)
+    self.assertEqual(metrics.timeouts.get(DeyeProxyMetrics.client_wait_timeout), 1)
+
+    text = metrics.render()
+    self.assertIn("deyeproxy_queue_depth 0\n", text)
+    self.assertIn('deyeproxy_queue_wait_seconds_count{priority="high"} 1\n', text)
+    self.assertIn('deyeproxy_timeouts_total{type="client_wait"} 1\n', text)
+
+  async def test_server(self):
+    metrics = DeyeProxyMetrics()
+    metrics.timeouts.inc(DeyeProxyMetrics.session_timeout)
+
+    server = DeyeProxyMetricsServer(metrics, logging.getLogger())
+    await server.start("127.0.0.1", 0)
+    assert server._server is not None
+    port = server._server.sockets[0].getsockname()[1]
+
+    async def get(path: str) -> bytes:
+      reader, writer = await asyncio.open_connection("127.0.0.1", port)
+      writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+      response = await reader.read()
+      writer.close()
+      return response
+
+    try:
+      response = await get("/metrics")
+      self.assertTrue(response.startswith(b"HTTP/1.1 200 OK\r\n"))
+      self.assertIn(b'deyeproxy_timeouts_total{type="session"} 1\n', response)
+
+      response = await get("/")
+      self.assertTrue(response.startswith(b"HTTP/1.1 404 Not Found\r\n"))
+    finally:
+      server.close()
+
+if __name__ == '__main__':
+  unittest.main()
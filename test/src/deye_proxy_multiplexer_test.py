@@ -0,0 +1,189 @@
+import os
+import sys
+import struct
+import asyncio
+import contextlib
+import logging
+import unittest
+
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+sys.path.append(str((current_path / base_path / 'deyeproxy').resolve()))
+
+from src.deye_proxy_frame import DeyeProxyFrame
+from src.deye_proxy_multiplexer import DeyeProxyMultiplexer
+from src.deye_proxy_priority import DeyeProxyPriority
+from src.deye_proxy_queue import DeyeProxyQueue
+
+@contextlib.asynccontextmanager
+async def busy_logger(queue: DeyeProxyQueue) -> AsyncIterator[None]:
+  """
+  Holds the logger, so requests are queued
+  """
+  await queue.acquire(DeyeProxyPriority.normal, 1)
+  try:
+    yield
+  finally:
+    queue.release()
+
+def make_frame(control_code: int, sequence: int, payload: bytes, logger_counter: int = 0) -> bytes:
+  frame = bytearray(struct.pack("<BHHBBI", DeyeProxyFrame.start, len(payload), control_code, sequence,
+                                logger_counter, 12345678))
+  frame += payload + bytes([0, DeyeProxyFrame.end])
+  frame[-2] = DeyeProxyFrame.get_checksum(frame)
+  return bytes(frame)
+
+class FakeLogger:
+  """
+  Logger which echoes payloads of request frames in response frames
+  """
+  def __init__(self, close_after: int = 0, send_counter_frames: bool = False, response_delay: float = 0):
+    self.close_after = close_after
+    self.response_delay = response_delay
+    self.send_counter_frames = send_counter_frames
+    self.connections = 0
+    self.requests: List[bytes] = []
+    self.port = 0
+    self._server: Optional[asyncio.Server] = None
+
+  async def start(self) -> None:
+    self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+    self.port = self._server.sockets[0].getsockname()[1]
+
+  def close(self) -> None:
+    if self._server is not None:
+      self._server.close()
+
+  async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    self.connections += 1
+    handled = 0
+
+    try:
+      while True:
+        frame = await DeyeProxyFrame.read(reader)
+        if frame is None:
+          return
+
+        self.requests.append(frame)
+        sequence = DeyeProxyFrame.get_sequence(frame)
+        payload = frame[DeyeProxyFrame.header_length:-2]
+
+        if self.send_counter_frames:
+          writer.write(make_frame(DeyeProxyFrame.counter_control_code, sequence, b"\x01"))
+          # Late response to some earlier request
+          writer.write(make_frame(DeyeProxyFrame.response_control_code, (sequence + 7) & 0xFF, b"late"))
+
+        await asyncio.sleep(self.response_delay)
+        response = make_frame(DeyeProxyFrame.response_control_code, sequence, payload, logger_counter = handled & 0xFF)
+        writer.write(response)
+        await writer.drain()
+        handled += 1
+
+        if self.close_after and handled >= self.close_after:
+          return
+    except (OSError, ValueError, asyncio.CancelledError):
+      # Connections left open by the test are cancelled with the event loop
+      return
+    finally:
+      writer.close()
+
+class TestDeyeProxyFrame(unittest.TestCase):
+  def test_frame_helpers(self):
+    frame = make_frame(DeyeProxyFrame.request_control_code, 0x42, b"payload")
+    self.assertTrue(DeyeProxyFrame.is_valid(frame))
+    self.assertEqual(DeyeProxyFrame.get_length(frame), len(frame))
+    self.assertEqual(DeyeProxyFrame.get_sequence(frame), 0x42)
+
+    changed = DeyeProxyFrame.with_sequence(frame, 0x43)
+    self.assertTrue(DeyeProxyFrame.is_valid(changed))
+    self.assertEqual(DeyeProxyFrame.get_sequence(changed), 0x43)
+    self.assertFalse(DeyeProxyFrame.is_valid(frame[:-2] + bytes([frame[-2] ^ 1, frame[-1]])))
+
+class TestDeyeProxyMultiplexer(unittest.IsolatedAsyncioTestCase):
+  async def start(self, **kwargs) -> DeyeProxyMultiplexer:
+    self.fake_logger = FakeLogger(**kwargs)
+    await self.fake_logger.start()
+    self.multiplexer = DeyeProxyMultiplexer(
+      host = "127.0.0.1",
+      port = self.fake_logger.port,
+      connect_timeout = 1,
+      response_timeout = 1,
+      logger = logging.getLogger(),
+    )
+    return self.multiplexer
+
+  async def asyncTearDown(self):
+    self.multiplexer.close()
+    self.fake_logger.close()
+
+  async def test_sequence_is_rewritten_and_restored(self):
+    multiplexer = await self.start(send_counter_frames = True)
+
+    for i in range(3):
+      response = await multiplexer.exchange(make_frame(DeyeProxyFrame.request_control_code, 0x42, bytes([i])), 1)
+      assert response is not None
+      self.assertTrue(DeyeProxyFrame.is_valid(response))
+      self.assertEqual(DeyeProxyFrame.get_sequence(response), 0x42)
+      self.assertEqual(DeyeProxyFrame.get_control_code(response), DeyeProxyFrame.response_control_code)
+      self.assertEqual(response[DeyeProxyFrame.header_length:-2], bytes([i]))
+
+    # Proxy sequence numbers are sent to the logger over one connection
+    self.assertEqual([DeyeProxyFrame.get_sequence(frame) for frame in self.fake_logger.requests], [1, 2, 3])
+    self.assertEqual(self.fake_logger.connections, 1)
+
+  async def test_concurrent_clients(self):
+    multiplexer = await self.start()
+    errors: List[str] = []
+
+    async def client(client_id: int) -> None:
+      for i in range(20):
+        payload = bytes([client_id, i])
+        response = await multiplexer.exchange(make_frame(DeyeProxyFrame.request_control_code, client_id, payload), 5)
+        if response is None or response[DeyeProxyFrame.header_length:-2] != payload or \
+            DeyeProxyFrame.get_sequence(response) != client_id:
+          errors.append(f"client {client_id} request {i} got {response!r}")
+
+    await asyncio.gather(*[client(client_id) for client_id in range(1, 9)])
+
+    self.assertEqual(errors, [])
+    self.assertEqual(len(self.fake_logger.requests), 160)
+    self.assertEqual(self.fake_logger.connections, 1)
+
+  async def test_reconnect_after_logger_closed_connection(self):
+    multiplexer = await self.start(close_after = 2)
+
+    for i in range(5):
+      response = await multiplexer.exchange(make_frame(DeyeProxyFrame.request_control_code, 1, bytes([i])), 1)
+      assert response is not None
+      self.assertEqual(response[DeyeProxyFrame.header_length:-2], bytes([i]))
+
+    self.assertEqual(self.fake_logger.connections, 3)
+
+  async def test_busy_logger(self):
+    multiplexer = await self.start()
+    async with busy_logger(multiplexer.queue):
+      self.assertIsNone(await multiplexer.exchange(make_frame(DeyeProxyFrame.request_control_code, 1, b"x"), 0.05))
+
+  async def test_cancelled_request_drops_connection(self):
+    multiplexer = await self.start(response_delay = 0.1)
+    task = asyncio.create_task(multiplexer.exchange(make_frame(DeyeProxyFrame.request_control_code, 1, b"x"), 1))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with self.assertRaises(asyncio.CancelledError):
+      await task
+
+    response = await multiplexer.exchange(make_frame(DeyeProxyFrame.request_control_code, 1, b"y"), 1)
+    assert response is not None
+    # Not the late response to the cancelled request
+    self.assertEqual(response[DeyeProxyFrame.header_length:-2], b"y")
+    self.assertEqual(self.fake_logger.connections, 2)
+
+if __name__ == '__main__':
+  unittest.main()
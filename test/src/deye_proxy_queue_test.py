@@ -0,0 +1,124 @@
+import os
+import sys
+import asyncio
+import unittest
+
+from pathlib import Path
+from typing import List
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+sys.path.append(str((current_path / base_path / 'deyeproxy').resolve()))
+
+from src.deye_proxy_priority import DeyeProxyPriority
+from src.deye_proxy_priority_map import DeyeProxyPriorityMap
+from src.deye_proxy_queue import DeyeProxyQueue, DeyeProxyQueueFullError
+
+class TestDeyeProxyQueue(unittest.IsolatedAsyncioTestCase):
+  async def test_priority_and_fifo_order(self):
+    queue = DeyeProxyQueue()
+    order: List[str] = []
+
+    async def client(name: str, priority: DeyeProxyPriority) -> None:
+      self.assertTrue(await queue.acquire(priority, 1))
+      order.append(name)
+      await asyncio.sleep(0.01)
+      queue.release()
+
+    self.assertTrue(await queue.acquire(DeyeProxyPriority.normal, 1))
+
+    clients = []
+    for name, priority in [
+      ("low", DeyeProxyPriority.low),
+      ("normal1", DeyeProxyPriority.normal),
+      ("high", DeyeProxyPriority.high),
+      ("normal2", DeyeProxyPriority.normal),
+    ]:
+      clients.append(asyncio.create_task(client(name, priority)))
+      await asyncio.sleep(0)
+
+    self.assertEqual(queue.depth, 4)
+    queue.release()
+    await asyncio.gather(*clients)
+
+    self.assertEqual(order, ["high", "normal1", "normal2", "low"])
+    self.assertFalse(queue.locked())
+    self.assertEqual(queue.stats[DeyeProxyPriority.normal].count, 3)
+    self.assertGreater(queue.stats[DeyeProxyPriority.low].max_wait, 0.02)
+
+  async def test_timeout(self):
+    queue = DeyeProxyQueue()
+    await queue.acquire(DeyeProxyPriority.normal, 1)
+
+    self.assertFalse(await queue.acquire(DeyeProxyPriority.low, 0.01))
+    self.assertEqual(queue.depth, 0)
+    self.assertEqual(queue.stats[DeyeProxyPriority.low].timed_out, 1)
+
+    queue.release()
+    self.assertFalse(queue.locked())
+
+  async def test_full_queue_rejects_at_once(self):
+    queue = DeyeProxyQueue(max_depth = 1)
+    await queue.acquire(DeyeProxyPriority.normal, 1)
+    waiter = asyncio.create_task(queue.acquire(DeyeProxyPriority.normal, 1))
+    await asyncio.sleep(0)
+
+    with self.assertRaises(DeyeProxyQueueFullError):
+      await queue.acquire(DeyeProxyPriority.high, 1)
+    self.assertEqual(queue.stats[DeyeProxyPriority.high].rejected, 1)
+
+    queue.release()
+    self.assertTrue(await waiter)
+    queue.release()
+
+  async def test_cancelled_waiter(self):
+    queue = DeyeProxyQueue()
+    await queue.acquire(DeyeProxyPriority.normal, 1)
+
+    waiter = asyncio.create_task(queue.acquire(DeyeProxyPriority.normal, 1))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with self.assertRaises(asyncio.CancelledError):
+      await waiter
+    self.assertEqual(queue.depth, 0)
+
+    # Cancelled after the access was passed to it
+    waiter = asyncio.create_task(queue.acquire(DeyeProxyPriority.normal, 1))
+    await asyncio.sleep(0)
+    queue.release()
+    waiter.cancel()
+    with self.assertRaises(asyncio.CancelledError):
+      await waiter
+    self.assertFalse(queue.locked())
+
+class TestDeyeProxyPriorityMap(unittest.TestCase):
+  def test_priorities(self):
+    priority_map = DeyeProxyPriorityMap(
+      default = "normal",
+      clients = "192.168.1.50=high, 172.20.0.0/16=low",
+      ports = "8898=high",
+    )
+
+    self.assertEqual(priority_map.ports, {8898: DeyeProxyPriority.high})
+    self.assertEqual(priority_map.get_priority("172.20.0.5", 8898), DeyeProxyPriority.high)
+    self.assertEqual(priority_map.get_priority("172.20.0.5", 8899), DeyeProxyPriority.low)
+    self.assertEqual(priority_map.get_priority("192.168.1.50", 8899), DeyeProxyPriority.high)
+    self.assertEqual(priority_map.get_priority("192.168.1.51", 8899), DeyeProxyPriority.normal)
+    self.assertEqual(priority_map.get_priority("::1", 8899), DeyeProxyPriority.normal)
+
+  def test_invalid_mapping(self):
+    with self.assertRaises(ValueError):
+      DeyeProxyPriorityMap(default = "urgent")
+    with self.assertRaises(ValueError):
+      DeyeProxyPriorityMap(default = "normal", clients = "192.168.1.50")
+    with self.assertRaises(ValueError):
+      DeyeProxyPriorityMap(default = "normal", clients = "not-an-ip=high")
+    with self.assertRaises(ValueError):
+      DeyeProxyPriorityMap(default = "normal", ports = "port=high")
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,281 @@
+import os
+import sys
+import struct
+import asyncio
+import contextlib
+import logging
+import unittest
+
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+sys.path.append(str((current_path / base_path / 'deyeproxy').resolve()))
+
+from src.deye_proxy_frame import DeyeProxyFrame
+from src.deye_proxy_modbus import DeyeProxyModbus
+from src.deye_proxy_multiplexer import DeyeProxyMultiplexer
+from src.deye_proxy_priority import DeyeProxyPriority
+from src.deye_proxy_queue import DeyeProxyQueue
+from src.deye_proxy_read_coalescer import DeyeProxyReadCoalescer
+from src.deye_proxy_register_range import DeyeProxyRegisterRange
+
+@contextlib.asynccontextmanager
+async def busy_logger(queue: DeyeProxyQueue) -> AsyncIterator[None]:
+  """
+  Holds the logger, so requests are queued
+  """
+  await queue.acquire(DeyeProxyPriority.normal, 1)
+  try:
+    yield
+  finally:
+    queue.release()
+
+serial = 12345678
+
+def make_frame(control_code: int, sequence: int, payload: bytes) -> bytes:
+  frame = bytearray(struct.pack("<BHHBBI", DeyeProxyFrame.start, len(payload), control_code, sequence, 0, serial))
+  frame += payload + bytes([0, DeyeProxyFrame.end])
+  frame[-2] = DeyeProxyFrame.get_checksum(frame)
+  return bytes(frame)
+
+def make_request(sequence: int, modbus: bytes) -> bytes:
+  # Frame type, sensor type and timestamps
+  payload = bytes([0x02, 0, 0]) + bytes(12) + DeyeProxyModbus.with_crc(modbus)
+  return make_frame(DeyeProxyFrame.request_control_code, sequence, payload)
+
+def make_read(sequence: int, start: int, count: int) -> bytes:
+  return make_request(sequence, struct.pack(">BBHH", 1, DeyeProxyModbus.read_holding_registers, start, count))
+
+def make_write(sequence: int, address: int, value: int) -> bytes:
+  return make_request(sequence, struct.pack(">BBHH", 1, DeyeProxyModbus.write_single_register, address, value))
+
+class FakeModbusLogger:
+  """
+  Logger with holding registers, which are equal to their addresses until written.
+  Registers starting from error_address can't be read
+  """
+  def __init__(self, error_address: int = 0x10000):
+    self.error_address = error_address
+    self.registers: Dict[int, int] = {}
+    self.requests: List[DeyeProxyRegisterRange] = []
+    self.port = 0
+    self._server: Optional[asyncio.Server] = None
+
+  async def start(self) -> None:
+    self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+    self.port = self._server.sockets[0].getsockname()[1]
+
+  def close(self) -> None:
+    if self._server is not None:
+      self._server.close()
+
+  async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+      while True:
+        frame = await DeyeProxyFrame.read(reader)
+        if frame is None:
+          return
+
+        modbus = frame[DeyeProxyModbus.request_offset:-2]
+        slave, function, start, value = struct.unpack_from(">BBHH", modbus)
+
+        if function == DeyeProxyModbus.write_single_register:
+          self.registers[start] = value
+          response = modbus
+        else:
+          self.requests.append(DeyeProxyRegisterRange(slave, function, start, value))
+          if start + value > self.error_address:
+            response = DeyeProxyModbus.with_crc(bytes([slave, function | 0x80, 0x02]))
+          else:
+            data = b"".join(struct.pack(">H", self.registers.get(a, a)) for a in range(start, start + value))
+            response = DeyeProxyModbus.with_crc(bytes([slave, function, len(data)]) + data)
+
+        # Frame type, status and timestamps
+        payload = bytes([0x02, 0x01]) + bytes(12) + response
+        writer.write(make_frame(DeyeProxyFrame.response_control_code, DeyeProxyFrame.get_sequence(frame), payload))
+        await writer.drain()
+    except (OSError, ValueError, asyncio.CancelledError):
+      # Connections left open by the test are cancelled with the event loop
+      return
+    finally:
+      writer.close()
+
+class TestDeyeProxyModbus(unittest.TestCase):
+  def test_read_request_and_response(self):
+    request = make_read(7, 100, 3)
+    registers = DeyeProxyModbus.get_read_range(request)
+    self.assertEqual(registers, DeyeProxyRegisterRange(1, DeyeProxyModbus.read_holding_registers, 100, 3))
+    self.assertIsNone(DeyeProxyModbus.get_write_range(request))
+
+    # Known CRC of 01 03 00 00 00 01
+    self.assertEqual(DeyeProxyModbus.with_crc(bytes.fromhex("010300000001"))[-2:], bytes.fromhex("840a"))
+
+    merged = DeyeProxyRegisterRange(1, DeyeProxyModbus.read_holding_registers, 90, 20)
+    merged_request = DeyeProxyModbus.with_read_range(request, merged)
+    self.assertTrue(DeyeProxyFrame.is_valid(merged_request))
+    self.assertEqual(DeyeProxyModbus.get_read_range(merged_request), merged)
+
+    assert registers is not None
+    data = bytes(range(6))
+    template = make_frame(DeyeProxyFrame.response_control_code, 1, bytes([0x02, 0x01]) + bytes(12) +
+                          DeyeProxyModbus.with_crc(bytes([1, 3, 40]) + bytes(40)))
+    response = DeyeProxyModbus.build_read_response(template, request, registers, data)
+    self.assertTrue(DeyeProxyFrame.is_valid(response))
+    self.assertEqual(DeyeProxyFrame.get_sequence(response), 7)
+    self.assertEqual(DeyeProxyModbus.get_read_data(response, registers), data)
+
+  def test_write_request(self):
+    registers = DeyeProxyModbus.get_write_range(make_write(1, 200, 5))
+    self.assertEqual(registers, DeyeProxyRegisterRange(1, DeyeProxyModbus.read_holding_registers, 200, 1))
+    self.assertIsNone(DeyeProxyModbus.get_read_range(make_write(1, 200, 5)))
+
+class TestDeyeProxyReadCoalescer(unittest.IsolatedAsyncioTestCase):
+  async def start(self, cache_ttl: float = 0, **kwargs) -> DeyeProxyReadCoalescer:
+    self.fake_logger = FakeModbusLogger(**kwargs)
+    await self.fake_logger.start()
+    self.multiplexer = DeyeProxyMultiplexer(
+      host = "127.0.0.1",
+      port = self.fake_logger.port,
+      connect_timeout = 1,
+      response_timeout = 1,
+      logger = logging.getLogger(),
+    )
+    self.coalescer = DeyeProxyReadCoalescer(self.multiplexer, cache_ttl, logging.getLogger())
+    return self.coalescer
+
+  async def asyncTearDown(self):
+    self.coalescer.close()
+    self.multiplexer.close()
+    self.fake_logger.close()
+
+  async def read(self, sequence: int, start: int, count: int) -> List[int]:
+    request = make_read(sequence, start, count)
+    response = await self.coalescer.exchange(request, 1)
+    assert response is not None
+    self.assertTrue(DeyeProxyFrame.is_valid(response))
+    self.assertEqual(DeyeProxyFrame.get_sequence(response), sequence)
+
+    registers = DeyeProxyModbus.get_read_range(request)
+    assert registers is not None
+    data = DeyeProxyModbus.get_read_data(response, registers)
+    assert data is not None
+    return list(struct.unpack(f">{count}H", data))
+
+  async def test_repeated_reads_are_cached(self):
+    await self.start(cache_ttl = 0.2)
+
+    self.assertEqual(await self.read(1, 100, 10), list(range(100, 110)))
+    self.assertEqual(await self.read(2, 100, 10), list(range(100, 110)))
+    # Covered by the cached range
+    self.assertEqual(await self.read(3, 102, 3), [102, 103, 104])
+    self.assertEqual(len(self.fake_logger.requests), 1)
+
+    await asyncio.sleep(0.25)
+    self.assertEqual(await self.read(4, 100, 10), list(range(100, 110)))
+    self.assertEqual(len(self.fake_logger.requests), 2)
+
+  async def test_no_cache_with_zero_ttl(self):
+    await self.start()
+    await self.read(1, 100, 10)
+    await self.read(2, 100, 10)
+    self.assertEqual(len(self.fake_logger.requests), 2)
+
+  async def test_queued_reads_are_merged(self):
+    await self.start()
+
+    # Reads are queued while the logger is busy
+    async with busy_logger(self.multiplexer.queue):
+      reads = [
+        asyncio.create_task(self.read(1, 0, 10)),
+        asyncio.create_task(self.read(2, 5, 10)),
+        # Adjoins the merged range
+        asyncio.create_task(self.read(3, 15, 5)),
+        asyncio.create_task(self.read(4, 100, 2)),
+      ]
+      await asyncio.sleep(0.05)
+
+    results = await asyncio.gather(*reads)
+
+    self.assertEqual(results, [list(range(0, 10)), list(range(5, 15)), list(range(15, 20)), [100, 101]])
+    self.assertEqual([(r.start, r.count) for r in self.fake_logger.requests], [(0, 20), (100, 2)])
+
+  async def test_high_priority_read_is_not_merged_into_queued_read(self):
+    await self.start()
+
+    async with busy_logger(self.multiplexer.queue):
+      normal = asyncio.create_task(self.read(1, 0, 10))
+      await asyncio.sleep(0.01)
+      high = asyncio.create_task(self.coalescer.exchange(make_read(2, 5, 5), 1, DeyeProxyPriority.high))
+      await asyncio.sleep(0.01)
+
+    self.assertEqual(await normal, list(range(0, 10)))
+    self.assertIsNotNone(await high)
+    # The high priority read is sent first
+    self.assertEqual([(r.start, r.count) for r in self.fake_logger.requests], [(5, 5), (0, 10)])
+
+  async def test_read_joins_sent_read(self):
+    await self.start()
+
+    first = asyncio.create_task(self.read(1, 0, 10))
+    await asyncio.sleep(0)
+    # The first read is being sent and covers the second one
+    second = asyncio.create_task(self.read(2, 2, 3))
+
+    self.assertEqual(await asyncio.gather(first, second), [list(range(0, 10)), [2, 3, 4]])
+    self.assertEqual(len(self.fake_logger.requests), 1)
+
+  async def test_write_invalidates_cache(self):
+    await self.start(cache_ttl = 10)
+    await self.read(1, 100, 10)
+
+    response = await self.coalescer.exchange(make_write(2, 105, 7), 1)
+    assert response is not None
+    self.assertEqual(await self.read(3, 100, 10), [100, 101, 102, 103, 104, 7, 106, 107, 108, 109])
+    # Not overlapping the write
+    self.assertEqual(await self.read(4, 200, 2), [200, 201])
+    self.assertEqual(await self.read(5, 200, 2), [200, 201])
+    self.assertEqual(len(self.fake_logger.requests), 3)
+
+  async def test_write_invalidates_queued_read(self):
+    await self.start(cache_ttl = 10)
+
+    async with busy_logger(self.multiplexer.queue):
+      read = asyncio.create_task(self.read(1, 100, 10))
+      await asyncio.sleep(0.01)
+      write = asyncio.create_task(self.coalescer.exchange(make_write(2, 105, 7), 1))
+      await asyncio.sleep(0.01)
+      # Isn't merged with the read queued before the write
+      after_write = asyncio.create_task(self.read(3, 104, 2))
+      await asyncio.sleep(0.01)
+
+    self.assertEqual((await read)[5], 105)
+    await write
+    self.assertEqual(await after_write, [104, 7])
+    # The values read before the write aren't cached
+    self.assertEqual(await self.read(4, 100, 10), [100, 101, 102, 103, 104, 7, 106, 107, 108, 109])
+    self.assertEqual(len(self.fake_logger.requests), 3)
+
+  async def test_error_of_merged_read(self):
+    await self.start(error_address = 200)
+
+    async with busy_logger(self.multiplexer.queue):
+      valid = asyncio.create_task(self.read(1, 190, 10))
+      invalid = asyncio.create_task(self.coalescer.exchange(make_read(2, 198, 5), 1))
+      await asyncio.sleep(0.01)
+
+    # Both reads are sent again alone
+    self.assertEqual(await valid, list(range(190, 200)))
+    response = await invalid
+    assert response is not None
+    self.assertEqual(DeyeProxyFrame.get_sequence(response), 2)
+    self.assertEqual(response[DeyeProxyModbus.response_offset + 1], DeyeProxyModbus.read_holding_registers | 0x80)
+    self.assertEqual(sorted((r.start, r.count) for r in self.fake_logger.requests), [(190, 10), (190, 13), (198, 5)])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,298 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+# Output and baseline paths are relative to the initial working directory
+start_path = Path.cwd()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+
+from common_modules import import_dirs
+
+import_dirs(
+  current_path,
+  [
+    'src',
+    os.path.join(base_path, 'deye'),
+    os.path.join(base_path, 'common'),
+  ],
+)
+
+from deye_utils import DeyeUtils
+from deye_loggers import DeyeLoggers
+from deye_test_utils import DeyeTestUtils
+from solarman_test_server import SolarmanTestServer
+from deye_registers_holder_async import DeyeRegistersHolderAsync
+
+# Read path benchmark.
+#
+# Starts N solarman test servers with injected per-frame latency and reads all registers
+# with DeyeRegistersHolderAsync without cache, with local cache and with remote cache
+# (local deyestorage). Reports latency percentiles, frames and bytes per read as JSON
+# and compares the results with a saved baseline.
+#
+# Usage:
+#   python -u test/src/deye_read_benchmark.py --output bench.json
+#   python -u test/src/deye_read_benchmark.py --baseline bench.json --max-regression 10
+
+modes = ['none', 'local', 'remote']
+
+def get_percentile(values: List[float], percent: float) -> float:
+  """
+  Nearest-rank percentile
+  """
+  if not values:
+    return 0.0
+
+  ordered = sorted(values)
+  rank = max(1, -(-len(ordered) * percent // 100))
+  return ordered[int(rank) - 1]
+
+def get_args(args: List[str]) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description = 'Deye read path benchmark')
+
+  def int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item.strip()]
+
+  def mode_list(value: str) -> List[str]:
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    for item in items:
+      if item not in modes:
+        raise argparse.ArgumentTypeError(f"unknown mode '{item}', should be one of: {', '.join(modes)}")
+    return items
+
+  parser.add_argument('--inverters', type = int_list, default = [1, 4, 16], help = 'inverter counts, max 16')
+  parser.add_argument('--modes', type = mode_list, default = modes, help = 'cache modes')
+  parser.add_argument('--reads', type = int, default = 20, help = 'measured read rounds')
+  parser.add_argument('--warmup', type = int, default = 1, help = 'read rounds before measuring')
+  parser.add_argument('--concurrency', type = int, default = 1, help = 'concurrent holders in each round')
+  parser.add_argument('--interval', type = float, default = 0, help = 'pause between rounds in seconds')
+  parser.add_argument('--latency-ms', type = float, default = 50, help = 'server delay before every response')
+  parser.add_argument('--jitter-ms', type = float, default = 20, help = 'random addition to the delay')
+  parser.add_argument('--multi-connection', action = 'store_true', help = 'allow concurrent logger connections')
+  parser.add_argument('--caching-time', type = int, default = 5, help = 'caching time in cache modes')
+  parser.add_argument('--memory-cache-size', type = int, default = 0)
+  parser.add_argument('--socket-timeout', type = int, default = 10)
+  parser.add_argument('--output', help = 'file to save results to')
+  parser.add_argument('--baseline', help = 'file with saved results to compare to')
+  parser.add_argument('--max-regression', type = float, default = 10, help = 'allowed p95 regression in percent')
+  parser.add_argument('-v', '--verbose', action = 'store_true')
+
+  parsed = parser.parse_args(args)
+
+  for count in parsed.inverters:
+    if not 1 <= count <= 16:
+      parser.error('inverters count should be from 1 to 16')
+
+  return parsed
+
+async def read_round(
+  holders_count: int,
+  kwargs: Dict[str, Any],
+  latencies: List[float],
+) -> int:
+  """
+  Reads registers with concurrent holders, returns number of failed reads
+  """
+  async def read_once() -> None:
+    holder = DeyeRegistersHolderAsync(loggers = DeyeLoggers().loggers, **kwargs)
+    start = time.perf_counter()
+    try:
+      await holder.read_registers()
+    finally:
+      holder.disconnect()
+    latencies.append((time.perf_counter() - start) * 1000)
+
+  results = await asyncio.gather(*[read_once() for _ in range(holders_count)], return_exceptions = True)
+
+  errors = [result for result in results if isinstance(result, BaseException)]
+  for error in errors:
+    logging.getLogger().error(f'Read failed: {error}')
+
+  return len(errors)
+
+def reset_stats(servers: List[SolarmanTestServer]) -> None:
+  for server in servers:
+    server.reset_stats()
+
+async def run_case(
+  args: argparse.Namespace,
+  mode: str,
+  inverters_count: int,
+) -> Dict[str, Any]:
+  log = logging.getLogger()
+
+  DeyeTestUtils.setup_test_environment(log_name = Path(__file__).stem, inverters_count = inverters_count)
+  if mode == 'remote':
+    DeyeTestUtils.turn_on_remote_cache()
+
+  kwargs: Dict[str, Any] = {
+    'name': 'benchmark',
+    'caching_time': 0 if mode == 'none' else args.caching_time,
+    'memory_cache_size': args.memory_cache_size,
+    'socket_timeout': args.socket_timeout,
+    'verbose': args.verbose,
+  }
+
+  log.warning(f'Running {mode} mode with {inverters_count} inverters...')
+
+  async with DeyeTestUtils.solarman_servers(DeyeLoggers().loggers) as servers:
+    for server in servers:
+      server.set_sequential_mode(True)
+      server.set_latency(args.latency_ms, args.jitter_ms)
+      server.set_single_connection(not args.multi_connection)
+
+    # Start from the empty cache
+    if mode != 'none':
+      holder = DeyeRegistersHolderAsync(loggers = DeyeLoggers().loggers, **kwargs)
+      try:
+        await holder.reset_cache()
+      finally:
+        holder.disconnect()
+
+    for _ in range(args.warmup):
+      await read_round(args.concurrency, kwargs, [])
+
+    reset_stats(servers)
+
+    latencies: List[float] = []
+    errors = 0
+
+    start = time.perf_counter()
+    for _ in range(args.reads):
+      errors += await read_round(args.concurrency, kwargs, latencies)
+      if args.interval > 0:
+        await asyncio.sleep(args.interval)
+    duration = time.perf_counter() - start
+
+    stats = [server.stats for server in servers]
+
+  reads = max(1, len(latencies))
+  frames = sum(stat.frames for stat in stats)
+
+  return {
+    'mode': mode,
+    'inverters': inverters_count,
+    'reads': len(latencies),
+    'errors': errors,
+    'duration_s': round(duration, 3),
+    'latency_ms': {
+      'p50': round(get_percentile(latencies, 50), 2),
+      'p95': round(get_percentile(latencies, 95), 2),
+      'p99': round(get_percentile(latencies, 99), 2),
+      'max': round(max(latencies, default = 0), 2),
+    },
+    'frames': frames,
+    'frames_per_read': round(frames / reads, 2),
+    'connections_per_read': round(sum(stat.connections for stat in stats) / reads, 2),
+    'bytes_received': sum(stat.bytes_received for stat in stats),
+    'bytes_sent': sum(stat.bytes_sent for stat in stats),
+    'bytes_per_read': round(sum(stat.bytes_total for stat in stats) / reads, 1),
+  }
+
+def compare_with_baseline(
+  results: List[Dict[str, Any]],
+  baseline: Dict[str, Any],
+  max_regression: float,
+) -> List[str]:
+  """
+  Adds comparison with the baseline to results, returns descriptions of regressions
+  """
+  baseline_results = {(item['mode'], item['inverters']): item for item in baseline.get('results', [])}
+  regressions: List[str] = []
+
+  def get_change(current: float, base: float) -> Optional[float]:
+    return round((current - base) / base * 100, 1) if base else None
+
+  for result in results:
+    base = baseline_results.get((result['mode'], result['inverters']))
+    if base is None:
+      continue
+
+    comparison = {
+      f'latency_{name}_change_percent': get_change(result['latency_ms'][name], base['latency_ms'][name])
+      for name in ('p50', 'p95', 'p99')
+    }
+
+    comparison['frames_per_read_change_percent'] = get_change(result['frames_per_read'], base['frames_per_read'])
+    comparison['bytes_per_read_change_percent'] = get_change(result['bytes_per_read'], base['bytes_per_read'])
+    result['baseline'] = comparison
+
+    for key in ('latency_p95_change_percent', 'frames_per_read_change_percent'):
+      change = comparison[key]
+      if change is not None and change > max_regression:
+        regressions.append(f"{result['mode']} mode with {result['inverters']} inverters: {key} = {change}")
+
+  return regressions
+
+async def main(argv: List[str]) -> int:
+  args = get_args(argv)
+
+  logging.basicConfig(
+    level = logging.INFO if args.verbose else logging.WARNING,
+    format = "[%(asctime)s.%(msecs)03d] [%(levelname)s] %(message)s",
+    datefmt = DeyeUtils.time_format_str,
+  )
+
+  log = logging.getLogger()
+
+  DeyeTestUtils.setup_test_environment(log_name = Path(__file__).stem, inverters_count = max(args.inverters))
+  if not DeyeLoggers().is_test_loggers:
+    log.error('ERROR: your loggers are not test loggers')
+    return 1
+
+  results: List[Dict[str, Any]] = []
+
+  for mode in args.modes:
+    for inverters_count in args.inverters:
+      if mode == 'remote':
+        with DeyeTestUtils.storage_server():
+          results.append(await run_case(args, mode, inverters_count))
+      else:
+        results.append(await run_case(args, mode, inverters_count))
+
+  report: Dict[str, Any] = {
+    'config': {
+      'reads': args.reads,
+      'warmup': args.warmup,
+      'concurrency': args.concurrency,
+      'interval_s': args.interval,
+      'latency_ms': args.latency_ms,
+      'jitter_ms': args.jitter_ms,
+      'single_connection': not args.multi_connection,
+      'caching_time': args.caching_time,
+      'memory_cache_size': args.memory_cache_size,
+    },
+    'results': results,
+  }
+
+  regressions: List[str] = []
+  if args.baseline:
+    with open(start_path / args.baseline, 'r', encoding = 'utf-8') as f:
+      regressions = compare_with_baseline(results, json.load(f), args.max_regression)
+
+  output = json.dumps(report, indent = 2)
+  print(output)
+
+  if args.output:
+    with open(start_path / args.output, 'w', encoding = 'utf-8') as f:
+      f.write(output)
+
+  for regression in regressions:
+    log.error(f'Regression: {regression}')
+
+  return 1 if regressions or any(result['errors'] for result in results) else 0
+
+if __name__ == "__main__":
+  sys.exit(asyncio.run(main(sys.argv[1:])))
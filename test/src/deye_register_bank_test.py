@@ -0,0 +1,89 @@
+import os
+import sys
+import unittest
+
+from typing import List
+from pathlib import Path
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+
+from common_modules import import_dirs
+
+import_dirs(
+  current_path,
+  [
+    os.path.join(base_path, 'common'),
+    os.path.join(base_path, 'deye/src'),
+  ],
+)
+
+from deye_register_bank import DeyeRegisterBank
+from deye_register_cache_data import DeyeRegisterCacheData
+
+class TestDeyeRegisterBank(unittest.TestCase):
+  def setUp(self):
+    self.bank = DeyeRegisterBank()
+
+  def make_register(self, address: int, values: List[int]) -> DeyeRegisterCacheData:
+    return DeyeRegisterCacheData(
+      address = address,
+      quantity = len(values),
+      caching_time = 0,
+      values = values,
+    )
+
+  def test_empty_bank(self):
+    self.assertIsNone(self.bank.get_view(0, 1))
+    self.assertEqual(self.bank.get_values(10, 3), [0, 0, 0])
+    self.assertEqual(len(self.bank), 0)
+
+  def test_exact_register(self):
+    self.bank.load([self.make_register(100, [1, 2, 3])])
+    self.assertEqual(self.bank.get_view(100, 3).tolist(), [1, 2, 3])
+    self.assertEqual(self.bank.get_values(101, 2), [2, 3])
+
+  def test_register_read_in_pieces(self):
+    self.bank.load([
+      self.make_register(10, [1, 2]),
+      self.make_register(12, [3, 4]),
+      self.make_register(50, [9]),
+    ])
+
+    # Adjacent registers are merged, so view covers both of them
+    self.assertEqual(self.bank.get_view(11, 2).tolist(), [2, 3])
+    self.assertEqual(self.bank.get_values(50, 1), [9])
+    self.assertEqual(len(self.bank), 5)
+
+  def test_missing_values_are_zeros(self):
+    self.bank.load([
+      self.make_register(10, [1, 2]),
+      self.make_register(14, [5, 6]),
+    ])
+
+    self.assertIsNone(self.bank.get_view(10, 6))
+    self.assertEqual(self.bank.get_values(8, 10), [0, 0, 1, 2, 0, 0, 5, 6, 0, 0])
+
+  def test_later_register_wins(self):
+    self.bank.load([
+      self.make_register(20, [1, 2, 3, 4]),
+      self.make_register(21, [7, 8]),
+    ])
+
+    self.assertEqual(self.bank.get_values(20, 4), [1, 7, 8, 4])
+
+  def test_values_are_unsigned(self):
+    self.bank.load([self.make_register(0, [-1, 65535, 1])])
+    self.assertEqual(self.bank.get_values(0, 3), [65535, 65535, 1])
+
+  def test_clear(self):
+    self.bank.load([self.make_register(0, [1])])
+    self.bank.clear()
+    self.assertIsNone(self.bank.get_view(0, 1))
+
+if __name__ == '__main__':
+  unittest.main()
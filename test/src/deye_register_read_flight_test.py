@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import asyncio
+import unittest
+
+from pathlib import Path
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+
+from common_modules import import_dirs
+
+import_dirs(
+  current_path,
+  [
+    os.path.join(base_path, 'common'),
+    os.path.join(base_path, 'deye/src'),
+  ],
+)
+
+from deye_register_cache_data import DeyeRegisterCacheData
+from deye_register_read_flight_async import DeyeRegisterReadFlightAsync
+
+def make_registers(*specs):
+  return {
+    address: DeyeRegisterCacheData(
+      address = address,
+      quantity = quantity,
+      caching_time = caching_time,
+    )
+    for address, quantity, caching_time in specs
+  }
+
+def make_results(registers):
+  return {
+    addr: DeyeRegisterCacheData(
+      address = addr,
+      quantity = reg.quantity,
+      caching_time = reg.caching_time,
+      read_ts = time.time(),
+      values = list(range(addr, addr + reg.quantity)),
+    )
+    for addr, reg in registers.items()
+  }
+
+class TestDeyeRegisterReadFlight(unittest.IsolatedAsyncioTestCase):
+  async def test_concurrent_reads_are_coalesced(self):
+    """
+    N concurrent readers of the same registers cause only one read.
+    """
+    registers = make_registers((100, 2, 10), (200, 1, 10))
+    reads = 0
+
+    async def reader():
+      nonlocal reads
+      flight = DeyeRegisterReadFlightAsync.start("inv", registers, stale_time = 0, use_cache = True)
+
+      own = {}
+      if flight.own_registers:
+        reads += 1
+        await asyncio.sleep(0.05)
+        own = make_results(flight.own_registers)
+      flight.complete(own)
+
+      joined, missing = await flight.get_joined_registers()
+      self.assertEqual(missing, {})
+      return {**joined, **own}
+
+    results = await asyncio.gather(*[reader() for _ in range(8)])
+
+    self.assertEqual(reads, 1)
+    for result in results:
+      self.assertEqual(result[100].values, [100, 101])
+      self.assertEqual(result[200].values, [200])
+
+  async def test_overlapping_reads(self):
+    """
+    Only registers not being read are read by the next reader, the rest are shared.
+    """
+    first = DeyeRegisterReadFlightAsync.start("inv", make_registers((100, 2, 10), (200, 2, 10)), 0, True)
+
+    second_registers = make_registers((100, 1, 10), (200, 3, 10), (300, 1, 10))
+    second = DeyeRegisterReadFlightAsync.start("inv", second_registers, 0, True)
+
+    # Shorter register is shared, longer and new ones should be read
+    self.assertEqual(sorted(second.own_registers.keys()), [200, 300])
+    self.assertEqual(second.joined_count, 1)
+
+    first.complete(make_results(first.own_registers))
+    second.complete(make_results(second.own_registers))
+
+    joined, missing = await second.get_joined_registers()
+    self.assertEqual(missing, {})
+    self.assertEqual(joined[100].quantity, 1)
+    self.assertEqual(joined[100].values, [100])
+
+  async def test_freshness_requirement(self):
+    """
+    Reads accepting older values are not shared with readers requiring fresher values.
+    """
+    registers = make_registers((100, 1, 60))
+    first = DeyeRegisterReadFlightAsync.start("inv", registers, stale_time = 0, use_cache = True)
+
+    # Fresher value is required
+    second = DeyeRegisterReadFlightAsync.start("inv", make_registers((100, 1, 5)), 0, True)
+    self.assertIn(100, second.own_registers)
+
+    # Inverter only reader requires the freshest value
+    third = DeyeRegisterReadFlightAsync.start("inv", registers, stale_time = 0, use_cache = False)
+    self.assertIn(100, third.own_registers)
+
+    # Reader accepting stale values can join
+    fourth = DeyeRegisterReadFlightAsync.start("inv", registers, stale_time = 60, use_cache = True)
+    self.assertEqual(fourth.own_registers, {})
+
+    # Other inverters are not shared
+    fifth = DeyeRegisterReadFlightAsync.start("other", registers, 0, True)
+    self.assertIn(100, fifth.own_registers)
+
+    for flight in (first, second, third, fourth, fifth):
+      flight.complete({})
+
+  async def test_error_is_shared(self):
+    registers = make_registers((100, 1, 10))
+    first = DeyeRegisterReadFlightAsync.start("inv", registers, 0, True)
+    second = DeyeRegisterReadFlightAsync.start("inv", registers, 0, True)
+
+    first.fail(RuntimeError("inverter is not responding"))
+    second.complete({})
+
+    with self.assertRaises(RuntimeError):
+      await second.get_joined_registers()
+
+  async def test_cancelled_read_is_read_by_joined(self):
+    registers = make_registers((100, 1, 10))
+    first = DeyeRegisterReadFlightAsync.start("inv", registers, 0, True)
+    second = DeyeRegisterReadFlightAsync.start("inv", registers, 0, True)
+
+    first.fail(asyncio.CancelledError())
+    second.complete({})
+
+    joined, missing = await second.get_joined_registers()
+    self.assertEqual(joined, {})
+    self.assertEqual(list(missing.keys()), [100])
+
+  async def test_finished_reads_are_not_joined(self):
+    registers = make_registers((100, 1, 10))
+    first = DeyeRegisterReadFlightAsync.start("inv", registers, 0, True)
+    first.complete(make_results(registers))
+
+    self.assertFalse(DeyeRegisterReadFlightAsync.can_join_all("inv", registers, 0, True))
+
+    second = DeyeRegisterReadFlightAsync.start("inv", registers, 0, True)
+    self.assertIn(100, second.own_registers)
+    second.complete({})
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,117 @@
+import os
+import sys
+import unittest
+
+from typing import Dict, List
+from pathlib import Path
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+
+from common_modules import import_dirs
+
+import_dirs(
+  current_path,
+  [
+    os.path.join(base_path, 'common'),
+    os.path.join(base_path, 'deye/src'),
+  ],
+)
+
+from deye_register_cache_data import DeyeRegisterCacheData
+from deye_modbus_cost_model import DeyeModbusCostModel
+from deye_register_read_planner import DeyeRegisterReadPlanner
+
+class TestDeyeRegisterReadPlanner(unittest.TestCase):
+  def make_registers(self, items: List[List[int]]) -> Dict[int, DeyeRegisterCacheData]:
+    return {
+      addr: DeyeRegisterCacheData(
+        address = addr,
+        quantity = quantity,
+        caching_time = 0,
+      )
+      for addr, quantity in items
+    }
+
+  def make_planner(self, request_cost_ms: float, register_cost_ms: float) -> DeyeRegisterReadPlanner:
+    return DeyeRegisterReadPlanner(
+      max_register_count = 120,
+      cost_model = DeyeModbusCostModel(
+        request_cost_ms = request_cost_ms,
+        register_cost_ms = register_cost_ms,
+      ),
+    )
+
+  def test_empty(self):
+    plan = self.make_planner(250, 2.5).plan({})
+    self.assertEqual(plan.requests_count, 0)
+    self.assertEqual(plan.registers_count, 0)
+    self.assertEqual(plan.predicted_cost_ms, 0)
+
+  def test_gap_cheaper_than_request(self):
+    """
+    Small gap between registers should be read within one request
+    """
+    plan = self.make_planner(250, 2.5).plan(self.make_registers([[100, 2], [150, 1]]))
+    self.assertEqual(plan.requests_count, 1)
+    self.assertEqual(plan.registers_count, 51)
+    self.assertAlmostEqual(plan.predicted_cost_ms, 250 + 51 * 2.5)
+
+  def test_gap_more_expensive_than_request(self):
+    """
+    Large gap between registers should be skipped with an extra request
+    """
+    plan = self.make_planner(10, 2.5).plan(self.make_registers([[100, 2], [150, 1]]))
+    self.assertEqual(plan.requests_count, 2)
+    self.assertEqual(plan.registers_count, 3)
+    self.assertAlmostEqual(plan.predicted_cost_ms, 2 * 10 + 3 * 2.5)
+
+  def test_max_register_count(self):
+    """
+    Requests should never be longer than max register count
+    """
+    registers = self.make_registers([[addr, 10] for addr in range(0, 500, 10)])
+    plan = self.make_planner(1000, 0.1).plan(registers)
+
+    self.assertEqual(plan.requests_count, 5)
+    for group in plan.groups:
+      self.assertLessEqual(plan.get_group_quantity(group), 120)
+
+  def test_better_than_greedy(self):
+    """
+    Greedy packing would read [0..119] and then [200..225] (146 registers in 2 requests).
+    Optimal plan reads [0..1] and then [110..225] (118 registers in 2 requests)
+    """
+    registers = self.make_registers([[0, 2], [110, 10], [200, 2], [225, 1]])
+    plan = self.make_planner(300, 2).plan(registers)
+
+    self.assertEqual(plan.requests_count, 2)
+    self.assertEqual([reg.address for reg in plan.groups[0]], [0])
+    self.assertEqual([reg.address for reg in plan.groups[1]], [110, 200, 225])
+
+  def test_all_registers_planned_once(self):
+    registers = self.make_registers([[addr, 3] for addr in range(0, 1000, 37)])
+    plan = self.make_planner(250, 2.5).plan(registers)
+
+    planned = [reg.address for group in plan.groups for reg in group]
+    self.assertEqual(planned, sorted(registers.keys()))
+
+  def test_overlapping_registers(self):
+    registers = self.make_registers([[100, 10], [105, 1], [109, 5]])
+    plan = self.make_planner(250, 2.5).plan(registers)
+
+    self.assertEqual(plan.requests_count, 1)
+    self.assertEqual(plan.registers_count, 14)
+
+  def test_cost_model_observe(self):
+    model = DeyeModbusCostModel(request_cost_ms = 100, register_cost_ms = 1, smoothing = 0.5)
+    model.observe(quantity = 10, duration_ms = 310)
+    self.assertAlmostEqual(model.request_cost_ms, 200)
+    self.assertAlmostEqual(model.estimate(20), 220)
+
+if __name__ == "__main__":
+  unittest.main(verbosity = 2)
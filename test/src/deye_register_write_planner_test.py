@@ -0,0 +1,90 @@
+import os
+import sys
+import unittest
+
+from typing import List
+from pathlib import Path
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+
+from common_modules import import_dirs
+
+import_dirs(
+  current_path,
+  [
+    os.path.join(base_path, 'common'),
+    os.path.join(base_path, 'deye/src'),
+  ],
+)
+
+from deye_register_cache_data import DeyeRegisterCacheData
+from deye_register_write_planner import DeyeRegisterWritePlanner
+
+class TestDeyeRegisterWritePlanner(unittest.TestCase):
+  def setUp(self):
+    self.planner = DeyeRegisterWritePlanner(max_register_count = 123)
+
+  def make_register(self, address: int, values: List[int]) -> DeyeRegisterCacheData:
+    return DeyeRegisterCacheData(
+      address = address,
+      quantity = len(values),
+      caching_time = 0,
+      values = values,
+    )
+
+  def plan(self, registers: List[DeyeRegisterCacheData]) -> List[List[int]]:
+    frames = self.planner.plan({reg.address: reg for reg in registers})
+    return [[frame.address] + frame.values for frame in frames]
+
+  def test_empty(self):
+    self.assertEqual(self.plan([]), [])
+
+  def test_time_of_use_layout(self):
+    """
+    Time of use writes: weekly 248, times 250, powers 256, socs 268, charges 274
+    """
+    registers = [
+      self.make_register(274, [1] * 6),
+      self.make_register(250, [2] * 6),
+      self.make_register(256, [3] * 6),
+      self.make_register(268, [4] * 6),
+      self.make_register(248, [5]),
+    ]
+
+    self.assertEqual(self.plan(registers), [
+      [248, 5],
+      [250] + [2] * 6 + [3] * 6,
+      [268] + [4] * 6 + [1] * 6,
+    ])
+
+  def test_gap_not_merged(self):
+    registers = [
+      self.make_register(100, [1, 2]),
+      self.make_register(103, [3]),
+    ]
+
+    self.assertEqual(self.plan(registers), [[100, 1, 2], [103, 3]])
+
+  def test_overlapping_later_wins(self):
+    registers = [
+      self.make_register(100, [1, 1, 1, 1]),
+      self.make_register(102, [2, 2, 2]),
+    ]
+
+    self.assertEqual(self.plan(registers), [[100, 1, 1, 2, 2, 2]])
+
+  def test_max_register_count(self):
+    registers = [self.make_register(addr, [addr] * 10) for addr in range(0, 300, 10)]
+    frames = self.planner.plan({reg.address: reg for reg in registers})
+
+    self.assertEqual([frame.quantity for frame in frames], [123, 123, 54])
+    self.assertEqual([frame.address for frame in frames], [0, 123, 246])
+    self.assertEqual(frames[1].values[0], 120)
+
+if __name__ == "__main__":
+  unittest.main(verbosity = 2)
@@ -27,6 +27,7 @@ import_dirs(
 
 from deye_exceptions import DeyeCacheException
 from deye_register_cache_data import DeyeRegisterCacheData
+from deye_registers_cache_file import DeyeRegistersCacheFile
 from deye_registers_local_cache_manager import DeyeRegistersLocalCacheManager
 
 class TestDeyeRegistersLocalCacheManager(unittest.TestCase):
@@ -53,7 +54,7 @@ class TestDeyeRegistersLocalCacheManager(unittest.TestCase):
     safe_name = self.get_safe_file_name(self.name)
 
     # Path to the file created by the manager
-    self.expected_file_path = os.path.join(self.temp_dir.name, f"registers-cache-{safe_name}-{self.serial}.json")
+    self.expected_file_path = os.path.join(self.temp_dir.name, f"registers-cache-{safe_name}-{self.serial}.bin")
 
     # Sample register for base logic testing
     self.reg_100 = DeyeRegisterCacheData(
@@ -92,6 +93,46 @@ class TestDeyeRegistersLocalCacheManager(unittest.TestCase):
     self.assertEqual(results[100].values, [42])
     self.assertEqual(results[100].address, 100)
 
+  def test_stale_registers_within_stale_time(self):
+    """
+    Verify that expired registers are returned only within stale_time and carry their read timestamp.
+    """
+    read_ts = time.time()
+    reg = DeyeRegisterCacheData(
+      address = 200,
+      quantity = 1,
+      caching_time = 5,
+      values = [7],
+      read_ts = read_ts,
+    )
+
+    self.cache_manager.save_to_cache({200: reg})
+
+    # 10 seconds later the register is expired, but still within stale time
+    current_ts = read_ts + 10
+
+    results = self.cache_manager.get_cached_registers(
+      registers_to_check = {200: reg},
+      current_ts = current_ts,
+    )
+    self.assertNotIn(200, results, "Expired register should be skipped without stale_time")
+
+    results = self.cache_manager.get_cached_registers(
+      registers_to_check = {200: reg},
+      current_ts = current_ts,
+      stale_time = 60,
+    )
+    self.assertIn(200, results, "Expired register should be returned within stale_time")
+    self.assertEqual(results[200].values, [7])
+    self.assertAlmostEqual(results[200].read_ts, read_ts, delta = 0.001)
+
+    results = self.cache_manager.get_cached_registers(
+      registers_to_check = {200: reg},
+      current_ts = read_ts + 100,
+      stale_time = 60,
+    )
+    self.assertNotIn(200, results, "Register should be skipped after stale_time")
+
   def test_remote_ttl_enforcement_mixed_data(self):
     """
     BASE LOGIC: Verify that only expired registers are filtered out, 
@@ -193,21 +234,60 @@ class TestDeyeRegistersLocalCacheManager(unittest.TestCase):
     self.assertEqual(results[100].values, [42])
     self.assertEqual(results[200].values, [84])
 
-  def test_malformed_json_exception(self):
+  def test_malformed_file_as_empty_cache(self):
     """
-    If the file is corrupted, the base class must raise DeyeCacheException.
+    If the file is corrupted, it is treated as an empty cache and reinitialized on the next save.
     """
     # Manually corrupt the file
     with open(self.expected_file_path, 'w') as f:
       f.write("{ broken json ...")
 
-    with self.assertRaises(DeyeCacheException) as cm:
-      self.cache_manager.get_cached_registers(
-        registers_to_check = {100: self.reg_100},
-        current_ts = time.time(),
-      )
+    results = self.cache_manager.get_cached_registers(
+      registers_to_check = {100: self.reg_100},
+      current_ts = time.time(),
+    )
+
+    self.assertEqual(results, {})
 
-    self.assertIn("json parse error", str(cm.exception))
+    self.cache_manager.save_to_cache({100: self.reg_100})
+
+    results = self.cache_manager.get_cached_registers(
+      registers_to_check = {100: self.reg_100},
+      current_ts = time.time(),
+    )
+
+    self.assertEqual(results[100].values, [42])
+
+  def test_save_touches_only_saved_slots(self):
+    """
+    Saving a register doesn't rewrite other registers in the file.
+    """
+    reg_200 = DeyeRegisterCacheData(
+      address = 200,
+      quantity = 1,
+      caching_time = 60,
+      values = [84],
+      read_ts = time.time(),
+    )
+
+    self.cache_manager.save_to_cache({100: self.reg_100, 200: reg_200})
+
+    with open(self.expected_file_path, 'r+b') as f:
+      with DeyeRegistersCacheFile.map(f, writable = True) as cache_file:
+        slots = cache_file.read([100, 200])
+        cache_file.write({200: {"ts_label": slots[200]["ts_label"] + 1, "data": [85]}})
+        self.assertEqual(cache_file.read([100]), {100: slots[100]})
+
+    results = self.cache_manager.get_cached_registers(
+      registers_to_check = {
+        100: self.reg_100,
+        200: reg_200
+      },
+      current_ts = time.time(),
+    )
+
+    self.assertEqual(results[100].values, [42])
+    self.assertEqual(results[200].values, [85])
 
   def test_reset(self):
     """
@@ -1,5 +1,6 @@
 import os
 import re
+import json
 import sys
 import requests
 import time
@@ -104,6 +105,31 @@ class TestDeyeRegistersRemoteCacheManager(unittest.TestCase):
     self.assertEqual(results[self.reg_100.address].values, self.reg_100.values)
     self.assertEqual(results[self.reg_100.address].address, self.reg_100.address)
 
+  def test_remote_get_only_requested_registers(self):
+    """
+    LOGIC: Ensure only registers at requested addresses are downloaded from the server.
+    """
+    reg_200 = DeyeRegisterCacheData(
+      address = 200,
+      quantity = 1,
+      caching_time = 60,
+      values = [456],
+      read_ts = time.time(),
+    )
+
+    self.cache_manager.save_to_cache({**self.reg_100_json, reg_200.address: reg_200})
+
+    content = json.loads(self.cache_manager._get_json(addresses = [self.reg_100.address]))
+    self.assertEqual(list(content["registers"].keys()), [str(self.reg_100.address)])
+
+    results = self.cache_manager.get_cached_registers(
+      registers_to_check = {reg_200.address: reg_200},
+      current_ts = time.time(),
+    )
+
+    self.assertEqual(list(results.keys()), [reg_200.address])
+    self.assertEqual(results[reg_200.address].values, reg_200.values)
+
   def test_remote_404_as_empty_cache(self):
     """
     EDGE CASE: Verify that HTTP 404 from server is handled as "no data" 
@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import unittest
+import tempfile
+
+from pathlib import Path
+from unittest.mock import patch
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+
+from common_modules import import_dirs
+
+import_dirs(
+  current_path,
+  [
+    os.path.join(base_path, 'common'),
+    os.path.join(base_path, 'deye/src'),
+  ],
+)
+
+from deye_register_cache_data import DeyeRegisterCacheData
+from deye_registers_memory_cache import DeyeRegistersMemoryCache
+from deye_registers_local_cache_manager_async import DeyeRegistersLocalCacheManagerAsync
+from deye_registers_tiered_cache_manager_async import DeyeRegistersTieredCacheManagerAsync
+
+class TestDeyeRegistersTieredCacheManager(unittest.IsolatedAsyncioTestCase):
+  # Annotations for mypy
+  temp_dir: tempfile.TemporaryDirectory
+  storage_manager: DeyeRegistersLocalCacheManagerAsync
+  cache_manager: DeyeRegistersTieredCacheManagerAsync
+
+  def setUp(self):
+    self.temp_dir = tempfile.TemporaryDirectory()
+
+    # Redirect local cache files to the temp folder
+    self.patcher = patch('deye_file_lock.DeyeFileLock.lock_path', self.temp_dir.name)
+    self.patcher.start()
+
+    self.storage_manager = DeyeRegistersLocalCacheManagerAsync("tiered_inverter", 1234567)
+    self.cache_manager = DeyeRegistersTieredCacheManagerAsync(
+      cache_manager = self.storage_manager,
+      memory_cache_size = 16,
+    )
+
+    DeyeRegistersMemoryCache.clear(self.cache_manager._cache_key)
+
+    self.reg_100 = DeyeRegisterCacheData(
+      address = 100,
+      quantity = 2,
+      caching_time = 60,
+      values = [1, 2],
+      read_ts = time.time(),
+    )
+
+  async def asyncSetUp(self):
+    # Statistics are process-wide, so start every test from zero
+    await self.cache_manager.reset_cache_hit_rate()
+
+  def tearDown(self):
+    DeyeRegistersMemoryCache.clear(self.cache_manager._cache_key)
+    self.patcher.stop()
+    self.temp_dir.cleanup()
+
+  async def test_write_through(self):
+    """
+    Saved registers are available in both tiers.
+    """
+    await self.cache_manager.save_to_cache({100: self.reg_100})
+
+    storage_results = await self.storage_manager.get_cached_registers({100: self.reg_100}, time.time())
+    self.assertEqual(storage_results[100].values, [1, 2])
+
+    results = await self.cache_manager.get_cached_registers({100: self.reg_100}, time.time())
+    self.assertEqual(results[100].values, [1, 2])
+
+    stats = self.cache_manager.get_tier_stats()
+    self.assertEqual(stats["memory"].hits, 2)
+    self.assertEqual(stats["memory"].misses, 0)
+
+  async def test_storage_results_are_kept_in_memory(self):
+    """
+    Registers got from the underlying cache are served from memory on the next read.
+    """
+    await self.storage_manager.save_to_cache({100: self.reg_100})
+
+    results = await self.cache_manager.get_cached_registers({100: self.reg_100}, time.time())
+    self.assertEqual(results[100].values, [1, 2])
+
+    with patch.object(self.storage_manager, 'get_cached_registers') as storage_read:
+      results = await self.cache_manager.get_cached_registers({100: self.reg_100}, time.time())
+      storage_read.assert_not_called()
+
+    self.assertEqual(results[100].values, [1, 2])
+
+    stats = self.cache_manager.get_tier_stats()
+    self.assertEqual(stats["memory"].hits, 2)
+    self.assertEqual(stats["memory"].misses, 2)
+    self.assertEqual(stats["storage"].hits, 2)
+
+  async def test_expired_registers_are_not_served_from_memory(self):
+    """
+    Memory cache honors caching_time of the registers.
+    """
+    await self.cache_manager.save_to_cache({100: self.reg_100})
+
+    results = await self.cache_manager.get_cached_registers({100: self.reg_100}, time.time() + 120)
+    self.assertEqual(results, {})
+
+  async def test_invalidate_through(self):
+    """
+    Removed registers are removed from memory even if memory cache is disabled for the remover.
+    """
+    await self.cache_manager.save_to_cache({100: self.reg_100})
+
+    remover = DeyeRegistersTieredCacheManagerAsync(
+      cache_manager = self.storage_manager,
+      memory_cache_size = 0,
+    )
+
+    written = DeyeRegisterCacheData(
+      address = 100,
+      quantity = 2,
+      caching_time = 60,
+      values = [3, 4],
+      read_ts = time.time() + 1,
+    )
+
+    await remover.remove_from_cache({100: written})
+
+    results = await self.cache_manager.get_cached_registers({100: self.reg_100}, time.time())
+    self.assertEqual(results, {})
+
+  async def test_reset(self):
+    await self.cache_manager.save_to_cache({100: self.reg_100})
+    await self.cache_manager.reset_cache()
+
+    results = await self.cache_manager.get_cached_registers({100: self.reg_100}, time.time())
+    self.assertEqual(results, {})
+
+  async def test_lru_eviction(self):
+    """
+    Memory cache doesn't grow above its size, least recently used registers are evicted first.
+    """
+    DeyeRegistersMemoryCache.put("lru_test", {addr: {"ts_label": 0, "data": [addr]} for addr in range(16)})
+
+    # Touch the first register, so the second one becomes the oldest
+    DeyeRegistersMemoryCache.get("lru_test", [0])
+    DeyeRegistersMemoryCache.put("lru_test", {100: {"ts_label": 0, "data": [100]}})
+
+    self.assertLessEqual(DeyeRegistersMemoryCache.size(), 16)
+    self.assertIn("0", DeyeRegistersMemoryCache.get("lru_test", [0]))
+    self.assertNotIn("1", DeyeRegistersMemoryCache.get("lru_test", [1]))
+
+    DeyeRegistersMemoryCache.clear("lru_test")
+
+if __name__ == '__main__':
+  unittest.main()
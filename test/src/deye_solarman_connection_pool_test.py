@@ -0,0 +1,184 @@
+import os
+import sys
+import asyncio
+import unittest
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+
+from common_modules import import_dirs
+
+import_dirs(
+  current_path,
+  [
+    os.path.join(base_path, 'common'),
+    os.path.join(base_path, 'deye/src'),
+  ],
+)
+
+from pysolarmanv5 import NoSocketAvailableError, V5FrameError
+from deye_logger import DeyeLogger
+from deye_modbus_solarman_async import DeyeModbusSolarmanAsync
+from deye_solarman_connection_pool_async import DeyeSolarmanConnectionPoolAsync
+
+class FakeWriter:
+  def __init__(self):
+    self.closing = False
+
+  def is_closing(self) -> bool:
+    return self.closing
+
+class FakeModbus:
+  """
+  PySolarmanV5Async replacement which counts connections and raises queued errors
+  """
+  instances: List['FakeModbus'] = []
+
+  def __init__(self, address: str, serial: int, **kwargs):
+    self.writer: Optional[FakeWriter] = None
+    self.reader_task = None
+    self.connected = False
+    self.requests = 0
+    self.errors: List[Exception] = []
+    FakeModbus.instances.append(self)
+
+  async def connect(self) -> None:
+    self.writer = FakeWriter()
+    self.connected = True
+
+  async def disconnect(self) -> None:
+    self.writer = None
+    self.connected = False
+
+  async def read_holding_registers(self, address: int, quantity: int) -> List[int]:
+    self.requests += 1
+    if self.errors:
+      raise self.errors.pop(0)
+    return list(range(address, address + quantity))
+
+class TestDeyeSolarmanConnectionPool(unittest.IsolatedAsyncioTestCase):
+  def setUp(self):
+    FakeModbus.instances = []
+    self.logger = DeyeLogger(name = 'master', address = '127.0.0.1', serial = 1234567890)
+    patcher = patch('deye_solarman_connection_pool_async.PySolarmanV5Async', FakeModbus)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  async def asyncTearDown(self):
+    # Not close_all(), it waits for connections which a failed test didn't release
+    for connection in DeyeSolarmanConnectionPoolAsync._connections.values():
+      await connection.close()
+    DeyeSolarmanConnectionPoolAsync._connections.clear()
+
+  async def acquire(self, **kwargs):
+    return await DeyeSolarmanConnectionPoolAsync.acquire(self.logger, **kwargs)
+
+  async def release(self, reusable: bool = True, **kwargs):
+    await DeyeSolarmanConnectionPoolAsync.release(self.logger, reusable = reusable, **kwargs)
+
+  async def test_reuse(self):
+    modbus1, reused1 = await self.acquire()
+    await self.release()
+    modbus2, reused2 = await self.acquire()
+    await self.release()
+
+    self.assertFalse(reused1)
+    self.assertTrue(reused2)
+    self.assertIs(modbus1, modbus2)
+    self.assertEqual(len(FakeModbus.instances), 1)
+
+  async def test_exclusive_access(self):
+    await self.acquire()
+    second = asyncio.create_task(self.acquire())
+    await asyncio.sleep(0.05)
+    self.assertFalse(second.done())
+
+    await self.release()
+    _, reused = await second
+    await self.release()
+    self.assertTrue(reused)
+
+  async def test_idle_close(self):
+    timeouts: Dict[str, Any] = {'keep_alive_idle_timeout': 0.05}
+    modbus, _ = await self.acquire(**timeouts)
+    await self.release(**timeouts)
+    await asyncio.sleep(0.15)
+
+    self.assertFalse(modbus.connected)
+
+    _, reused = await self.acquire(**timeouts)
+    await self.release(**timeouts)
+    self.assertFalse(reused)
+    self.assertEqual(len(FakeModbus.instances), 2)
+
+  async def test_max_lifetime(self):
+    timeouts: Dict[str, Any] = {'keep_alive_idle_timeout': 10, 'keep_alive_max_lifetime': 0.05}
+    modbus, _ = await self.acquire(**timeouts)
+    await self.release(**timeouts)
+    await asyncio.sleep(0.1)
+
+    _, reused = await self.acquire(**timeouts)
+    await self.release(**timeouts)
+    self.assertFalse(reused)
+    self.assertFalse(modbus.connected)
+
+  async def test_closed_by_remote(self):
+    modbus, _ = await self.acquire()
+    await self.release()
+    modbus.writer.closing = True
+
+    _, reused = await self.acquire()
+    await self.release()
+    self.assertFalse(reused)
+
+  async def test_no_reuse_after_failure(self):
+    modbus, _ = await self.acquire()
+    await self.release(reusable = False)
+    self.assertFalse(modbus.connected)
+
+    _, reused = await self.acquire()
+    await self.release()
+    self.assertFalse(reused)
+
+  async def test_retry_on_connection_error(self):
+    solarman = DeyeModbusSolarmanAsync(self.logger, keep_alive = True)
+    self.assertEqual(await solarman.read_holding_registers(10, 2), [10, 11])
+    await solarman.disconnect()
+
+    FakeModbus.instances[0].errors.append(NoSocketAvailableError('Connection already closed'))
+    self.assertEqual(await solarman.read_holding_registers(10, 2), [10, 11])
+    await solarman.disconnect()
+
+    self.assertEqual(len(FakeModbus.instances), 2)
+    self.assertFalse(FakeModbus.instances[0].connected)
+
+  async def test_no_retry_on_error_reply(self):
+    solarman = DeyeModbusSolarmanAsync(self.logger, keep_alive = True)
+    await solarman.read_holding_registers(10, 2)
+    await solarman.disconnect()
+
+    modbus = FakeModbus.instances[0]
+    modbus.errors.append(V5FrameError('V5 frame contains invalid sequence number'))
+
+    with self.assertRaises(V5FrameError):
+      await solarman.read_holding_registers(10, 2)
+    await solarman.disconnect()
+
+    self.assertEqual(modbus.requests, 2)
+    self.assertEqual(len(FakeModbus.instances), 1)
+
+    # Broken connection is not reused
+    self.assertEqual(await solarman.read_holding_registers(10, 2), [10, 11])
+    await solarman.disconnect()
+    self.assertEqual(len(FakeModbus.instances), 2)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import unittest
+
+from pathlib import Path
+from typing import Dict, List, Optional
+from unittest.mock import patch
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+
+from common_modules import import_dirs
+
+import_dirs(
+  current_path,
+  [
+    os.path.join(base_path, 'common'),
+    os.path.join(base_path, 'deye/src'),
+  ],
+)
+
+from deye_logger import DeyeLogger
+from deye_register_cache_data import DeyeRegisterCacheData
+from deye_register_cache_hit_rate import DeyeRegisterCacheHitRate
+from deye_modbus_interactor_async import DeyeModbusInteractorAsync
+from deye_modbus_solarman_async import DeyeModbusSolarmanAsync
+from deye_registers_base_cache_manager_async import DeyeRegistersBaseCacheManagerAsync
+from deye_registers_tiered_cache_manager_async import DeyeRegistersTieredCacheManagerAsync
+
+class FakeCacheManager(DeyeRegistersBaseCacheManagerAsync):
+  """
+  Cache manager which keeps the cache json in memory
+  """
+  def __init__(self, name: str, serial: int):
+    super().__init__(name, serial)
+    self.json = ''
+
+  async def is_cache_available(self) -> bool:
+    return True
+
+  async def _get_json(self, addresses: Optional[List[int]] = None) -> str:
+    return self.json
+
+  async def _read_json(self) -> str:
+    return self.json
+
+  async def _save_json(self, json_string: str) -> None:
+    self.json = json_string
+
+  async def _reset(self) -> None:
+    self.json = ''
+
+  async def get_cache_hit_rate(self) -> DeyeRegisterCacheHitRate:
+    return DeyeRegisterCacheHitRate.zero()
+
+  async def update_cache_hit_rate(self, got_from_cache: int, got_from_inverter: int) -> DeyeRegisterCacheHitRate:
+    return DeyeRegisterCacheHitRate.zero()
+
+  async def reset_cache_hit_rate(self) -> None:
+    pass
+
+  def get_values(self, address: int) -> List[int]:
+    return json.loads(self.json)["registers"][str(address)]["data"]
+
+class TestDeyeStaleWhileRevalidate(unittest.IsolatedAsyncioTestCase):
+  def setUp(self):
+    self.logger = DeyeLogger(name = 'swr-inverter', address = '127.0.0.1', serial = 1234567890)
+    self.cache_manager = FakeCacheManager(self.logger.name, self.logger.serial)
+    # Inverter reads wait for this event
+    self.inverter_ready = asyncio.Event()
+    self.inverter_error: Optional[Exception] = None
+    self.inverter_reads = 0
+
+    patcher = patch.object(DeyeModbusInteractorAsync, '_can_cache', return_value = True)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def tearDown(self):
+    DeyeModbusInteractorAsync._revalidating.clear()
+
+  def create_interactor(self) -> DeyeModbusInteractorAsync:
+    interactor = DeyeModbusInteractorAsync(
+      logger = self.logger,
+      caching_time = 5,
+      stale_while_revalidate = True,
+      max_stale_time = 60,
+    )
+
+    interactor._cache_manager = DeyeRegistersTieredCacheManagerAsync(
+      cache_manager = self.cache_manager,
+      memory_cache_size = 0,
+    )
+
+    patcher = patch.object(interactor, '_read_from_inverter', self.read_from_inverter)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+    interactor.enqueue_register(100, 2, None)
+    return interactor
+
+  async def read_from_inverter(
+    self,
+    registers: Dict[int, DeyeRegisterCacheData],
+    solarman: Optional[DeyeModbusSolarmanAsync] = None,
+  ) -> Dict[int, DeyeRegisterCacheData]:
+    self.inverter_reads += 1
+    await self.inverter_ready.wait()
+
+    if self.inverter_error is not None:
+      raise self.inverter_error
+
+    return {
+      addr: DeyeRegisterCacheData(
+        address = addr,
+        quantity = reg.quantity,
+        caching_time = reg.caching_time,
+        read_ts = time.time(),
+        values = [addr * 10 + i for i in range(reg.quantity)],
+      )
+      for addr, reg in registers.items()
+    }
+
+  async def save_stale_register(self) -> None:
+    await self.cache_manager.save_to_cache({
+      100: DeyeRegisterCacheData(
+        address = 100,
+        quantity = 2,
+        caching_time = 5,
+        read_ts = time.time() - 10,
+        values = [1, 2],
+      ),
+    })
+
+  def get_refresh_task(self, interactor: DeyeModbusInteractorAsync) -> 'asyncio.Task[None]':
+    return DeyeModbusInteractorAsync._revalidating[(interactor.name, 100)]
+
+  async def test_stale_value_returned_immediately(self):
+    await self.save_stale_register()
+    interactor = self.create_interactor()
+
+    # The inverter doesn't answer yet, but the stale value is returned
+    await asyncio.wait_for(interactor.process_enqueued_registers(), 1)
+    self.assertEqual(interactor.read_register(100, 2), [1, 2])
+
+    task = self.get_refresh_task(interactor)
+    self.assertFalse(task.done())
+
+    self.inverter_ready.set()
+    await task
+
+    self.assertEqual(self.inverter_reads, 1)
+    self.assertEqual(self.cache_manager.get_values(100), [1000, 1001])
+    self.assertNotIn((interactor.name, 100), DeyeModbusInteractorAsync._revalidating)
+
+  async def test_one_refresh_for_concurrent_callers(self):
+    await self.save_stale_register()
+    interactors = [self.create_interactor() for _ in range(3)]
+
+    for interactor in interactors:
+      await asyncio.wait_for(interactor.process_enqueued_registers(), 1)
+      self.assertEqual(interactor.read_register(100, 2), [1, 2])
+
+    self.inverter_ready.set()
+    await self.get_refresh_task(interactors[0])
+    self.assertEqual(self.inverter_reads, 1)
+
+    # Refreshed value is fresh, so no new refresh is scheduled
+    interactor = self.create_interactor()
+    await interactor.process_enqueued_registers()
+    self.assertEqual(interactor.read_register(100, 2), [1000, 1001])
+    self.assertEqual(self.inverter_reads, 1)
+    self.assertNotIn((interactor.name, 100), DeyeModbusInteractorAsync._revalidating)
+
+  async def test_failed_refresh(self):
+    await self.save_stale_register()
+    self.inverter_error = RuntimeError('inverter is not available')
+    self.inverter_ready.set()
+
+    interactor = self.create_interactor()
+
+    with self.assertLogs(level = 'WARNING') as logs:
+      await interactor.process_enqueued_registers()
+      await self.get_refresh_task(interactor)
+
+    self.assertEqual(interactor.read_register(100, 2), [1, 2])
+    self.assertTrue(any('background refresh of stale registers failed' in line for line in logs.output))
+    self.assertEqual(self.cache_manager.get_values(100), [1, 2])
+
+    # The failed refresh doesn't block the next one
+    self.inverter_error = None
+    interactor = self.create_interactor()
+    await interactor.process_enqueued_registers()
+    await self.get_refresh_task(interactor)
+
+    self.assertEqual(self.inverter_reads, 2)
+    self.assertEqual(self.cache_manager.get_values(100), [1000, 1001])
+
+if __name__ == '__main__':
+  unittest.main()
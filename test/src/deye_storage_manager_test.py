@@ -0,0 +1,589 @@
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import random
+import logging
+import tempfile
+import unittest
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from unittest.mock import patch
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+sys.path.append(str((current_path / base_path / 'deyestorage').resolve()))
+
+from common_modules import import_dirs
+
+import_dirs(
+  current_path,
+  [
+    os.path.join(base_path, 'common'),
+  ],
+)
+
+from src.deye_storage_config import DeyeStorageConfig
+from src.deye_storage_manager import DeyeStorageManager
+from src.deye_storage_history import DeyeStorageHistory
+from src.deye_storage_sqlite_backend import DeyeStorageSqliteBackend
+
+class FakeRequest:
+  """
+  Minimal request with the attributes used by DeyeStorageManager
+  """
+  def __init__(self, json_data):
+    self._body = json.dumps(json_data).encode("utf-8")
+    self.headers = {"Content-Length": str(len(self._body))}
+    self.client = None
+
+  async def body(self) -> bytes:
+    return self._body
+
+def get_storage(manager: DeyeStorageManager):
+  return dict(manager._backend.items())
+
+def assert_sizes(test: unittest.TestCase, manager: DeyeStorageManager):
+  """
+  Incrementally maintained sizes should be the same as sizes of serialized entries
+  """
+  stat = manager.get_stat()
+  expected = {key: len(json.dumps(entry).encode("utf-8")) for key, entry in get_storage(manager).items()}
+
+  test.assertEqual(stat["key_bytes_used"], expected)
+  test.assertEqual(stat["bytes_used"], sum(expected.values()))
+
+class TestDeyeStorageManager(unittest.IsolatedAsyncioTestCase):
+  def setUp(self):
+    self.manager = DeyeStorageManager(
+      config = DeyeStorageConfig(),
+      logger = logging.getLogger(),
+    )
+
+  def assert_sizes(self):
+    assert_sizes(self, self.manager)
+
+  async def update(self, key, json_data):
+    await self.manager.update(key, json_data, FakeRequest(json_data))
+
+  async def test_sizes_after_merges(self):
+    rnd = random.Random(42)
+
+    for i in range(300):
+      key = f"inverter-{rnd.randint(1, 3)}"
+      registers = {
+        str(rnd.randint(0, 50)): {
+          "ts_label": i if rnd.random() > 0.1 else 0,
+          "data": [rnd.randint(0, 65535) for _ in range(rnd.randint(0, 4))],
+        }
+        for _ in range(rnd.randint(1, 5))
+      }
+
+      json_data = {"inverter": key, "serial": rnd.randint(1, 10**9), "registers": registers}
+
+      if rnd.random() < 0.1:
+        # Replace nested dictionary with a scalar and back
+        json_data["registers"] = {str(rnd.randint(0, 50)): rnd.choice([None, 1.5, "Текст", [1, {"a": 2}]])}
+
+      await self.update(key, json_data)
+      self.assert_sizes()
+
+  async def test_sizes_after_remove_and_clear(self):
+    await self.update("first", {"a": {"b": 1}})
+    await self.update("second", {"a": [1, 2, 3]})
+    self.assert_sizes()
+
+    await self.manager.remove("first")
+    self.assert_sizes()
+
+    await self.manager.clear()
+    self.assert_sizes()
+    self.assertEqual(self.manager.get_stat()["bytes_used"], 0)
+
+  async def test_sizes_after_average_update(self):
+    await self.manager.update_average("avg", 1, 2, FakeRequest({}))
+    await self.manager.update_average("avg", 0.1, 0.2, FakeRequest({}))
+    self.assert_sizes()
+
+  async def test_raw_body_update(self):
+    request = FakeRequest({"registers": {"100": {"ts_label": 2, "data": [1]}}})
+    await self.manager.update_raw("inverter", request)
+
+    # Stale data is ignored the same way as with parsed body
+    request = FakeRequest({"registers": {"100": {"ts_label": 1, "data": [0]}, "200": {"ts_label": 1}}})
+    await self.manager.update_raw("inverter", request)
+
+    registers = self.manager.get_items("inverter", "registers", None)["registers"]
+    self.assertEqual(registers, {"100": {"ts_label": 2, "data": [1]}, "200": {"ts_label": 1}})
+    self.assert_sizes()
+
+  async def test_raw_body_errors(self):
+    cases = [
+      (b'{"registers": ', 422),
+      (b'[1, 2]', 422),
+      (b'', 422),
+      (b'{"a": "' + b'x' * self.manager._config.MAX_JSON_SIZE + b'"}', 413),
+    ]
+
+    for body, status_code in cases:
+      request = FakeRequest({})
+      request._body = body
+      request.headers = {}
+
+      with self.assertRaises(Exception) as cm:
+        await self.manager.update_raw("inverter", request)
+      self.assertEqual(getattr(cm.exception, "status_code", None), status_code, body[:20])
+
+    # Values accepted by the standard json module are accepted without model validation too
+    request = FakeRequest({})
+    request._body = b'{"value": NaN, "big": 100000000000000000000000}'
+    await self.manager.update_raw("inverter", request)
+    self.assertEqual(self.manager.get("inverter")["big"], 10**23)
+
+  def test_json_size(self):
+    values = [0, -15, 10**30, True, None, 1.5, float("inf"), "", "Текст", "quote \" and \n", [], [1, "a", None],
+              list(range(20)), {"a": [1, {"b": 2}]}]
+
+    for value in values:
+      self.assertEqual(self.manager._get_json_size(value), len(json.dumps(value)), value)
+
+  async def test_versions(self):
+    await self.update("first", {"a": 1})
+    etag = self.manager.get_etag("first")
+    self.assertEqual(self.manager.get_etag("first"), etag)
+
+    await self.update("first", {"a": 2})
+    self.assertNotEqual(self.manager.get_etag("first"), etag)
+
+    # Removed and created again key doesn't get one of the previous versions
+    etag = self.manager.get_etag("first")
+    await self.manager.remove("first")
+    with self.assertRaises(Exception) as cm:
+      self.manager.get_etag("first")
+    self.assertEqual(getattr(cm.exception, "status_code", None), 404)
+
+    await self.update("first", {"a": 2})
+    self.assertNotEqual(self.manager.get_etag("first"), etag)
+
+  async def test_unchanged_update_keeps_version(self):
+    await self.update("first", {"a": 1, "registers": {"100": {"ts_label": 2, "data": [2]}}})
+    etag = self.manager.get_etag("first")
+
+    await self.update("first", {"a": 1, "registers": {"100": {"ts_label": 1, "data": [1]}}})
+    self.assertEqual(self.manager.get_etag("first"), etag)
+    self.assertEqual(get_storage(self.manager)["first"]["data"]["registers"]["100"]["data"], [2])
+
+    await self.update("first", {"registers": {"100": {"ts_label": 3, "data": [3]}}})
+    self.assertNotEqual(self.manager.get_etag("first"), etag)
+    self.assert_sizes()
+
+  async def test_storage_size_limit(self):
+    limit = self.manager._config.MAX_JSON_STORAGE_SIZE
+    chunk = "x" * (self.manager._config.MAX_JSON_SIZE // 2)
+
+    # Storage size is checked before merge, so the last update over the limit succeeds
+    i = 0
+    while self.manager.get_stat()["key_bytes_used"].get("big", 0) <= limit:
+      await self.update("big", {f"value{i}": chunk})
+      i += 1
+
+    self.assert_sizes()
+
+    with self.assertRaises(Exception) as cm:
+      await self.update("big", {"other": 1})
+
+    self.assertEqual(getattr(cm.exception, "status_code", None), 413)
+
+class TestDeyeStorageManagerExpiry(unittest.IsolatedAsyncioTestCase):
+  def setUp(self):
+    self.records: List[Tuple[Dict[str, Any], Optional[bytes]]] = []
+    self.manager = DeyeStorageManager(
+      config = DeyeStorageConfig(),
+      logger = logging.getLogger(),
+      ttl_grace = 10,
+      memory_budget = 0,
+    )
+    self.manager.set_journal(lambda record, payload: self.records.append((record, payload)))
+
+  async def update(self, key, json_data):
+    await self.manager.update(key, json_data, FakeRequest(json_data))
+
+  def get_registers(self, key):
+    return self.manager.get_items(key, "registers", None)["registers"]
+
+  async def save_registers(self, key, ages, ttl = 5):
+    # Registers with ttl read the specified number of seconds ago
+    now = time.time()
+    await self.update(key, {
+      "registers": {
+        name: {"ts_label": int((now - age) * 1000), "ttl": ttl, "data": [1]}
+        for name, age in ages.items()
+      },
+    })
+
+  async def test_expired_registers_are_not_returned(self):
+    await self.save_registers("inverter", {"fresh": 1, "stale": 10, "expired": 20})
+    await self.update("inverter", {"registers": {"no_ttl": {"ts_label": 1, "data": [1]}}})
+
+    self.assertEqual(set(self.get_registers("inverter")), {"fresh", "stale", "no_ttl"})
+
+    registers = self.manager.get_items("inverter", "registers", ["fresh", "expired"])["registers"]
+    self.assertEqual(set(registers), {"fresh"})
+
+  async def test_registers_within_grace_are_returned(self):
+    # 'ttl' is the caching time of the writer, readers can accept older data
+    await self.save_registers("inverter", {"old": 4}, ttl = 3)
+    await self.save_registers("inverter", {"no_caching_time": 0}, ttl = 0)
+
+    self.assertEqual(set(self.get_registers("inverter")), {"old", "no_caching_time"})
+
+  async def test_expire_and_replay(self):
+    await self.save_registers("inverter", {"fresh": 1, "expired": 20})
+    await self.save_registers("other", {"expired": 30})
+    etag = self.manager.get_etag("inverter")
+
+    self.assertEqual(self.manager.expire(), 2)
+    # Expired registers were not returned before, so the version is the same
+    self.assertEqual(self.manager.get_etag("inverter"), etag)
+    self.assertEqual(set(get_storage(self.manager)["inverter"]["data"]["registers"]), {"fresh"})
+    self.assertEqual(get_storage(self.manager)["other"]["data"]["registers"], {})
+    self.assertEqual(self.manager.get_stat()["expired_objects"], 2)
+    assert_sizes(self, self.manager)
+
+    replica = DeyeStorageManager(config = DeyeStorageConfig(), logger = logging.getLogger())
+    for record, payload in self.records:
+      replica.apply_record(record, payload)
+
+    self.assertEqual(get_storage(replica), get_storage(self.manager))
+
+  async def test_memory_budget_evicts_least_recently_used_keys(self):
+    await self.save_registers("first", {"a": 1})
+    size = self.manager.get_stat()["bytes_used"]
+    self.manager._memory_budget = size * 2
+
+    await self.save_registers("second", {"a": 1})
+    # Reading makes the first key the most recently used
+    self.get_registers("first")
+    await self.save_registers("third", {"a": 1})
+
+    self.assertEqual(set(get_storage(self.manager)), {"first", "third"})
+    self.assertEqual(self.manager.get_stat()["evicted_keys"], 1)
+    self.assertIn(({"op": "remove", "key": "second"}, None), self.records)
+    assert_sizes(self, self.manager)
+
+  async def test_keys_count_evicts_instead_of_rejecting(self):
+    keys_count = self.manager._config.MAX_KEYS_COUNT
+
+    for i in range(keys_count + 3):
+      await self.update(f"key{i}", {"registers": {}})
+
+    self.assertEqual(len(get_storage(self.manager)), keys_count)
+    self.assertNotIn("key0", get_storage(self.manager))
+    self.assertIn(f"key{keys_count + 2}", get_storage(self.manager))
+
+  async def test_expired_registers_give_place_to_new_data(self):
+    limit = self.manager._config.MAX_JSON_STORAGE_SIZE
+    chunk = [1] * (self.manager._config.MAX_JSON_SIZE // 4)
+
+    i = 0
+    while self.manager.get_stat()["key_bytes_used"].get("big", 0) <= limit:
+      now = time.time()
+      await self.update("big", {"registers": {str(i): {"ts_label": int((now - 60) * 1000), "ttl": 5, "data": chunk}}})
+      i += 1
+
+    await self.save_registers("big", {"fresh": 1})
+    self.assertEqual(set(self.get_registers("big")), {"fresh"})
+
+class TestDeyeStorageManagerWatch(unittest.IsolatedAsyncioTestCase):
+  def setUp(self):
+    self.manager = DeyeStorageManager(
+      config = DeyeStorageConfig(),
+      logger = logging.getLogger(),
+    )
+
+  async def update(self, key, json_data):
+    await self.manager.update(key, json_data, FakeRequest(json_data))
+
+  async def watch(self, keys, since, timeout = 5.0):
+    return await self.manager.wait_for_changes(keys, "registers", since, timeout)
+
+  async def test_changed_registers_only(self):
+    await self.update("inverter", {"serial": 1, "registers": {"100": {"ts_label": 1, "data": [1]}}})
+
+    # Without cursor all data is returned at once
+    result = await self.watch(["inverter", "other"], None)
+    self.assertEqual(result["changes"], {"inverter": {"serial": 1, "registers": {"100": {"ts_label": 1, "data": [1]}}}})
+
+    task = asyncio.create_task(self.watch(["inverter", "other"], result["cursor"]))
+    await asyncio.sleep(0.05)
+    self.assertFalse(task.done())
+
+    await self.update("inverter", {"registers": {"200": {"ts_label": 2, "data": [2]}}})
+    result = await asyncio.wait_for(task, 1)
+    self.assertEqual(result["changes"], {"inverter": {"serial": 1, "registers": {"200": {"ts_label": 2, "data": [2]}}}})
+
+    # Stale register is not reported as changed
+    cursor = result["cursor"]
+    await self.update("inverter", {"registers": {"100": {"ts_label": 0, "data": [0]}, "300": {"ts_label": 3}}})
+    result = await self.watch(["inverter"], cursor)
+    self.assertEqual(set(result["changes"]["inverter"]["registers"]), {"300"})
+
+  async def test_new_and_removed_keys(self):
+    result = await self.watch(["new"], None, timeout = 0)
+    self.assertEqual(result["changes"], {})
+
+    task = asyncio.create_task(self.watch(["new"], result["cursor"]))
+    await asyncio.sleep(0)
+    await self.update("new", {"registers": {"1": {"ts_label": 1}}})
+    result = await asyncio.wait_for(task, 1)
+    self.assertEqual(result["changes"], {"new": {"registers": {"1": {"ts_label": 1}}}})
+
+    task = asyncio.create_task(self.watch(["new"], result["cursor"]))
+    await asyncio.sleep(0)
+    await self.manager.remove("new")
+    result = await asyncio.wait_for(task, 1)
+    self.assertEqual(result["changes"], {"new": None})
+
+  async def test_timeout_and_foreign_cursor(self):
+    await self.update("inverter", {"registers": {}})
+    cursor = (await self.watch(["inverter"], None))["cursor"]
+
+    start = time.monotonic()
+    result = await self.watch(["inverter"], cursor, timeout = 0.1)
+    self.assertGreaterEqual(time.monotonic() - start, 0.1)
+    self.assertEqual(result, {"cursor": cursor, "changes": {}})
+
+    # Cursor of another server run returns all data
+    result = await self.watch(["inverter"], "0-100", timeout = 0.1)
+    self.assertEqual(result["changes"], {"inverter": {"registers": {}}})
+
+  async def test_stale_update_is_not_a_change(self):
+    await self.update("inverter", {"registers": {"100": {"ts_label": 2, "data": [2]}}})
+    cursor = (await self.watch(["inverter"], None))["cursor"]
+
+    task = asyncio.create_task(self.watch(["inverter"], cursor, timeout = 0.1))
+    await asyncio.sleep(0)
+    await self.update("inverter", {"registers": {"100": {"ts_label": 1, "data": [1]}}})
+
+    self.assertEqual(await task, {"cursor": cursor, "changes": {}})
+
+  async def test_events_of_timed_out_waiters_are_removed(self):
+    await asyncio.gather(
+      self.watch(["first", "second"], None, timeout = 0.05),
+      self.watch(["first"], None, timeout = 0.1),
+    )
+
+    self.assertEqual(self.manager._changes._events, {})
+    self.assertEqual(self.manager._changes._waiters, {})
+
+class TestDeyeStorageManagerAverage(unittest.IsolatedAsyncioTestCase):
+  def setUp(self):
+    self.manager = DeyeStorageManager(
+      config = DeyeStorageConfig(),
+      logger = logging.getLogger(),
+    )
+
+  async def update(self, count1, count2, now):
+    with patch("time.time", return_value = now):
+      return await self.manager.update_average("rate", count1, count2, FakeRequest({}))
+
+  def get_average(self, now, window = None):
+    with patch("time.time", return_value = now):
+      return self.manager.get_average("rate", window)
+
+  async def test_windows_follow_recent_values(self):
+    start = 1_000_000
+    result = await self.update(0, 100, start)
+    self.assertEqual(set(result["windows"]), {"1m", "15m", "24h"})
+    self.assertEqual(result["windows"]["1m"]["average"], 0)
+
+    # All hits an hour later
+    result = await self.update(100, 0, start + 3600)
+    self.assertEqual(result["average"], 0.5)
+    self.assertAlmostEqual(result["windows"]["1m"]["average"], 1.0, places = 6)
+    self.assertAlmostEqual(result["windows"]["15m"]["average"], 100 / (100 + 100 * math.exp(-4)), places = 6)
+    self.assertAlmostEqual(result["windows"]["24h"]["average"], 100 / (100 + 100 * math.exp(-1 / 24)), places = 6)
+
+    # Reading decays the counts, but doesn't change the averages
+    average = self.get_average(start + 3660)
+    self.assertAlmostEqual(average["windows"]["1m"]["total"], 100 * math.exp(-1), places = 6)
+    self.assertAlmostEqual(average["windows"]["15m"]["average"], result["windows"]["15m"]["average"], places = 6)
+    self.assertEqual(average["count1"], 100)
+
+    self.assertEqual(set(self.get_average(start + 3660, "15m")["windows"]), {"15m"})
+
+    with self.assertRaises(Exception) as cm:
+      self.get_average(start, "1h")
+    self.assertEqual(getattr(cm.exception, "status_code", None), 422)
+
+  async def test_reset_keeps_windows(self):
+    start = 1_000_000
+    await self.update(100, 0, start)
+
+    with patch("time.time", return_value = start + 60):
+      await self.manager.reset_average_totals("rate", FakeRequest({}))
+
+    average = self.get_average(start + 60)
+    self.assertEqual(average["count1"], 0)
+    self.assertEqual(average["total"], 0)
+    self.assertAlmostEqual(average["windows"]["1m"]["count1"], 100 * math.exp(-1), places = 6)
+    self.assertEqual(average["windows"]["15m"]["average"], 1)
+
+    with self.assertRaises(Exception) as cm:
+      await self.manager.reset_average_totals("other", FakeRequest({}))
+    self.assertEqual(getattr(cm.exception, "status_code", None), 404)
+
+class TestDeyeStorageManagerHistory(unittest.IsolatedAsyncioTestCase):
+  def setUp(self):
+    self.manager = DeyeStorageManager(
+      config = DeyeStorageConfig(),
+      logger = logging.getLogger(),
+      history = DeyeStorageHistory(size = 4, max_series = 3),
+    )
+
+  async def save(self, key, registers):
+    json_data = {"registers": {name: {"ts_label": ts, "data": data} for name, (ts, data) in registers.items()}}
+    await self.manager.update(key, json_data, FakeRequest(json_data))
+
+  def get_history(self, key, **kwargs):
+    return self.manager.get_history(key, **kwargs)["registers"]
+
+  async def test_ring_buffer(self):
+    for ts in range(1, 7):
+      await self.save("inverter", {"100": (ts, [ts])})
+
+    # Repeated and stale readings are not recorded
+    await self.save("inverter", {"100": (6, [60]), "200": (1, [0xFFFF, 0xFFFF])})
+    await self.save("inverter", {"100": (5, [50])})
+
+    history = self.get_history("inverter")
+    self.assertEqual(history["100"], {"ts": [3, 4, 5, 6], "value": [3, 4, 5, 6]})
+    self.assertEqual(history["200"], {"ts": [1], "value": [0xFFFFFFFF]})
+
+    history = self.get_history("inverter", items = ["200"], signed = True)
+    self.assertEqual(history, {"200": {"ts": [1], "value": [-1]}})
+
+    history = self.get_history("inverter", items = ["100"], since = 4, until = 5)
+    self.assertEqual(history["100"]["value"], [4, 5])
+
+  async def test_downsampling(self):
+    for ts in range(10, 14):
+      await self.save("inverter", {"100": (ts, [ts * 2])})
+
+    history = self.get_history("inverter", step = 2)
+    self.assertEqual(history["100"], {"ts": [10, 12], "min": [20, 24], "max": [22, 26], "avg": [21, 25]})
+
+    with self.assertRaises(Exception) as cm:
+      self.get_history("inverter", step = 0)
+    self.assertEqual(getattr(cm.exception, "status_code", None), 422)
+
+  async def test_bounded_series(self):
+    await self.save("first", {"1": (1, [1]), "2": (1, [2])})
+    await self.save("second", {"1": (1, [1])})
+    await self.save("first", {"1": (2, [1])})
+    await self.save("third", {"1": (1, [1])})
+
+    # The series which wasn't updated for the longest time is dropped
+    self.assertEqual(set(self.get_history("first")), {"1"})
+    self.assertEqual(self.manager.get_stat()["history_series"], 3)
+    self.assertEqual(self.manager.get_stat()["history_bytes"], 3 * 4 * 16)
+
+    await self.manager.remove("first")
+    self.assertEqual(self.get_history("first"), {})
+    self.assertEqual(set(self.get_history("second")), {"1"})
+
+class TestDeyeStorageManagerSqlite(TestDeyeStorageManager):
+  """
+  The same tests with the SQLite backend shared by processes
+  """
+  def setUp(self):
+    self.temp_dir = tempfile.TemporaryDirectory()
+    self.manager = DeyeStorageManager(
+      config = DeyeStorageConfig(),
+      logger = logging.getLogger(),
+      backend = DeyeStorageSqliteBackend(os.path.join(self.temp_dir.name, "storage.sqlite")),
+    )
+
+  def tearDown(self):
+    self.manager._backend.close()
+    self.temp_dir.cleanup()
+
+class TestDeyeStorageSqliteSharing(unittest.IsolatedAsyncioTestCase):
+  """
+  Two managers on the same database work like two uvicorn workers
+  """
+  def setUp(self):
+    self.temp_dir = tempfile.TemporaryDirectory()
+    path = os.path.join(self.temp_dir.name, "storage.sqlite")
+    self.first = self.create_manager(path)
+    self.second = self.create_manager(path)
+
+  def tearDown(self):
+    self.first._backend.close()
+    self.second._backend.close()
+    self.temp_dir.cleanup()
+
+  def create_manager(self, path):
+    return DeyeStorageManager(
+      config = DeyeStorageConfig(),
+      logger = logging.getLogger(),
+      backend = DeyeStorageSqliteBackend(path),
+    )
+
+  async def update(self, manager, key, json_data):
+    await manager.update(key, json_data, FakeRequest(json_data))
+
+  def get_registers(self, manager, key):
+    return manager.get_items(key, "registers", None)["registers"]
+
+  async def test_merges_are_shared(self):
+    await self.update(self.first, "inverter", {"registers": {"100": {"ts_label": 2, "data": [2]}}})
+    self.assertEqual(self.get_registers(self.second, "inverter"), {"100": {"ts_label": 2, "data": [2]}})
+
+    # Stale data from the other process doesn't overwrite newer data
+    await self.update(self.second, "inverter", {"registers": {
+      "100": {"ts_label": 1, "data": [1]},
+      "200": {"ts_label": 1, "data": [1]},
+    }})
+
+    expected = {"100": {"ts_label": 2, "data": [2]}, "200": {"ts_label": 1, "data": [1]}}
+    self.assertEqual(self.get_registers(self.first, "inverter"), expected)
+    self.assertEqual(self.get_registers(self.second, "inverter"), expected)
+    self.assertEqual(self.first.get_etag("inverter"), self.second.get_etag("inverter"))
+    assert_sizes(self, self.first)
+
+    await self.second.remove("inverter")
+    self.assertEqual(get_storage(self.first), {})
+
+  async def test_concurrent_merges(self):
+    managers = [self.first, self.second]
+
+    await asyncio.gather(*[
+      self.update(managers[i % 2], "inverter", {"registers": {str(i): {"ts_label": i, "data": [i]}}})
+      for i in range(20)
+    ])
+
+    self.assertEqual(set(self.get_registers(self.first, "inverter")), {str(i) for i in range(20)})
+    assert_sizes(self, self.second)
+
+  async def test_watch_changes_of_other_process(self):
+    await self.update(self.first, "inverter", {"registers": {}})
+    cursor = (await self.second.wait_for_changes(["inverter"], "registers", None, 0))["cursor"]
+
+    task = asyncio.create_task(self.second.wait_for_changes(["inverter"], "registers", cursor, 5))
+    await asyncio.sleep(0.05)
+    await self.update(self.first, "inverter", {"registers": {"1": {"ts_label": 1}}})
+
+    result = await asyncio.wait_for(task, 1)
+    self.assertEqual(result["changes"], {"inverter": {"registers": {"1": {"ts_label": 1}}}})
+    self.assertEqual(result["cursor"], (await self.first.wait_for_changes([], "registers", None, 0))["cursor"])
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,158 @@
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import unittest
+
+from pathlib import Path
+
+base_path = '../..'
+current_path = Path(__file__).parent.resolve()
+modules_path = (current_path / base_path / 'modules').resolve()
+
+os.chdir(current_path)
+sys.path.append(str(modules_path))
+sys.path.append(str((current_path / base_path / 'deyestorage').resolve()))
+
+from common_modules import import_dirs
+
+import_dirs(
+  current_path,
+  [
+    os.path.join(base_path, 'common'),
+  ],
+)
+
+from src.deye_storage_config import DeyeStorageConfig
+from src.deye_storage_manager import DeyeStorageManager
+from src.deye_storage_persistence import DeyeStoragePersistence
+
+class FakeRequest:
+  """
+  Minimal request with the attributes used by DeyeStorageManager
+  """
+  def __init__(self, json_data):
+    self._body = json.dumps(json_data).encode("utf-8")
+    self.headers = {"Content-Length": str(len(self._body))}
+    self.client = None
+
+  async def body(self) -> bytes:
+    return self._body
+
+class TestDeyeStoragePersistence(unittest.IsolatedAsyncioTestCase):
+  def setUp(self):
+    self.temp_dir = tempfile.TemporaryDirectory()
+    self.config = DeyeStorageConfig()
+    self.logger = logging.getLogger()
+    self.persistences = []
+
+  def tearDown(self):
+    for persistence in self.persistences:
+      persistence._close_wal()
+    self.temp_dir.cleanup()
+
+  def start(self, restore_max_age = 0):
+    manager = DeyeStorageManager(config = self.config, logger = self.logger)
+    persistence = DeyeStoragePersistence(
+      manager = manager,
+      config = self.config,
+      logger = self.logger,
+      data_dir = self.temp_dir.name,
+      name = "cache",
+      restore_max_age = restore_max_age,
+    )
+    persistence.restore()
+    self.persistences.append(persistence)
+    return manager, persistence
+
+  async def update(self, manager, key, json_data):
+    await manager.update(key, json_data, FakeRequest(json_data))
+
+  def get_files(self):
+    return sorted(os.listdir(self.temp_dir.name))
+
+  async def populate(self, manager):
+    now_ms = int(time.time() * 1000)
+    await self.update(manager, "inv1", {"registers": {"100": {"ts_label": now_ms, "data": [1]}}})
+    await self.update(manager, "inv1", {"registers": {"101": {"ts_label": now_ms, "data": [2, 3]}}})
+    # Stale update is ignored by the merge and should be ignored by replay too
+    await self.update(manager, "inv1", {"registers": {"100": {"ts_label": now_ms - 1, "data": [9]}}})
+    await self.update(manager, "inv2", {"registers": {"100": {"ts_label": now_ms, "data": [4]}}})
+    await self.update(manager, "to_remove", {"value": 1})
+    await manager.remove("to_remove")
+    await manager.update_average("avg", 1, 3, FakeRequest({}))
+
+  async def test_restore_after_crash(self):
+    """
+    Changes are restored from the WAL if the process was killed without saving.
+    """
+    manager, _ = self.start()
+    await self.populate(manager)
+
+    restored, _ = self.start()
+
+    self.assertEqual(dict(restored._backend.items()), dict(manager._backend.items()))
+    self.assertEqual(restored.get_stat()["bytes_used"], manager.get_stat()["bytes_used"])
+
+  async def test_compaction(self):
+    """
+    WAL is merged into the snapshot and removed.
+    """
+    manager, persistence = self.start()
+    await self.populate(manager)
+
+    await persistence.compact()
+    self.assertIn("cache.json", self.get_files())
+
+    # Changes after compaction go to the new segment
+    await self.update(manager, "inv3", {"value": 2})
+
+    restored, _ = self.start()
+    self.assertEqual(dict(restored._backend.items()), dict(manager._backend.items()))
+
+  async def test_close(self):
+    manager, persistence = self.start()
+    await self.populate(manager)
+    await persistence.close()
+
+    self.assertEqual(self.get_files(), ["cache.json"])
+
+    restored, _ = self.start()
+    self.assertEqual(dict(restored._backend.items()), dict(manager._backend.items()))
+
+  async def test_torn_record_is_ignored(self):
+    manager, persistence = self.start()
+    await self.update(manager, "inv1", {"value": 1})
+    await self.update(manager, "inv1", {"value": 2})
+
+    # Simulate a crash in the middle of the last record
+    segment = persistence._get_segment_path(persistence._wal_seq)
+    with open(segment, "r+b") as f:
+      f.truncate(os.path.getsize(segment) - 5)
+
+    restored, _ = self.start()
+    self.assertEqual(restored.get("inv1"), {"value": 1})
+
+  async def test_stale_registers_are_discarded(self):
+    """
+    Register entries older than restore_max_age are discarded on restore.
+    """
+    manager, _ = self.start()
+
+    now_ms = int(time.time() * 1000)
+    await self.update(manager, "inv1", {
+      "registers": {
+        "100": {"ts_label": now_ms, "data": [1]},
+        "200": {"ts_label": now_ms - 7200 * 1000, "data": [2]},
+      }
+    })
+
+    restored, _ = self.start(restore_max_age = 3600)
+
+    self.assertEqual(list(restored.get("inv1")["registers"].keys()), ["100"])
+    self.assertEqual(restored.get_stat()["key_bytes_used"]["inv1"], len(json.dumps(restored._backend.get("inv1"))))
+
+if __name__ == '__main__':
+  unittest.main()
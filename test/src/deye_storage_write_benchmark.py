@@ -0,0 +1,237 @@
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import aiohttp
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote, urlsplit
+
+# Output and baseline paths are relative to the initial working directory
+start_path = Path.cwd()
+
+# Cache write load test.
+#
+# Sends register updates (the same shape as DeyeRegistersRemoteCacheManager sends)
+# to POST /cache/{key} of a running deyestorage with concurrent clients. Request bodies
+# are prepared before the measurement, so only the server is measured. Reports
+# throughput and latency percentiles as JSON and compares them with a saved baseline.
+#
+# Usage:
+#   cd deyestorage && DEYE_LOG_NAME=bench SERVER_PORT=5000 python deye_storage.py
+#   python -u test/src/deye_storage_write_benchmark.py --output write.json
+#   python -u test/src/deye_storage_write_benchmark.py --baseline write.json --max-regression 10
+#
+# With SERVER_SOCKET=/tmp/deye-storage.sock the server is also measured over the Unix domain socket:
+#   python -u test/src/deye_storage_write_benchmark.py --url unix://%2Ftmp%2Fdeye-storage.sock
+
+def get_percentile(values: List[float], percent: float) -> float:
+  """
+  Nearest-rank percentile
+  """
+  if not values:
+    return 0.0
+
+  ordered = sorted(values)
+  rank = max(1, -(-len(ordered) * percent // 100))
+  return ordered[int(rank) - 1]
+
+def get_args(args: List[str]) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description = 'Deye storage cache write load test')
+
+  parser.add_argument('--url', default = 'http://127.0.0.1:5000', help = 'deyestorage base URL (http:// or unix://)')
+  parser.add_argument('--requests', type = int, default = 5000, help = 'measured requests')
+  parser.add_argument('--warmup', type = int, default = 200, help = 'requests before measuring')
+  parser.add_argument('--concurrency', type = int, default = 16, help = 'concurrent clients')
+  parser.add_argument('--keys', type = int, default = 4, help = 'number of cache keys (inverters)')
+  parser.add_argument('--registers', type = int, default = 100, help = 'registers in every request')
+  parser.add_argument('--output', help = 'file to save results to')
+  parser.add_argument('--baseline', help = 'file with saved results to compare to')
+  parser.add_argument('--max-regression', type = float, default = 10, help = 'allowed throughput drop in percent')
+  parser.add_argument('-v', '--verbose', action = 'store_true')
+
+  parsed = parser.parse_args(args)
+
+  if parsed.keys < 1 or parsed.registers < 1 or parsed.concurrency < 1:
+    parser.error('keys, registers and concurrency should be positive')
+
+  return parsed
+
+def get_bodies(args: argparse.Namespace, count: int, first_ts: int) -> List[bytes]:
+  """
+  Request bodies with growing ts_label, so every update is merged and not ignored as stale
+  """
+  bodies: List[bytes] = []
+
+  for i in range(count):
+    registers = {
+      str(address): {
+        "ts_label": first_ts + i,
+        "ttl": 5,
+        "data": [(i + address + word) % 65536 for word in range(2)],
+      }
+      for address in range(args.registers)
+    }
+
+    bodies.append(json.dumps({"registers": registers}).encode('utf-8'))
+
+  return bodies
+
+async def send_all(
+  session: aiohttp.ClientSession,
+  args: argparse.Namespace,
+  bodies: List[bytes],
+  latencies: List[float],
+) -> int:
+  """
+  Sends bodies with concurrent clients, returns number of failed requests
+  """
+  queue = list(enumerate(bodies))
+  queue.reverse()
+  errors = 0
+
+  async def client() -> None:
+    nonlocal errors
+    while queue:
+      i, body = queue.pop()
+      url = f"{args.url}/cache/bench-{i % args.keys}"
+
+      start = time.perf_counter()
+      try:
+        async with session.post(url, data = body, headers = {'Content-Type': 'application/json'}) as response:
+          await response.read()
+          if response.status != 200:
+            errors += 1
+            logging.getLogger().error(f'POST {url} failed with status {response.status}')
+      except aiohttp.ClientError as e:
+        errors += 1
+        logging.getLogger().error(f'POST {url} failed: {e}')
+
+      latencies.append((time.perf_counter() - start) * 1000)
+
+  await asyncio.gather(*[client() for _ in range(args.concurrency)])
+  return errors
+
+def get_connector(args: argparse.Namespace) -> aiohttp.BaseConnector:
+  """
+  Connector for the base URL, unix:// URLs have the percent-encoded socket path as the host
+  """
+  if not args.url.startswith('unix://'):
+    return aiohttp.TCPConnector(limit = args.concurrency)
+
+  socket_path = unquote(urlsplit(args.url).netloc)
+  args.url = 'http://localhost'
+  return aiohttp.UnixConnector(path = socket_path, limit = args.concurrency)
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+  log = logging.getLogger()
+
+  first_ts = int(time.time() * 1000)
+  warmup_bodies = get_bodies(args, args.warmup, first_ts)
+  bodies = get_bodies(args, args.requests, first_ts + args.warmup)
+
+  connector = get_connector(args)
+  async with aiohttp.ClientSession(connector = connector) as session:
+    for i in range(args.keys):
+      async with session.delete(f"{args.url}/cache/bench-{i}"):
+        pass
+
+    log.info(f'Sending {args.warmup} warmup requests...')
+    await send_all(session, args, warmup_bodies, [])
+
+    log.info(f'Sending {args.requests} requests with {args.concurrency} clients...')
+    latencies: List[float] = []
+    start = time.perf_counter()
+    errors = await send_all(session, args, bodies, latencies)
+    duration = time.perf_counter() - start
+
+    for i in range(args.keys):
+      async with session.delete(f"{args.url}/cache/bench-{i}"):
+        pass
+
+  return {
+    'requests': len(latencies),
+    'errors': errors,
+    'duration_s': round(duration, 3),
+    'requests_per_s': round(len(latencies) / duration, 1) if duration else 0,
+    'body_bytes': round(sum(len(body) for body in bodies) / max(1, len(bodies))),
+    'latency_ms': {
+      'p50': round(get_percentile(latencies, 50), 2),
+      'p95': round(get_percentile(latencies, 95), 2),
+      'p99': round(get_percentile(latencies, 99), 2),
+      'max': round(max(latencies, default = 0), 2),
+    },
+  }
+
+def compare_with_baseline(
+  result: Dict[str, Any],
+  baseline: Dict[str, Any],
+  max_regression: float,
+) -> Optional[str]:
+  """
+  Adds comparison with the baseline to the result, returns description of the regression
+  """
+  base = baseline.get('result', {})
+
+  def get_change(current: float, base: float) -> Optional[float]:
+    return round((current - base) / base * 100, 1) if base else None
+
+  comparison = {
+    f'latency_{name}_change_percent': get_change(result['latency_ms'][name], base['latency_ms'][name])
+    for name in ('p50', 'p95', 'p99')
+  }
+
+  change = get_change(result['requests_per_s'], base.get('requests_per_s', 0))
+  comparison['requests_per_s_change_percent'] = change
+  result['baseline'] = comparison
+
+  if change is not None and -change > max_regression:
+    return f'requests_per_s_change_percent = {change}'
+
+  return None
+
+async def main(argv: List[str]) -> int:
+  args = get_args(argv)
+
+  logging.basicConfig(
+    level = logging.INFO if args.verbose else logging.WARNING,
+    format = "[%(asctime)s.%(msecs)03d] [%(levelname)s] %(message)s",
+    datefmt = "%Y-%m-%d %H:%M:%S",
+  )
+
+  log = logging.getLogger()
+  result = await run(args)
+
+  report: Dict[str, Any] = {
+    'config': {
+      'requests': args.requests,
+      'warmup': args.warmup,
+      'concurrency': args.concurrency,
+      'keys': args.keys,
+      'registers': args.registers,
+    },
+    'result': result,
+  }
+
+  regression: Optional[str] = None
+  if args.baseline:
+    with open(start_path / args.baseline, 'r', encoding = 'utf-8') as f:
+      regression = compare_with_baseline(result, json.load(f), args.max_regression)
+
+  output = json.dumps(report, indent = 2)
+  print(output)
+
+  if args.output:
+    with open(start_path / args.output, 'w', encoding = 'utf-8') as f:
+      f.write(output)
+
+  if regression:
+    log.error(f'Regression: {regression}')
+
+  return 1 if regression or result['errors'] else 0
+
+if __name__ == "__main__":
+  sys.exit(asyncio.run(main(sys.argv[1:])))
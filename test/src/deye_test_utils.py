@@ -6,6 +6,7 @@ import os
 import socket
 import sys
 import time
+import tempfile
 import uvicorn
 import logging.config
 import multiprocessing
@@ -24,7 +25,7 @@ class DeyeTestUtils:
   storage_server_port = 5000
 
   @staticmethod
-  def setup_test_environment(log_name: str) -> None:
+  def setup_test_environment(log_name: str, inverters_count: int = 4) -> None:
     os.environ[EnvUtils.IS_TEST_RUN] = 'true'
     os.environ[EnvUtils.DEYE_LOG_NAME] = log_name
 
@@ -35,13 +36,16 @@ class DeyeTestUtils:
     os.environ[EnvUtils.DEYE_MASTER_LOGGER_SERIAL] = str(num)
     os.environ[EnvUtils.DEYE_MASTER_LOGGER_PORT] = str(port)
 
-    for i in range(1, 4):
+    for i in range(1, inverters_count):
       num += 1
       port += 1
       os.environ[EnvUtils.DEYE_SLAVE_LOGGER_HOST.format(i)] = '127.0.0.1'
       os.environ[EnvUtils.DEYE_SLAVE_LOGGER_SERIAL.format(i)] = str(num)
       os.environ[EnvUtils.DEYE_SLAVE_LOGGER_PORT.format(i)] = str(port)
 
+    # Remove slaves left from the previous setup with more inverters
+    os.environ.pop(EnvUtils.DEYE_SLAVE_LOGGER_HOST.format(max(1, inverters_count)), None)
+
     os.environ[EnvUtils.REMOTE_CACHE_SERVER_URL] = ""
 
   @staticmethod
@@ -52,20 +56,22 @@ class DeyeTestUtils:
   @staticmethod
   @contextmanager
   def storage_server():
-    # Start the server process
-    server_process = DeyeTestUtils._run_storage_server()
-    try:
-      yield
-    finally:
-      # Stop the server process automatically when exiting the 'with' block
-      DeyeTestUtils._stop_storage_server(server_process)
+    # Fresh data directory, so snapshots of the previous runs are not restored
+    with tempfile.TemporaryDirectory() as data_dir:
+      # Start the server process
+      server_process = DeyeTestUtils._run_storage_server(data_dir)
+      try:
+        yield
+      finally:
+        # Stop the server process automatically when exiting the 'with' block
+        DeyeTestUtils._stop_storage_server(server_process)
 
   @staticmethod
-  def _run_storage_server() -> multiprocessing.Process:
+  def _run_storage_server(data_dir: str) -> multiprocessing.Process:
     logger = logging.getLogger()
     logger.info(f"Starting storage server at {DeyeTestUtils.storage_server_host}:"
                 f"{DeyeTestUtils.storage_server_port}...")
-    server_process = multiprocessing.Process(target = DeyeTestUtils._run_server, daemon = True)
+    server_process = multiprocessing.Process(target = DeyeTestUtils._run_server, args = (data_dir, ), daemon = True)
     server_process.start()
 
     # Waiting for server start
@@ -88,7 +94,7 @@ class DeyeTestUtils:
     logger.info("Storage server stopped.")
 
   @staticmethod
-  def _run_server() -> None:
+  def _run_server(data_dir: str) -> None:
     # Load the config from the JSON file
     current_dir = Path(__file__).parent.resolve()
     config_path = current_dir / "log_config.json"
@@ -111,6 +117,7 @@ class DeyeTestUtils:
         l = logging.getLogger(logger_name)
         l.propagate = False
 
+      os.environ["DATA_DIR"] = data_dir
       from deye_storage import app
 
       uvicorn.run(